@@ -0,0 +1,349 @@
+"""
+Admission control and weighted fair queuing of generations.
+
+Every generation is given a cost estimate before any work starts, from the
+size of the uploads, their page counts and the number of images that may
+need OCR. The ``AdmissionController`` then:
+
+- rejects requests that would take a client over its in-flight cost quota
+  (or that could never fit), so one client cannot queue unbounded work
+- limits how many generations a client runs at once
+- orders queued work by weighted fair queuing across clients, so a client
+  submitting many large jobs does not delay everyone else's small ones
+
+Clients are identified by API key or IP address; weights let trusted or
+interactive clients get a larger share.
+"""
+
+import asyncio
+import heapq
+import io
+import itertools
+import logging
+import os
+import re
+import zipfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+_PDF_PAGE = re.compile(rb"/Type\s*/Page\b")
+_PDF_IMAGE = re.compile(rb"/Subtype\s*/Image\b")
+# Typical size of a page of a PDF with compressed object streams
+_BYTES_PER_COMPRESSED_PAGE = 50 * 1024
+_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".bmp", ".tif", ".tiff"}
+
+
+@dataclass(frozen=True)
+class CostEstimate:
+    """Up-front estimate of the work a generation needs."""
+
+    files: int
+    bytes: int
+    pages: int
+    images: int
+    cost: float
+
+
+@dataclass(frozen=True)
+class CostWeights:
+    """Cost units per unit of input; one unit is roughly one small text document."""
+
+    base: float = 1.0
+    per_page: float = 0.05
+    per_image: float = 0.5  # images may need OCR
+    per_megabyte: float = 0.2
+
+    @classmethod
+    def from_env(cls) -> "CostWeights":
+        return cls(
+            base=float(os.environ.get("ADMISSION_COST_BASE", cls.base)),
+            per_page=float(os.environ.get("ADMISSION_COST_PER_PAGE", cls.per_page)),
+            per_image=float(os.environ.get("ADMISSION_COST_PER_IMAGE", cls.per_image)),
+            per_megabyte=float(os.environ.get("ADMISSION_COST_PER_MB", cls.per_megabyte)),
+        )
+
+
+def count_pdf_pages(data: bytes) -> int:
+    """
+    Count PDF pages without parsing the document.
+
+    Admission runs in the API process on untrusted uploads, so it never
+    parses them (that happens in the extraction sandbox). When the page
+    objects are hidden in compressed object streams, the page count is
+    estimated from the file size instead.
+    """
+    pages = len(_PDF_PAGE.findall(data))
+    if pages:
+        return pages
+    return max(1, len(data) // _BYTES_PER_COMPRESSED_PAGE)
+
+
+def count_docx_images(data: bytes) -> int:
+    try:
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            return sum(1 for name in archive.namelist() if name.startswith("word/media/"))
+    except zipfile.BadZipFile:
+        return 0
+
+
+def estimate_cost(sources: Sequence[Any], weights: Optional[CostWeights] = None) -> CostEstimate:
+    """
+    Estimate the cost of generating a brief from the given documents.
+
+    Args:
+        sources: Loaded documents (anything with ``filename`` and ``data``,
+            e.g. DocumentSource); None entries are skipped
+
+    Returns:
+        CostEstimate: Input totals and the cost in units
+    """
+    weights = weights or CostWeights()
+    files = total_bytes = pages = images = 0
+    for source in sources:
+        if source is None:
+            continue
+        data, extension = source.data, Path(source.filename or "").suffix.lower()
+        files += 1
+        total_bytes += len(data)
+        if extension == ".pdf" or data[:5] == b"%PDF-":
+            pages += count_pdf_pages(data)
+            images += len(_PDF_IMAGE.findall(data))
+        elif extension == ".docx":
+            pages += 1
+            images += count_docx_images(data)
+        elif extension in _IMAGE_EXTENSIONS:
+            pages += 1
+            images += 1
+        else:
+            pages += 1
+
+    cost = (
+        weights.base
+        + pages * weights.per_page
+        + images * weights.per_image
+        + total_bytes / (1024 * 1024) * weights.per_megabyte
+    )
+    return CostEstimate(files, total_bytes, pages, images, round(cost, 3))
+
+
+class AdmissionError(Exception):
+    """A request was refused; ``retry_after`` suggests when to try again (seconds)."""
+
+    def __init__(self, message: str, retry_after: Optional[int] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@dataclass
+class _ClientState:
+    weight: float
+    running: int = 0
+    queued: int = 0
+    cost: float = 0.0  # cost of running and queued work
+    last_finish: float = 0.0  # WFQ finish tag of the client's latest request
+
+
+@dataclass(order=True)
+class _Waiter:
+    finish: float
+    seq: int
+    start: float = field(compare=False)
+    client: str = field(compare=False)
+    cost: float = field(compare=False)
+    future: "asyncio.Future" = field(compare=False)
+
+
+class Ticket:
+    """An admitted request; release it when the work is done."""
+
+    def __init__(self, controller: "AdmissionController", client: str, cost: float):
+        self.controller = controller
+        self.client = client
+        self.cost = cost
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self)
+
+
+class AdmissionController:
+    """Per-client quotas plus weighted fair queuing for the shared worker slots."""
+
+    def __init__(
+        self,
+        max_concurrency: int = 4,
+        client_max_concurrency: int = 2,
+        client_max_cost: float = 100.0,
+        max_queued: int = 100,
+        weights: Optional[Dict[str, float]] = None,
+        default_weight: float = 1.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.client_max_concurrency = client_max_concurrency
+        self.client_max_cost = client_max_cost
+        self.max_queued = max_queued
+        self.weights = weights or {}
+        self.default_weight = default_weight
+        self._clients: Dict[str, _ClientState] = {}
+        self._queue: List[_Waiter] = []
+        self._running = 0
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """
+        Build a controller from ``ADMISSION_*`` environment variables.
+
+        ADMISSION_CLIENT_WEIGHTS takes ``client=weight`` pairs separated by
+        commas, e.g. ``frontend-key=4,batch-key=0.5``.
+        """
+        weights = {}
+        for pair in os.environ.get("ADMISSION_CLIENT_WEIGHTS", "").split(","):
+            if "=" in pair:
+                client, weight = pair.split("=", 1)
+                weights[client.strip()] = float(weight)
+        # With several server processes (SERVER_WORKERS) each gets its share of the cores
+        cores = max(1, (os.cpu_count() or 4) // int(os.environ.get("SERVER_WORKERS", 1)))
+        return cls(
+            max_concurrency=int(os.environ.get("ADMISSION_MAX_CONCURRENCY", cores)),
+            client_max_concurrency=int(os.environ.get("ADMISSION_CLIENT_MAX_CONCURRENCY", 2)),
+            client_max_cost=float(os.environ.get("ADMISSION_CLIENT_MAX_COST", 100.0)),
+            max_queued=int(os.environ.get("ADMISSION_MAX_QUEUED", 100)),
+            weights=weights,
+        )
+
+    def _client(self, client: str) -> _ClientState:
+        if client not in self._clients:
+            self._clients[client] = _ClientState(self.weights.get(client, self.default_weight))
+        return self._clients[client]
+
+    def check(self, client: str, cost: float) -> None:
+        """
+        Refuse the request up front if it cannot be admitted.
+
+        Raises:
+            AdmissionError: If the request alone exceeds the client quota, the
+                client's in-flight cost would exceed it, or the queue is full
+        """
+        if cost > self.client_max_cost:
+            raise AdmissionError(
+                f"Request cost {cost:.1f} exceeds the per-client limit of {self.client_max_cost:.1f}; "
+                "split the documents into smaller requests"
+            )
+        state = self._clients.get(client)
+        if state is not None and state.cost + cost > self.client_max_cost:
+            raise AdmissionError(
+                f"Too much work in progress for this client ({state.cost:.1f} of "
+                f"{self.client_max_cost:.1f} cost units)",
+                retry_after=30,
+            )
+        if len(self._queue) >= self.max_queued:
+            raise AdmissionError("Server is busy, too many queued requests", retry_after=10)
+
+    async def acquire(
+        self, client: str, cost: float, on_queued: Optional[Callable[[int], None]] = None
+    ) -> Ticket:
+        """
+        Wait for a worker slot, in weighted fair order across clients.
+
+        Args:
+            client: Client identity for quotas and fair queuing
+            cost: Estimated cost of the work
+            on_queued: Called once the request is in the queue, with the number
+                of queued requests ahead of it (0 when admitted right away)
+
+        Raises:
+            AdmissionError: See ``check``
+        """
+        self.check(client, cost)
+        state = self._client(client)
+        state.cost += cost
+        state.queued += 1
+
+        # WFQ tags: a client's requests are spaced by cost / weight in virtual time
+        start = max(self._virtual_time, state.last_finish)
+        state.last_finish = start + cost / state.weight
+        waiter = _Waiter(
+            state.last_finish, next(self._seq), start, client, cost,
+            asyncio.get_running_loop().create_future(),
+        )
+        heapq.heappush(self._queue, waiter)
+        self._dispatch()
+        if on_queued is not None:
+            on_queued(sorted(self._queue).index(waiter) if waiter in self._queue else 0)
+
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Admitted just as the caller went away
+                waiter.future.result().release()
+            elif waiter in self._queue:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+                state.queued -= 1
+                self._refund(client, cost)
+            raise
+
+    @asynccontextmanager
+    async def admit(
+        self, client: str, cost: float, on_queued: Optional[Callable[[int], None]] = None
+    ) -> AsyncIterator[Ticket]:
+        """Hold a worker slot for the duration of the block (see ``acquire``)."""
+        ticket = await self.acquire(client, cost, on_queued)
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def _dispatch(self) -> None:
+        while self._running < self.max_concurrency and self._queue:
+            # Lowest finish tag among clients that are under their concurrency limit
+            eligible = [
+                w for w in self._queue
+                if self._clients[w.client].running < self.client_max_concurrency
+            ]
+            if not eligible:
+                return
+            waiter = min(eligible)
+            self._queue.remove(waiter)
+            heapq.heapify(self._queue)
+
+            state = self._clients[waiter.client]
+            state.queued -= 1
+            state.running += 1
+            self._running += 1
+            self._virtual_time = max(self._virtual_time, waiter.start)
+            waiter.future.set_result(Ticket(self, waiter.client, waiter.cost))
+
+    def _release(self, ticket: Ticket) -> None:
+        self._running -= 1
+        self._clients[ticket.client].running -= 1
+        self._refund(ticket.client, ticket.cost)
+        self._dispatch()
+
+    def _refund(self, client: str, cost: float) -> None:
+        state = self._clients[client]
+        state.cost = max(0.0, state.cost - cost)
+        if state.running == 0 and state.queued == 0:
+            # Idle clients start afresh (their finish tag would be in the past anyway)
+            del self._clients[client]
+        if not self._queue and self._running == 0:
+            self._virtual_time = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self._running,
+            "queued": len(self._queue),
+            "clients": {
+                client: {"running": s.running, "queued": s.queued, "cost": round(s.cost, 3)}
+                for client, s in self._clients.items()
+            },
+        }
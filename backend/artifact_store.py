@@ -0,0 +1,336 @@
+"""
+Persistent store of per-brief artefacts.
+
+Every generated brief has a ``document_id`` (as in the PRD API) under which
+the output of each pipeline stage is kept:
+
+- ``context``: the consolidated text extracted from the uploads
+- ``model``: the validated model JSON
+- ``html``: the rendered template
+- ``pdf``: the final document
+
+so a brief can be regenerated from any stage: re-rendering with a new
+template starts from the stored model and skips extraction and the LLM.
+
+Metadata lives in SQLite; artefact bodies are content-addressed blobs
+(``blobs/ab/abcdef...``), so identical artefacts are stored once. Documents
+not accessed within the TTL are removed, then the least recently used ones
+until the blobs fit the size budget; unreferenced blobs are deleted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGES = ("context", "model", "html", "pdf")
+
+_DOCUMENT_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    accessed REAL NOT NULL,
+    metadata TEXT NOT NULL DEFAULT '{}'
+);
+CREATE TABLE IF NOT EXISTS artifacts (
+    document_id TEXT NOT NULL REFERENCES documents(document_id) ON DELETE CASCADE,
+    stage TEXT NOT NULL,
+    digest TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (document_id, stage)
+);
+CREATE INDEX IF NOT EXISTS artifacts_digest ON artifacts(digest);
+"""
+
+
+def new_document_id() -> str:
+    return uuid.uuid4().hex
+
+
+def validate_document_id(document_id: str) -> str:
+    if not _DOCUMENT_ID.match(document_id or ""):
+        raise ValueError(f"Invalid document id: {document_id!r}")
+    return document_id
+
+
+def downstream_stages(stage: str) -> tuple:
+    """The stage and every stage after it."""
+    if stage not in STAGES:
+        raise ValueError(f"Unknown stage '{stage}', expected one of {list(STAGES)}")
+    return STAGES[STAGES.index(stage):]
+
+
+class ArtifactStore:
+    """SQLite metadata plus content-addressed blob files."""
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 2 * 1024 ** 3,
+        ttl: float = 30 * 24 * 3600,
+        gc_interval: float = 300.0,
+        blob_grace: float = 60.0,
+    ):
+        self.directory = Path(directory)
+        self.blob_dir = self.directory / "blobs"
+        self.blob_dir.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.directory / "artifacts.db"
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.gc_interval = gc_interval
+        self.blob_grace = blob_grace
+        # The first GC runs one interval after start-up, off the save path
+        self._last_gc = time.time()
+        self._gc_lock = threading.Lock()
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @classmethod
+    def from_env(cls) -> "ArtifactStore":
+        """Build a store from ``ARTIFACT_STORE_*`` environment variables."""
+        directory = os.environ.get(
+            "ARTIFACT_STORE_DIR", os.path.join(tempfile.gettempdir(), "ba_solution_brief", "artifacts")
+        )
+        return cls(
+            Path(directory),
+            max_bytes=int(os.environ.get("ARTIFACT_STORE_MAX_BYTES", 2 * 1024 ** 3)),
+            ttl=float(os.environ.get("ARTIFACT_STORE_TTL", 30 * 24 * 3600)),
+        )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # One short-lived connection per operation: safe across threads, and
+        # WAL lets readers proceed while another thread writes
+        db = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA foreign_keys=ON")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def _blob_path(self, digest: str) -> Path:
+        return self.blob_dir / digest[:2] / digest
+
+    def _write_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._blob_path(digest)
+        if path.exists():
+            # Refresh the mtime so GC's grace period covers the new reference
+            os.utime(path)
+        else:
+            path.parent.mkdir(exist_ok=True)
+            fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+            with os.fdopen(fd, "wb") as tmp:
+                tmp.write(data)
+            os.replace(tmp_name, path)
+        return digest
+
+    def create_document(self, document_id: Optional[str] = None, **metadata: Any) -> str:
+        """Register a document (a no-op for existing ids, apart from metadata updates)."""
+        document_id = validate_document_id(document_id or new_document_id())
+        now = time.time()
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT metadata FROM documents WHERE document_id = ?", (document_id,)
+            ).fetchone()
+            if row is None:
+                db.execute(
+                    "INSERT INTO documents (document_id, created, accessed, metadata) VALUES (?, ?, ?, ?)",
+                    (document_id, now, now, json.dumps(metadata)),
+                )
+            elif metadata:
+                merged = {**json.loads(row[0]), **metadata}
+                db.execute(
+                    "UPDATE documents SET metadata = ?, accessed = ? WHERE document_id = ?",
+                    (json.dumps(merged), now, document_id),
+                )
+        return document_id
+
+    def save(self, document_id: str, stage: str, data: bytes) -> str:
+        """
+        Store the artefact of a stage, replacing the previous one.
+
+        Returns:
+            str: The blob digest
+        """
+        downstream_stages(stage)
+        self.create_document(document_id)
+        digest = self._write_blob(data)
+        with self._connect() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO artifacts (document_id, stage, digest, size, created) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (document_id, stage, digest, len(data), time.time()),
+            )
+        self.maybe_gc()
+        return digest
+
+    def load(self, document_id: str, stage: str) -> Optional[bytes]:
+        """Return the stored artefact, or None if the document or stage is missing."""
+        validate_document_id(document_id)
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT digest FROM artifacts WHERE document_id = ? AND stage = ?",
+                (document_id, stage),
+            ).fetchone()
+            if row is None:
+                return None
+            db.execute(
+                "UPDATE documents SET accessed = ? WHERE document_id = ?", (time.time(), document_id)
+            )
+        try:
+            return self._blob_path(row[0]).read_bytes()
+        except FileNotFoundError:
+            logger.warning(f"Blob {row[0]} of {document_id}/{stage} is missing")
+            return None
+
+    def get_document(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata of a document and its stored stages."""
+        validate_document_id(document_id)
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT created, accessed, metadata FROM documents WHERE document_id = ?",
+                (document_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            artifacts = db.execute(
+                "SELECT stage, digest, size, created FROM artifacts WHERE document_id = ?",
+                (document_id,),
+            ).fetchall()
+        stages = {stage: {"digest": d, "size": s, "created": c} for stage, d, s, c in artifacts}
+        return {
+            "document_id": document_id,
+            "created": row[0],
+            "accessed": row[1],
+            "metadata": json.loads(row[2]),
+            "stages": {stage: stages[stage] for stage in STAGES if stage in stages},
+        }
+
+    def invalidate(self, document_id: str, from_stage: str) -> None:
+        """Drop the artefacts of ``from_stage`` and every later stage."""
+        stages = downstream_stages(from_stage)
+        with self._connect() as db:
+            db.execute(
+                f"DELETE FROM artifacts WHERE document_id = ? AND stage IN ({','.join('?' * len(stages))})",
+                (document_id, *stages),
+            )
+
+    def delete_document(self, document_id: str) -> bool:
+        validate_document_id(document_id)
+        with self._connect() as db:
+            deleted = db.execute("DELETE FROM documents WHERE document_id = ?", (document_id,)).rowcount
+        self._delete_unreferenced_blobs()
+        return bool(deleted)
+
+    def maybe_gc(self) -> None:
+        """
+        Start ``gc`` in a background thread if the last run is older than
+        ``gc_interval``, so the save that triggers it does not wait for it.
+        """
+        if time.time() - self._last_gc < self.gc_interval or self._gc_lock.locked():
+            return
+        self._last_gc = time.time()
+        threading.Thread(target=self._gc_in_background, name="artifact-gc", daemon=True).start()
+
+    def _gc_in_background(self) -> None:
+        try:
+            self.gc()
+        except Exception as e:
+            logger.warning(f"Artefact store GC failed: {e}")
+
+    def gc(self) -> Dict[str, int]:
+        """
+        Apply the retention policy.
+
+        Removes documents not accessed within the TTL, then the least recently
+        accessed documents until the referenced blobs fit ``max_bytes``, then
+        every blob no artefact refers to.
+
+        Returns:
+            Dict[str, int]: Number of documents and blobs removed
+        """
+        with self._gc_lock:
+            self._last_gc = time.time()
+            with self._connect() as db:
+                removed = db.execute(
+                    "DELETE FROM documents WHERE accessed < ?", (time.time() - self.ttl,)
+                ).rowcount
+
+                # Blob sizes are counted once however many artefacts share them
+                rows = db.execute(
+                    "SELECT d.document_id, a.digest, a.size FROM documents d "
+                    "LEFT JOIN artifacts a ON a.document_id = d.document_id ORDER BY d.accessed, d.document_id"
+                ).fetchall()
+                references: Dict[str, int] = {}
+                sizes: Dict[str, int] = {}
+                by_document: Dict[str, list] = {}
+                for document_id, digest, size in rows:
+                    blobs_of = by_document.setdefault(document_id, [])
+                    if digest is not None:
+                        blobs_of.append(digest)
+                        references[digest] = references.get(digest, 0) + 1
+                        sizes[digest] = size
+                total = sum(sizes.values())
+
+                # Least recently accessed first (dicts keep the query order);
+                # a blob only frees space once its last reference is gone
+                evicted = []
+                for document_id, digests in by_document.items():
+                    if total <= self.max_bytes:
+                        break
+                    evicted.append((document_id,))
+                    for digest in digests:
+                        references[digest] -= 1
+                        if references[digest] == 0:
+                            total -= sizes[digest]
+                db.executemany("DELETE FROM documents WHERE document_id = ?", evicted)
+                removed += len(evicted)
+
+            blobs = self._delete_unreferenced_blobs()
+        if removed or blobs:
+            logger.info(f"Artefact store GC removed {removed} documents and {blobs} blobs")
+        return {"documents": removed, "blobs": blobs}
+
+    def _delete_unreferenced_blobs(self) -> int:
+        with self._connect() as db:
+            referenced = {digest for (digest,) in db.execute("SELECT DISTINCT digest FROM artifacts")}
+        deleted = 0
+        cutoff = time.time() - self.blob_grace
+        for path in self.blob_dir.glob("*/*"):
+            if path.name in referenced:
+                continue
+            try:
+                # Skip recent files: a concurrent save may not have recorded
+                # its artefact row (or finished writing) yet
+                if path.stat().st_mtime > cutoff:
+                    continue
+                path.unlink()
+                deleted += 1
+            except FileNotFoundError:
+                continue
+        return deleted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._connect() as db:
+            documents = db.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            total = db.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT digest, size FROM artifacts)"
+            ).fetchone()[0]
+        return {"documents": documents, "bytes": total, "max_bytes": self.max_bytes, "ttl": self.ttl}
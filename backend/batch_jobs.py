@@ -0,0 +1,329 @@
+"""
+Batch generation of many briefs from one shared document set.
+
+The shared context is extracted once by the caller; each batch item then
+only pays for its own model stage and render. Items run concurrently,
+bounded separately for the model stage and the render stage (renders are
+sized to the CPU count), and results are either streamed back as a ZIP
+archive or tracked as per-item jobs (in memory, or in a shared SQLite database
+when several server workers run, see serve.py). Job stores are blocking and
+are called from worker threads; a finished job's PDF can be handed to
+``keep`` so it outlives cache eviction.
+"""
+
+import asyncio
+import io
+import json
+import logging
+import os
+import re
+import sqlite3
+import time
+import uuid
+import zipfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+
+
+class BatchItem(BaseModel):
+    """Per-item variation of a batch brief."""
+
+    name: str = Field(..., description="Product or customer name, used for the file name")
+    context: Optional[str] = Field(None, description="Extra context appended to the shared context")
+    overrides: Dict[str, Any] = Field(
+        default_factory=dict, description="Model fields replaced after the model stage"
+    )
+
+
+class BatchResult(BaseModel):
+    """Outcome of one batch item."""
+
+    index: int
+    name: str
+    key: Optional[str] = None
+    pdf: Optional[bytes] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+ModelFn = Callable[[str], Awaitable[BaseModel]]
+RenderFn = Callable[[BaseModel, str], Awaitable[Tuple[bytes, str]]]
+# Persists a finished job's result under its job id (e.g. in the artefact store)
+KeepFn = Callable[[str, BatchResult], Awaitable[None]]
+
+
+def apply_overrides(model: BaseModel, overrides: Dict[str, Any]) -> BaseModel:
+    """Return the model with overrides applied and re-validated."""
+    if not overrides:
+        return model
+    return type(model).model_validate({**model.model_dump(), **overrides})
+
+
+def item_context(shared_context: str, item: BatchItem) -> str:
+    if not item.context:
+        return shared_context
+    return f"{shared_context}\n\n=== Item: {item.name} ===\n{item.context}"
+
+
+async def generate_batch(
+    shared_context: str,
+    items: List[BatchItem],
+    model_fn: ModelFn,
+    render_fn: RenderFn,
+    model_concurrency: int = 8,
+    render_concurrency: Optional[int] = None,
+) -> AsyncIterator[BatchResult]:
+    """
+    Generate one brief per item, yielding results as they complete.
+
+    Args:
+        shared_context: Context extracted once from the shared documents
+        items: Per-item variations
+        model_fn: Async model stage (context -> model)
+        render_fn: Async render stage (model, context -> PDF bytes and cache key)
+        model_concurrency: Items in the model stage at once
+        render_concurrency: Items rendering at once (defaults to the CPU count)
+    """
+    model_slots = asyncio.Semaphore(model_concurrency)
+    render_slots = asyncio.Semaphore(render_concurrency or os.cpu_count() or 1)
+
+    async def run(index: int, item: BatchItem) -> BatchResult:
+        start = time.perf_counter()
+        context = item_context(shared_context, item)
+        try:
+            async with model_slots:
+                model = await model_fn(context)
+            model = apply_overrides(model, item.overrides)
+            async with render_slots:
+                pdf, key = await render_fn(model, context)
+            return BatchResult(
+                index=index, name=item.name, key=key, pdf=pdf, seconds=time.perf_counter() - start
+            )
+        except Exception as e:
+            logger.error(f"Batch item {index} ({item.name}) failed: {e}")
+            return BatchResult(
+                index=index, name=item.name, error=str(e), seconds=time.perf_counter() - start
+            )
+
+    tasks = [asyncio.ensure_future(run(i, item)) for i, item in enumerate(items)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def safe_filename(name: str, used: set) -> str:
+    """File-system and archive safe, unique file stem for an item name."""
+    stem = re.sub(r"[^A-Za-z0-9._-]+", "_", name).strip("._") or "brief"
+    candidate, counter = stem, 2
+    while candidate in used:
+        candidate = f"{stem}_{counter}"
+        counter += 1
+    used.add(candidate)
+    return candidate
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only, non-seekable sink that hands written bytes to the stream."""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+async def stream_zip(results: AsyncIterator[BatchResult]) -> AsyncIterator[bytes]:
+    """
+    Stream a ZIP archive, adding each brief as soon as it is ready.
+
+    Failed items are written as ``<name>.error.txt`` so one failure does not
+    abort the archive.
+    """
+    sink = _ChunkBuffer()
+    used: set = set()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for result in results:
+            stem = safe_filename(result.name, used)
+            if result.error is not None:
+                archive.writestr(f"{stem}.error.txt", result.error)
+            else:
+                # PDFs are already compressed; storing them keeps the stream fast
+                archive.writestr(f"{stem}.pdf", result.pdf)
+            yield sink.drain()
+    yield sink.drain()
+
+
+class JobStore:
+    """In-memory status of per-item batch jobs."""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+
+    def create(self, batch_id: str, name: str) -> str:
+        return self.create_many(batch_id, [name])[0]
+
+    def create_many(self, batch_id: str, names: List[str]) -> List[str]:
+        """Register one queued job per name, returning their ids in order."""
+        self._expire()
+        job_ids = []
+        for name in names:
+            job_id = uuid.uuid4().hex
+            self._jobs[job_id] = {
+                "job_id": job_id,
+                "batch_id": batch_id,
+                "name": name,
+                "status": "queued",
+                "created": time.time(),
+            }
+            job_ids.append(job_id)
+        return job_ids
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        self.update_many([job_id], **fields)
+
+    def update_many(
+        self, job_ids: List[str], where_status: Optional[Tuple[str, ...]] = None, **fields: Any
+    ) -> None:
+        """Set fields on several jobs, optionally only those in one of ``where_status``."""
+        for job_id in job_ids:
+            job = self._jobs.get(job_id)
+            if job is not None and (where_status is None or job["status"] in where_status):
+                job.update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        return self._jobs.get(job_id)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for job_id in [j for j, job in self._jobs.items() if job["created"] < cutoff]:
+            del self._jobs[job_id]
+
+
+class SQLiteJobStore:
+    """Job status in a shared SQLite database (WAL), for multi-process servers."""
+
+    def __init__(self, path: Union[str, Path], ttl: float = 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        with self._connect() as db:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS batch_jobs "
+                "(job_id TEXT PRIMARY KEY, created REAL NOT NULL, job TEXT NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            with db:
+                yield db
+        finally:
+            db.close()
+
+    def create(self, batch_id: str, name: str) -> str:
+        return self.create_many(batch_id, [name])[0]
+
+    def create_many(self, batch_id: str, names: List[str]) -> List[str]:
+        """Register one queued job per name in a single transaction."""
+        self._expire()
+        now = time.time()
+        jobs = [
+            {"job_id": uuid.uuid4().hex, "batch_id": batch_id, "name": name, "status": "queued", "created": now}
+            for name in names
+        ]
+        with self._connect() as db:
+            db.executemany(
+                "INSERT INTO batch_jobs (job_id, created, job) VALUES (?, ?, ?)",
+                [(job["job_id"], now, json.dumps(job)) for job in jobs],
+            )
+        return [job["job_id"] for job in jobs]
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        self.update_many([job_id], **fields)
+
+    def update_many(
+        self, job_ids: List[str], where_status: Optional[Tuple[str, ...]] = None, **fields: Any
+    ) -> None:
+        """
+        Set fields on several jobs, optionally only those in one of ``where_status``.
+
+        The fields are merged into the stored JSON by one UPDATE (json_patch),
+        so concurrent updates from other workers are not lost. As with
+        json_patch, a field set to None is removed.
+        """
+        if not job_ids:
+            return
+        query = (
+            "UPDATE batch_jobs SET job = json_patch(job, ?) "
+            f"WHERE job_id IN ({','.join('?' * len(job_ids))})"
+        )
+        params: List[Any] = [json.dumps(fields), *job_ids]
+        if where_status:
+            query += f" AND json_extract(job, '$.status') IN ({','.join('?' * len(where_status))})"
+            params.extend(where_status)
+        with self._connect() as db:
+            db.execute(query, params)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as db:
+            row = db.execute("SELECT job FROM batch_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _expire(self) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM batch_jobs WHERE created < ?", (time.time() - self.ttl,))
+
+
+def job_store_from_env() -> Union[JobStore, SQLiteJobStore]:
+    """A shared SQLite store when SHARED_STATE_DB is set (multi-worker mode), else in-memory."""
+    path = os.environ.get("SHARED_STATE_DB")
+    return SQLiteJobStore(path) if path else JobStore()
+
+
+async def run_batch_jobs(
+    job_ids: List[str],
+    store: Union[JobStore, SQLiteJobStore],
+    results: AsyncIterator[BatchResult],
+    keep: Optional[KeepFn] = None,
+) -> None:
+    """
+    Consume batch results and record them against their job ids.
+
+    Store calls run in worker threads. With ``keep``, each finished PDF is
+    persisted under its job id before the job is marked done, and the job
+    records ``document_id``; a job whose result cannot be kept fails.
+    """
+    await asyncio.to_thread(store.update_many, job_ids, status="running")
+    async for result in results:
+        job_id = job_ids[result.index]
+        fields: Dict[str, Any] = {"status": "done", "key": result.key, "seconds": result.seconds}
+        if result.error is None and keep is not None:
+            try:
+                await keep(job_id, result)
+                fields["document_id"] = job_id
+            except Exception as e:
+                logger.error(f"Could not keep the result of batch job {job_id}: {e}")
+                result.error = f"Could not store the result: {e}"
+        if result.error is not None:
+            fields = {"status": "failed", "error": result.error, "seconds": result.seconds}
+        await asyncio.to_thread(store.update, job_id, **fields)
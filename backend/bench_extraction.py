@@ -0,0 +1,227 @@
+"""
+Benchmark plain and layout-aware PDF extraction (PDF_EXTRACTION_MODE).
+
+By default a marketing-style document is generated: a running header and
+footer, a full-width heading, two text columns and a ruled table on every
+third page. Each mode runs in a fresh subprocess so time and peak memory are
+measured in isolation. Reports seconds, pages/s, peak RSS and output size
+and, for the generated document, how well the output keeps the reading
+order (the fraction of consecutive lines as written that are consecutive
+in the output) and how many copies of the running header are left.
+
+Usage (from the repository root):
+    python -m backend.bench_extraction [--pages 300] [--pdf brief.pdf ...]
+"""
+
+import argparse
+import io
+import multiprocessing
+import random
+import re
+import resource
+import time
+from typing import Any, Dict, List, Tuple
+
+from PyPDF2 import PdfWriter
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
+from pdfminer.fontmetrics import FONT_METRICS
+
+from .document_processor import DocumentProcessor
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792
+MARGIN, GUTTER = 54, 24
+COLUMN_WIDTH = (PAGE_WIDTH - 2 * MARGIN - GUTTER) / 2
+BODY_SIZE, LEADING = 10, 13
+HEADER = "BlueAlly Solution Brief - Confidential"
+
+_WORDS = (
+    "cloud platform migration security workloads governance automation analytics "
+    "resilience compliance latency throughput customers partners roadmap pipeline "
+    "architecture integration observability modernization outcomes licensing "
+    "support deployment identity network storage backup recovery insights"
+).split()
+
+
+def _width(text: str, font: str, size: float) -> float:
+    widths = FONT_METRICS[font][1]
+    return sum(widths.get(char, 556) for char in text) * size / 1000
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _show(text: str, x: float, top: float, size: float, font: str = "/F1") -> str:
+    # PDF y grows upwards from the bottom; ``top`` is measured from the top
+    return f"BT {font} {size} Tf 1 0 0 1 {x:.2f} {PAGE_HEIGHT - top - size:.2f} Tm ({_escape(text)}) Tj ET\n"
+
+
+def _wrap(words: List[str], width: float) -> List[str]:
+    lines, current = [], ""
+    for word in words:
+        candidate = f"{current} {word}".strip()
+        if current and _width(candidate, "Helvetica", BODY_SIZE) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+
+def _table(rng: random.Random, top: float) -> Tuple[str, List[str]]:
+    rows = [["Service", "Tier", "Hours", "Price"]] + [
+        [rng.choice(_WORDS).title(), rng.choice(["Basic", "Pro", "Enterprise"]), str(rng.randint(8, 200)),
+         f"${rng.randint(1, 99)},000"]
+        for _ in range(4)
+    ]
+    width, height = (PAGE_WIDTH - 2 * MARGIN) / 4, 18
+    ops = ["0.5 w\n"]
+    for r, row in enumerate(rows):
+        for c, cell in enumerate(row):
+            ops.append(_show(cell, MARGIN + c * width + 4, top + r * height + 4, 9))
+    for r in range(len(rows) + 1):
+        y = PAGE_HEIGHT - top - r * height
+        ops.append(f"{MARGIN} {y} m {PAGE_WIDTH - MARGIN} {y} l S\n")
+    for c in range(5):
+        x = MARGIN + c * width
+        ops.append(f"{x} {PAGE_HEIGHT - top} m {x} {PAGE_HEIGHT - top - len(rows) * height} l S\n")
+    return "".join(ops), [" ".join(row) for row in rows]
+
+
+def make_layout_pdf(pages: int, seed: int = 0) -> Tuple[bytes, List[str]]:
+    """
+    Generate a two-column document.
+
+    Returns:
+        The PDF and, per page, its body text in reading order
+    """
+    rng = random.Random(seed)
+    writer = PdfWriter()
+    fonts = DictionaryObject()
+    for name, base in (("/F1", "/Helvetica"), ("/F2", "/Helvetica-Bold")):
+        fonts[NameObject(name)] = writer._add_object(DictionaryObject({
+            NameObject("/Type"): NameObject("/Font"),
+            NameObject("/Subtype"): NameObject("/Type1"),
+            NameObject("/BaseFont"): NameObject(base),
+            NameObject("/Encoding"): NameObject("/WinAnsiEncoding"),
+        }))
+    expected = []
+    for number in range(1, pages + 1):
+        heading = f"{rng.choice(_WORDS).title()} {rng.choice(_WORDS)} overview {number}"
+        ops = [_show(HEADER, MARGIN, 24, 8), _show(heading, MARGIN, 70, 16, "/F2")]
+        text = [heading]
+        has_table = number % 3 == 0
+        column_bottom = 560 if has_table else 700
+        for column in range(2):
+            x, top = MARGIN + column * (COLUMN_WIDTH + GUTTER), 110
+            while True:
+                words = [rng.choice(_WORDS) for _ in range(rng.randint(25, 60))]
+                lines = _wrap(words, COLUMN_WIDTH)
+                if top + len(lines) * LEADING > column_bottom:
+                    break
+                for line in lines:
+                    ops.append(_show(line, x, top, BODY_SIZE))
+                    top += LEADING
+                text.extend(lines)
+                top += LEADING
+        if has_table:
+            table_ops, rows = _table(rng, 590)
+            ops.append(table_ops)
+            text.extend(rows)
+        ops.append(_show(f"Page {number} of {pages}", PAGE_WIDTH - MARGIN - 60, 760, 8))
+
+        writer.add_blank_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        page = writer.pages[-1]
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): fonts})
+        content = DecodedStreamObject()
+        content.set_data("".join(ops).encode("latin-1"))
+        page[NameObject("/Contents")] = writer._add_object(content)
+        expected.append("\n".join(text))
+
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue(), expected
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _run_mode(layout: bool, pdf: bytes, queue: "multiprocessing.Queue") -> None:
+    try:
+        start = time.perf_counter()
+        text = DocumentProcessor.extract_text_from_pdf(pdf, layout=layout)
+        queue.put({"seconds": time.perf_counter() - start, "peak_rss_mb": _peak_rss_mb(), "text": text})
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+
+
+def _normalize(line: str) -> str:
+    return " ".join(line.replace("|", " ").split())
+
+
+def _lines_in_order(expected: List[str], text: str) -> float:
+    """
+    Fraction of consecutive lines of the text as written that are also
+    consecutive lines of the output. Interleaved columns score near zero.
+    """
+    position = {_normalize(line): i for i, line in enumerate(text.split("\n")) if line.strip()}
+    written = [_normalize(line) for page in expected for line in page.split("\n")]
+    pairs = list(zip(written, written[1:]))
+    in_order = sum(
+        1 for first, second in pairs
+        if first in position and position.get(second, -1) > position[first]
+        and position[second] - position[first] <= 2  # a blank line between blocks is fine
+    )
+    return in_order / len(pairs) if pairs else 1.0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pdf", nargs="+", help="Benchmark these files instead of a generated document")
+    args = parser.parse_args()
+
+    if args.pdf:
+        documents: List[Tuple[str, bytes, Any]] = []
+        for path in args.pdf:
+            with open(path, "rb") as f:
+                documents.append((path, f.read(), None))
+    else:
+        start = time.perf_counter()
+        pdf, expected = make_layout_pdf(args.pages)
+        print(f"Generated {args.pages} pages ({len(pdf) / 1024:.0f} KiB) in {time.perf_counter() - start:.1f}s")
+        documents = [(f"generated, {args.pages} pages", pdf, expected)]
+
+    ctx = multiprocessing.get_context("spawn")
+    for name, pdf, expected in documents:
+        print(name)
+        for mode, layout in (("plain", False), ("layout", True)):
+            queue = ctx.Queue()
+            process = ctx.Process(target=_run_mode, args=(layout, pdf, queue))
+            process.start()
+            result: Dict[str, Any] = queue.get()
+            process.join()
+            if "error" in result:
+                print(f"  {mode:>6}: failed ({result['error']})")
+                continue
+            pages = args.pages if expected is not None else None
+            line = (
+                f"  {mode:>6}: {result['seconds']:.2f}s"
+                + (f" ({pages / result['seconds']:.0f} pages/s)" if pages else "")
+                + f", peak RSS {result['peak_rss_mb']:.0f} MB, {len(result['text'])} chars,"
+                f" {len(result['text'].split())} words"
+            )
+            if expected is not None:
+                line += (
+                    f", lines in order {_lines_in_order(expected, result['text']):.3f},"
+                    f" header lines {result['text'].count(HEADER)}"
+                )
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Benchmark the PDF renderer backends on examples/template.html.
+
+For each backend, renders run in a fresh subprocess so startup cost and peak
+memory (including child processes such as Chromium) are measured in
+isolation. Reports cold start, warm throughput, peak RSS and, for every
+backend other than the reference, fidelity against the reference output
+(page count and text similarity of the extracted PDF text).
+
+Usage (from the repository root):
+    python -m backend.bench_renderers [--renders 20] [--backends chromium weasyprint]
+
+Results:
+    No numbers have been measured yet. On the development host that added
+    this benchmark (2026-10-19, `--renders 5`) neither backend could run:
+    pyppeteer could not download Chromium without network access, and
+    weasyprint and pango were not installed. Record the output here, with
+    the host, when the benchmark is run on a node with both backends.
+"""
+
+import argparse
+import difflib
+import io
+import multiprocessing
+import resource
+import time
+from typing import Any, Dict, List
+
+from examples.model import ProjectModel
+
+from .get_document_bytes_from_model import RenderOptions, get_document_bytes_from_model
+from .renderers import RENDERERS, close_renderers
+
+SAMPLE_MODEL = ProjectModel(
+    title="Cloud Modernization Accelerator",
+    intro="Move legacy workloads to a secure, cost-efficient cloud platform in weeks, not months.",
+    problem=[
+        "Aging on-premises infrastructure drives up maintenance costs",
+        "Release cycles are slowed by manual provisioning",
+        "Security controls are inconsistent across environments",
+        "Teams lack visibility into cloud spend",
+    ],
+    solution_desc="A packaged assessment, landing zone and migration factory.",
+    implementation="Delivered by certified architects using infrastructure as code.",
+    approach=["Assess", "Design the landing zone", "Migrate in waves", "Optimize"],
+    about="BlueAlly is a technology solutions provider serving enterprises nationwide.",
+    getting_started="Contact us to schedule a two-hour discovery workshop.",
+)
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (own + children) / 1024
+
+
+def _run_backend(name: str, renders: int, queue: "multiprocessing.Queue") -> None:
+    try:
+        options = RenderOptions(renderer=name)
+        start = time.perf_counter()
+        first = get_document_bytes_from_model(SAMPLE_MODEL, options=options)
+        cold = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for _ in range(renders):
+            get_document_bytes_from_model(SAMPLE_MODEL, options=options)
+        warm = time.perf_counter() - start
+
+        close_renderers()
+        queue.put({
+            "backend": name,
+            "cold_start_s": cold,
+            "renders_per_s": renders / warm if warm else float("inf"),
+            "peak_rss_mb": _peak_rss_mb(),
+            "pdf_bytes": len(first),
+            "pdf": first,
+        })
+    except Exception as e:
+        queue.put({"backend": name, "error": f"{type(e).__name__}: {e}"})
+
+
+def _pdf_text(pdf: bytes) -> List[str]:
+    import pdfplumber
+
+    with pdfplumber.open(io.BytesIO(pdf)) as document:
+        return [page.extract_text() or "" for page in document.pages]
+
+
+def _fidelity(reference: bytes, candidate: bytes) -> Dict[str, Any]:
+    ref_pages, cand_pages = _pdf_text(reference), _pdf_text(candidate)
+    ref_words = " ".join(ref_pages).split()
+    cand_words = " ".join(cand_pages).split()
+    return {
+        "pages": f"{len(cand_pages)} vs {len(ref_pages)}",
+        "text_similarity": round(difflib.SequenceMatcher(None, ref_words, cand_words).ratio(), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--renders", type=int, default=20)
+    parser.add_argument("--backends", nargs="+", default=list(RENDERERS))
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    results = []
+    for name in args.backends:
+        queue = ctx.Queue()
+        process = ctx.Process(target=_run_backend, args=(name, args.renders, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    reference = next((r for r in results if "pdf" in r), None)
+    for result in results:
+        if "error" in result:
+            print(f"{result['backend']:>11}: unavailable ({result['error']})")
+            continue
+        line = (
+            f"{result['backend']:>11}: cold start {result['cold_start_s']:.2f}s, "
+            f"{result['renders_per_s']:.2f} renders/s, peak RSS {result['peak_rss_mb']:.0f} MB, "
+            f"{result['pdf_bytes'] / 1024:.0f} KiB"
+        )
+        if reference is not None and result is not reference:
+            fidelity = _fidelity(reference["pdf"], result["pdf"])
+            line += (
+                f", pages {fidelity['pages']} ({reference['backend']}), "
+                f"text similarity {fidelity['text_similarity']}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Bookkeeping for offline bulk runs (see cli): work-unit discovery, the
+resumable manifest, and the per-stage timing summary.
+
+Each finished unit is appended to the manifest with a fingerprint of its
+inputs, so a rerun skips units that are already done (and previous failures
+unless asked to retry) and picks up inputs that changed. The pipeline itself
+is passed in as ``process``, which runs in a process pool.
+"""
+
+import json
+import logging
+import os
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.jsonl"
+SUMMARY_NAME = "summary.json"
+STAGES = ("extract", "model", "render")
+
+# process(unit, paths, out_path, options) -> manifest record, run in a worker process
+ProcessFn = Callable[[str, List[str], str, Dict[str, Any]], Dict[str, Any]]
+
+
+def discover_units(input_dir: Path, group_by: str, exclude: Optional[Path] = None) -> Dict[str, List[Path]]:
+    """
+    Find the work units under ``input_dir``.
+
+    With ``file`` every document is its own brief; with ``directory`` all
+    documents in the same directory are combined into one brief. Files under
+    ``exclude`` (the output directory, when it is inside ``input_dir``) are
+    skipped, so a rerun does not take its own PDFs and manifest as inputs.
+
+    Returns:
+        Dict[str, List[Path]]: Unit id (relative path) to its input files
+    """
+    excluded = exclude.resolve() if exclude is not None else None
+    files = sorted(
+        p for p in input_dir.rglob("*")
+        if p.is_file()
+        and not p.name.startswith(".")
+        and not (excluded and p.resolve().is_relative_to(excluded))
+    )
+    units: Dict[str, List[Path]] = {}
+    for path in files:
+        if group_by == "directory":
+            unit = str(path.parent.relative_to(input_dir)) or "."
+        else:
+            unit = str(path.relative_to(input_dir))
+        units.setdefault(unit, []).append(path)
+    return units
+
+
+def unit_fingerprint(paths: List[Path]) -> str:
+    """Cheap change detector for resume: names, sizes and mtimes of the inputs."""
+    return ";".join(f"{p.name}:{p.stat().st_size}:{p.stat().st_mtime_ns}" for p in paths)
+
+
+def output_path(output_dir: Path, unit: str, group_by: str) -> Path:
+    """
+    Where a unit's PDF is written. Files keep their extension
+    (``brief.docx.pdf``), so inputs that differ only in extension do not
+    overwrite each other.
+    """
+    if group_by == "directory":
+        name = "root" if unit == "." else unit
+        return output_dir / f"{name}.pdf"
+    return output_dir / f"{unit}.pdf"
+
+
+def check_output_collisions(outputs: Dict[str, Path]) -> None:
+    """
+    Raises:
+        ValueError: If two units would write the same PDF (e.g. a
+            directory named ``root`` next to top-level files)
+    """
+    owners: Dict[Path, str] = {}
+    for unit, out in outputs.items():
+        if out in owners:
+            raise ValueError(f"Units {owners[out]!r} and {unit!r} would both be written to {out}")
+        owners[out] = unit
+
+
+def load_manifest(manifest_path: Path) -> Dict[str, Dict[str, Any]]:
+    """Latest manifest record per unit (later lines win)."""
+    records: Dict[str, Dict[str, Any]] = {}
+    if manifest_path.exists():
+        for line in manifest_path.read_text().splitlines():
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write leaves a partial last line
+                continue
+            records[record["unit"]] = record
+    return records
+
+
+def summarize(records: List[Dict[str, Any]], wall_time: float) -> Dict[str, Any]:
+    """Per-stage timing statistics and the slowest units."""
+    done = [r for r in records if r.get("status") == "done"]
+    stages = {}
+    for stage in STAGES:
+        values = sorted(r["timings"][stage] for r in done if stage in r.get("timings", {}))
+        if values:
+            stages[stage] = {
+                "total": sum(values),
+                "mean": statistics.mean(values),
+                "p50": values[len(values) // 2],
+                "p95": values[min(len(values) - 1, int(len(values) * 0.95))],
+                "max": values[-1],
+            }
+    slowest = sorted(done, key=lambda r: sum(r["timings"].values()), reverse=True)[:10]
+    return {
+        "processed": len(records),
+        "succeeded": len(done),
+        "failed": [{"unit": r["unit"], "error": r.get("error")} for r in records if r.get("status") == "failed"],
+        "wall_time": wall_time,
+        "stages": stages,
+        "slowest": [{"unit": r["unit"], "seconds": sum(r["timings"].values())} for r in slowest],
+    }
+
+
+def run(
+    process: ProcessFn,
+    input_dir: Path,
+    output_dir: Path,
+    group_by: str = "file",
+    workers: Optional[int] = None,
+    options: Optional[Dict[str, Any]] = None,
+    retry_failed: bool = False,
+) -> Dict[str, Any]:
+    """
+    Process every unit under ``input_dir`` that is not already done.
+
+    Args:
+        process: Runs the pipeline for one unit in a worker process (must be
+            picklable, i.e. a module-level function)
+        input_dir: Directory tree of input documents
+        output_dir: Where the PDFs, manifest and summary are written
+        group_by: ``file`` or ``directory``, see ``discover_units``
+        workers: Worker processes (default: CPU count)
+        options: Passed through to ``process``
+        retry_failed: Re-run units whose last attempt failed
+
+    Returns:
+        Dict[str, Any]: The run summary (also written to ``SUMMARY_NAME``)
+
+    Raises:
+        ValueError: See ``check_output_collisions``
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = output_dir / MANIFEST_NAME
+    previous = load_manifest(manifest_path)
+    units = discover_units(input_dir, group_by, exclude=output_dir)
+    outputs = {unit: output_path(output_dir, unit, group_by) for unit in units}
+    check_output_collisions(outputs)
+
+    pending = {}
+    for unit, paths in units.items():
+        fingerprint = unit_fingerprint(paths)
+        record = previous.get(unit)
+        out = outputs[unit]
+        if record and record.get("fingerprint") == fingerprint:
+            if record.get("status") == "done" and out.exists():
+                continue
+            if record.get("status") == "failed" and not retry_failed:
+                continue
+        pending[unit] = (paths, fingerprint, out)
+
+    logger.info(f"{len(units)} units found, {len(units) - len(pending)} already processed")
+
+    records: List[Dict[str, Any]] = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool, \
+            manifest_path.open("a") as manifest:
+        futures = {
+            pool.submit(process, unit, [str(p) for p in paths], str(out), options or {}): (unit, fp)
+            for unit, (paths, fp, out) in pending.items()
+        }
+        for future in as_completed(futures):
+            unit, fingerprint = futures[future]
+            try:
+                record = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. killed for memory)
+                record = {"unit": unit, "status": "failed", "error": f"{type(e).__name__}: {e}", "timings": {}}
+            record["fingerprint"] = fingerprint
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            records.append(record)
+            logger.info(
+                f"[{len(records)}/{len(pending)}] {unit}: {record['status']} "
+                f"({sum(record['timings'].values()):.2f}s)"
+            )
+
+    summary = summarize(records, time.perf_counter() - start)
+    (output_dir / SUMMARY_NAME).write_text(json.dumps(summary, indent=2))
+    return summary
+
+
+def format_summary(summary: Dict[str, Any], summary_path: Path) -> str:
+    """The end-of-run report printed by the CLI."""
+    lines = [
+        f"Processed {summary['processed']} units: {summary['succeeded']} succeeded, "
+        f"{len(summary['failed'])} failed in {summary['wall_time']:.1f}s"
+    ]
+    for stage, stats in summary["stages"].items():
+        lines.append(f"  {stage:>7}: p50 {stats['p50']:.2f}s  p95 {stats['p95']:.2f}s  max {stats['max']:.2f}s")
+    lines.append(f"Summary written to {summary_path}")
+    return "\n".join(lines)
@@ -0,0 +1,102 @@
+"""
+Offline bulk processing: turn a directory tree of documents into PDFs.
+
+Runs the same extraction -> model -> render pipeline as the API, without
+HTTP, in a process pool sized to the CPU count. Progress is recorded in a
+manifest so an interrupted run resumes where it stopped, and a summary of
+per-file stage timings is written at the end (see bulk_runner).
+
+Usage (from the repository root):
+    python -m backend.cli INPUT_DIR OUTPUT_DIR [--group-by file|directory] [--workers N]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .bulk_runner import SUMMARY_NAME, format_summary, run
+from .document_processor import get_context_from_paths
+from .get_document_bytes_from_model import RenderOptions, get_document_bytes_from_model
+from .get_model_from_context import extract_model_with_llm, get_model_from_context, llm_model_enabled
+from .llm_client import LLMClient
+
+
+async def _extract_model_with_llm(context: str) -> Any:
+    # Each unit runs in its own event loop, so it gets its own client
+    client = LLMClient()
+    try:
+        return await extract_model_with_llm(context, complete=client.complete)
+    finally:
+        await client.aclose()
+
+
+def build_model(context: str) -> Any:
+    """Group 2, as in the API: the LLM in field groups when configured, else the placeholder."""
+    if llm_model_enabled():
+        return asyncio.run(_extract_model_with_llm(context))
+    return get_model_from_context(context)
+
+
+def process_unit(
+    unit: str, paths: List[str], out_path: str, options: Dict[str, Any]
+) -> Dict[str, Any]:
+    """
+    Run the pipeline for one unit (executed in a worker process).
+
+    Returns:
+        A manifest record with status and per-stage timings
+    """
+    timings: Dict[str, float] = {}
+    record: Dict[str, Any] = {"unit": unit, "output": out_path, "timings": timings}
+    try:
+        start = time.perf_counter()
+        context = get_context_from_paths(paths)  # Group 1
+        timings["extract"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        model = build_model(context)  # Group 2
+        timings["model"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        pdf = get_document_bytes_from_model(model, context, RenderOptions(**options))  # Group 3
+        timings["render"] = time.perf_counter() - start
+
+        Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(out_path).write_bytes(pdf)
+        record.update(status="done", bytes=len(pdf))
+    except Exception as e:
+        record.update(status="failed", error=f"{type(e).__name__}: {e}")
+    return record
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Bulk-convert a directory tree of documents to PDF briefs.")
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--group-by", choices=("file", "directory"), default="file",
+                        help="one brief per file, or per directory of files")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--renderer", default=None, help="PDF renderer backend")
+    parser.add_argument("--no-page-numbers", action="store_true")
+    parser.add_argument("--retry-failed", action="store_true", help="re-run units that failed previously")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    options = {"renderer": args.renderer, "include_page_numbers": not args.no_page_numbers}
+    try:
+        summary = run(
+            process_unit, args.input_dir, args.output_dir, args.group_by, args.workers, options, args.retry_failed
+        )
+    except ValueError as e:
+        parser.error(str(e))
+
+    print(format_summary(summary, args.output_dir / SUMMARY_NAME))
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
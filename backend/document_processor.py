@@ -0,0 +1,1044 @@
+"""
+Transport-neutral document extraction core.
+
+Everything here works on plain ``DocumentSource`` values (file name, bytes and
+optional content type), so the same code serves the FastAPI endpoint, the
+CLI, worker processes and benchmarks. ``load_source`` accepts paths, bytes,
+sync or async file-like objects (including FastAPI's ``UploadFile``) and
+async byte streams; ``extract_context`` is synchronous and its inputs are
+picklable, so it can run in a thread or process pool.
+"""
+
+import asyncio
+import inspect
+import io
+import mimetypes
+import os
+import re
+import warnings
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from pathlib import Path
+import logging
+
+# Document parsing libraries
+try:
+    import PyPDF2
+    from pdfplumber import PDF
+except ImportError:
+    PyPDF2 = None
+    PDF = None
+
+try:
+    from pdfminer.converter import PDFLayoutAnalyzer
+    from pdfminer.layout import LTFigure, LTLine, LTRect
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdffont import PDFUnicodeNotDefined
+    from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.utils import apply_matrix_rect
+except ImportError:
+    PDFLayoutAnalyzer = None
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    from docx import Document
+except ImportError:
+    Document = None
+
+try:
+    from PIL import Image
+    import pytesseract
+except ImportError:
+    Image = None
+    pytesseract = None
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+try:
+    import markdown
+except ImportError:
+    markdown = None
+
+# Setup logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class DocumentProcessor:
+    """Handles extraction of text from various document formats."""
+
+    SUPPORTED_FORMATS = {
+        'text/plain': ['txt', 'text', 'log', 'csv'],
+        'application/pdf': ['pdf'],
+        'application/vnd.openxmlformats-officedocument.wordprocessingml.document': ['docx'],
+        'application/msword': ['doc'],
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet': ['xlsx'],
+        'application/vnd.ms-excel': ['xls'],
+        'text/markdown': ['md', 'markdown'],
+        'text/html': ['html', 'htm'],
+        'image/jpeg': ['jpg', 'jpeg'],
+        'image/png': ['png'],
+        'image/gif': ['gif'],
+        'image/bmp': ['bmp']
+    }
+
+    @staticmethod
+    def extract_text_from_pdf(
+        file_content: bytes,
+        on_page: Optional[Callable[[int, int], None]] = None,
+        layout: Optional[bool] = None,
+    ) -> str:
+        """
+        Extract text from PDF file.
+
+        ``on_page(done, total)`` is called after each page, for progress reporting.
+        With ``layout`` (default: PDF_EXTRACTION_MODE=layout) the text is
+        ordered by layout analysis, see extract_text_from_pdf_layout.
+        """
+        if layout is None:
+            layout = pdf_layout_mode()
+        if layout:
+            if np is None or PDFLayoutAnalyzer is None:
+                logger.warning("numpy or pdfminer.six not installed, using plain PDF extraction")
+            else:
+                try:
+                    return DocumentProcessor.extract_text_from_pdf_layout(file_content, on_page)
+                except Exception as e:
+                    logger.warning(f"PDF layout analysis failed, using plain extraction: {e}")
+
+        if PDF:
+            # Use pdfplumber for better text extraction
+            try:
+                text_parts = []
+                with PDF(io.BytesIO(file_content)) as pdf:
+                    for number, page in enumerate(pdf.pages, 1):
+                        text = page.extract_text()
+                        if text:
+                            text_parts.append(text)
+                        if on_page:
+                            on_page(number, len(pdf.pages))
+                return '\n\n'.join(text_parts)
+            except Exception as e:
+                logger.warning(f"pdfplumber failed, falling back to PyPDF2: {e}")
+
+        if PyPDF2:
+            # Fallback to PyPDF2
+            try:
+                pdf_reader = PyPDF2.PdfReader(io.BytesIO(file_content))
+                text_parts = []
+                for page_num in range(len(pdf_reader.pages)):
+                    page = pdf_reader.pages[page_num]
+                    text_parts.append(page.extract_text())
+                    if on_page:
+                        on_page(page_num + 1, len(pdf_reader.pages))
+                return '\n\n'.join(text_parts)
+            except Exception as e:
+                logger.error(f"Failed to extract text from PDF: {e}")
+                return ""
+
+        raise ImportError("PDF processing libraries not installed. Install 'PyPDF2' or 'pdfplumber'")
+
+    @staticmethod
+    def extract_text_from_pdf_layout(
+        file_content: bytes, on_page: Optional[Callable[[int, int], None]] = None
+    ) -> str:
+        """
+        Extract text from a PDF in reading order.
+
+        ``extract_text`` reads each page in horizontal lines, so the lines of
+        side-by-side columns are interleaved. Here columns are read one
+        after the other, ruled and aligned tables are kept as ``a | b`` rows
+        and headers and footers repeated on every page are kept only once
+        (see analyze_page_layout and remove_repeated_margins).
+        """
+        resources = PDFResourceManager(caching=True)
+        device = _PageGeometry(resources)
+        interpreter = PDFPageInterpreter(resources, device)
+        document = PDFDocument(PDFParser(io.BytesIO(file_content)))
+        pdf_pages = list(PDFPage.create_pages(document))
+        pages = []
+        for number, pdf_page in enumerate(pdf_pages, 1):
+            interpreter.process_page(pdf_page)
+            height, chars, rulings = device.page
+            pages.append((height, analyze_page_layout(chars, find_ruled_tables(chars, rulings))))
+            if on_page:
+                on_page(number, len(pdf_pages))
+        removed = remove_repeated_margins(pages)
+        if removed:
+            logger.info(f"Removed {removed} repeated header/footer lines")
+        page_texts = ["\n\n".join(block.text for block in blocks) for _, blocks in pages]
+        return '\n\n'.join(text for text in page_texts if text)
+
+    @staticmethod
+    def extract_text_from_docx(file_content: bytes) -> str:
+        """Extract text from DOCX file."""
+        if not Document:
+            raise ImportError("python-docx not installed. Install it with: pip install python-docx")
+
+        try:
+            doc = Document(io.BytesIO(file_content))
+            text_parts = []
+
+            # Extract paragraphs
+            for paragraph in doc.paragraphs:
+                if paragraph.text.strip():
+                    text_parts.append(paragraph.text)
+
+            # Extract text from tables
+            for table in doc.tables:
+                for row in table.rows:
+                    row_text = []
+                    for cell in row.cells:
+                        if cell.text.strip():
+                            row_text.append(cell.text.strip())
+                    if row_text:
+                        text_parts.append(' | '.join(row_text))
+
+            return '\n\n'.join(text_parts)
+        except Exception as e:
+            logger.error(f"Failed to extract text from DOCX: {e}")
+            return ""
+
+    @staticmethod
+    def extract_text_from_excel(file_content: bytes) -> str:
+        """Extract text from Excel file."""
+        if not openpyxl:
+            raise ImportError("openpyxl not installed. Install it with: pip install openpyxl")
+
+        try:
+            workbook = openpyxl.load_workbook(io.BytesIO(file_content), read_only=True)
+            text_parts = []
+
+            for sheet_name in workbook.sheetnames:
+                sheet = workbook[sheet_name]
+                text_parts.append(f"=== Sheet: {sheet_name} ===")
+
+                for row in sheet.iter_rows(values_only=True):
+                    row_values = [str(cell) if cell is not None else '' for cell in row]
+                    if any(row_values):
+                        text_parts.append(' | '.join(row_values))
+
+            workbook.close()
+            return '\n\n'.join(text_parts)
+        except Exception as e:
+            logger.error(f"Failed to extract text from Excel: {e}")
+            return ""
+
+    @staticmethod
+    def extract_text_from_image(file_content: bytes) -> str:
+        """Extract text from image using OCR."""
+        if not Image or not pytesseract:
+            raise ImportError("PIL and pytesseract not installed. Install with: pip install pillow pytesseract")
+
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter("error", Image.DecompressionBombWarning)
+                # Image.open checks the pixel count from the header, before decoding
+                image = Image.open(io.BytesIO(file_content))
+            text = pytesseract.image_to_string(image)
+            return text.strip()
+        except Exception as e:
+            logger.error(f"Failed to extract text from image: {e}")
+            return ""
+
+    @staticmethod
+    def extract_text_from_html(file_content: bytes) -> str:
+        """Extract text from HTML file."""
+        try:
+            from bs4 import BeautifulSoup
+            soup = BeautifulSoup(file_content, 'html.parser')
+
+            # Remove script and style elements
+            for script in soup(["script", "style"]):
+                script.decompose()
+
+            # Get text
+            text = soup.get_text()
+
+            # Break into lines and remove leading/trailing space
+            lines = (line.strip() for line in text.splitlines())
+            # Break multi-headlines into a line each
+            chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+            # Drop blank lines
+            text = '\n'.join(chunk for chunk in chunks if chunk)
+
+            return text
+        except ImportError:
+            # Fallback to basic extraction
+            text = file_content.decode('utf-8', errors='ignore')
+            # Remove HTML tags
+            import re
+            text = re.sub('<[^<]+?>', '', text)
+            return text.strip()
+        except Exception as e:
+            logger.error(f"Failed to extract text from HTML: {e}")
+            return ""
+
+
+def pdf_layout_mode() -> bool:
+    """Whether PDFs are extracted with layout analysis (PDF_EXTRACTION_MODE=layout)."""
+    return os.environ.get("PDF_EXTRACTION_MODE", "plain").lower() == "layout"
+
+
+# Layout analysis. Distances are in multiples of the median font size, so the
+# same settings work for 8pt footnotes and 14pt marketing copy.
+WORD_GAP = 0.15  # horizontal gap read as a space
+CELL_GAP = 1.0  # horizontal gap that ends a text segment (column or table cell)
+COLUMN_GAP = 1.5  # minimum width of the empty strip between two columns
+BLOCK_GAP = 0.8  # vertical gap that starts a new block
+SPANNING = 0.6  # segments wider than this fraction of the text are headings/full-width text
+MIN_COLUMN_RATIO = 2.0  # column width / gutter width below which "columns" are table cells
+MARGIN_BAND = 0.1  # top and bottom fraction of the page searched for headers and footers
+MAX_RULINGS = 2000  # pages with more lines and rectangles are artwork; no table detection
+
+
+@dataclass
+class LayoutLine:
+    text: str
+    top: float
+    bottom: float
+
+
+@dataclass
+class LayoutBlock:
+    """A paragraph, heading or table, in reading order."""
+
+    kind: str  # "text" or "table"
+    lines: List[LayoutLine]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines)
+
+
+@dataclass
+class _Segments:
+    """Runs of characters on one line, separated by gaps wider than a space."""
+
+    x0: Any
+    x1: Any
+    top: Any
+    bottom: Any
+    line: Any
+    text: List[str]
+
+
+def _char_segments(chars: Sequence[Dict[str, Any]], size: float) -> _Segments:
+    n = len(chars)
+    x0 = np.fromiter((c["x0"] for c in chars), float, n)
+    x1 = np.fromiter((c["x1"] for c in chars), float, n)
+    top = np.fromiter((c["top"] for c in chars), float, n)
+    bottom = np.fromiter((c["bottom"] for c in chars), float, n)
+
+    # Lines: characters whose vertical centres are within half a line of each other
+    mid = (top + bottom) / 2
+    by_mid = np.argsort(mid, kind="stable")
+    line = np.empty(n, dtype=int)
+    line[by_mid] = np.concatenate([[0], np.cumsum(np.diff(mid[by_mid]) > 0.5 * size)])
+
+    # Segments: split each line, ordered left to right, at wide gaps
+    order = np.lexsort((x0, line))
+    x0, x1, top, bottom, line = x0[order], x1[order], top[order], bottom[order], line[order]
+    gap = x0[1:] - x1[:-1]
+    same_line = line[1:] == line[:-1]
+    new_segment = np.concatenate([[True], ~same_line | (gap > CELL_GAP * size)])
+    space = np.concatenate([[False], same_line & (gap > WORD_GAP * size)]) & ~new_segment
+    starts = np.flatnonzero(new_segment)
+    bounds = np.append(starts, n)
+
+    pieces = [" " + chars[i]["text"] if s else chars[i]["text"] for i, s in zip(order, space)]
+    return _Segments(
+        x0=np.minimum.reduceat(x0, starts),
+        x1=np.maximum.reduceat(x1, starts),
+        top=np.minimum.reduceat(top, starts),
+        bottom=np.maximum.reduceat(bottom, starts),
+        line=line[starts],
+        text=["".join(pieces[a:b]) for a, b in zip(bounds[:-1], bounds[1:])],
+    )
+
+
+def _find_gutters(segments: _Segments, size: float) -> List[Tuple[float, float]]:
+    """
+    Empty vertical strips separating text columns, as (x0, x1).
+
+    Only segments narrower than ``SPANNING`` of the text width count, and a
+    few of them (headings, captions) may cross a gutter. Strips wider than
+    half the columns beside them are gaps between table cells, not gutters.
+    """
+    left, right = float(segments.x0.min()), float(segments.x1.max())
+    width = segments.x1 - segments.x0
+    narrow = width < SPANNING * (right - left)
+    if narrow.sum() < 2:
+        return []
+    bins = int(np.ceil(right - left)) + 2
+    coverage = np.zeros(bins)
+    np.add.at(coverage, np.floor(segments.x0[narrow] - left).astype(int), 1)
+    np.add.at(coverage, np.ceil(segments.x1[narrow] - left).astype(int), -1)
+    crossing = max(1, int(0.05 * narrow.sum()))
+    empty = np.concatenate([[False], np.cumsum(coverage)[: bins - 1] <= crossing, [False]])
+    changes = np.diff(empty.astype(int))
+    gutters = []
+    # Runs of empty bins strictly inside the text, ignoring the margins
+    for start, end in zip(np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)):
+        if end - start >= COLUMN_GAP * size and start > 0 and left + end < right:
+            gutters.append((left + start, left + end))
+    if not gutters:
+        return []
+
+    # Text columns are much wider than the strips between them; short cells
+    # separated by wide gaps are an unruled table
+    bounds = [left] + [x for gutter in gutters for x in gutter] + [right]
+    columns = [column_right - column_left for column_left, column_right in zip(bounds[::2], bounds[1::2])]
+    return [
+        (x0, x1) for i, (x0, x1) in enumerate(gutters)
+        if min(columns[i], columns[i + 1]) >= MIN_COLUMN_RATIO * (x1 - x0)
+    ]
+
+
+def _rows_to_blocks(rows: List[Any], segments: _Segments, size: float) -> List[LayoutBlock]:
+    """
+    Group a column's rows (segment indices of one line, or a ready table
+    block) into blocks at vertical gaps. Consecutive rows of several cells
+    form a table.
+    """
+    blocks: List[LayoutBlock] = []
+    previous_bottom: Optional[float] = None
+    previous_kind: Optional[str] = None
+    for row in rows:
+        if isinstance(row, LayoutBlock):
+            blocks.append(row)
+            previous_bottom, previous_kind = None, None
+            continue
+        top = float(segments.top[row].min())
+        bottom = float(segments.bottom[row].max())
+        kind = "table" if len(row) > 1 else "text"
+        separator = " | " if kind == "table" else " "
+        line = LayoutLine(separator.join(segments.text[i] for i in row), top, bottom)
+        if previous_bottom is not None and kind == previous_kind and top - previous_bottom <= BLOCK_GAP * size:
+            blocks[-1].lines.append(line)
+        else:
+            blocks.append(LayoutBlock(kind, [line]))
+        previous_bottom, previous_kind = bottom, kind
+    # A single row of several cells is a line with wide gaps, not a table
+    for block in blocks:
+        if block.kind == "table" and len(block.lines) == 1:
+            block.kind = "text"
+    return blocks
+
+
+def _inside(char: Dict[str, Any], bbox: Tuple[float, float, float, float]) -> bool:
+    x0, top, x1, bottom = bbox
+    return char["x0"] >= x0 - 1 and char["x1"] <= x1 + 1 and char["top"] >= top - 1 and char["bottom"] <= bottom + 1
+
+
+def _table_block(bbox: Tuple[float, float, float, float], rows: List[List[Optional[str]]]) -> LayoutBlock:
+    cells = [" | ".join((cell or "").replace("\n", " ") for cell in row) for row in rows]
+    return LayoutBlock("table", [LayoutLine(text, bbox[1], bbox[3]) for text in cells])
+
+
+def analyze_page_layout(
+    chars: Sequence[Dict[str, Any]],
+    tables: Sequence[Tuple[Tuple[float, float, float, float], List[List[Optional[str]]]]] = (),
+) -> List[LayoutBlock]:
+    """
+    Order a page's text by its layout.
+
+    Characters are grouped into lines and segments, the page is split into
+    columns at empty vertical strips, and text is read column by column
+    within each horizontal band between full-width elements (headings,
+    banners, wide tables). Rows of aligned cells become table blocks.
+
+    Args:
+        chars: pdfplumber character dicts (``x0``, ``x1``, ``top``,
+            ``bottom``, ``text``, optionally ``size``)
+        tables: Ruled tables found on the page, as ``(bbox, rows)`` with
+            bbox ``(x0, top, x1, bottom)``; their characters are not analysed
+            again
+    """
+    chars = [c for c in chars if not c["text"].isspace() and not any(_inside(c, bbox) for bbox, _ in tables)]
+    table_blocks = [(bbox, _table_block(bbox, rows)) for bbox, rows in tables]
+    if not chars:
+        return [block for _, block in sorted(table_blocks, key=lambda item: item[0][1])]
+
+    sizes = np.fromiter((c.get("size") or c["bottom"] - c["top"] for c in chars), float, len(chars))
+    size = max(float(np.median(sizes)), 1.0)
+    segments = _char_segments(chars, size)
+    gutters = _find_gutters(segments, size)
+
+    # Column of each segment; -1 where it crosses a gutter
+    column = np.searchsorted([x0 for x0, _ in gutters], segments.x0, side="right")
+    for x0, x1 in gutters:
+        column[(segments.x0 < x0) & (segments.x1 > x1)] = -1
+
+    # Walk lines and tables from the top, collecting each band's columns
+    # until a full-width line or table ends the band
+    # Segments are ordered by line, then left to right
+    line_starts = np.flatnonzero(np.concatenate([[True], np.diff(segments.line) != 0]))
+    line_tops = np.minimum.reduceat(segments.top, line_starts)
+    line_bounds = np.append(line_starts, len(segments.line))
+    items: List[Tuple[float, int, Any]] = [
+        (float(top), 0, np.arange(a, b)) for top, a, b in zip(line_tops, line_bounds[:-1], line_bounds[1:])
+    ]
+    for bbox, block in table_blocks:
+        items.append((bbox[1], 1, (bbox, block)))
+    items.sort(key=lambda item: (item[0], item[1]))
+
+    blocks: List[LayoutBlock] = []
+    band: Dict[int, List[Any]] = {}
+    spanning: List[Any] = []
+
+    def flush_band() -> None:
+        for index in sorted(band):
+            blocks.extend(_rows_to_blocks(band[index], segments, size))
+        band.clear()
+
+    def flush_spanning() -> None:
+        blocks.extend(_rows_to_blocks(spanning, segments, size))
+        spanning.clear()
+
+    for _, is_table, item in items:
+        if is_table:
+            (tx0, _, tx1, _), block = item
+            index = int(np.searchsorted([x0 for x0, _ in gutters], tx0, side="right"))
+            inside = all(not (tx0 < x0 and tx1 > x1) for x0, x1 in gutters)
+            if inside and gutters:
+                flush_spanning()
+                band.setdefault(index, []).append(block)
+            else:
+                flush_band()
+                spanning.append(block)
+            continue
+        if (column[item] == -1).any() or not gutters:
+            flush_band()
+            spanning.append(item)
+            continue
+        flush_spanning()
+        for index in np.unique(column[item]):
+            band.setdefault(int(index), []).append(item[column[item] == index])
+    flush_band()
+    flush_spanning()
+    return blocks
+
+
+def _margin_key(line: LayoutLine, height: float) -> Optional[Tuple[str, str]]:
+    if line.bottom <= height * MARGIN_BAND:
+        band = "header"
+    elif line.top >= height * (1 - MARGIN_BAND):
+        band = "footer"
+    else:
+        return None
+    # Page numbers and dates differ between pages; compare the rest
+    return band, re.sub(r"\d+", "#", line.text.strip().lower())
+
+
+def remove_repeated_margins(pages: List[Tuple[float, List[LayoutBlock]]], min_fraction: float = 0.5) -> int:
+    """
+    Drop header and footer lines repeated across pages, keeping the first.
+
+    A line in the top or bottom ``MARGIN_BAND`` of a page is a repeat when
+    the same text (ignoring numbers) is in the same band on at least
+    ``min_fraction`` of the pages, and on more than one page.
+
+    Args:
+        pages: (page height, blocks) for each page; blocks are edited in place
+
+    Returns:
+        The number of lines removed
+    """
+    counts: Dict[Tuple[str, str], int] = {}
+    for height, blocks in pages:
+        keys = {_margin_key(line, height) for block in blocks for line in block.lines}
+        for key in keys - {None}:
+            counts[key] = counts.get(key, 0) + 1
+    threshold = max(2, int(np.ceil(min_fraction * len(pages))))
+    repeated = {key for key, count in counts.items() if count >= threshold}
+    if not repeated:
+        return 0
+
+    seen = set()
+    removed = 0
+    for height, blocks in pages:
+        for block in blocks:
+            kept = []
+            for line in block.lines:
+                key = _margin_key(line, height)
+                if key in repeated and key in seen:
+                    removed += 1
+                    continue
+                seen.add(key)
+                kept.append(line)
+            block.lines = kept
+        blocks[:] = [block for block in blocks if block.lines]
+    return removed
+
+
+class _PageGeometry(PDFLayoutAnalyzer or object):
+    """
+    pdfminer device that records only what layout analysis reads.
+
+    pdfplumber resolves some twenty attributes (colours, graphic state,
+    marked content) for every character, which is most of its parsing time.
+    Here each page yields its height, character boxes as pdfplumber-style
+    dicts (``top`` measured from the top of the page) and the boxes of its
+    lines and rectangles, for find_ruled_tables.
+    """
+
+    def begin_page(self, page: Any, ctm: Any) -> None:
+        super().begin_page(page, ctm)
+        self.chars: List[Dict[str, Any]] = []
+        self.page: Optional[Tuple[float, List[Dict[str, Any]], List[Tuple[float, float, float, float]]]] = None
+
+    def render_char(
+        self, matrix: Any, font: Any, fontsize: float, scaling: float, rise: float, cid: int, ncs: Any, graphicstate: Any
+    ) -> float:
+        try:
+            text = font.to_unichr(cid)
+        except PDFUnicodeNotDefined:
+            text = self.handle_undefined_char(font, cid)
+        advance = font.char_width(cid) * fontsize * scaling
+        descent = font.get_descent() * fontsize
+        if font.is_vertical():
+            box = (-fontsize / 2, rise - advance, fontsize / 2, rise)
+        else:
+            box = (0, descent + rise, advance, descent + rise + fontsize)
+        x0, y0, x1, y1 = apply_matrix_rect(matrix, box)
+        height = self.cur_item.height
+        a, b, c, d, _, _ = matrix
+        self.chars.append({
+            "x0": x0,
+            "x1": x1,
+            "top": height - y1,
+            "bottom": height - y0,
+            "text": text,
+            "size": fontsize * abs(a * d - b * c) ** 0.5,
+        })
+        return advance
+
+    def receive_layout(self, ltpage: Any) -> None:
+        height = ltpage.height
+        rulings = []
+        containers = [ltpage]
+        while containers:
+            for item in containers.pop():
+                if isinstance(item, (LTLine, LTRect)):
+                    rulings.append((item.x0, height - item.y1, item.x1, height - item.y0))
+                elif isinstance(item, LTFigure):
+                    containers.append(item)
+        self.page = (height, self.chars, rulings)
+
+
+def _positions(values: Any, tolerance: float) -> Any:
+    """Distinct values, merging those within ``tolerance`` of each other."""
+    values = np.sort(values)
+    return values[np.concatenate([[True], np.diff(values) > tolerance])]
+
+
+def _touching_groups(h: Any, v: Any, tolerance: float) -> Any:
+    """
+    Label connected groups of touching horizontal and vertical rules.
+
+    Vertical rules are sorted by x, so each horizontal rule only checks the
+    ones within its x range; no rule-by-rule matrix is built.
+
+    Returns:
+        A group label for each rule, horizontal rules first
+    """
+    parent = list(range(len(h) + len(v)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    by_x = np.argsort(v[:, 0], kind="stable")
+    xs = v[by_x, 0]
+    starts = np.searchsorted(xs, h[:, 0] - tolerance, side="left")
+    ends = np.searchsorted(xs, h[:, 1] + tolerance, side="right")
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        candidates = by_x[start:end]
+        y = h[i, 2]
+        hits = candidates[(v[candidates, 1] - tolerance <= y) & (v[candidates, 2] + tolerance >= y)]
+        root = find(i)
+        for j in hits:
+            other = find(len(h) + int(j))
+            if other != root:
+                parent[other] = root
+    return np.array([find(i) for i in range(len(parent))])
+
+
+def find_ruled_tables(
+    chars: Sequence[Dict[str, Any]], rulings: Sequence[Tuple[float, float, float, float]], tolerance: float = 2.0
+) -> List[Tuple[Tuple[float, float, float, float], List[List[Optional[str]]]]]:
+    """
+    Tables drawn with ruling lines, with at least two rows and two columns.
+
+    Thin boxes are rules and larger rectangles contribute their four sides.
+    Horizontal and vertical rules that touch form a grid; the characters in
+    each grid cell are its text. A box drawn around a paragraph is a single
+    cell and not a table. Pages with more than ``MAX_RULINGS`` lines and
+    rectangles (charts, vector artwork) are skipped.
+
+    Args:
+        chars: Character dicts as for analyze_page_layout
+        rulings: Line and rectangle boxes ``(x0, top, x1, bottom)``
+
+    Returns:
+        ``(bbox, rows)`` for each table, as accepted by analyze_page_layout
+    """
+    if len(rulings) < 4:
+        return []
+    if len(rulings) > MAX_RULINGS:
+        # Charts and vector artwork, not tables
+        logger.debug(f"Skipping table detection on a page with {len(rulings)} lines and rectangles")
+        return []
+    x0, top, x1, bottom = np.asarray(rulings, dtype=float).reshape(-1, 4).T
+    thin_h = (bottom - top <= tolerance) & (x1 - x0 > tolerance)
+    thin_v = (x1 - x0 <= tolerance) & (bottom - top > tolerance)
+    box = (x1 - x0 > tolerance) & (bottom - top > tolerance)
+    # Horizontal rules as (x0, x1, y) and vertical rules as (x, top, bottom)
+    h = np.concatenate([
+        np.stack([x0[thin_h], x1[thin_h], (top[thin_h] + bottom[thin_h]) / 2], axis=1),
+        np.stack([x0[box], x1[box], top[box]], axis=1),
+        np.stack([x0[box], x1[box], bottom[box]], axis=1),
+    ])
+    v = np.concatenate([
+        np.stack([(x0[thin_v] + x1[thin_v]) / 2, top[thin_v], bottom[thin_v]], axis=1),
+        np.stack([x0[box], top[box], bottom[box]], axis=1),
+        np.stack([x1[box], top[box], bottom[box]], axis=1),
+    ])
+    if len(h) < 3 or len(v) < 3:
+        return []
+    group = _touching_groups(h, v, tolerance)
+
+    chars = [c for c in chars if not c["text"].isspace()]
+    n = len(chars)
+    cx = np.fromiter(((c["x0"] + c["x1"]) / 2 for c in chars), float, n)
+    cy = np.fromiter(((c["top"] + c["bottom"]) / 2 for c in chars), float, n)
+
+    tables = []
+    h_group, v_group = group[: len(h)], group[len(h):]
+    for label in np.unique(h_group):
+        rows_h, cols_v = h_group == label, v_group == label
+        if rows_h.sum() < 3 or cols_v.sum() < 3:
+            continue
+        ys = _positions(h[rows_h, 2], tolerance)
+        xs = _positions(v[cols_v, 0], tolerance)
+        if len(ys) < 3 or len(xs) < 3:
+            continue
+        inside = np.flatnonzero((cx > xs[0]) & (cx < xs[-1]) & (cy > ys[0]) & (cy < ys[-1]))
+        row = np.searchsorted(ys, cy[inside]) - 1
+        col = np.searchsorted(xs, cx[inside]) - 1
+        cells: Dict[Tuple[int, int], List[Dict[str, Any]]] = {}
+        for i, r, c in zip(inside, row, col):
+            cells.setdefault((int(r), int(c)), []).append(chars[i])
+        if not cells:
+            continue
+        sizes = [c.get("size") or c["bottom"] - c["top"] for cell in cells.values() for c in cell]
+        size = max(float(np.median(sizes)), 1.0)
+        text = {key: " ".join(_char_segments(cell, size).text) for key, cell in cells.items()}
+        # Rules at the edge of a shaded background add empty rows and columns
+        used_rows = sorted({r for r, _ in text})
+        used_cols = sorted({c for _, c in text})
+        if len(used_rows) < 2 or len(used_cols) < 2:
+            continue
+        rows = [[text.get((r, c), "") for c in used_cols] for r in used_rows]
+        tables.append(((float(xs[0]), float(ys[0]), float(xs[-1]), float(ys[-1])), rows))
+    return tables
+
+
+@dataclass(frozen=True)
+class DocumentSource:
+    """A document to extract, independent of how it was received."""
+
+    filename: str
+    data: bytes
+    content_type: Optional[str] = None
+
+
+def _source_from_sync(obj: Any) -> DocumentSource:
+    """Build a source from a path, bytes, a DocumentSource or a sync file-like."""
+    if isinstance(obj, DocumentSource):
+        return obj
+    if isinstance(obj, (bytes, bytearray, memoryview)):
+        return DocumentSource("document", bytes(obj))
+    if isinstance(obj, (str, os.PathLike)):
+        path = Path(obj)
+        return DocumentSource(path.name, path.read_bytes(), mimetypes.guess_type(path.name)[0])
+    if hasattr(obj, "read"):
+        data = obj.read()
+        if hasattr(obj, "seek"):
+            obj.seek(0)  # Reset file pointer
+        filename = getattr(obj, "filename", None) or Path(getattr(obj, "name", "") or "document").name
+        return DocumentSource(filename, bytes(data), getattr(obj, "content_type", None))
+    raise TypeError(f"Unsupported document input: {type(obj).__name__}")
+
+
+async def load_source(obj: Any) -> DocumentSource:
+    """
+    Normalise any supported input into a DocumentSource.
+
+    Supports paths, bytes, DocumentSource, sync file-likes, async file-likes
+    with ``await read()`` (e.g. UploadFile) and async iterables of bytes.
+    """
+    read = getattr(obj, "read", None)
+    if read is not None and not isinstance(obj, (str, bytes, os.PathLike)):
+        data = read()
+        if inspect.isawaitable(data):
+            data = await data
+            seek = getattr(obj, "seek", None)
+            if seek is not None:
+                await seek(0)  # Reset file pointer
+            filename = getattr(obj, "filename", None) or "document"
+            return DocumentSource(filename, bytes(data), getattr(obj, "content_type", None))
+        if hasattr(obj, "seek"):
+            obj.seek(0)
+        filename = getattr(obj, "filename", None) or Path(getattr(obj, "name", "") or "document").name
+        return DocumentSource(filename, bytes(data), getattr(obj, "content_type", None))
+    if hasattr(obj, "__aiter__"):
+        chunks = [bytes(chunk) async for chunk in obj]
+        filename = getattr(obj, "filename", None) or "document"
+        return DocumentSource(filename, b"".join(chunks), getattr(obj, "content_type", None))
+    return _source_from_sync(obj)
+
+
+async def load_sources(files: Sequence[Any]) -> List[Optional[DocumentSource]]:
+    """Load every input; unreadable ones are logged and returned as None."""
+    sources: List[Optional[DocumentSource]] = []
+    for file in files:
+        try:
+            sources.append(await load_source(file))
+        except Exception as e:
+            logger.error(f"Error processing file {getattr(file, 'filename', file)}: {str(e)}")
+            sources.append(None)
+    return sources
+
+
+def extract_text(
+    source: DocumentSource, on_page: Optional[Callable[[int, int], None]] = None
+) -> str:
+    """
+    Extract text from one document based on its extension or content type.
+
+    ``on_page(done, total)`` reports PDF pages as they are read and OCR'd
+    images as a single page.
+    """
+    processor = DocumentProcessor()
+    content = source.data
+
+    # Get file extension
+    filename = source.filename or ""
+    extension = Path(filename).suffix.lower().lstrip('.')
+
+    # Determine content type
+    content_type = source.content_type or mimetypes.guess_type(filename)[0] or 'text/plain'
+
+    logger.info(f"Processing file: {filename} (type: {content_type})")
+
+    if extension in ['txt', 'text', 'log', 'csv'] or content_type.startswith('text/plain'):
+        # Plain text files
+        return content.decode('utf-8', errors='ignore')
+
+    if extension == 'pdf' or content_type == 'application/pdf':
+        # PDF files
+        return processor.extract_text_from_pdf(content, on_page=on_page)
+
+    if extension == 'docx' or content_type == 'application/vnd.openxmlformats-officedocument.wordprocessingml.document':
+        # Word documents
+        return processor.extract_text_from_docx(content)
+
+    if extension in ['xlsx', 'xls'] or content_type in [
+        'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+        'application/vnd.ms-excel'
+    ]:
+        # Excel files
+        return processor.extract_text_from_excel(content)
+
+    if extension in ['html', 'htm'] or content_type == 'text/html':
+        # HTML files
+        return processor.extract_text_from_html(content)
+
+    if extension in ['md', 'markdown'] or content_type == 'text/markdown':
+        # Markdown files
+        md_text = content.decode('utf-8', errors='ignore')
+        if markdown:
+            text = markdown.markdown(md_text, extensions=['extra'])
+            # Convert HTML to plain text
+            return processor.extract_text_from_html(text.encode('utf-8'))
+        return md_text
+
+    if extension in ['jpg', 'jpeg', 'png', 'gif', 'bmp'] or content_type.startswith('image/'):
+        # Image files (OCR)
+        text = processor.extract_text_from_image(content)
+        if on_page:
+            on_page(1, 1)
+        return text
+
+    # Try to decode as text
+    return content.decode('utf-8', errors='ignore')
+
+
+def extract_document(
+    source: Optional[DocumentSource], on_page: Optional[Callable[[int, int], None]] = None
+) -> Optional[str]:
+    """
+    Extract the cleaned text of one document.
+
+    Returns:
+        The stripped text, or None if nothing could be extracted (extraction
+        errors are logged, not raised)
+    """
+    if source is None:
+        return None
+    try:
+        # Clean and process text
+        text = extract_text(source, on_page).strip()
+    except MemoryError:
+        # Let a sandbox worker report the limit breach and be replaced
+        raise
+    except Exception as e:
+        logger.error(f"Error processing file {source.filename}: {str(e)}")
+        return None
+
+    if not text:
+        logger.warning(f"No text extracted from {source.filename}")
+        return None
+    logger.info(f"Successfully extracted {len(text)} characters from {source.filename}")
+    return text
+
+
+def combine_texts(
+    sources: Sequence[Optional[DocumentSource]], texts: Sequence[Optional[str]]
+) -> str:
+    """
+    Consolidate per-document texts (from ``extract_document``) into the context.
+
+    Args:
+        sources: The documents, in upload order
+        texts: Extracted text for each document, None where extraction failed
+
+    Returns:
+        str: Consolidated text content from all documents
+    """
+    extracted_texts = [
+        # Add file metadata
+        f"=== File: {source.filename} ===\n" + text
+        for source, text in zip(sources, texts)
+        if text
+    ]
+
+    # Combine all extracted texts
+    if not extracted_texts:
+        return "No text content could be extracted from the uploaded documents."
+
+    # Join texts with clear separation
+    combined_text = "\n\n" + "=" * 50 + "\n\n".join(extracted_texts) + "\n\n" + "=" * 50
+
+    # Add summary
+    summary = f"Successfully processed {len(extracted_texts)} out of {len(sources)} files.\n"
+    summary += f"Total extracted text length: {len(combined_text)} characters.\n"
+
+    return summary + combined_text
+
+
+def extract_context(sources: Sequence[Optional[DocumentSource]]) -> str:
+    """
+    Extract and consolidate text from already-loaded documents.
+
+    Args:
+        sources: Loaded documents; None entries (inputs that could not be
+            read) count as failed files
+
+    Returns:
+        str: Consolidated text content from all documents
+    """
+    if not sources:
+        return ""
+    return combine_texts(sources, [extract_document(source) for source in sources])
+
+
+def get_context_from_paths(paths: Sequence[Any]) -> str:
+    """Synchronous extraction straight from local paths (CLI and worker processes)."""
+    sources: List[Optional[DocumentSource]] = []
+    for path in paths:
+        try:
+            sources.append(_source_from_sync(path))
+        except Exception as e:
+            logger.error(f"Error processing file {path}: {str(e)}")
+            sources.append(None)
+    return extract_context(sources)
+
+
+async def get_context_from_docs(files: Sequence[Any]) -> str:
+    """
+    Extract and consolidate context/content from documents.
+
+    This function:
+    - Reads and parses various file formats (PDF, DOCX, TXT, etc.)
+    - Extracts text content from each file
+    - Combines/consolidates the content into a single context string
+    - Handles different file types appropriately
+    - Returns clean, structured text that can be used for further processing
+
+    Reading the files is awaited; the CPU-bound parsing runs in a worker
+    thread so it does not block the event loop.
+
+    Args:
+        files: Documents as paths, bytes, DocumentSource values, file-like
+            objects (including FastAPI UploadFile) or async byte streams
+
+    Returns:
+        str: Consolidated text content from all files
+    """
+    if not files:
+        return ""
+
+    sources = await load_sources(files)
+    return await asyncio.to_thread(extract_context, sources)
+
+
+# Additional utility functions
+def clean_text(text: str) -> str:
+    """
+    Clean and normalize extracted text.
+
+    Runs of spaces and tabs collapse to one space, but line breaks are kept
+    (at most one blank line in a row) so paragraphs, list items and table
+    rows stay apart. (Earlier versions collapsed line breaks too and
+    returned a single line.)
+    """
+    import re
+
+    # Remove excessive whitespace, keeping line breaks
+    text = re.sub(r'[^\S\n]+', ' ', text)
+
+    # Remove control characters
+    text = ''.join(char for char in text if ord(char) >= 32 or char == '\n')
+
+    # Normalize line breaks
+    text = re.sub(r'\n{3,}', '\n\n', text)
+
+    return text.strip()
+
+
+def get_text_summary(text: str, max_length: int = 500) -> str:
+    """Get a summary/preview of the extracted text."""
+    if len(text) <= max_length:
+        return text
+
+    # Find a good break point
+    break_point = text.rfind(' ', 0, max_length)
+    if break_point == -1:
+        break_point = max_length
+
+    return text[:break_point] + "..."
+
@@ -0,0 +1,367 @@
+"""
+Sandboxed worker processes for document parsing.
+
+Parsers run on untrusted input: a malformed PDF, a decompression-bomb image
+or a huge spreadsheet can make pdfplumber, PIL or openpyxl spin for minutes
+or allocate gigabytes. A ``try/except`` cannot stop that, so extraction runs
+in a pool of separate worker processes, each with
+
+- an address-space limit (``RLIMIT_AS``), turning runaway allocations into
+  a MemoryError inside the worker
+- a CPU-time limit per task (``RLIMIT_CPU``), after which the kernel kills
+  the worker
+- a wall-clock timeout enforced by the parent, which kills the worker
+- a pixel limit for PIL, so decompression bombs raise instead of decoding
+  (set in the workers only; the API process keeps PIL's defaults)
+
+A worker that breaches a limit, crashes, or grows past its memory budget is
+killed and replaced, and the task fails with ``ExtractionLimitError``. Other
+requests keep running in the other workers.
+
+A task can also be profiled: the caller passes a picklable profiler factory
+(see ``profiling.ProfileSession.worker_profiler``) and gets the stacks
+sampled inside the worker back.
+
+Limits are configured with ``EXTRACTION_*`` environment variables (see
+``SandboxLimits.from_env``). ``resource`` is POSIX-only; elsewhere only the
+wall-clock timeout applies.
+"""
+
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Callable, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class SandboxLimits:
+    """Per-worker resource limits; None disables a limit."""
+
+    cpu_seconds: Optional[int] = 60
+    memory_bytes: Optional[int] = 2 * 1024 ** 3
+    wall_seconds: Optional[float] = 120.0
+    max_tasks_per_worker: int = 100
+    max_image_pixels: Optional[int] = 50_000_000
+
+    @classmethod
+    def from_env(cls) -> "SandboxLimits":
+        def optional(name: str, default: Any, cast: Callable) -> Any:
+            value = os.environ.get(name)
+            if value is None:
+                return default
+            return cast(value) if value not in ("", "0", "none") else None
+
+        return cls(
+            cpu_seconds=optional("EXTRACTION_CPU_SECONDS", cls.cpu_seconds, int),
+            memory_bytes=optional("EXTRACTION_MEMORY_MB", cls.memory_bytes, lambda v: int(v) * 1024 ** 2),
+            wall_seconds=optional("EXTRACTION_TIMEOUT", cls.wall_seconds, float),
+            max_tasks_per_worker=int(os.environ.get("EXTRACTION_MAX_TASKS_PER_WORKER", cls.max_tasks_per_worker)),
+            max_image_pixels=optional("EXTRACTION_MAX_IMAGE_PIXELS", cls.max_image_pixels, int),
+        )
+
+
+class ExtractionLimitError(Exception):
+    """A task was stopped for breaching a limit or crashing its worker."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(message)
+        self.reason = reason  # "timeout", "cpu", "memory" or "crashed"
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource else 0
+
+
+def _worker_main(conn: Connection, limits: SandboxLimits) -> None:
+    """Worker loop: receive (fn, args, progress_param, profiler), reply with messages."""
+    # The parent handles Ctrl-C and shutdown; workers are killed by it
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if resource is not None and limits.memory_bytes:
+        resource.setrlimit(resource.RLIMIT_AS, (limits.memory_bytes, limits.memory_bytes))
+    if limits.max_image_pixels:
+        try:
+            from PIL import Image
+
+            # Refuse decompression bombs: images above this many pixels raise
+            # instead of being decoded (PIL only warns below twice its default)
+            Image.MAX_IMAGE_PIXELS = limits.max_image_pixels
+        except ImportError:
+            pass
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            return
+        if task is None:
+            return
+        fn, args, progress_param, make_profiler = task
+
+        if resource is not None and limits.cpu_seconds:
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = int(usage.ru_utime + usage.ru_stime)
+            resource.setrlimit(
+                resource.RLIMIT_CPU, (used + limits.cpu_seconds, resource.RLIM_INFINITY)
+            )
+
+        kwargs = {}
+        if progress_param:
+            kwargs[progress_param] = lambda *values: conn.send(("progress", values))
+        profiler = make_profiler().start() if make_profiler else None
+        try:
+            result = fn(*args, **kwargs)
+        except MemoryError:
+            conn.send(("error", ("memory", "Memory limit exceeded while parsing")))
+            return  # the heap may be in a bad state; let the parent respawn us
+        except Exception as e:
+            conn.send(("error", ("exception", f"{type(e).__name__}: {e}")))
+            continue
+        finally:
+            stacks = profiler.stop() if profiler else None
+        conn.send(("result", (result, _peak_rss_bytes(), stacks)))
+
+
+class _Worker:
+    def __init__(self, context: Any, limits: SandboxLimits):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main, args=(child_conn, limits), name="extraction-worker", daemon=True
+        )
+        self.process.start()
+        child_conn.close()
+        self.tasks = 0
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join(timeout=5)
+        self.conn.close()
+
+
+class SandboxPool:
+    """A pool of limited worker processes that run picklable functions."""
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        limits: Optional[SandboxLimits] = None,
+        start_method: Optional[str] = None,
+    ):
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.limits = limits or SandboxLimits()
+        # forkserver: workers are forked from a clean process, not from the
+        # multi-threaded API server
+        self._context = multiprocessing.get_context(
+            start_method or ("forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn")
+        )
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        # Async callers wait for their worker in these threads, at most one
+        # per worker; extra tasks queue here without holding a thread of the
+        # default executor, which the other pipeline stages use
+        self._waiters = ThreadPoolExecutor(self.max_workers, thread_name_prefix="extraction-wait")
+        self._started = 0
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def _checkout(self) -> _Worker:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        while True:
+            with self._lock:
+                if self._started < self.max_workers:
+                    self._started += 1
+                    try:
+                        return _Worker(self._context, self.limits)
+                    except Exception:
+                        self._started -= 1
+                        raise
+            try:
+                # Re-check capacity now and then: a retired worker frees a slot
+                return self._idle.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def _retire(self, worker: _Worker) -> None:
+        worker.kill()
+        with self._lock:
+            self._started -= 1
+
+    def _checkin(self, worker: _Worker) -> None:
+        worker.tasks += 1
+        if self._closed or worker.tasks >= self.limits.max_tasks_per_worker:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            self._retire(worker)
+        else:
+            self._idle.put(worker)
+
+    def run_sync(
+        self,
+        fn: Callable,
+        *args: Any,
+        on_progress: Optional[Callable] = None,
+        progress_param: Optional[str] = None,
+        profiler: Optional[Callable[[], Any]] = None,
+        on_profile: Optional[Callable[[Dict[Any, int]], None]] = None,
+    ) -> Any:
+        """
+        Run ``fn(*args)`` in a sandboxed worker and return its result.
+
+        Args:
+            fn: Picklable (module-level) function
+            on_progress: Called in this process with the values the worker
+                passes to the callback named ``progress_param``
+            progress_param: Keyword argument of ``fn`` that receives the
+                progress callback inside the worker
+            profiler: Picklable factory of a profiler (``start()`` and
+                ``stop()`` returning stack counts) to run around ``fn``
+            on_profile: Called with the stack counts of a successful task
+
+        Raises:
+            ExtractionLimitError: The task hit a limit or killed its worker
+            RuntimeError: ``fn`` raised (the original exception is logged by
+                type and message only, as it crossed a process boundary)
+        """
+        if self._closed:
+            raise RuntimeError("Sandbox pool is closed")
+        worker = self._checkout()
+        deadline = time.monotonic() + self.limits.wall_seconds if self.limits.wall_seconds else None
+        try:
+            worker.conn.send(
+                (fn, args, progress_param if on_progress else None, profiler if on_profile else None)
+            )
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                if not worker.conn.poll(timeout):
+                    raise ExtractionLimitError(
+                        "timeout", f"Parsing took longer than {self.limits.wall_seconds:.0f}s"
+                    )
+                kind, payload = worker.conn.recv()
+                if kind == "progress":
+                    on_progress(*payload)
+                    continue
+                break
+        except ExtractionLimitError:
+            self._retire(worker)
+            raise
+        except (EOFError, OSError):
+            # The worker died mid-task: CPU limit (SIGXCPU), OOM killer or a parser crash
+            worker.process.join(timeout=5)
+            self._retire(worker)
+            exitcode = worker.process.exitcode
+            if exitcode == -signal.SIGXCPU:
+                raise ExtractionLimitError(
+                    "cpu", f"Parsing used more than {self.limits.cpu_seconds}s of CPU time"
+                )
+            raise ExtractionLimitError("crashed", f"Parser worker died (exit code {exitcode})")
+        except BaseException:
+            self._retire(worker)
+            raise
+
+        if kind == "error":
+            reason, message = payload
+            if reason == "memory":
+                worker.process.join(timeout=5)
+                self._retire(worker)
+                raise ExtractionLimitError("memory", message)
+            self._checkin(worker)
+            raise RuntimeError(message)
+
+        result, peak_rss, stacks = payload
+        if stacks is not None:
+            on_profile(stacks)
+        if self.limits.memory_bytes and peak_rss > self.limits.memory_bytes // 2:
+            # Python rarely returns memory to the OS; recycle bloated workers
+            logger.info(f"Recycling extraction worker after peak RSS of {peak_rss // 2 ** 20} MiB")
+            worker.tasks = self.limits.max_tasks_per_worker
+        self._checkin(worker)
+        return result
+
+    async def run(
+        self,
+        fn: Callable,
+        *args: Any,
+        on_progress: Optional[Callable] = None,
+        progress_param: Optional[str] = None,
+        profiler: Optional[Callable[[], Any]] = None,
+        on_profile: Optional[Callable[[Dict[Any, int]], None]] = None,
+    ) -> Any:
+        """Async version of ``run_sync`` (waits in one of the pool's own threads)."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self._waiters,
+            functools.partial(
+                self.run_sync,
+                fn,
+                *args,
+                on_progress=on_progress,
+                progress_param=progress_param,
+                profiler=profiler,
+                on_profile=on_profile,
+            ),
+        )
+
+    def close(self) -> None:
+        """Stop all idle workers; busy ones are stopped when their task returns."""
+        self._closed = True
+        self._waiters.shutdown(wait=False)
+        workers: List[_Worker] = []
+        while True:
+            try:
+                workers.append(self._idle.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            try:
+                worker.conn.send(None)
+            except OSError:
+                pass
+            self._retire(worker)
+
+
+_sandbox: Optional[SandboxPool] = None
+
+
+def sandbox_enabled() -> bool:
+    return os.environ.get("EXTRACTION_SANDBOX", "1").lower() in ("1", "true", "yes")
+
+
+def get_extraction_sandbox() -> SandboxPool:
+    """Return the process-wide sandbox pool (started lazily)."""
+    global _sandbox
+    if _sandbox is None:
+        # With several server processes (SERVER_WORKERS) each gets its share of the cores
+        cores = max(1, (os.cpu_count() or 1) // int(os.environ.get("SERVER_WORKERS", 1)))
+        _sandbox = SandboxPool(
+            max_workers=int(os.environ.get("EXTRACTION_WORKERS", cores)),
+            limits=SandboxLimits.from_env(),
+        )
+    return _sandbox
+
+
+def close_extraction_sandbox() -> None:
+    """Stop the sandbox workers (call on application shutdown)."""
+    global _sandbox
+    if _sandbox is not None:
+        _sandbox.close()
+        _sandbox = None
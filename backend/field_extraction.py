@@ -0,0 +1,293 @@
+"""
+Field-group extraction planner.
+
+Instead of asking the LLM for a whole model in one large completion, the model
+is split into independent section groups (overview, problems, solution, ...).
+Each group is requested concurrently with a smaller prompt and schema, bounded
+by a semaphore. When a group fails to parse or validate only that group is
+retried, and the final model is assembled and validated once all groups are in.
+
+For large uploads each group can be given only the passages relevant to it
+(``retrieve``, see retrieval_index) instead of the whole context, and
+optional fields the template never renders can be left out of the requests
+(``fields``, see template_schema).
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Sequence, Tuple, Type
+
+from pydantic import BaseModel, ValidationError, create_model
+
+logger = logging.getLogger(__name__)
+
+# A completion function takes a prompt and the JSON schema the answer must
+# follow, and returns the raw JSON text produced by the LLM.
+CompletionFn = Callable[[str, Dict[str, Any]], Awaitable[str]]
+
+
+@dataclass(frozen=True)
+class FieldGroup:
+    """A set of model fields that are extracted together in one LLM call."""
+
+    name: str
+    fields: Tuple[str, ...]
+    instructions: str = ""
+    query: str = ""  # search terms for retrieving the group's passages
+
+    def search_query(self) -> str:
+        """The retrieval query: ``query`` if set, else the field names and instructions."""
+        if self.query:
+            return self.query
+        return " ".join([*(f.replace("_", " ") for f in self.fields), self.instructions])
+
+
+# Section groups for ProjectModel (examples/model.py). Fields that belong to
+# the same section of the brief are kept together so the LLM sees them in
+# context; unrelated sections are requested independently.
+PROJECT_MODEL_GROUPS: List[FieldGroup] = [
+    FieldGroup(
+        "overview",
+        ("title", "intro"),
+        "Write a concise project title and a short introduction paragraph.",
+    ),
+    FieldGroup(
+        "problems",
+        ("problem",),
+        "List the key problems the customer faces (more than 3 items recommended).",
+        "problem problems challenge issue pain point risk cost delay manual inefficient limitation",
+    ),
+    FieldGroup(
+        "solution",
+        ("solution_desc", "implementation"),
+        "Describe the solution and how it is implemented.",
+    ),
+    FieldGroup(
+        "approach",
+        ("approach",),
+        "List the steps of the delivery approach in order.",
+        "approach step phase stage methodology plan timeline milestone delivery week workshop",
+    ),
+    FieldGroup(
+        "about",
+        ("about", "getting_started"),
+        "Describe the provider and how a customer gets started.",
+        "about company provider founded expertise partner getting started next step contact onboarding",
+    ),
+]
+
+
+class FieldGroupError(Exception):
+    """Raised when a field group still fails after all retries."""
+
+    def __init__(self, group: FieldGroup, message: str):
+        self.group = group
+        super().__init__(f"Field group '{group.name}' failed: {message}")
+
+
+def plan_field_groups(
+    model_cls: Type[BaseModel],
+    groups: Optional[Sequence[FieldGroup]] = None,
+    fields: Optional[Collection[str]] = None,
+) -> List[FieldGroup]:
+    """
+    Build the extraction plan for a model.
+
+    Groups naming fields the model does not have are trimmed (or dropped when
+    empty), and any model field not covered by a group is collected into a
+    trailing "remaining" group so nothing is silently left out.
+
+    Args:
+        model_cls: Pydantic model to extract
+        groups: Preferred grouping of the model fields
+        fields: Only request these fields (e.g.
+            ``get_document_bytes_from_model.rendered_fields``); optional
+            fields outside it keep their defaults, required ones are always
+            requested
+
+    Returns:
+        List[FieldGroup]: Groups covering every requested field exactly once
+    """
+    model_fields = [
+        name
+        for name, info in model_cls.model_fields.items()
+        if fields is None or name in fields or info.is_required()
+    ]
+    seen = set()
+    plan: List[FieldGroup] = []
+
+    for group in groups or []:
+        group_fields = tuple(f for f in group.fields if f in model_fields and f not in seen)
+        if not group_fields:
+            continue
+        seen.update(group_fields)
+        plan.append(FieldGroup(group.name, group_fields, group.instructions, group.query))
+
+    remaining = tuple(f for f in model_fields if f not in seen)
+    if remaining:
+        plan.append(FieldGroup("remaining", remaining))
+
+    return plan
+
+
+_group_models: Dict[Tuple[Type[BaseModel], Tuple[str, ...]], Type[BaseModel]] = {}
+
+
+def _group_model(model_cls: Type[BaseModel], group: FieldGroup) -> Type[BaseModel]:
+    """Return (and cache) a partial model containing only the group's fields."""
+    key = (model_cls, group.fields)
+    partial = _group_models.get(key)
+    if partial is None:
+        definitions = {
+            name: (model_cls.model_fields[name].annotation, model_cls.model_fields[name])
+            for name in group.fields
+        }
+        partial = create_model(f"{model_cls.__name__}_{group.name}", **definitions)
+        _group_models[key] = partial
+    return partial
+
+
+def build_group_schema(model_cls: Type[BaseModel], group: FieldGroup) -> Dict[str, Any]:
+    """JSON schema restricted to the fields of one group."""
+    return _group_model(model_cls, group).model_json_schema()
+
+
+def build_group_prompt(
+    context: str, group: FieldGroup, schema: Dict[str, Any], error: Optional[str] = None
+) -> str:
+    """Build the prompt for a single field group."""
+    parts = [
+        "You are filling in part of a marketing solution brief from source documents.",
+        f"Return only a JSON object with the keys: {', '.join(group.fields)}.",
+    ]
+    if group.instructions:
+        parts.append(group.instructions)
+    parts.append(f"JSON schema:\n{json.dumps(schema)}")
+    if error:
+        parts.append(f"Your previous answer was rejected: {error}\nFix it and answer again.")
+    parts.append(f"Source documents:\n{context}")
+    return "\n\n".join(parts)
+
+
+def _parse_group(model_cls: Type[BaseModel], group: FieldGroup, raw: str) -> Dict[str, Any]:
+    """Parse and validate the LLM answer for a group, returning its field values."""
+    payload = json.loads(raw)
+    if not isinstance(payload, dict):
+        raise ValueError("answer is not a JSON object")
+    validated = _group_model(model_cls, group).model_validate(payload)
+    return validated.model_dump()
+
+
+async def _gather_or_cancel(coroutines: Sequence[Awaitable[Any]]) -> List[Any]:
+    """
+    Like ``asyncio.gather``, but the first failure cancels the remaining
+    coroutines (as a TaskGroup does), so a model that cannot be assembled
+    stops spending LLM calls on its other groups.
+    """
+    tasks = [asyncio.ensure_future(coroutine) for coroutine in coroutines]
+    if not tasks:
+        return []
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+    finally:
+        # Also runs when the caller is cancelled; cancelling a done task is a no-op
+        for task in tasks:
+            task.cancel()
+        await asyncio.wait(tasks)
+    for task in tasks:
+        if not task.cancelled() and task.exception() is not None:
+            raise task.exception()
+    return [task.result() for task in tasks]
+
+
+async def extract_model_in_groups(
+    context: str,
+    complete: CompletionFn,
+    model_cls: Type[BaseModel],
+    groups: Optional[Sequence[FieldGroup]] = None,
+    max_concurrency: int = 4,
+    max_retries: int = 2,
+    on_group: Optional[Callable[[FieldGroup], None]] = None,
+    retrieve: Optional[Callable[[FieldGroup], Optional[str]]] = None,
+    fields: Optional[Collection[str]] = None,
+) -> BaseModel:
+    """
+    Extract a model from context with one concurrent LLM call per field group.
+
+    Args:
+        context: Consolidated text extracted from the uploaded documents
+        complete: Async completion function returning JSON text
+        model_cls: Pydantic model to assemble
+        groups: Field grouping to use (defaults to a single group with every field)
+        max_concurrency: Maximum number of LLM calls in flight for this model
+        max_retries: Extra attempts allowed per group after a failed answer
+        on_group: Called with each group once its fields are validated, for
+            progress reporting
+        retrieve: Returns the passages relevant to a group, used in its
+            prompt instead of the whole context (None falls back to the
+            whole context), e.g. ``retrieval_index.group_retriever``
+        fields: Only request these fields, see ``plan_field_groups``
+
+    Returns:
+        BaseModel: The assembled and validated model instance
+
+    Raises:
+        FieldGroupError: If a group still fails after all retries
+        ValidationError: If the assembled model fails whole-model validation
+    """
+    plan = plan_field_groups(model_cls, groups, fields)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run_group(group: FieldGroup) -> Dict[str, Any]:
+        schema = build_group_schema(model_cls, group)
+        group_context = (retrieve(group) if retrieve else None) or context
+        error: Optional[str] = None
+
+        for attempt in range(max_retries + 1):
+            prompt = build_group_prompt(group_context, group, schema, error)
+            async with semaphore:
+                raw = await complete(prompt, schema)
+            try:
+                values = _parse_group(model_cls, group, raw)
+            except (ValueError, ValidationError) as e:
+                # json.JSONDecodeError is a ValueError subclass
+                error = str(e)
+                logger.warning(
+                    f"Field group '{group.name}' attempt {attempt + 1} failed validation: {error}"
+                )
+                continue
+            if on_group:
+                on_group(group)
+            return values
+
+        raise FieldGroupError(group, error or "no valid answer")
+
+    results = await _gather_or_cancel([run_group(group) for group in plan])
+
+    values: Dict[str, Any] = {}
+    for result in results:
+        values.update(result)
+
+    return model_cls.model_validate(values)
+
+
+def make_openai_completion(client: Any, model: str, temperature: float = 0.2) -> CompletionFn:
+    """
+    Adapt an ``openai.AsyncOpenAI``-compatible client to a CompletionFn.
+
+    Kamiwaza deployments expose an OpenAI-compatible endpoint, so the same
+    adapter works for both.
+    """
+
+    async def complete(prompt: str, schema: Dict[str, Any]) -> str:
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "user", "content": prompt}],
+            response_format={"type": "json_object"},
+            temperature=temperature,
+        )
+        return response.choices[0].message.content or ""
+
+    return complete
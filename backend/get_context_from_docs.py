@@ -1,32 +1,11 @@
-from typing import List
+"""
+GROUP 1 IMPLEMENTATION: extract and consolidate context from uploaded documents.
 
-from fastapi import UploadFile
+The implementation is ``document_processor.get_context_from_docs``. It takes
+FastAPI uploads as well as paths, bytes and streams, and parses in a worker
+thread. This module keeps the group's entry point.
+"""
 
+from .document_processor import get_context_from_docs
 
-def get_context_from_docs(files: List[UploadFile]) -> str:
-    """
-    GROUP 1 IMPLEMENTATION:
-    Extract and consolidate context/content from uploaded documents.
-
-    This function should:
-    - Read and parse various file formats (PDF, DOCX, TXT, etc.)
-    - Extract text content from each file
-    - Combine/consolidate the content into a single context string
-    - Handle different file types appropriately
-    - Return clean, structured text that can be used for further processing
-
-    Args:
-        files: List of uploaded files from the FastAPI endpoint
-
-    Returns:
-        str: Consolidated text content from all uploaded files
-
-    Notes:
-    - Consider handling different file formats (PDF, Word docs, images with OCR, etc.)
-    - Think about how to structure the combined content (concatenation, sections, etc.)
-    - Handle potential encoding issues and file corruption gracefully
-    - You may want to preserve some metadata about which content came from which file
-    """
-    # TODO: Group 1 - Implement document parsing and context extraction
-    # Placeholder implementation
-    return "Extracted context from uploaded documents..."
+__all__ = ["get_context_from_docs"]
@@ -1,48 +1,262 @@
-from typing import Optional
+import logging
+import os
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple, Type
 
+from jinja2 import Environment, FileSystemLoader, select_autoescape
 from pydantic import BaseModel
 
+from .page_renderer import render_incrementally
+from .pdf_cache import PDFCache, code_version, template_version
+from .pdf_optimize import PdfOptimizer
+from .progress import report_progress
+from .renderers import get_renderer
+from .template_assets import AssetInliningLoader
+from .template_schema import SchemaReport, TemplateSchema, analyze_template, reconcile
+
+logger = logging.getLogger(__name__)
+
+# Directory holding the Jinja templates (template.html and friends)
+TEMPLATE_DIR = Path(
+    os.environ.get("TEMPLATE_DIR", Path(__file__).resolve().parent.parent / "examples")
+)
+TEMPLATE_NAME = os.environ.get("TEMPLATE_NAME", "template.html")
+COMPANY_NAME = os.environ.get("COMPANY_NAME", "BlueAlly")
+# Render page sections separately and reuse unchanged ones (see page_renderer)
+INCREMENTAL_RENDER = os.environ.get("PDF_INCREMENTAL_RENDER", "1").lower() in ("1", "true", "yes")
+# Hash of the code between a model and its PDF: this module's mapping onto
+# the template (build_solution_brief_data, DERIVED_FIELDS), schema
+# reconciliation, asset inlining, the renderer backends and the optimiser.
+# Part of every render cache key, so cached PDFs are not served after a deploy
+# that changes how they would be rendered.
+RENDER_CODE_VERSION = code_version(
+    sys.modules[__name__], reconcile, AssetInliningLoader, get_renderer, render_incrementally, PdfOptimizer
+)
+
+
+class RenderOptions(BaseModel):
+    """Options exposed to the template as ``options``."""
+
+    include_page_numbers: bool = True
+    renderer: Optional[str] = None  # renderer backend, see renderers.RENDERERS
+
+
+_environment: Optional[Environment] = None
+_fragment_cache: Optional[PDFCache] = None
+_pdf_optimizer: Optional[PdfOptimizer] = None
+
+
+def get_template_environment() -> Environment:
+    """
+    Return the shared Jinja environment.
+
+    Templates are compiled once with minified CSS and inlined assets, and only
+    reloaded when their source changes.
+    """
+    global _environment
+    if _environment is None:
+        _environment = Environment(
+            loader=AssetInliningLoader(str(TEMPLATE_DIR)),
+            autoescape=select_autoescape(["html"]),
+            auto_reload=True,
+        )
+    return _environment
+
+
+def get_fragment_cache() -> PDFCache:
+    """Return the shared cache of rendered page fragments."""
+    global _fragment_cache
+    if _fragment_cache is None:
+        directory = os.environ.get(
+            "PDF_FRAGMENT_CACHE_DIR",
+            os.path.join(tempfile.gettempdir(), "ba_solution_brief", "page_fragments"),
+        )
+        _fragment_cache = PDFCache(
+            directory,
+            max_bytes=int(os.environ.get("PDF_FRAGMENT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+            ttl=float(os.environ.get("PDF_CACHE_TTL", 24 * 3600)),
+        )
+    return _fragment_cache
+
+
+def get_pdf_optimizer() -> PdfOptimizer:
+    """Return the shared PDF post-processor, configured from the environment."""
+    global _pdf_optimizer
+    if _pdf_optimizer is None:
+        _pdf_optimizer = PdfOptimizer.from_env()
+    return _pdf_optimizer
+
+
+# Template fields derived from ProjectModel fields: (model fields it is
+# built from, builder). Each is only filled in when one of its sources is set.
+DERIVED_FIELDS: Dict[str, Tuple[Tuple[str, ...], Callable[[Dict[str, Any]], Any]]] = {
+    "service_title": (("title",), lambda data: data["title"]),
+    "service_overview": (("intro",), lambda data: data["intro"]),
+    "problem_categories": (("problem",), lambda data: [{"title": "Key Challenges", "items": data["problem"]}]),
+    "value_propositions": (
+        ("solution_desc", "implementation"),
+        lambda data: [
+            {"title": "Our Solution", "description": data.get("solution_desc") or ""},
+            {"title": "Implementation", "description": data.get("implementation") or ""},
+        ],
+    ),
+    "methodology_phases": (
+        ("approach",),
+        lambda data: [
+            {"phase_number": i + 1, "title": f"Phase {i + 1}", "description": step}
+            for i, step in enumerate(data["approach"])
+        ],
+    ),
+    "why_choose_blueally": (("about",), lambda data: [data["about"]]),
+    "call_to_action": (("getting_started",), lambda data: data["getting_started"]),
+}
+# Template fields that always get a value
+DEFAULTED_FIELDS = ("company_name", "prepared_by", "date")
+
+
+def build_solution_brief_data(model: BaseModel) -> Dict[str, Any]:
+    """
+    Map the model onto the ``solution_brief_data`` names the template reads.
+
+    Fields that already use template names are passed through; ProjectModel
+    fields are mapped onto the closest template section (DERIVED_FIELDS).
+    """
+    data = model.model_dump()
+    data.setdefault("company_name", COMPANY_NAME)
+    data.setdefault("prepared_by", data["company_name"])
+    data.setdefault("date", date.today().strftime("%B %Y"))
+
+    for name, (sources, build) in DERIVED_FIELDS.items():
+        if any(data.get(source) for source in sources):
+            data.setdefault(name, build(data))
+
+    return data
+
+
+_schemas: Dict[str, TemplateSchema] = {}
+
+
+def template_schema() -> TemplateSchema:
+    """What the configured template reads, re-analysed when the template directory changes."""
+    version = template_version(TEMPLATE_DIR)
+    schema = _schemas.get(version)
+    if schema is None:
+        # The unprocessed sources, so reported line numbers match the files
+        raw = Environment(loader=FileSystemLoader(str(TEMPLATE_DIR)), autoescape=select_autoescape(["html"]))
+        schema = analyze_template(raw, TEMPLATE_NAME)
+        _schemas.clear()
+        _schemas[version] = schema
+    return schema
+
+
+def reconcile_model(model_cls: Type[BaseModel]) -> SchemaReport:
+    """Compare a model class with what the template renders from ``solution_brief_data``."""
+    return reconcile(
+        model_cls,
+        template_schema(),
+        "solution_brief_data",
+        sources={name: sources for name, (sources, _) in DERIVED_FIELDS.items()},
+        defaults=DEFAULTED_FIELDS,
+    )
+
+
+def rendered_fields(model_cls: Type[BaseModel]) -> Tuple[str, ...]:
+    """
+    The model fields the template actually renders: the ``fields`` to request
+    from the LLM (see ``field_extraction.extract_model_in_groups``).
+    """
+    return reconcile_model(model_cls).rendered
+
+
+def render_html(model: BaseModel, options: Optional[RenderOptions] = None) -> str:
+    """Render the solution brief template for a model."""
+    template = get_template_environment().get_template(TEMPLATE_NAME)
+    return template.render(
+        solution_brief_data=build_solution_brief_data(model),
+        options=options or RenderOptions(),
+    )
+
+
+def prepare_render(options: Optional[RenderOptions] = None) -> None:
+    """
+    Do the model-independent render setup ahead of time.
+
+    Compiles the template (a no-op once cached) and starts the renderer
+    backend, so the pipeline can overlap this with extraction and modelling.
+    """
+    options = options or RenderOptions()
+    get_template_environment().get_template(TEMPLATE_NAME)
+    get_renderer(options.renderer).warm_up()
+
+
+def render_pdf(html: str, options: Optional[RenderOptions] = None) -> bytes:
+    """
+    Convert rendered template HTML to PDF with the selected renderer backend.
+
+    Unless disabled with PDF_INCREMENTAL_RENDER=0, each page section is
+    rendered and cached on its own, so an edited brief only re-renders the
+    pages that changed. The result is then optimised, see optimize_pdf.
+    """
+    options = options or RenderOptions()
+    renderer = get_renderer(options.renderer)
+    if INCREMENTAL_RENDER:
+        pdf = render_incrementally(
+            html,
+            renderer,
+            get_fragment_cache(),
+            base_url=TEMPLATE_DIR,
+            on_fragment=lambda done, total: report_progress("pages_rendered", done=done, total=total),
+            asset_version=f"{template_version(TEMPLATE_DIR)}+{RENDER_CODE_VERSION}",
+        )
+    else:
+        pdf = renderer.render(html, base_url=TEMPLATE_DIR)
+        report_progress("pages_rendered", done=1, total=1)
+    return optimize_pdf(pdf)
+
+
+def optimize_pdf(pdf: bytes) -> bytes:
+    """
+    Downsample images, subset fonts, deduplicate and compress objects and
+    linearise a rendered PDF (see pdf_optimize); PDF_OPTIMIZE=0 disables it.
+
+    Runs after the page sections are merged, since identical logos and
+    resources across sections are only duplicates of each other then.
+    """
+    optimizer = get_pdf_optimizer()
+    if not optimizer.enabled:
+        return pdf
+    optimized, report = optimizer.optimize(pdf)
+    logger.info(
+        f"Optimised PDF {report.bytes_in} -> {report.bytes_out} bytes in {report.seconds * 1000:.0f} ms "
+        f"({report.images_downsampled} images downsampled, {report.fonts_subset} fonts subset, "
+        f"{report.objects_deduplicated} duplicates merged, {report.streams_compressed} streams compressed, "
+        f"linearized={report.linearized})"
+    )
+    report_progress("pdf_optimized", **report.as_dict())
+    return optimized
+
 
 def get_document_bytes_from_model(
-    model: BaseModel, context: Optional[str] = None
+    model: BaseModel, context: Optional[str] = None, options: Optional[RenderOptions] = None
 ) -> bytes:
     """
     GROUP 3 IMPLEMENTATION:
     Generate a PDF document from the structured model data.
 
-    This function should:
-    - Take the structured data model from Group 2
-    - Create a well-formatted PDF document using the model data
-    - Apply appropriate styling, layout, and formatting
-    - Handle different types of content (text, tables, images, etc.)
-    - Return the PDF as bytes for download
+    The model is rendered into the Jinja solution brief template and the
+    resulting HTML is converted to PDF by the selected renderer backend
+    (headless Chromium by default, or WeasyPrint), see render_pdf.
 
     Args:
         model: Structured data model containing processed information from Group 2
         context: Optional raw context string (in case you need additional context)
+        options: Render options passed to the template
 
     Returns:
         bytes: PDF document as binary data ready for download
-
-    Notes:
-    - YOU SHOULD CREATE YOUR OWN MODEL STRUCTURE FOR TESTING - since Group 2's model may not be ready
-    - Consider using libraries like reportlab, weasyprint, or fpdf for PDF generation
-    - Think about document structure: headers, sections, formatting, page breaks
-    - Handle cases where model data might be incomplete or missing
-    - Consider adding features like table of contents, page numbers, headers/footers
-    - Test with your own model structure initially, integration will happen later
-    - Focus on creating a professional-looking document output
-    - Consider error handling for PDF generation failures
-
-    Example libraries you might use:
-    - reportlab: Good for programmatic PDF creation
-    - weasyprint: HTML/CSS to PDF conversion
-    - jinja2 + weasyprint: Template-based PDF generation
-    """
-    # TODO: Group 3 - Implement PDF document generation
-    # Create your own test model structure for development
-    # This is a placeholder implementation that returns empty PDF bytes
-
-    # Placeholder: Return minimal PDF bytes (this won't be a valid PDF)
-    # Replace this with actual PDF generation logic
-    return b"%PDF-1.4\n%placeholder PDF content for testing\n%%EOF"
+    """
+    options = options or RenderOptions()
+    return render_pdf(render_html(model, options), options)
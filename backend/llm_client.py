@@ -0,0 +1,357 @@
+"""
+Shared, rate-limit-aware async LLM client.
+
+One client per process is shared by every model-stage call so HTTP connections
+are pooled and kept alive instead of being set up per request. Calls go
+through, in order:
+
+- a circuit breaker that fails fast while the backend is known to be down
+- an adaptive concurrency limit that halves on 429s and grows back slowly
+- token buckets for requests-per-minute and tokens-per-minute
+- a per-attempt timeout, with retries using exponential backoff and full jitter
+
+The endpoint is OpenAI-compatible, which covers both OpenAI and Kamiwaza
+deployments (point ``LLM_BASE_URL`` at the Kamiwaza model endpoint).
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+try:
+    import openai
+except ImportError:
+    openai = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class LLMClientConfig:
+    """Configuration for the shared LLM client."""
+
+    base_url: Optional[str] = None
+    api_key: Optional[str] = None
+    model: str = "gpt-4o-mini"
+    max_connections: int = 64
+    max_keepalive_connections: int = 32
+    keepalive_expiry: float = 30.0
+    requests_per_minute: float = 500
+    tokens_per_minute: float = 200_000
+    initial_concurrency: int = 8
+    max_concurrency: int = 32
+    request_timeout: float = 60.0
+    max_retries: int = 4
+    backoff_base: float = 0.5
+    backoff_max: float = 20.0
+    breaker_failure_threshold: int = 5
+    breaker_reset_timeout: float = 30.0
+
+    @classmethod
+    def from_env(cls) -> "LLMClientConfig":
+        """Build a config from ``LLM_*`` environment variables."""
+        defaults = cls()
+        env = os.environ
+        return cls(
+            base_url=env.get("LLM_BASE_URL") or env.get("OPENAI_BASE_URL"),
+            api_key=env.get("LLM_API_KEY") or env.get("OPENAI_API_KEY"),
+            model=env.get("LLM_MODEL", defaults.model),
+            max_connections=int(env.get("LLM_MAX_CONNECTIONS", defaults.max_connections)),
+            requests_per_minute=float(env.get("LLM_RPM", defaults.requests_per_minute)),
+            tokens_per_minute=float(env.get("LLM_TPM", defaults.tokens_per_minute)),
+            max_concurrency=int(env.get("LLM_MAX_CONCURRENCY", defaults.max_concurrency)),
+            request_timeout=float(env.get("LLM_TIMEOUT", defaults.request_timeout)),
+            max_retries=int(env.get("LLM_MAX_RETRIES", defaults.max_retries)),
+        )
+
+
+class CircuitOpenError(Exception):
+    """Raised when the circuit breaker is open and calls are rejected."""
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate_per_minute``."""
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity if capacity is not None else rate_per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` tokens are available and take them."""
+        # Requests larger than the bucket would never fit; let them drain it.
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD concurrency limit: halve on overload, add one after a run of successes.
+    """
+
+    def __init__(self, initial: int, maximum: int, minimum: int = 1, increase_after: int = 10):
+        self.limit = max(minimum, min(initial, maximum))
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase_after = increase_after
+        self.in_flight = 0
+        self._successes = 0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < self.limit)
+            self.in_flight += 1
+
+    async def release(self, overloaded: bool = False) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            if overloaded:
+                self.limit = max(self.minimum, self.limit // 2)
+                self._successes = 0
+                logger.warning(f"LLM backend overloaded, concurrency limit now {self.limit}")
+            else:
+                self._successes += 1
+                if self._successes >= self.increase_after and self.limit < self.maximum:
+                    self.limit += 1
+                    self._successes = 0
+            self._condition.notify_all()
+
+
+class CircuitBreaker:
+    """Closed -> open after repeated failures -> half-open probe after a timeout."""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_call(self) -> bool:
+        """Raise while open; returns True if this call is the half-open probe."""
+        state = self.state
+        if state == "open" or (state == "half-open" and self._probing):
+            raise CircuitOpenError("LLM backend circuit is open")
+        if state == "half-open":
+            self._probing = True
+            return True
+        return False
+
+    def release_probe(self) -> None:
+        """Let another call probe after a probe ended without an outcome (e.g. cancelled)."""
+        self._probing = False
+
+    def record_success(self) -> None:
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probing = False
+        if self.opened_at is not None or self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            logger.error(f"LLM circuit opened after {self.failures} consecutive failures")
+
+
+def _is_overload(error: Exception) -> bool:
+    return getattr(error, "status_code", None) == 429
+
+
+def _is_retryable(error: Exception) -> bool:
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException, httpx.TransportError)):
+        return True
+    if openai and isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return status == 429 or (status is not None and status >= 500)
+
+
+def _retry_after(error: Exception) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def estimate_tokens(messages: List[Dict[str, Any]], max_tokens: Optional[int] = None) -> int:
+    """Rough token estimate (about four characters per token) for rate limiting."""
+    chars = sum(len(str(m.get("content", ""))) for m in messages)
+    return chars // 4 + (max_tokens or 512)
+
+
+class LLMClient:
+    """Pooled async LLM client with rate limiting, retries and a circuit breaker."""
+
+    def __init__(self, config: Optional[LLMClientConfig] = None, client: Any = None):
+        self.config = config or LLMClientConfig.from_env()
+        self._http_client: Optional[httpx.AsyncClient] = None
+        self._client = client
+        self.request_bucket = TokenBucket(self.config.requests_per_minute)
+        self.token_bucket = TokenBucket(self.config.tokens_per_minute)
+        self.limiter = AdaptiveConcurrencyLimiter(
+            self.config.initial_concurrency, self.config.max_concurrency
+        )
+        self.breaker = CircuitBreaker(
+            self.config.breaker_failure_threshold, self.config.breaker_reset_timeout
+        )
+
+    @property
+    def client(self) -> Any:
+        """The underlying ``AsyncOpenAI`` client, created lazily on first use."""
+        if self._client is None:
+            if not openai:
+                raise ImportError("openai not installed. Install it with: pip install openai")
+            self._http_client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=self.config.max_connections,
+                    max_keepalive_connections=self.config.max_keepalive_connections,
+                    keepalive_expiry=self.config.keepalive_expiry,
+                ),
+                timeout=self.config.request_timeout,
+            )
+            # Retries are handled here so they share the rate limiter and breaker.
+            self._client = openai.AsyncOpenAI(
+                base_url=self.config.base_url,
+                api_key=self.config.api_key or "not-needed",
+                http_client=self._http_client,
+                max_retries=0,
+            )
+        return self._client
+
+    def _backoff(self, attempt: int) -> float:
+        ceiling = min(self.config.backoff_max, self.config.backoff_base * (2 ** attempt))
+        return random.uniform(0, ceiling)
+
+    async def _request(self, call: Callable[[], Awaitable[Any]], tokens: int) -> Any:
+        """Run ``call`` under the breaker, rate limits and concurrency limit, with retries."""
+        last_error: Optional[Exception] = None
+
+        for attempt in range(self.config.max_retries + 1):
+            probe = self.breaker.before_call()
+            try:
+                await self.request_bucket.acquire()
+                await self.token_bucket.acquire(tokens)
+                await self.limiter.acquire()
+                overloaded = False
+                try:
+                    response = await asyncio.wait_for(call(), timeout=self.config.request_timeout)
+                    self.breaker.record_success()
+                    return response
+                except Exception as e:
+                    last_error = e
+                    overloaded = _is_overload(e)
+                    if not _is_retryable(e):
+                        # The backend answered, so it is healthy even if the request was bad.
+                        self.breaker.record_success()
+                        raise
+                    # Rate limiting backs off through the limiter; it is not an outage
+                    if not overloaded:
+                        self.breaker.record_failure()
+                    if attempt == self.config.max_retries:
+                        break
+                    delay = _retry_after(e) or self._backoff(attempt)
+                    logger.warning(
+                        f"LLM call failed ({type(e).__name__}), retry {attempt + 1} in {delay:.2f}s"
+                    )
+                finally:
+                    await self.limiter.release(overloaded)
+            finally:
+                # A cancelled probe (CancelledError is not an Exception) must
+                # not leave the breaker rejecting every call
+                if probe:
+                    self.breaker.release_probe()
+            await asyncio.sleep(delay)
+
+        raise last_error
+
+    async def chat(self, messages: List[Dict[str, Any]], **kwargs: Any) -> Any:
+        """
+        Run a chat completion through the shared limits.
+
+        Args:
+            messages: Chat messages in OpenAI format
+            **kwargs: Extra arguments for ``chat.completions.create``
+
+        Returns:
+            The completion response object
+        """
+        kwargs.setdefault("model", self.config.model)
+        tokens = estimate_tokens(messages, kwargs.get("max_tokens"))
+        return await self._request(
+            lambda: self.client.chat.completions.create(messages=messages, **kwargs), tokens
+        )
+
+    async def complete(self, prompt: str, schema: Optional[Dict[str, Any]] = None) -> str:
+        """
+        Return the JSON text answer for a prompt (a field_extraction CompletionFn).
+
+        With a ``schema`` the answer is constrained to it (structured output),
+        otherwise to any JSON object.
+        """
+        if schema is None:
+            response_format: Dict[str, Any] = {"type": "json_object"}
+        else:
+            response_format = {"type": "json_schema", "json_schema": {"name": "answer", "schema": schema}}
+        response = await self.chat(
+            [{"role": "user", "content": prompt}],
+            response_format=response_format,
+            temperature=0.2,
+        )
+        return response.choices[0].message.content or ""
+
+    async def aclose(self) -> None:
+        """Close pooled connections."""
+        if self._http_client is not None:
+            await self._http_client.aclose()
+            self._http_client = None
+            self._client = None
+
+
+_shared_client: Optional[LLMClient] = None
+
+
+def get_llm_client() -> LLMClient:
+    """Return the process-wide LLM client, creating it from the environment."""
+    global _shared_client
+    if _shared_client is None:
+        _shared_client = LLMClient()
+    return _shared_client
+
+
+async def close_llm_client() -> None:
+    """Close the process-wide client (call on application shutdown)."""
+    global _shared_client
+    if _shared_client is not None:
+        await _shared_client.aclose()
+        _shared_client = None
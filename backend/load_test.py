@@ -0,0 +1,628 @@
+"""
+Load test of the generation endpoints against the PRD targets.
+
+The PRD asks for PDF generation in under 10 seconds with more than 50
+concurrent users. This harness drives the API with generated upload mixes
+(or a folder of real documents) and checks those targets:
+
+- closed loop: ``--users`` simulated users, each submitting a brief,
+  waiting for it and thinking for ``--think-time`` seconds before the next
+- open loop: Poisson arrivals at each of ``--rates`` requests per second;
+  the sweep reports the saturation knee, the highest rate the server keeps
+  up with before throughput falls behind or latency climbs
+
+Each user sends its own X-API-Key (``loadtest-user-<n>``), so admission
+control sees 50 clients and not one. Only keys listed in API_KEYS are
+trusted; the in-process app is started with them, and a deployment under
+``--url`` must list them too or every user shares the harness's IP.
+Open-loop arrivals cycle through ``--users`` keys. Every upload starts with
+a unique line, so no request is answered from the PDF cache.
+
+By default the app runs in this process on a local port with the LLM and
+the PDF renderer replaced by stubs that sleep for a log-normally distributed
+time around ``--llm-latency`` and ``--render-latency``. Extraction, admission,
+the pipeline and HTTP handling are real. ``--real-llm`` and
+``--real-renderer`` keep the real implementations, and ``--url`` targets a
+running deployment instead.
+
+The report covers throughput, error and rejection rates, p50/p95/p99 of
+the whole request and of every stage. Stages come from the Server-Timing
+header of /generate-document, or from the time each progress event arrives
+for /generations. With ``--output`` the report is written as JSON. The exit
+status is 1 when a target is missed or, with ``--baseline``, when
+throughput or p95 latency regressed against an earlier report.
+
+Usage (from the repository root):
+    python -m backend.load_test --users 50 --duration 60
+    python -m backend.load_test --rates 1,2,4,8,16 --duration 30
+    python -m backend.load_test --endpoint generations --output report.json --baseline last.json
+    python -m backend.load_test --url http://localhost:8000 --users 50
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import math
+import os
+import random
+import socket
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# PRD: "PDF generation < 10 seconds", "Concurrent use by 50+ users"
+TARGET_LATENCY = 10.0
+TARGET_USERS = 50
+
+_WORDS = (
+    "cloud migration security compliance workload platform customer data pipeline analytics "
+    "integration legacy infrastructure cost visibility automation governance network identity "
+    "backup recovery modernization assessment roadmap architecture team delivery support "
+    "monitoring performance latency scale availability risk audit policy vendor contract "
+    "budget timeline milestone workshop stakeholder requirement outcome benefit challenge"
+).split()
+
+
+@dataclass(frozen=True)
+class DocumentKind:
+    """One kind of upload in the mix."""
+
+    name: str
+    extension: str
+    content_type: str
+    min_words: int
+    max_words: int
+    weight: float
+
+
+# A mix modelled on what users upload: short notes, requirement documents,
+# exported web pages and the occasional long transcript (large enough for
+# the retrieval index to kick in)
+DEFAULT_MIX: Tuple[DocumentKind, ...] = (
+    DocumentKind("notes", ".txt", "text/plain", 150, 800, 0.4),
+    DocumentKind("requirements", ".md", "text/markdown", 500, 2500, 0.3),
+    DocumentKind("web_page", ".html", "text/html", 300, 1500, 0.2),
+    DocumentKind("transcript", ".txt", "text/plain", 4000, 12000, 0.1),
+)
+
+Upload = Tuple[str, bytes, str]  # filename, content, content type
+
+
+def _paragraphs(rng: random.Random, words: int) -> List[str]:
+    paragraphs = []
+    while words > 0:
+        size = min(words, rng.randint(40, 120))
+        paragraphs.append(" ".join(rng.choice(_WORDS) for _ in range(size)).capitalize() + ".")
+        words -= size
+    return paragraphs
+
+
+def make_document(kind: DocumentKind, rng: random.Random, marker: str) -> Upload:
+    """A synthetic document of the given kind, starting with ``marker``."""
+    paragraphs = _paragraphs(rng, rng.randint(kind.min_words, kind.max_words))
+    if kind.extension == ".html":
+        body = "".join(f"<p>{p}</p>" for p in paragraphs)
+        text = f"<html><body><h1>{marker}</h1>{body}</body></html>"
+    elif kind.extension == ".md":
+        text = f"# {marker}\n\n" + "\n\n".join(
+            f"## Section {i + 1}\n\n{p}" if i % 3 == 0 else p for i, p in enumerate(paragraphs)
+        )
+    else:
+        text = marker + "\n\n" + "\n\n".join(paragraphs)
+    return f"{kind.name}-{marker}{kind.extension}", text.encode("utf-8"), kind.content_type
+
+
+class UploadMix:
+    """Draws the files of one request from a document mix or a folder of real documents."""
+
+    def __init__(
+        self,
+        kinds: Sequence[DocumentKind] = DEFAULT_MIX,
+        files_per_request: Tuple[int, int] = (1, 3),
+        corpus: Optional[Path] = None,
+        seed: int = 0,
+    ):
+        self.kinds = list(kinds)
+        self.files_per_request = files_per_request
+        self.corpus = sorted(p for p in Path(corpus).rglob("*") if p.is_file()) if corpus else []
+        self.rng = random.Random(seed)
+        self._count = 0
+
+    def next_request(self) -> List[Upload]:
+        self._count += 1
+        uploads = []
+        for i in range(self.rng.randint(*self.files_per_request)):
+            marker = f"loadtest-{self._count}-{i}-{self.rng.getrandbits(32):08x}"
+            if self.corpus:
+                path = self.rng.choice(self.corpus)
+                uploads.append((path.name, path.read_bytes(), "application/octet-stream"))
+            else:
+                kind = self.rng.choices(self.kinds, weights=[k.weight for k in self.kinds])[0]
+                uploads.append(make_document(kind, self.rng, marker))
+        if self.corpus:
+            # Real files would all hit the PDF cache after the first round
+            uploads.append((f"{uploads[0][0]}.note.txt", marker.encode("utf-8"), "text/plain"))
+        return uploads
+
+
+@dataclass
+class Sample:
+    """The outcome of one request."""
+
+    start: float  # seconds since the run started
+    latency: float
+    status: int  # HTTP status, 0 for a transport error
+    stages: Dict[str, float] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and 200 <= self.status < 300
+
+    @property
+    def rejected(self) -> bool:
+        """Refused by admission control (quota, queue full) rather than failed."""
+        return self.status in (429, 503)
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """The q-th percentile (0-100) with linear interpolation; NaN for no values."""
+    if not values:
+        return math.nan
+    ordered = sorted(values)
+    rank = (len(ordered) - 1) * q / 100
+    low, high = math.floor(rank), math.ceil(rank)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def parse_server_timing(header: Optional[str]) -> Dict[str, float]:
+    """``Server-Timing`` entries as seconds by name (``total`` included)."""
+    stages: Dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    stages[name] = float(value) / 1000
+                except ValueError:
+                    pass
+    return stages
+
+
+def _distribution(values: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 4),
+        "p95": round(percentile(values, 95), 4),
+        "p99": round(percentile(values, 99), 4),
+        "max": round(max(values), 4) if values else math.nan,
+    }
+
+
+def summarize(samples: Sequence[Sample], duration: float) -> Dict[str, Any]:
+    """Throughput, error rates and latency percentiles of a run."""
+    completed = [s for s in samples if s.ok]
+    rejected = sum(1 for s in samples if s.rejected)
+    failed = len(samples) - len(completed) - rejected
+    stage_names = sorted({name for s in completed for name in s.stages})
+    errors: Dict[str, int] = {}
+    for s in samples:
+        if not s.ok:
+            label = s.error or f"HTTP {s.status}"
+            errors[label] = errors.get(label, 0) + 1
+    return {
+        "requests": len(samples),
+        "completed": len(completed),
+        "throughput": round(len(completed) / duration, 4) if duration > 0 else 0.0,
+        "error_rate": round(failed / len(samples), 4) if samples else 0.0,
+        "rejection_rate": round(rejected / len(samples), 4) if samples else 0.0,
+        "latency": _distribution([s.latency for s in completed]),
+        "stages": {
+            name: _distribution([s.stages[name] for s in completed if name in s.stages]) for name in stage_names
+        },
+        "errors": errors,
+    }
+
+
+def find_knee(steps: Sequence[Dict[str, Any]], keep_up: float = 0.9, latency_growth: float = 2.0) -> Optional[float]:
+    """
+    The saturation knee of an open-loop sweep: the highest offered rate
+    before the server stops keeping up (throughput below ``keep_up`` of the
+    offered rate) or p95 latency grows past ``latency_growth`` times the
+    lowest rate's. None if even the lowest rate saturates.
+    """
+    knee = None
+    baseline = None
+    for step in sorted(steps, key=lambda s: s["offered_rate"]):
+        p95 = step["latency"]["p95"]
+        if baseline is None and not math.isnan(p95):
+            baseline = p95
+        saturated = (
+            step["throughput"] < keep_up * step["offered_rate"]
+            or math.isnan(p95)
+            or (baseline is not None and p95 > latency_growth * baseline)
+        )
+        if saturated:
+            break
+        knee = step["offered_rate"]
+    return knee
+
+
+def check_targets(
+    report: Dict[str, Any],
+    max_latency: float = TARGET_LATENCY,
+    latency_percentile: str = "p95",
+    max_error_rate: float = 0.01,
+    min_rate: Optional[float] = None,
+    baseline: Optional[Dict[str, Any]] = None,
+    tolerance: float = 0.2,
+) -> List[str]:
+    """
+    The targets a report misses, as messages (empty when all are met).
+
+    Every run must keep latency and errors within the targets. A sweep must
+    reach ``min_rate`` before its knee. Compared with a ``baseline`` report
+    of the same scenario, throughput may not drop and latency may not rise
+    by more than ``tolerance``.
+    """
+    failures = []
+    for run in report["runs"]:
+        label = run["label"]
+        if run["completed"] == 0:
+            failures.append(f"{label}: no request completed")
+            continue
+        latency = run["latency"][latency_percentile]
+        if latency > max_latency:
+            failures.append(f"{label}: {latency_percentile} latency {latency:.2f}s exceeds {max_latency:.2f}s")
+        if run["error_rate"] > max_error_rate:
+            failures.append(f"{label}: error rate {run['error_rate']:.2%} exceeds {max_error_rate:.2%}")
+
+    if min_rate is not None and "knee" in report:
+        knee = report["knee"]
+        if knee is None or knee < min_rate:
+            failures.append(f"saturation knee {knee} req/s is below {min_rate} req/s")
+
+    if baseline:
+        previous = {run["label"]: run for run in baseline.get("runs", [])}
+        for run in report["runs"]:
+            before = previous.get(run["label"])
+            if not before or not before["completed"]:
+                continue
+            if run["throughput"] < before["throughput"] * (1 - tolerance):
+                failures.append(
+                    f"{run['label']}: throughput {run['throughput']:.2f}/s regressed from {before['throughput']:.2f}/s"
+                )
+            now, then = run["latency"][latency_percentile], before["latency"][latency_percentile]
+            if now > then * (1 + tolerance):
+                failures.append(
+                    f"{run['label']}: {latency_percentile} latency {now:.2f}s regressed from {then:.2f}s"
+                )
+    return failures
+
+
+SendFn = Callable[[int, float], Awaitable[Sample]]
+
+
+async def closed_loop(send: SendFn, users: int, duration: float, think_time: float, seed: int = 0) -> List[Sample]:
+    """``users`` concurrent users sending requests back to back (with think time) for ``duration`` seconds."""
+    start = time.monotonic()
+    samples: List[Sample] = []
+    rng = random.Random(seed)
+
+    async def user(n: int) -> None:
+        # Stagger the first requests over one think time so users do not arrive in lockstep
+        await asyncio.sleep(rng.uniform(0, think_time))
+        while time.monotonic() - start < duration:
+            samples.append(await send(n, time.monotonic() - start))
+            if think_time:
+                await asyncio.sleep(rng.expovariate(1 / think_time))
+
+    await asyncio.gather(*(user(n) for n in range(users)))
+    return samples
+
+
+async def open_loop(send: SendFn, rate: float, duration: float, seed: int = 0) -> List[Sample]:
+    """Poisson arrivals at ``rate`` requests per second for ``duration`` seconds, whatever the responses."""
+    start = time.monotonic()
+    rng = random.Random(seed)
+    tasks = []
+    n = 0
+    next_arrival = 0.0
+    while True:
+        next_arrival += rng.expovariate(rate)
+        if next_arrival >= duration:
+            break
+        await asyncio.sleep(max(0.0, start + next_arrival - time.monotonic()))
+        tasks.append(asyncio.ensure_future(send(n, time.monotonic() - start)))
+        n += 1
+    return list(await asyncio.gather(*tasks))
+
+
+def api_key(user: int) -> str:
+    """X-API-Key of simulated user ``user``."""
+    return f"loadtest-user-{user}"
+
+
+class Client:
+    """Sends one brief request through the chosen endpoint and times it."""
+
+    def __init__(
+        self,
+        http: httpx.AsyncClient,
+        mix: UploadMix,
+        endpoint: str = "generate",
+        timeout: float = 300.0,
+        users: int = TARGET_USERS,
+    ):
+        self.http = http
+        self.mix = mix
+        self.endpoint = endpoint
+        self.timeout = timeout
+        self.users = users
+
+    async def send(self, user: int, started_at: float) -> Sample:
+        files = [("files", upload) for upload in self.mix.next_request()]
+        headers = {"X-API-Key": api_key(user % self.users)}
+        start = time.perf_counter()
+        try:
+            if self.endpoint == "generations":
+                status, stages, error = await self._generation(files, headers, start)
+            elif self.endpoint == "jobs":
+                status, stages, error = await self._jobs(files, headers, start)
+            else:
+                response = await self.http.post("/generate-document", files=files, headers=headers, timeout=self.timeout)
+                status, error = response.status_code, None
+                stages = parse_server_timing(response.headers.get("Server-Timing"))
+                if "total" in stages:
+                    # Whatever the pipeline did not account for: admission
+                    # queueing, upload transfer and request handling
+                    stages["pipeline"] = stages.pop("total")
+                    stages["outside_pipeline"] = max(0.0, time.perf_counter() - start - stages["pipeline"])
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            status, stages, error = 0, {}, type(e).__name__
+        return Sample(started_at, time.perf_counter() - start, status, stages, error)
+
+    async def _generation(self, files: list, headers: Dict[str, str], start: float) -> Tuple[int, Dict[str, float], Optional[str]]:
+        response = await self.http.post("/generations", files=files, headers=headers, timeout=self.timeout)
+        if response.status_code != 202:
+            return response.status_code, {}, None
+        # Time until each progress event first arrives
+        stages: Dict[str, float] = {"accepted": time.perf_counter() - start}
+        async with self.http.stream("GET", response.json()["events_url"], timeout=self.timeout) as events:
+            async for line in events.aiter_lines():
+                if not line.startswith("event: "):
+                    continue
+                event = line[len("event: "):]
+                stages.setdefault(event, time.perf_counter() - start)
+                if event in ("completed", "failed"):
+                    return 200, stages, "generation failed" if event == "failed" else None
+        return 200, stages, "event stream ended early"
+
+    async def _jobs(self, files: list, headers: Dict[str, str], start: float) -> Tuple[int, Dict[str, float], Optional[str]]:
+        items = json.dumps([{"name": "Brief"}])
+        response = await self.http.post(
+            "/generate-documents/batch", params={"mode": "jobs"}, files=files, data={"items": items},
+            headers=headers, timeout=self.timeout,
+        )
+        if response.status_code != 200:
+            return response.status_code, {}, None
+        stages = {"accepted": time.perf_counter() - start}
+        job_ids = [job["job_id"] for job in response.json()["jobs"]]
+        while time.perf_counter() - start < self.timeout:
+            await asyncio.sleep(0.1)
+            jobs = [(await self.http.get(f"/jobs/{job_id}")).json() for job_id in job_ids]
+            if any(job["status"] == "running" for job in jobs):
+                stages.setdefault("running", time.perf_counter() - start)
+            if all(job["status"] in ("done", "failed") for job in jobs):
+                failed = any(job["status"] == "failed" for job in jobs)
+                return 200, stages, "job failed" if failed else None
+        return 200, stages, "job timed out"
+
+
+_STUB_PDF = b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\ntrailer<</Root 1 0 R>>\n%%EOF\n"
+
+
+def _lognormal_sleep(mean: float, rng: random.Random, sigma: float = 0.5) -> None:
+    if mean > 0:
+        # mu chosen so the distribution's mean is ``mean``
+        time.sleep(rng.lognormvariate(math.log(mean) - sigma ** 2 / 2, sigma))
+
+
+def install_stubs(main: Any, llm_latency: Optional[float], render_latency: Optional[float], seed: int = 0) -> None:
+    """
+    Replace the model stage's LLM work and the PDF renderer of the app module
+    with sleeps of realistic length (None keeps the real implementation).
+    """
+    rng = random.Random(seed)
+    lock = threading.Lock()
+
+    def draw(mean: float) -> None:
+        with lock:
+            seed_value = rng.random()
+        _lognormal_sleep(mean, random.Random(seed_value))
+
+    if llm_latency is not None:
+        real_model = main.get_model_from_context
+
+        def get_model_from_context(context: str) -> Any:
+            draw(llm_latency)
+            return real_model(context)
+
+        main.get_model_from_context = get_model_from_context
+
+    if render_latency is not None:
+
+        def render_pdf(html: str, options: Any = None) -> bytes:
+            draw(render_latency)
+            return _STUB_PDF
+
+        def get_document_bytes_from_model(model: Any, context: Any = None, options: Any = None) -> bytes:
+            return render_pdf("", options)
+
+        main.render_pdf = render_pdf
+        main.get_document_bytes_from_model = get_document_bytes_from_model
+        main.prepare_render = lambda options=None: None
+
+
+class LocalServer:
+    """The app served by uvicorn from a background thread on a free local port."""
+
+    def __init__(self, app: Any):
+        import uvicorn
+
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.server = uvicorn.Server(
+            uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        )
+        self.thread = threading.Thread(target=self.server.run, name="load-test-server", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self) -> "LocalServer":
+        self.thread.start()
+        deadline = time.monotonic() + 30
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("load test server did not start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=60)
+
+
+async def run_scenarios(args: argparse.Namespace, url: str) -> Dict[str, Any]:
+    mix = UploadMix(corpus=args.corpus, seed=args.seed)
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    async with httpx.AsyncClient(base_url=url, limits=limits) as http:
+        client = Client(http, mix, args.endpoint, timeout=args.timeout, users=args.users)
+        runs = []
+        if args.rates:
+            for rate in args.rates:
+                logger.info(f"Open loop at {rate} req/s for {args.duration}s")
+                started = time.monotonic()
+                samples = await open_loop(client.send, rate, args.duration, seed=args.seed)
+                run = summarize([s for s in samples if s.start >= args.warmup], time.monotonic() - started - args.warmup)
+                runs.append({"label": f"rate={rate}", "offered_rate": rate, **run})
+        else:
+            logger.info(f"Closed loop with {args.users} users for {args.duration}s")
+            started = time.monotonic()
+            samples = await closed_loop(client.send, args.users, args.duration, args.think_time, seed=args.seed)
+            elapsed = time.monotonic() - started
+            run = summarize([s for s in samples if s.start >= args.warmup], elapsed - args.warmup)
+            runs.append({"label": f"users={args.users}", "users": args.users, **run})
+
+    report: Dict[str, Any] = {
+        "endpoint": args.endpoint,
+        "target": url if args.url else "in-process",
+        "stubs": {
+            "llm_latency": None if args.real_llm else args.llm_latency,
+            "render_latency": None if args.real_renderer else args.render_latency,
+        },
+        "runs": runs,
+    }
+    if args.rates:
+        report["knee"] = find_knee(runs)
+    return report
+
+
+def print_report(report: Dict[str, Any], failures: List[str]) -> None:
+    print(f"\nEndpoint {report['endpoint']} on {report['target']} (stubs: {report['stubs']})")
+    for run in report["runs"]:
+        latency = run["latency"]
+        print(
+            f"\n{run['label']}: {run['completed']}/{run['requests']} completed, "
+            f"{run['throughput']:.2f} req/s, errors {run['error_rate']:.1%}, rejected {run['rejection_rate']:.1%}"
+        )
+        print(f"  {'':<18}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+        for name, dist in [("request", latency), *run["stages"].items()]:
+            print(f"  {name:<18}" + "".join(f"{dist[k]:>9.3f}" for k in ("p50", "p95", "p99", "max")))
+        for error, count in run["errors"].items():
+            print(f"  {count} x {error}")
+    if "knee" in report:
+        print(f"\nSaturation knee: {report['knee']} req/s")
+    print()
+    for failure in failures:
+        print(f"FAIL {failure}")
+    if not failures:
+        print("All targets met")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Load test the generation endpoints against the PRD targets")
+    parser.add_argument("--url", help="Base URL of a running server (default: run the app in-process)")
+    parser.add_argument("--endpoint", choices=("generate", "generations", "jobs"), default="generate")
+    parser.add_argument("--users", type=int, default=TARGET_USERS, help="Concurrent users of the closed-loop run")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Mean seconds a user waits between briefs")
+    parser.add_argument("--rates", type=lambda s: [float(r) for r in s.split(",")], help="Open-loop rates to sweep, e.g. 1,2,4,8")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds per run")
+    parser.add_argument("--warmup", type=float, default=5.0, help="Seconds at the start of each run left out of the stats")
+    parser.add_argument("--timeout", type=float, default=300.0)
+    parser.add_argument("--corpus", type=Path, help="Folder of real documents to upload instead of generated ones")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--llm-latency", type=float, default=3.0, help="Mean seconds of the stubbed LLM call")
+    parser.add_argument("--render-latency", type=float, default=1.5, help="Mean seconds of the stubbed render")
+    parser.add_argument("--real-llm", action="store_true", help="Keep the real model stage")
+    parser.add_argument("--real-renderer", action="store_true", help="Keep the real PDF renderer")
+    parser.add_argument("--max-latency", type=float, default=TARGET_LATENCY)
+    parser.add_argument("--latency-percentile", choices=("p50", "p95", "p99"), default="p95")
+    parser.add_argument("--max-error-rate", type=float, default=0.01)
+    parser.add_argument("--min-rate", type=float, help="Fail if a sweep saturates below this rate")
+    parser.add_argument("--baseline", type=Path, help="Earlier JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed regression against the baseline")
+    parser.add_argument("--output", type=Path, help="Write the report as JSON")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+
+    if args.url:
+        report = asyncio.run(run_scenarios(args, args.url.rstrip("/")))
+    else:
+        # Keep the run's caches and artefacts out of the real ones
+        scratch = tempfile.mkdtemp(prefix="ba_solution_brief_load_test_")
+        for name in ("PDF_CACHE_DIR", "PDF_FRAGMENT_CACHE_DIR", "ARTIFACT_STORE_DIR", "RETRIEVAL_CACHE_DIR", "PROFILE_DIR"):
+            os.environ.setdefault(name, os.path.join(scratch, name.lower()))
+        os.environ.setdefault("API_KEYS", ",".join(api_key(user) for user in range(args.users)))
+        from . import main as app_module
+
+        install_stubs(
+            app_module,
+            None if args.real_llm else args.llm_latency,
+            None if args.real_renderer else args.render_latency,
+            seed=args.seed,
+        )
+        with LocalServer(app_module.app) as server:
+            report = asyncio.run(run_scenarios(args, server.url))
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline else None
+    failures = check_targets(
+        report,
+        max_latency=args.max_latency,
+        latency_percentile=args.latency_percentile,
+        max_error_rate=args.max_error_rate,
+        min_rate=args.min_rate,
+        baseline=baseline,
+        tolerance=args.tolerance,
+    )
+    report["failures"] = failures
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    print_report(report, failures)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,37 +1,569 @@
-from typing import List
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
-from fastapi.responses import Response
-from pydantic import BaseModel
+from fastapi import FastAPI, File, Form, Header, HTTPException, Query, Request, UploadFile
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
+from pydantic import BaseModel, Field, TypeAdapter, ValidationError
 
-from .get_context_from_docs import get_context_from_docs
-from .get_document_bytes_from_model import get_document_bytes_from_model
-from .get_model_from_context import get_model_from_context
+from .admission import AdmissionController, AdmissionError, CostEstimate, CostWeights, estimate_cost
+from .artifact_store import STAGES as ARTIFACT_STAGES
+from .artifact_store import ArtifactStore, new_document_id, validate_document_id
+from .batch_jobs import (
+    BatchItem,
+    BatchResult,
+    apply_overrides,
+    generate_batch,
+    job_store_from_env,
+    run_batch_jobs,
+    stream_zip,
+)
+from .document_processor import (
+    DocumentSource,
+    combine_texts,
+    extract_document,
+    load_sources,
+)
+from .extraction_sandbox import (
+    ExtractionLimitError,
+    close_extraction_sandbox,
+    get_extraction_sandbox,
+    sandbox_enabled,
+)
+from .field_extraction import FieldGroup
+from .get_document_bytes_from_model import (
+    RENDER_CODE_VERSION,
+    TEMPLATE_DIR,
+    RenderOptions,
+    get_document_bytes_from_model,
+    get_pdf_optimizer,
+    prepare_render,
+    reconcile_model,
+    render_html,
+    render_pdf,
+)
+from .get_model_from_context import DocumentModel, extract_model_with_llm, get_model_from_context, llm_model_enabled
+from .llm_client import close_llm_client
+from .memory_budget import MemoryBudget, MemoryMeter, MemoryWeights, estimate_memory
+from .pdf_cache import PDFCache, model_fingerprint, template_version
+from .pipeline import PipelineRun, Stage, StageFn, run_pipeline
+from .profiling import (
+    ContinuousProfiler,
+    ProfileSession,
+    ProfileWriter,
+    RequestLog,
+    SamplingProfiler,
+    current_profile,
+)
+from .progress import (
+    COMPLETED,
+    FAILED,
+    ProgressTracker,
+    current_tracker,
+    format_sse,
+    progress_store_from_env,
+    report_progress,
+)
+from .renderers import close_renderers, resolve_renderer_name
+from .template_schema import import_model_class
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     title="File Processing API",
     description="API for processing uploaded files and returning PDF",
 )
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=os.environ.get("CORS_ORIGINS", "http://localhost:3000").split(","),
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "Server-Timing", "X-Document-Id", "X-Profile", "Accept-Ranges", "Content-Range", "Content-Length"],
+)
+
+
+pdf_cache = PDFCache.from_env()
+artifact_store = ArtifactStore.from_env()
+memory_budget = MemoryBudget.from_env()
+memory_weights = MemoryWeights.from_env()
+profile_writer = ProfileWriter.from_env()
+request_log = RequestLog()
+_continuous_profiler: Optional[ContinuousProfiler] = None
+# In-process unless SHARED_STATE_DB is set (multi-worker mode, see serve.py)
+batch_job_store = job_store_from_env()
+progress_store = progress_store_from_env()
+admission = AdmissionController.from_env()
+cost_weights = CostWeights.from_env()
+_background_tasks: set = set()
+
+
+def render_with_cache(
+    model: BaseModel,
+    context: Optional[str] = None,
+    options: Optional[RenderOptions] = None,
+    html: Optional[str] = None,
+) -> Tuple[bytes, str]:
+    """
+    Render the model to PDF, reusing a cached render of identical input.
+
+    ``html`` is the already rendered template for this model and options,
+    if the caller has it.
+
+    Returns:
+        The PDF bytes and their cache key (used as the ETag)
+    """
+    options = options or RenderOptions()
+    # Resolve the default backend so it is part of the cache key
+    options = options.model_copy(update={"renderer": resolve_renderer_name(options.renderer)})
+    # Rendering code and optimiser settings change the output as much as the template does
+    version = f"{template_version(TEMPLATE_DIR)}+{RENDER_CODE_VERSION}+{get_pdf_optimizer().signature()}"
+    pdf_cache.ensure_template_version(version)
+    key = model_fingerprint(model, version, options)
+
+    document_bytes = pdf_cache.get(key)
+    if document_bytes is not None:
+        report_progress("render_cached")
+    else:
+        if html is not None:
+            document_bytes = render_pdf(html, options)
+        else:
+            document_bytes = get_document_bytes_from_model(model, context, options)  # Group 3
+        pdf_cache.put(key, document_bytes)
+    return document_bytes, key
+
+
+def model_class_path(model: BaseModel) -> str:
+    return f"{type(model).__module__}:{type(model).__qualname__}"
+
+
+def load_stored_model(document_id: str) -> Optional[BaseModel]:
+    """Rebuild the validated model stored for a document, or None if there is none."""
+    document = artifact_store.get_document(document_id)
+    data = artifact_store.load(document_id, "model")
+    if document is None or data is None:
+        return None
+    model_cls = import_model_class(document["metadata"]["model_class"])
+    return model_cls.model_validate_json(data)
+
+
+def store_artifacts(document_id: str, options: Optional[RenderOptions] = None, **artifacts: Any) -> None:
+    """
+    Save stage outputs (context, model, html, pdf) of a document.
+
+    Later stages that were not given are dropped, since they no longer match.
+    """
+    stages = [stage for stage in ARTIFACT_STAGES if artifacts.get(stage) is not None]
+    metadata: Dict[str, Any] = {}
+    if options is not None:
+        metadata["options"] = json.loads(options.model_dump_json())
+    if isinstance(artifacts.get("model"), BaseModel):
+        metadata["model_class"] = model_class_path(artifacts["model"])
+    if "html" in stages:
+        metadata["template_version"] = template_version(TEMPLATE_DIR)
+    artifact_store.create_document(document_id, **metadata)
+    artifact_store.invalidate(document_id, stages[0])
+    for stage in stages:
+        value = artifacts[stage]
+        if isinstance(value, BaseModel):
+            value = value.model_dump_json()
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        artifact_store.save(document_id, stage, value)
+
+
+async def extract_isolated(
+    source: Optional[DocumentSource], on_page: Optional[Callable[[int, int], None]] = None
+) -> Optional[str]:
+    """
+    Extract one document in a sandboxed worker process (see extraction_sandbox).
+
+    A document that breaches the worker limits counts as a failed file; with
+    EXTRACTION_SANDBOX=0 extraction runs in a thread of this process instead.
+    """
+    if source is None:
+        return None
+    if not sandbox_enabled():
+        return await asyncio.to_thread(extract_document, source, on_page)
+    # An on-demand profile also covers the parsing in the worker process
+    session = current_profile.get()
+    try:
+        return await get_extraction_sandbox().run(
+            extract_document,
+            source,
+            on_progress=on_page,
+            progress_param="on_page",
+            profiler=session.worker_profiler() if session else None,
+            on_profile=session.merge_worker if session else None,
+        )
+    except (ExtractionLimitError, RuntimeError) as e:
+        logger.error(f"Error processing file {source.filename}: {e}")
+        return None
+
+
+async def build_model(context: str, on_group: Optional[Callable[[FieldGroup], None]] = None) -> BaseModel:
+    """
+    Group 2: fill in the brief model with the LLM in field groups when one
+    is configured (see get_model_from_context.llm_model_enabled), otherwise
+    the placeholder model. ``on_group`` is called as each LLM field group
+    completes.
+    """
+    if llm_model_enabled():
+        return await extract_model_with_llm(context, on_group=on_group)
+    return await asyncio.to_thread(get_model_from_context, context)
+
+
+def build_pipeline(
+    sources: List[Optional[DocumentSource]],
+    options: Optional[RenderOptions] = None,
+    document_id: Optional[str] = None,
+) -> List[Stage]:
+    """
+    The generation DAG for one request.
+
+    Every file is extracted in its own stage, and template and renderer
+    preparation runs alongside extraction and the model stage, so only the
+    slowest file, the model and the render are on the critical path. The
+    blocking stages run in worker threads. With a ``document_id``, every
+    stage's output is kept in the artefact store.
+
+    The caller's ``sources`` list is not modified. The pipeline drops its
+    references to the upload bytes as each file is extracted, so they are
+    freed early unless the caller still holds them.
+    """
+    sources = list(sources)
+    extracted = 0
+
+    def extract_stage(i: int) -> StageFn:
+        filename = sources[i].filename if sources[i] else None
+
+        def on_page(done: int, total: int) -> None:
+            report_progress("pages_extracted", file=filename, done=done, total=total)
+
+        async def extract() -> Optional[str]:
+            nonlocal extracted
+            source = sources[i]
+            text = await extract_isolated(source, on_page)
+            if source is not None:
+                # Drop the upload bytes now that the text is out; later
+                # stages only need the filename
+                sources[i] = DocumentSource(source.filename, b"", source.content_type)
+            del source
+            extracted += 1
+            report_progress(
+                "files_extracted", file=filename, ok=text is not None, done=extracted, total=len(sources)
+            )
+            return text
+
+        return extract
+
+    extract_names = [f"extract_{i}" for i in range(len(sources))]
+    stages = [Stage(name, extract_stage(i), group="extract") for i, name in enumerate(extract_names)]
+
+    async def context(**texts: Optional[str]) -> str:  # Group 1
+        return combine_texts(sources, [texts[name] for name in extract_names])
 
+    async def model(context: str) -> BaseModel:  # Group 2
+        groups_completed = 0
 
-def process_files_to_pdf(files: List[UploadFile]) -> bytes:
+        def on_group(group: FieldGroup) -> None:
+            nonlocal groups_completed
+            groups_completed += 1
+            report_progress("fields_completed", group=group.name, fields=list(group.fields))
+
+        report_progress("model_started")
+        model = await build_model(context, on_group)
+        if not groups_completed:
+            # The placeholder model is built in one step
+            report_progress("fields_completed", fields=sorted(model.model_fields_set))
+        return model
+
+    async def prepare() -> None:
+        try:
+            await asyncio.to_thread(prepare_render, options)
+        except Exception as e:
+            # A cache hit needs no renderer; a real render reports the error itself
+            logger.warning(f"Render preparation failed: {e}")
+
+    async def html(model: BaseModel) -> str:
+        return await asyncio.to_thread(render_html, model, options)
+
+    async def render(model: BaseModel, context: str, prepare: None, html: str) -> Tuple[bytes, str]:  # Group 3
+        return await asyncio.to_thread(render_with_cache, model, context, options, html)
+
+    async def store(context: str, model: BaseModel, html: str, render: Tuple[bytes, str]) -> None:
+        if document_id is not None:
+            await asyncio.to_thread(
+                store_artifacts, document_id, options, context=context, model=model, html=html, pdf=render[0]
+            )
+
+    return stages + [
+        Stage("context", context, deps=extract_names),
+        Stage("model", model, deps=["context"]),
+        Stage("prepare", prepare),
+        Stage("html", html, deps=["model"]),
+        Stage("render", render, deps=["model", "context", "prepare", "html"]),
+        Stage("store", store, deps=["context", "model", "html", "render"]),
+    ]
+
+
+async def process_sources_to_pdf(
+    sources: List[Optional[DocumentSource]],
+    options: Optional[RenderOptions] = None,
+    document_id: Optional[str] = None,
+) -> Tuple[bytes, str, PipelineRun]:
+    """
+    Run loaded documents through the extraction -> model -> render pipeline.
+
+    Returns:
+        The PDF bytes, their cache key (used as the ETag) and the pipeline
+        run with its per-stage timings
+    """
+    meter = MemoryMeter()
+    # Intermediate results (texts, context, HTML) are released as soon as
+    # their last consumer is done; only the PDF is kept
+    run = await run_pipeline(
+        build_pipeline(sources, options, document_id), keep=("render",), on_stage_done=meter.checkpoint
+    )
+    run.memory = meter.summary()
+    logger.info(
+        f"Process RSS growth during generation: {run.memory['process_peak_rss_delta'] / 2 ** 20:.1f} MiB "
+        f"({run.memory['concurrent']} generation(s) in flight)"
+    )
+    pdf_bytes, key = run.results["render"]
+    return pdf_bytes, key, run
+
+
+async def process_files_to_pdf(
+    files: List[UploadFile], options: Optional[RenderOptions] = None
+) -> Tuple[bytes, str, PipelineRun]:
+    """Run uploaded files through the pipeline (see process_sources_to_pdf)."""
+    return await process_sources_to_pdf(await load_sources(files), options)
+
+
+def is_known_api_key(api_key: Optional[str]) -> bool:
+    """Whether ``api_key`` is one of the comma-separated API_KEYS."""
+    if not api_key:
+        return False
+    keys = [key.strip() for key in os.environ.get("API_KEYS", "").split(",") if key.strip()]
+    # Compare against every key so the time taken does not reveal which one matched
+    matches = [hmac.compare_digest(api_key.encode(), key.encode()) for key in keys]
+    return any(matches)
+
+
+def client_id(request: Request, api_key: Optional[str]) -> str:
+    """
+    Admission-control identity of the caller: its API key, else its IP address.
+
+    Only keys listed in API_KEYS are trusted; anything else would let a caller
+    claim a fresh client (and a fresh fair share) on every request.
+    """
+    if is_known_api_key(api_key):
+        return f"key:{api_key}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+
+def is_admin(token: Optional[str]) -> bool:
+    """Whether ``token`` matches ADMIN_TOKEN (admin features are off without one)."""
+    expected = os.environ.get("ADMIN_TOKEN")
+    return bool(expected and token) and hmac.compare_digest(token.encode(), expected.encode())
+
+
+def require_admin(token: Optional[str]) -> None:
+    if not is_admin(token):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
+
+@app.middleware("http")
+async def profile_request(request: Request, call_next):
     """
-    Placeholder function that would process the uploaded files and return PDF bytes.
-    This function is not implemented - you would add your processing logic here.
+    Profile a request on demand: send ``X-Profile: 1`` (or ``?profile=1``)
+    with a valid ``X-Admin-Token``. The stacks of this process and of the
+    extraction workers it uses are sampled while the handler runs and
+    written to PROFILE_DIR as collapsed stacks and speedscope JSON; the
+    profile name is returned in the ``X-Profile`` header.
+    """
+    if request.headers.get("x-profile") != "1" and request.query_params.get("profile") != "1":
+        return await call_next(request)
+    if not is_admin(request.headers.get("x-admin-token")):
+        return JSONResponse(status_code=403, content={"detail": "Profiling requires an admin token"})
+
+    interval = float(os.environ.get("PROFILE_INTERVAL", 0.005))
+    name = f"request-{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{uuid.uuid4().hex[:8]}"
+    session = ProfileSession(name, SamplingProfiler(interval).start(), worker_interval=interval)
+    token = current_profile.set(session)
+    try:
+        response = await call_next(request)
+    finally:
+        current_profile.reset(token)
+        stacks = session.profiler.stop()
+        session.files = await asyncio.to_thread(profile_writer.write, name, stacks, interval)
+        logger.info(f"Profile of {request.url.path} written to {session.files['speedscope']}")
+    response.headers["X-Profile"] = name
+    return response
+
+
+@asynccontextmanager
+async def admitted(
+    client: str,
+    estimate: CostEstimate,
+    extra_cost: float = 0.0,
+    on_queued: Optional[Callable[[int], None]] = None,
+) -> AsyncIterator[None]:
     """
-    context: str = get_context_from_docs(files)  # Group 1
-    model: BaseModel = get_model_from_context(context)  # Group 2
-    document_bytes: bytes = get_document_bytes_from_model(model, context)  # Group 3
-    return document_bytes
+    Hold a fair-share worker slot (see admission) and then a reservation of
+    the generation's estimated peak memory from the node budget.
+
+    ``on_queued`` receives the queue position once the request is queued.
+
+    Raises:
+        AdmissionError: If the client is over its quota
+    """
+    async with admission.admit(client, estimate.cost + extra_cost, on_queued):
+        async with memory_budget.reserve(estimate_memory(estimate, memory_weights)):
+            yield
+
+
+def admission_refused(error: AdmissionError) -> HTTPException:
+    headers = {"Retry-After": str(error.retry_after)} if error.retry_after else None
+    return HTTPException(status_code=429, detail=str(error), headers=headers)
+
+
+async def run_tracked_generation(
+    tracker: ProgressTracker,
+    sources: List[Optional[DocumentSource]],
+    options: Optional[RenderOptions] = None,
+    client: Optional[str] = None,
+    cost: Optional[CostEstimate] = None,
+    document_id: Optional[str] = None,
+) -> None:
+    """
+    Run a generation in the background, reporting its progress and result to ``tracker``.
+
+    The generation waits for an admission slot first (when ``client`` and
+    ``cost`` are given).
+    """
+    current_tracker.set(tracker)
+    try:
+        if client is not None and cost is not None:
+            def queued(position: int) -> None:
+                tracker.emit("queued", cost=cost.cost, position=position)
+
+            async with admitted(client, cost, on_queued=queued):
+                _, key, run = await process_sources_to_pdf(sources, options, document_id)
+        else:
+            _, key, run = await process_sources_to_pdf(sources, options, document_id)
+    except Exception as e:
+        logger.error(f"Generation {tracker.generation_id} failed: {e}")
+        tracker.emit(FAILED, error=f"Error processing files: {str(e)}")
+        return
+    request_log.record(
+        "/generations", run.wall_time, run, generation_id=tracker.generation_id, document_id=document_id
+    )
+    tracker.emit(
+        COMPLETED,
+        key=key,
+        document_id=document_id,
+        pdf_url=f"/documents/{key}",
+        timings={name: round(seconds, 3) for name, seconds in run.breakdown().items()},
+    )
+
+
+def _etag_matches(if_none_match: Optional[str], key: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or f'"{key}"' in tags
+
+
+def _byte_range(range_header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    The inclusive (first, last) byte of a single-range ``Range`` header.
+
+    Returns None when the whole document should be sent (no header, several
+    ranges or another unit) and raises ValueError when the range cannot be
+    satisfied.
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    first, _, last = range_header[len("bytes="):].strip().partition("-")
+    try:
+        if not first:
+            # bytes=-N: the last N bytes
+            length = int(last)
+            if length <= 0:
+                raise ValueError(range_header)
+            return max(0, size - length), size - 1
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size or end < start:
+        raise ValueError(range_header)
+    return start, end
+
+
+def _pdf_response(
+    pdf_bytes: bytes, key: str, range_header: Optional[str] = None, if_range: Optional[str] = None
+) -> Response:
+    """
+    The PDF, or the requested part of it.
+
+    Byte ranges let PDF.js load a linearised document's first page before
+    the rest has arrived (see pdf_optimize).
+    """
+    headers = {
+        "Content-Disposition": "attachment; filename=processed_files.pdf",
+        "ETag": f'"{key}"',
+        "Content-Location": f"/documents/{key}",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+        "Accept-Ranges": "bytes",
+    }
+    # A range of another version of the document would be corrupt
+    if if_range is not None and if_range.strip() != f'"{key}"':
+        range_header = None
+    try:
+        byte_range = _byte_range(range_header, len(pdf_bytes))
+    except ValueError:
+        return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{len(pdf_bytes)}"})
+    if byte_range is None:
+        return Response(content=pdf_bytes, media_type="application/pdf", headers=headers)
+    start, end = byte_range
+    headers["Content-Range"] = f"bytes {start}-{end}/{len(pdf_bytes)}"
+    return Response(content=pdf_bytes[start : end + 1], status_code=206, media_type="application/pdf", headers=headers)
 
 
 @app.post("/generate-document")
-async def generate_document(files: List[UploadFile] = File(...)):
+async def generate_document(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    renderer: Optional[str] = Query(None),
+    document_id: Optional[str] = Query(None),
+    if_none_match: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+):
     """
     Process uploaded files and return a PDF file for download.
 
+    The request's cost is estimated from its uploads before any work starts;
+    it is refused with 429 if it would exceed the client's quota, and
+    otherwise waits for a fair share of the worker slots.
+
     Args:
         files: List of uploaded files to process
+        renderer: PDF renderer backend ("chromium" or "weasyprint"), defaults to PDF_RENDERER
+        document_id: Id to keep the brief's artefacts under (a new one by
+            default), returned in the X-Document-Id header
+        if_none_match: ETag of a PDF the client already holds (answered with 304)
+        x_api_key: Identifies the client for quotas and fair queuing if listed in API_KEYS (else its IP)
 
     Returns:
         PDF file as binary response
@@ -41,20 +573,469 @@ async def generate_document(files: List[UploadFile] = File(...)):
         if not files:
             raise HTTPException(status_code=400, detail="No files uploaded")
 
-        # Call the processing function (placeholder for now)
-        pdf_bytes = process_files_to_pdf(files)
+        try:
+            options = RenderOptions(renderer=resolve_renderer_name(renderer))
+            document_id = validate_document_id(document_id or new_document_id())
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
-        # Return PDF as downloadable file
-        return Response(
-            content=pdf_bytes,
-            media_type="application/pdf",
-            headers={"Content-Disposition": "attachment; filename=processed_files.pdf"},
+        sources = await load_sources(files)
+        cost = estimate_cost(sources, cost_weights)
+        try:
+            async with admitted(client_id(request, x_api_key), cost):
+                pdf_bytes, key, run = await process_sources_to_pdf(sources, options, document_id)
+        except AdmissionError as e:
+            raise admission_refused(e)
+        request_log.record(
+            "/generate-document", run.wall_time, run, document_id=document_id, files=len(sources)
         )
+        headers = {"Server-Timing": run.server_timing(), "X-Document-Id": document_id}
+        if _etag_matches(if_none_match, key):
+            return Response(status_code=304, headers={"ETag": f'"{key}"', **headers})
+
+        # Return PDF as downloadable file
+        response = _pdf_response(pdf_bytes, key)
+        response.headers.update(headers)
+        return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing files: {str(e)}")
 
 
+@app.post("/generations", status_code=202)
+async def start_generation(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    renderer: Optional[str] = Query(None),
+    document_id: Optional[str] = Query(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """
+    Start a generation in the background and return where to follow it.
+
+    Progress is streamed from ``events_url`` as server-sent events; the last
+    event is either ``completed`` (with the ``pdf_url`` of the brief) or
+    ``failed``. Reconnecting to the stream never restarts the generation.
+    Requests over the client's quota are refused with 429 up front.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    try:
+        options = RenderOptions(renderer=resolve_renderer_name(renderer))
+        document_id = validate_document_id(document_id or new_document_id())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Read the uploads now: they are closed once this request returns
+    sources = await load_sources(files)
+    client = client_id(request, x_api_key)
+    cost = estimate_cost(sources, cost_weights)
+    try:
+        admission.check(client, cost.cost)
+    except AdmissionError as e:
+        raise admission_refused(e)
+
+    tracker = progress_store.create()
+    # Wait for the first event to be stored, so another server worker can
+    # serve the events URL as soon as it is returned
+    await asyncio.to_thread(tracker.emit, "accepted", files=[s.filename for s in sources if s is not None])
+    task = asyncio.create_task(
+        run_tracked_generation(tracker, sources, options, client, cost, document_id)
+    )
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {
+        "generation_id": tracker.generation_id,
+        "document_id": document_id,
+        "events_url": f"/generations/{tracker.generation_id}/events",
+    }
+
+
+@app.get("/generations/{generation_id}/events")
+async def generation_events(generation_id: str, last_event_id: Optional[str] = Header(None)):
+    """
+    Server-sent progress events of a generation.
+
+    Events: accepted, queued, files_extracted, pages_extracted, model_started,
+    fields_completed (once per field group), pages_rendered and pdf_optimized
+    (or render_cached), then
+    completed or failed. Clients that reconnect with Last-Event-ID only
+    receive the events they missed.
+    """
+    tracker = await asyncio.to_thread(progress_store.get, generation_id)
+    if tracker is None:
+        raise HTTPException(status_code=404, detail="Generation not found")
+    try:
+        since = int(last_event_id) if last_event_id else -1
+    except ValueError:
+        since = -1
+
+    async def stream():
+        async for event in tracker.subscribe(since):
+            yield format_sse(event)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.post("/generate-documents/batch")
+async def generate_documents_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    items: str = Form(..., description="JSON list of {name, context?, overrides?}"),
+    mode: str = Query("zip", pattern="^(zip|jobs)$"),
+    renderer: Optional[str] = Query(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """
+    Generate one brief per item from a shared set of documents.
+
+    The shared documents are extracted once; each item adds its own context
+    and/or model field overrides. With mode=zip the PDFs are streamed back as
+    a ZIP archive as they finish; with mode=jobs per-item job ids are returned
+    and each finished PDF is served from /documents/{key}.
+
+    A batch is admitted as one request costing its shared extraction plus
+    one unit per item, so it takes its fair share of the workers rather
+    than crowding out interactive requests.
+    """
+    if not files:
+        raise HTTPException(status_code=400, detail="No files uploaded")
+    try:
+        batch_items = TypeAdapter(List[BatchItem]).validate_json(items)
+        options = RenderOptions(renderer=resolve_renderer_name(renderer))
+    except (ValidationError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid batch request: {e}")
+    if not batch_items:
+        raise HTTPException(status_code=400, detail="No batch items given")
+
+    sources = await load_sources(files)
+    client = client_id(request, x_api_key)
+    estimate = estimate_cost(sources, cost_weights)
+    cost = estimate.cost + len(batch_items) * cost_weights.base
+
+    async def model_fn(item_context: str) -> BaseModel:
+        return await build_model(item_context)  # Group 2
+
+    async def render_fn(model: BaseModel, item_context: str) -> Tuple[bytes, str]:
+        return await asyncio.to_thread(render_with_cache, model, item_context, options)
+
+    async def extract() -> str:
+        # Group 1, once for the whole batch
+        return combine_texts(sources, await asyncio.gather(*(extract_isolated(s) for s in sources)))
+
+    if mode == "zip":
+        try:
+            ticket = await admission.acquire(client, cost)
+        except AdmissionError as e:
+            raise admission_refused(e)
+
+        async def stream():
+            try:
+                async with memory_budget.reserve(estimate_memory(estimate, memory_weights)):
+                    context = await extract()
+                    async for chunk in stream_zip(generate_batch(context, batch_items, model_fn, render_fn)):
+                        yield chunk
+            finally:
+                ticket.release()
+
+        return StreamingResponse(
+            stream(),
+            media_type="application/zip",
+            headers={"Content-Disposition": "attachment; filename=briefs.zip"},
+            # Also release if the stream is never started (release is idempotent)
+            background=BackgroundTask(ticket.release),
+        )
+
+    try:
+        admission.check(client, cost)
+    except AdmissionError as e:
+        raise admission_refused(e)
+
+    batch_id = uuid.uuid4().hex
+    job_ids = await asyncio.to_thread(
+        batch_job_store.create_many, batch_id, [item.name for item in batch_items]
+    )
+
+    async def keep(job_id: str, result: BatchResult) -> None:
+        # The PDF cache may evict the render before the client fetches it
+        await asyncio.to_thread(store_artifacts, job_id, options, pdf=result.pdf)
+
+    async def run_jobs() -> None:
+        try:
+            async with admitted(client, estimate, extra_cost=cost - estimate.cost):
+                context = await extract()
+                results = generate_batch(context, batch_items, model_fn, render_fn)
+                await run_batch_jobs(job_ids, batch_job_store, results, keep)
+        except Exception as e:
+            logger.error(f"Batch {batch_id} failed: {e}")
+            await asyncio.to_thread(
+                batch_job_store.update_many,
+                job_ids,
+                where_status=("queued", "running"),
+                status="failed",
+                error=str(e),
+            )
+
+    task = asyncio.create_task(run_jobs())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return {
+        "batch_id": batch_id,
+        "jobs": [
+            {"job_id": job_id, "name": item.name, "status_url": f"/jobs/{job_id}"}
+            for job_id, item in zip(job_ids, batch_items)
+        ],
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status of a batch job; finished jobs include the URL of their PDF."""
+    job = await asyncio.to_thread(batch_job_store.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    response = {k: v for k, v in job.items() if k != "created"}
+    if job.get("document_id"):
+        # Kept in the artefact store, so the link outlives the PDF cache entry
+        response["pdf_url"] = f"/briefs/{job['document_id']}/pdf"
+    elif job.get("key"):
+        response["pdf_url"] = f"/documents/{job['key']}"
+    return response
+
+
+@app.get("/documents/{key}")
+async def get_document(
+    key: str,
+    if_none_match: Optional[str] = Header(None),
+    range_header: Optional[str] = Header(None, alias="Range"),
+    if_range: Optional[str] = Header(None),
+):
+    """
+    Serve a previously rendered PDF by its ETag for re-downloads and previews.
+
+    Returns 304 when the client already holds this version, and 206 with
+    part of the document for single byte-range requests.
+    """
+    try:
+        if _etag_matches(if_none_match, key) and pdf_cache.contains(key):
+            return Response(status_code=304, headers={"ETag": f'"{key}"'})
+        pdf_bytes = pdf_cache.get(key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    if pdf_bytes is None:
+        raise HTTPException(status_code=404, detail="Document not found or expired")
+    return _pdf_response(pdf_bytes, key, range_header, if_range)
+
+
+class RegenerateRequest(BaseModel):
+    """Optional body of a regeneration."""
+
+    overrides: Dict[str, Any] = Field(
+        default_factory=dict, description="Model fields replaced before rendering"
+    )
+
+
+_ARTIFACT_MEDIA_TYPES = {
+    "context": "text/plain; charset=utf-8",
+    "model": "application/json",
+    "html": "text/html; charset=utf-8",
+    "pdf": "application/pdf",
+}
+
+
+@app.get("/briefs/{document_id}")
+async def get_brief(document_id: str):
+    """Metadata of a stored brief and which stage artefacts it has."""
+    try:
+        document = await asyncio.to_thread(artifact_store.get_document, document_id)
+    except ValueError:
+        document = None
+    if document is None:
+        raise HTTPException(status_code=404, detail="Brief not found")
+    document["urls"] = {stage: f"/briefs/{document_id}/{stage}" for stage in document["stages"]}
+    return document
+
+
+@app.get("/briefs/{document_id}/{stage}")
+async def get_brief_artifact(document_id: str, stage: str):
+    """One stored artefact of a brief: context, model, html or pdf."""
+    if stage not in ARTIFACT_STAGES:
+        raise HTTPException(status_code=404, detail=f"Unknown stage '{stage}'")
+    try:
+        data = await asyncio.to_thread(artifact_store.load, document_id, stage)
+    except ValueError:
+        data = None
+    if data is None:
+        raise HTTPException(status_code=404, detail="Artefact not found")
+    return Response(content=data, media_type=_ARTIFACT_MEDIA_TYPES[stage])
+
+
+@app.delete("/briefs/{document_id}", status_code=204)
+async def delete_brief(document_id: str):
+    """Delete a brief and its artefacts."""
+    try:
+        deleted = await asyncio.to_thread(artifact_store.delete_document, document_id)
+    except ValueError:
+        deleted = False
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Brief not found")
+    return Response(status_code=204)
+
+
+def missing_artifact(stage: str) -> HTTPException:
+    """409 for a stage with no stored artefact (never saved, or removed by GC since it was listed)."""
+    return HTTPException(
+        status_code=409, detail=f"Brief has no stored {stage}; regenerate from an earlier stage"
+    )
+
+
+@app.post("/briefs/{document_id}/regenerate")
+async def regenerate_brief(
+    document_id: str,
+    request: Request,
+    body: Optional[RegenerateRequest] = None,
+    from_stage: str = Query("html", pattern="^(model|html|pdf)$"),
+    renderer: Optional[str] = Query(None),
+    x_api_key: Optional[str] = Header(None),
+):
+    """
+    Regenerate a stored brief starting from a later stage.
+
+    - from_stage=model re-runs the model stage on the stored context
+      (skips extraction)
+    - from_stage=html re-renders the stored model with the current template
+      (skips extraction and the LLM), applying any ``overrides``
+    - from_stage=pdf re-renders the stored HTML, e.g. with another renderer
+
+    The artefacts from that stage on are replaced and the new PDF returned.
+    """
+    overrides = body.overrides if body else {}
+    if overrides and from_stage == "pdf":
+        raise HTTPException(status_code=400, detail="Overrides need from_stage=model or html")
+    try:
+        options = RenderOptions(renderer=resolve_renderer_name(renderer))
+        document = await asyncio.to_thread(artifact_store.get_document, document_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if document is None:
+        raise HTTPException(status_code=404, detail="Brief not found")
+    previous = ARTIFACT_STAGES[ARTIFACT_STAGES.index(from_stage) - 1]
+    if previous not in document["stages"]:
+        raise missing_artifact(previous)
+
+    try:
+        async with admission.admit(client_id(request, x_api_key), cost_weights.base):
+            context = (await asyncio.to_thread(artifact_store.load, document_id, "context") or b"").decode("utf-8")
+            if from_stage == "pdf":
+                stored_html = await asyncio.to_thread(artifact_store.load, document_id, "html")
+                if stored_html is None:
+                    raise missing_artifact("html")
+                html = stored_html.decode("utf-8")
+                pdf_bytes = await asyncio.to_thread(render_pdf, html, options)
+                key = hashlib.sha256(f"{options.renderer}\0{html}".encode("utf-8")).hexdigest()
+                await asyncio.to_thread(pdf_cache.put, key, pdf_bytes)
+                await asyncio.to_thread(store_artifacts, document_id, options, pdf=pdf_bytes)
+            else:
+                if from_stage == "model":
+                    model = await build_model(context)  # Group 2
+                else:
+                    model = await asyncio.to_thread(load_stored_model, document_id)
+                    if model is None:
+                        raise missing_artifact("model")
+                model = apply_overrides(model, overrides)
+                html = await asyncio.to_thread(render_html, model, options)
+                pdf_bytes, key = await asyncio.to_thread(render_with_cache, model, context, options, html)
+                artifacts = {"model": model, "html": html, "pdf": pdf_bytes}
+                await asyncio.to_thread(store_artifacts, document_id, options, **artifacts)
+    except AdmissionError as e:
+        raise admission_refused(e)
+    except ValidationError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid overrides: {e}")
+
+    response = _pdf_response(pdf_bytes, key)
+    response.headers["X-Document-Id"] = document_id
+    return response
+
+
+@app.get("/admin/slow-requests")
+async def slow_requests(
+    limit: int = Query(20, ge=1, le=500),
+    x_admin_token: Optional[str] = Header(None),
+):
+    """The slowest recent generations with their critical-path and per-stage timings (admin only)."""
+    require_admin(x_admin_token)
+    return {"requests": request_log.slowest(limit)}
+
+
+@app.get("/admin/memory")
+async def memory_stats(x_admin_token: Optional[str] = Header(None)):
+    """Node memory budget: reserved bytes, running and waiting generations, RSS (admin only)."""
+    require_admin(x_admin_token)
+    return memory_budget.stats()
+
+
+def check_template_schema() -> None:
+    """
+    Warn about model fields the template never renders, template data no
+    model supplies and template branches that can therefore never render.
+
+    Checks the models listed in TEMPLATE_SCHEMA_MODELS (``module:Class``,
+    comma-separated), by default the pipeline's model and ProjectModel.
+    """
+    paths = os.environ.get(
+        "TEMPLATE_SCHEMA_MODELS", f"{DocumentModel.__module__}:DocumentModel,examples.model:ProjectModel"
+    )
+    for path in filter(None, (p.strip() for p in paths.split(","))):
+        try:
+            report = reconcile_model(import_model_class(path))
+        except (ImportError, AttributeError) as e:
+            logger.info(f"Skipping template schema check of {path}: {e}")
+            continue
+        except Exception as e:
+            logger.warning(f"Template schema check of {path} failed: {e}")
+            continue
+        for message in report.warnings():
+            logger.warning(message)
+
+
+@app.on_event("startup")
+async def startup():
+    """Check the template against the models and start continuous low-frequency profiling if PROFILE_CONTINUOUS is set"""
+    global _continuous_profiler
+    check_template_schema()
+    if os.environ.get("PROFILE_CONTINUOUS", "").lower() in ("1", "true", "yes"):
+        _continuous_profiler = ContinuousProfiler(
+            profile_writer,
+            interval=float(os.environ.get("PROFILE_CONTINUOUS_INTERVAL", 0.1)),
+            window=float(os.environ.get("PROFILE_CONTINUOUS_WINDOW", 300)),
+        ).start()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Finish background generations, release pooled connections and stop renderers, parser workers and the profiler"""
+    global _continuous_profiler
+    if _background_tasks:
+        # A worker stopped for a reload lets accepted generations finish
+        # rather than leaving their clients waiting on progress forever
+        timeout = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT", 60))
+        logger.info(f"Waiting up to {timeout}s for {len(_background_tasks)} background generations")
+        await asyncio.wait(set(_background_tasks), timeout=timeout)
+    if _continuous_profiler is not None:
+        _continuous_profiler.stop()
+        _continuous_profiler = None
+    await close_llm_client()
+    close_renderers()
+    close_extraction_sandbox()
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -62,6 +1043,6 @@ async def root():
 
 
 if __name__ == "__main__":
-    import uvicorn
+    from .serve import main
 
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    main()
@@ -0,0 +1,253 @@
+"""
+Per-request memory accounting and memory-aware admission.
+
+A generation holds the raw uploads, the parsers' object models, the
+consolidated context, the model, the HTML and the PDF. Under a burst of
+large uploads the sum of those outgrows the pod and it is OOM-killed.
+Admission control by cost (admission.py) bounds the number of requests,
+not their memory, so generations additionally reserve an estimate of their
+peak memory from a node budget:
+
+- ``estimate_memory`` turns the up-front cost estimate (upload bytes,
+  pages, images) into bytes
+- ``MemoryBudget`` admits reservations in FIFO order while they fit the
+  budget and the process RSS is below the high watermark; a request larger
+  than the whole budget runs alone rather than never
+- ``MemoryMeter`` records how the process's memory grew while a request
+  ran: RSS deltas at each pipeline stage in production, or tracemalloc's
+  peak when ``MEMORY_TRACE=1`` (debug; tracemalloc slows allocation down).
+  Both are process-wide, so they are only a per-request figure when the
+  request ran alone; the summary says how many generations overlapped
+"""
+
+import asyncio
+import logging
+import os
+import tracemalloc
+import weakref
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+
+try:
+    _PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+except (AttributeError, ValueError, OSError):
+    _PAGE_SIZE = 4096
+
+
+def current_rss() -> int:
+    """Resident set size of this process in bytes (0 where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def memory_limit() -> Optional[int]:
+    """The container's memory limit (cgroup v2 or v1), else the machine's RAM."""
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        # cgroup v1 reports "no limit" as a huge number
+        if value != "max" and int(value) < 1 << 60:
+            return int(value)
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemTotal:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def tracing_enabled() -> bool:
+    return os.environ.get("MEMORY_TRACE", "").lower() in ("1", "true", "yes")
+
+
+@dataclass(frozen=True)
+class MemoryWeights:
+    """Bytes of peak memory per unit of input."""
+
+    base: int = 48 * MB  # model, HTML, PDF and bookkeeping of any request
+    per_upload_byte: float = 6.0  # raw bytes, copies and the parser object model
+    per_page: int = 2 * MB  # pdfplumber page objects and layout analysis
+    per_image: int = 24 * MB  # decoded image for OCR
+
+    @classmethod
+    def from_env(cls) -> "MemoryWeights":
+        return cls(
+            base=int(float(os.environ.get("MEMORY_ESTIMATE_BASE_MB", cls.base / MB)) * MB),
+            per_upload_byte=float(os.environ.get("MEMORY_ESTIMATE_PER_UPLOAD_BYTE", cls.per_upload_byte)),
+            per_page=int(float(os.environ.get("MEMORY_ESTIMATE_PER_PAGE_MB", cls.per_page / MB)) * MB),
+            per_image=int(float(os.environ.get("MEMORY_ESTIMATE_PER_IMAGE_MB", cls.per_image / MB)) * MB),
+        )
+
+
+def estimate_memory(cost: Any, weights: Optional[MemoryWeights] = None) -> int:
+    """
+    Peak memory estimate of a generation, in bytes.
+
+    Args:
+        cost: Anything with ``bytes``, ``pages`` and ``images`` (e.g.
+            admission.CostEstimate), or None for a request without uploads
+    """
+    weights = weights or MemoryWeights()
+    if cost is None:
+        return weights.base
+    return int(
+        weights.base
+        + cost.bytes * weights.per_upload_byte
+        + cost.pages * weights.per_page
+        + cost.images * weights.per_image
+    )
+
+
+class MemoryBudget:
+    """FIFO admission of memory reservations against a node budget."""
+
+    def __init__(self, budget_bytes: int, high_watermark: float = 0.9):
+        self.budget_bytes = budget_bytes
+        self.high_watermark = high_watermark
+        self.reserved = 0
+        self.running = 0
+        self._waiters: Deque[Tuple[int, "asyncio.Future"]] = deque()
+
+    @classmethod
+    def from_env(cls) -> "MemoryBudget":
+        """
+        Budget from MEMORY_BUDGET_MB, else MEMORY_BUDGET_FRACTION (default
+        0.75) of the container limit or machine RAM. The node budget is
+        split evenly between the server processes (SERVER_WORKERS).
+        """
+        if os.environ.get("MEMORY_BUDGET_MB"):
+            budget = int(float(os.environ["MEMORY_BUDGET_MB"]) * MB)
+        else:
+            limit = memory_limit() or 4 * 1024 * MB
+            budget = int(limit * float(os.environ.get("MEMORY_BUDGET_FRACTION", 0.75)))
+        budget //= max(1, int(os.environ.get("SERVER_WORKERS", 1)))
+        return cls(budget, high_watermark=float(os.environ.get("MEMORY_HIGH_WATERMARK", 0.9)))
+
+    def _fits(self, nbytes: int) -> bool:
+        if self.running == 0:
+            # Always let one request through, however large, so it cannot starve
+            return True
+        if self.reserved + nbytes > self.budget_bytes:
+            return False
+        # Reservations are estimates: also hold back while the process is
+        # actually close to the budget (e.g. memory not yet returned to the OS)
+        rss = current_rss()
+        return not rss or rss < self.budget_bytes * self.high_watermark
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            nbytes, future = self._waiters[0]
+            if future.done():
+                self._waiters.popleft()
+                continue
+            if not self._fits(nbytes):
+                return
+            self._waiters.popleft()
+            self.reserved += nbytes
+            self.running += 1
+            future.set_result(None)
+
+    async def acquire(self, nbytes: int) -> None:
+        """Wait until ``nbytes`` can be reserved (in arrival order)."""
+        if not self._waiters and self._fits(nbytes):
+            self.reserved += nbytes
+            self.running += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append((nbytes, future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(nbytes)
+            else:
+                # The cancelled waiter may have been holding up the queue
+                self._dispatch()
+            raise
+
+    def release(self, nbytes: int) -> None:
+        self.reserved = max(0, self.reserved - nbytes)
+        self.running = max(0, self.running - 1)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """Hold a reservation for the duration of the block."""
+        await self.acquire(nbytes)
+        try:
+            yield
+        finally:
+            self.release(nbytes)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "budget_bytes": self.budget_bytes,
+            "reserved_bytes": self.reserved,
+            "running": self.running,
+            "waiting": sum(1 for _, future in self._waiters if not future.done()),
+            "rss_bytes": current_rss(),
+        }
+
+
+_active_meters: "weakref.WeakSet[MemoryMeter]" = weakref.WeakSet()
+
+
+class MemoryMeter:
+    """
+    Process memory growth while one request runs: RSS (or traced heap)
+    relative to its start.
+
+    Other requests running at the same time grow (and free) the same RSS,
+    so the figures are process-level. ``concurrent`` is the most meters that
+    were active at once during this one; only with 1 do the deltas belong
+    to this request alone.
+    """
+
+    def __init__(self, trace: Optional[bool] = None):
+        self.trace = tracing_enabled() if trace is None else trace
+        self.start_rss = current_rss()
+        self.peak_rss = self.start_rss
+        self.stages: Dict[str, int] = {}
+        self.concurrent = 0
+        _active_meters.add(self)
+        for meter in list(_active_meters):
+            meter.concurrent = max(meter.concurrent, len(_active_meters))
+        if self.trace:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+
+    def checkpoint(self, label: str) -> None:
+        """Record the RSS growth since the start, e.g. as a stage finishes."""
+        rss = current_rss()
+        self.peak_rss = max(self.peak_rss, rss)
+        self.stages[label] = rss - self.start_rss
+
+    def summary(self) -> Dict[str, Any]:
+        self.checkpoint("end")
+        _active_meters.discard(self)
+        summary: Dict[str, Any] = {
+            "process_start_rss": self.start_rss,
+            "process_peak_rss_delta": self.peak_rss - self.start_rss,
+            "stages": {label: delta for label, delta in self.stages.items() if label != "end"},
+            "concurrent": self.concurrent,
+        }
+        if self.trace and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            summary["traced_current"] = current
+            summary["traced_peak"] = peak
+        return summary
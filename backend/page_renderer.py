@@ -0,0 +1,158 @@
+"""
+Incremental page-level rendering.
+
+The solution brief template renders a cover header followed by independent
+``<div class="page">`` sections. Each top-level section is rendered to its own
+PDF fragment, cached under a hash of the section's rendered HTML (plus the
+document's stylesheets, the template asset version and the renderer), and
+the fragments are merged with PyPDF2. Because the key is the rendered HTML,
+a fragment is reused exactly when none of the model fields it displays
+changed: editing one use case re-renders only the use-cases page. Head
+content that does not affect layout, such as the ``<title>``, is not part
+of the key, so a new title does not re-render every page.
+"""
+
+import hashlib
+import io
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, List, Optional, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+
+logger = logging.getLogger(__name__)
+
+_DIV_TAG = re.compile(r"<div\b|</div\s*>", re.I)
+_BODY_OPEN = re.compile(r"<body[^>]*>", re.I)
+_BODY_CLOSE = re.compile(r"</body\s*>", re.I)
+_COMMENT = re.compile(r"<!--.*?-->", re.S)
+# Head elements that change how a section renders
+_STYLE_TAGS = re.compile(r"<style\b.*?</style\s*>|<link\b[^>]*>|<base\b[^>]*>", re.I | re.S)
+
+
+def split_pages(html: str) -> Tuple[str, List[str], str]:
+    """
+    Split a rendered document into its top-level ``<div>`` sections.
+
+    Returns:
+        The document prefix (up to and including ``<body>``), the section
+        fragments in order, and the suffix (from ``</body>`` on)
+    """
+    body_open = _BODY_OPEN.search(html)
+    body_close = _BODY_CLOSE.search(html, body_open.end() if body_open else 0)
+    if not body_open or not body_close:
+        return "", [html], ""
+
+    prefix, suffix = html[: body_open.end()], html[body_close.start():]
+    body = html[body_open.end(): body_close.start()]
+
+    fragments: List[str] = []
+    depth = 0
+    start: Optional[int] = None
+    for match in _DIV_TAG.finditer(body):
+        if match.group(0).lower().startswith("<div"):
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth > 0:
+            depth -= 1
+            if depth == 0 and start is not None:
+                fragments.append(body[start: match.end()])
+                start = None
+
+    # Anything outside the top-level divs (other than comments and whitespace)
+    # would be lost, so fall back to rendering the document as one fragment.
+    leftover = body
+    for fragment in fragments:
+        leftover = leftover.replace(fragment, "", 1)
+    if not fragments or _COMMENT.sub("", leftover).strip():
+        return prefix, [body], suffix
+
+    return prefix, fragments, suffix
+
+
+def style_signature(prefix: str) -> str:
+    """
+    The parts of the document prefix that affect how a section renders: its
+    ``<style>``, ``<link>`` and ``<base>`` elements and the ``<body>`` tag.
+    """
+    parts = _STYLE_TAGS.findall(_COMMENT.sub("", prefix))
+    body_open = _BODY_OPEN.search(prefix)
+    if body_open:
+        parts.append(body_open.group(0))
+    return "\n".join(parts)
+
+
+def fragment_key(renderer_name: str, prefix: str, fragment: str, asset_version: str = "") -> str:
+    """Cache key for one page fragment: the fragment, the stylesheets and assets, and the renderer."""
+    digest = hashlib.sha256()
+    for part in (renderer_name, asset_version, style_signature(prefix), fragment):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def merge_pdfs(parts: List[bytes]) -> bytes:
+    """Concatenate PDF documents in order."""
+    writer = PdfWriter()
+    for part in parts:
+        for page in PdfReader(io.BytesIO(part)).pages:
+            writer.add_page(page)
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def render_incrementally(
+    html: str,
+    renderer: Any,
+    cache: Any,
+    base_url: Any = None,
+    max_workers: int = 4,
+    on_fragment: Optional[Callable[[int, int], None]] = None,
+    asset_version: str = "",
+) -> bytes:
+    """
+    Render a document page section by page section, reusing cached fragments.
+
+    Args:
+        html: Complete rendered HTML document
+        renderer: Renderer backend (see renderers.Renderer)
+        cache: Fragment store with ``get(key)`` and ``put(key, data)`` (a PDFCache)
+        base_url: Directory relative resources resolve against
+        max_workers: Fragments rendered concurrently on a cache miss
+        on_fragment: Called with (fragments ready, total) as fragments are
+            reused or rendered, for progress reporting
+        asset_version: Version of the files the document links to (e.g.
+            ``pdf_cache.template_version``), so editing a linked stylesheet
+            or font invalidates the fragments
+
+    Returns:
+        bytes: The merged PDF
+    """
+    prefix, fragments, suffix = split_pages(html)
+    keys = [fragment_key(renderer.name, prefix, f, asset_version) for f in fragments]
+    parts: List[Optional[bytes]] = [cache.get(key) for key in keys]
+    missing = [i for i, part in enumerate(parts) if part is None]
+    if on_fragment:
+        on_fragment(len(fragments) - len(missing), len(fragments))
+
+    def render_fragment(index: int) -> bytes:
+        return renderer.render(prefix + fragments[index] + suffix, base_url=base_url)
+
+    if missing:
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(missing))) as pool:
+            for index, data in zip(missing, pool.map(render_fragment, missing)):
+                cache.put(keys[index], data)
+                parts[index] = data
+                if on_fragment:
+                    on_fragment(sum(part is not None for part in parts), len(fragments))
+
+    logger.info(
+        f"Rendered {len(missing)} of {len(fragments)} page fragments "
+        f"({len(fragments) - len(missing)} reused)"
+    )
+    if len(parts) == 1:
+        return parts[0]
+    return merge_pdfs(parts)
@@ -0,0 +1,239 @@
+"""
+Disk-backed cache of rendered PDFs.
+
+Entries are keyed by a canonical hash of the model JSON, the template version
+(with the version of the rendering code, see ``code_version``) and the render
+options, so regenerating an identical brief skips rendering.
+The key doubles as the HTTP ETag of the PDF. Entries expire after a TTL and the
+least recently used ones are evicted once the cache exceeds its size budget.
+When the template or code version changes the whole cache is dropped.
+
+The cache size is tracked as entries are written, so a ``put`` only scans
+the directory when the budget is exceeded or the periodic sweep for expired
+entries is due. Other processes sharing the directory are picked up by that
+sweep.
+"""
+
+import hashlib
+import inspect
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Files that affect rendered output: templates, stylesheets, fonts and images.
+# Anything else next to the templates (the model module, scripts, caches) is
+# left out of the template version.
+TEMPLATE_SUFFIXES = frozenset({
+    ".html", ".htm", ".jinja", ".j2", ".css",
+    ".woff", ".woff2", ".ttf", ".otf",
+    ".png", ".jpg", ".jpeg", ".gif", ".svg", ".webp",
+})
+
+_template_versions: Dict[str, Tuple[Tuple[Tuple[str, int, int], ...], str]] = {}
+
+
+def template_version(template_dir: Path) -> str:
+    """
+    Content hash of the templates and assets in the template directory
+    (``TEMPLATE_SUFFIXES``).
+
+    The hash is only recomputed when a file's size or mtime changes, so calling
+    this per request costs a directory stat.
+    """
+    template_dir = Path(template_dir)
+    files = sorted(
+        p for p in template_dir.rglob("*") if p.suffix.lower() in TEMPLATE_SUFFIXES and p.is_file()
+    )
+    signature = tuple(
+        (str(p.relative_to(template_dir)), p.stat().st_mtime_ns, p.stat().st_size) for p in files
+    )
+    cached = _template_versions.get(str(template_dir))
+    if cached and cached[0] == signature:
+        return cached[1]
+
+    digest = hashlib.sha256()
+    for path in files:
+        digest.update(str(path.relative_to(template_dir)).encode("utf-8"))
+        digest.update(path.read_bytes())
+    version = digest.hexdigest()[:16]
+    _template_versions[str(template_dir)] = (signature, version)
+    return version
+
+
+def code_version(*objects: Any) -> str:
+    """
+    Content hash of the source files defining ``objects`` (modules, classes
+    or functions), so cache keys change when the code that produces the
+    cached output does.
+    """
+    paths = sorted({Path(inspect.getsourcefile(obj)) for obj in objects}, key=lambda p: p.name)
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(path.name.encode("utf-8"))
+        digest.update(path.read_bytes())
+    return digest.hexdigest()[:16]
+
+
+def model_fingerprint(
+    model: BaseModel, template_ver: str, options: Optional[BaseModel] = None
+) -> str:
+    """Canonical hash of the model data, template version and render options."""
+    payload = {
+        "model": type(model).__name__,
+        "data": json.loads(model.model_dump_json()),
+        "template": template_ver,
+        "options": json.loads(options.model_dump_json()) if options is not None else None,
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class PDFCache:
+    """Content-addressed PDF files on disk with TTL and size-based LRU eviction."""
+
+    VERSION_FILE = "TEMPLATE_VERSION"
+
+    def __init__(
+        self,
+        directory: Path,
+        max_bytes: int = 512 * 1024 * 1024,
+        ttl: float = 24 * 3600,
+        sweep_interval: float = 600.0,
+    ):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last sweep plus what this process wrote since
+        self._total: Optional[int] = None
+        self._swept_at = 0.0
+
+    @classmethod
+    def from_env(cls) -> "PDFCache":
+        """Build a cache from ``PDF_CACHE_*`` environment variables."""
+        directory = os.environ.get(
+            "PDF_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ba_solution_brief", "pdf_cache")
+        )
+        return cls(
+            Path(directory),
+            max_bytes=int(os.environ.get("PDF_CACHE_MAX_BYTES", 512 * 1024 * 1024)),
+            ttl=float(os.environ.get("PDF_CACHE_TTL", 24 * 3600)),
+            sweep_interval=float(os.environ.get("PDF_CACHE_SWEEP_INTERVAL", 600)),
+        )
+
+    def _path(self, key: str) -> Path:
+        if not key or not all(c in "0123456789abcdef" for c in key):
+            raise ValueError(f"Invalid cache key: {key!r}")
+        return self.directory / f"{key}.pdf"
+
+    def ensure_template_version(self, version: str) -> None:
+        """Drop every entry if the templates changed since they were rendered."""
+        version_file = self.directory / self.VERSION_FILE
+        with self._lock:
+            current = version_file.read_text().strip() if version_file.exists() else None
+            if current == version:
+                return
+            if current is not None:
+                logger.info(f"Template version changed ({current} -> {version}), clearing PDF cache")
+                for entry in self.directory.glob("*.pdf"):
+                    entry.unlink(missing_ok=True)
+                self._total = None
+            version_file.write_text(version)
+
+    def get(self, key: str) -> Optional[bytes]:
+        """Return cached PDF bytes, or None on a miss or expired entry."""
+        path = self._path(key)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > self.ttl:
+            path.unlink(missing_ok=True)
+            self._account(-stat.st_size)
+            return None
+        try:
+            data = path.read_bytes()
+            # mtime is the write time (TTL), atime the last access (LRU)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except FileNotFoundError:
+            return None
+        return data
+
+    def contains(self, key: str) -> bool:
+        """Whether a fresh entry exists for ``key`` (without reading it)."""
+        try:
+            stat = self._path(key).stat()
+        except FileNotFoundError:
+            return False
+        return time.time() - stat.st_mtime <= self.ttl
+
+    def _account(self, delta: int) -> None:
+        with self._lock:
+            if self._total is not None:
+                self._total += delta
+
+    def put(self, key: str, data: bytes) -> None:
+        """Store PDF bytes atomically and evict entries over budget."""
+        path = self._path(key)
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_name, path)
+        self._account(len(data) - replaced)
+
+        with self._lock:
+            due = (
+                self._total is None
+                or self._total > self.max_bytes
+                or time.monotonic() - self._swept_at >= self.sweep_interval
+            )
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove expired entries, then least recently used ones until under budget."""
+        with self._lock:
+            self._swept_at = time.monotonic()
+            now = time.time()
+            entries = []
+            for path in self.directory.glob("*.pdf"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    path.unlink(missing_ok=True)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+            self._total = total
+
+    def stats(self) -> Dict[str, Any]:
+        sizes = [p.stat().st_size for p in self.directory.glob("*.pdf")]
+        return {
+            "entries": len(sizes),
+            "bytes": sum(sizes),
+            "max_bytes": self.max_bytes,
+            "ttl": self.ttl,
+        }
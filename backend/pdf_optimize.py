@@ -0,0 +1,551 @@
+"""
+Post-processing of rendered PDFs: smaller files that preview sooner.
+
+Briefs are downloaded and previewed in the browser, so every byte delays
+the first page. ``PdfOptimizer`` rewrites a rendered PDF in one pass over
+its objects:
+
+- images are downsampled to a target resolution (PDF_IMAGE_DPI, default
+  150) based on the size they are actually drawn at, found by following
+  the transformation matrix through the page and form content streams
+- embedded TrueType CID fonts that are not already subset (renderers
+  normally subset, fonts added by hand may not) are cut down to the glyphs
+  the text uses
+- identical objects are stored once: merged page sections each carry
+  their own copy of the header logo, fonts descriptors and resources
+- streams stored without compression are Flate-compressed
+- the file is linearised ("fast web view") with qpdf when it is installed,
+  so a viewer using range requests can show page one before the rest
+  arrives
+
+Every step is best effort: anything it does not understand (masks,
+indexed or CMYK images, simple fonts) is left untouched, and if the
+rewrite fails or does not help the original bytes are returned.
+"""
+
+import hashlib
+import io
+import logging
+import math
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+import zlib
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject,
+    ContentStream,
+    DictionaryObject,
+    EncodedStreamObject,
+    IndirectObject,
+    NameObject,
+    NullObject,
+    NumberObject,
+    StreamObject,
+)
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+try:
+    from fontTools import subset as font_subset
+    from fontTools.ttLib import TTFont
+except ImportError:
+    font_subset = None
+
+logger = logging.getLogger(__name__)
+
+Matrix = Tuple[float, float, float, float, float, float]
+IDENTITY: Matrix = (1.0, 0.0, 0.0, 1.0, 0.0, 0.0)
+
+# Only downsample images with noticeably more pixels than the target needs
+DOWNSAMPLE_ABOVE = 1.5
+MIN_IMAGE_PIXELS = 64
+MAX_FORM_DEPTH = 4
+# Objects that must stay distinct even when their contents are equal
+_UNIQUE_TYPES = {"/Page", "/Pages", "/Catalog", "/Annot", "/StructTreeRoot", "/StructElem"}
+_IMAGE_MODES = {"/DeviceRGB": "RGB", "/DeviceGray": "L"}
+
+
+@dataclass
+class OptimizationReport:
+    """What an optimisation pass did and what it cost."""
+
+    bytes_in: int = 0
+    bytes_out: int = 0
+    seconds: float = 0.0
+    images_downsampled: int = 0
+    fonts_subset: int = 0
+    objects_deduplicated: int = 0
+    streams_compressed: int = 0
+    linearized: bool = False
+    skipped: Optional[str] = None  # why the input was returned unchanged
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.bytes_in - self.bytes_out
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "saved_bytes": self.saved_bytes}
+
+
+@dataclass
+class ResourceUsage:
+    """How the pages use their resources, keyed by object number."""
+
+    # Largest size each image is drawn at, in points
+    images: Dict[int, Tuple[float, float]] = field(default_factory=dict)
+    # Character codes shown with each font
+    font_codes: Dict[int, Set[bytes]] = field(default_factory=dict)
+
+    def add_image(self, idnum: int, width: float, height: float) -> None:
+        shown_w, shown_h = self.images.get(idnum, (0.0, 0.0))
+        self.images[idnum] = (max(shown_w, width), max(shown_h, height))
+
+    def add_text(self, font: Optional[int], text: Any) -> None:
+        if font is None:
+            return
+        if isinstance(text, bytes):
+            data = bytes(text)
+        elif hasattr(text, "get_original_bytes"):
+            data = text.get_original_bytes()
+        else:
+            return
+        self.font_codes.setdefault(font, set()).add(data)
+
+
+def _resolve(obj: Any) -> Any:
+    return obj.get_object() if isinstance(obj, IndirectObject) else obj
+
+
+def _multiply(m: Matrix, n: Matrix) -> Matrix:
+    """The PDF matrix product ``m × n`` (``m`` applied first)."""
+    a, b, c, d, e, f = m
+    a2, b2, c2, d2, e2, f2 = n
+    return (
+        a * a2 + b * c2,
+        a * b2 + b * d2,
+        c * a2 + d * c2,
+        c * b2 + d * d2,
+        e * a2 + f * c2 + e2,
+        e * b2 + f * d2 + f2,
+    )
+
+
+def _scan(pdf: PdfWriter, content: Any, resources: Any, ctm: Matrix, usage: ResourceUsage, depth: int = 0) -> None:
+    """Record the images drawn and the text shown by a content stream."""
+    resources = _resolve(resources) or DictionaryObject()
+    xobjects = _resolve(resources.get("/XObject")) or DictionaryObject()
+    fonts = _resolve(resources.get("/Font")) or DictionaryObject()
+    saved: List[Matrix] = []
+    font: Optional[int] = None
+    for operands, operator in content.operations:
+        if operator == b"q":
+            saved.append(ctm)
+        elif operator == b"Q":
+            ctm = saved.pop() if saved else ctm
+        elif operator == b"cm":
+            ctm = _multiply(tuple(float(x) for x in operands), ctm)
+        elif operator == b"Tf":
+            ref = fonts.get(operands[0])
+            font = ref.idnum if isinstance(ref, IndirectObject) else None
+        elif operator in (b"Tj", b"'", b'"'):
+            usage.add_text(font, operands[-1])
+        elif operator == b"TJ":
+            for item in operands[0]:
+                usage.add_text(font, item)
+        elif operator == b"Do":
+            ref = xobjects.get(operands[0])
+            if not isinstance(ref, IndirectObject):
+                continue
+            xobject = ref.get_object()
+            subtype = xobject.get("/Subtype")
+            if subtype == "/Image":
+                # Images fill the unit square, so the CTM scales give the drawn size
+                usage.add_image(ref.idnum, math.hypot(ctm[0], ctm[1]), math.hypot(ctm[2], ctm[3]))
+            elif subtype == "/Form" and depth < MAX_FORM_DEPTH:
+                matrix = tuple(float(x) for x in xobject.get("/Matrix", IDENTITY))
+                try:
+                    form = ContentStream(xobject, pdf)
+                except Exception as e:
+                    logger.debug(f"Could not parse form XObject {ref.idnum}: {e}")
+                    continue
+                _scan(pdf, form, xobject.get("/Resources", resources), _multiply(matrix, ctm), usage, depth + 1)
+
+
+def collect_usage(writer: PdfWriter) -> ResourceUsage:
+    usage = ResourceUsage()
+    for page in writer.pages:
+        contents = _resolve(page.get("/Contents"))
+        if contents is None:
+            continue
+        try:
+            content = ContentStream(contents, writer)
+        except Exception as e:
+            logger.debug(f"Could not parse page content: {e}")
+            continue
+        _scan(writer, content, page.get("/Resources"), IDENTITY, usage)
+    return usage
+
+
+def _filters(stream: StreamObject) -> List[str]:
+    filters = _resolve(stream.get("/Filter"))
+    if filters is None:
+        return []
+    return [str(f) for f in filters] if isinstance(filters, ArrayObject) else [str(filters)]
+
+
+def _decode_image(stream: StreamObject) -> Optional[Tuple[Any, str]]:
+    """The image's pixels and original encoding, or None when it is not a simple 8-bit image."""
+    if stream.get("/ImageMask") or "/Mask" in stream or "/Decode" in stream:
+        return None
+    if stream.get("/BitsPerComponent") != 8:
+        return None
+    filters = _filters(stream)
+    if filters == ["/DCTDecode"]:
+        image = Image.open(io.BytesIO(stream._data))
+        return (image, "jpeg") if image.mode in ("RGB", "L") else None
+    if filters != ["/FlateDecode"]:
+        return None
+    colorspace = _resolve(stream.get("/ColorSpace"))
+    if isinstance(colorspace, ArrayObject) and colorspace and colorspace[0] == "/ICCBased":
+        components = _resolve(colorspace[1]).get("/N")
+        mode = {1: "L", 3: "RGB"}.get(components)
+    else:
+        mode = _IMAGE_MODES.get(colorspace)
+    if mode is None:
+        return None
+    size = (int(stream["/Width"]), int(stream["/Height"]))
+    return Image.frombytes(mode, size, stream.get_data()), "flate"
+
+
+def _encode_image(original: StreamObject, image: Any, encoding: str, quality: int) -> EncodedStreamObject:
+    encoded = EncodedStreamObject()
+    for key, value in original.items():
+        if key not in ("/Filter", "/DecodeParms", "/Length"):
+            encoded[key] = value
+    encoded[NameObject("/Width")] = NumberObject(image.width)
+    encoded[NameObject("/Height")] = NumberObject(image.height)
+    if encoding == "jpeg":
+        buffer = io.BytesIO()
+        image.save(buffer, format="JPEG", quality=quality, optimize=True)
+        encoded[NameObject("/Filter")] = NameObject("/DCTDecode")
+        encoded._data = buffer.getvalue()
+    else:
+        encoded[NameObject("/Filter")] = NameObject("/FlateDecode")
+        encoded._data = zlib.compress(image.tobytes(), 9)
+    return encoded
+
+
+def downsample_images(writer: PdfWriter, usage: ResourceUsage, dpi: float, quality: int) -> int:
+    """Resample images drawn above ``dpi``; returns the number resampled."""
+    if Image is None:
+        return 0
+    count = 0
+    for idnum, (shown_w, shown_h) in usage.images.items():
+        stream = writer._objects[idnum - 1]
+        if not isinstance(stream, StreamObject):
+            continue
+        width, height = int(stream.get("/Width", 0)), int(stream.get("/Height", 0))
+        if min(width, height) < MIN_IMAGE_PIXELS or not shown_w or not shown_h:
+            continue
+        scale = max(shown_w / 72 * dpi / width, shown_h / 72 * dpi / height)
+        if scale * DOWNSAMPLE_ABOVE > 1:
+            continue
+        try:
+            decoded = _decode_image(stream)
+            smask_ref = stream.get("/SMask")
+            smask = _decode_image(smask_ref.get_object()) if isinstance(smask_ref, IndirectObject) else None
+            if decoded is None or (smask_ref is not None and smask is None):
+                continue
+            size = (max(1, round(width * scale)), max(1, round(height * scale)))
+            image, encoding = decoded
+            resampled = _encode_image(stream, image.resize(size, Image.Resampling.LANCZOS), encoding, quality)
+            if len(resampled._data) >= len(stream._data):
+                continue
+            if smask is not None:
+                mask, mask_encoding = smask
+                writer._objects[smask_ref.idnum - 1] = _encode_image(
+                    smask_ref.get_object(), mask.resize(size, Image.Resampling.LANCZOS), mask_encoding, quality
+                )
+        except Exception as e:
+            logger.debug(f"Could not downsample image {idnum}: {e}")
+            continue
+        writer._objects[idnum - 1] = resampled
+        count += 1
+    return count
+
+
+def _is_subset(base_font: Any) -> bool:
+    # Subset fonts are named "ABCDEF+Name" (PDF 32000 9.6.4)
+    name = str(base_font or "").lstrip("/")
+    return len(name) > 7 and name[6] == "+" and name[:6].isalpha() and name[:6].isupper()
+
+
+def _subset_tag(glyphs: Set[int]) -> str:
+    digest = hashlib.sha1(repr(sorted(glyphs)).encode()).digest()
+    return "".join(chr(ord("A") + byte % 26) for byte in digest[:6])
+
+
+def subset_fonts(writer: PdfWriter, usage: ResourceUsage) -> int:
+    """
+    Subset embedded Identity-H TrueType CID fonts to the glyphs shown.
+
+    Glyph ids are kept (``retain_gids``) so the content streams and widths
+    stay valid; only the outlines of unused glyphs are dropped.
+    """
+    if font_subset is None:
+        return 0
+    count = 0
+    for idnum, codes in usage.font_codes.items():
+        font = writer._objects[idnum - 1]
+        if not isinstance(font, DictionaryObject) or font.get("/Subtype") != "/Type0":
+            continue
+        if font.get("/Encoding") != "/Identity-H" or _is_subset(font.get("/BaseFont")):
+            continue
+        descendant = _resolve(_resolve(font.get("/DescendantFonts"))[0])
+        if descendant.get("/Subtype") != "/CIDFontType2" or descendant.get("/CIDToGIDMap", "/Identity") != "/Identity":
+            continue
+        descriptor = _resolve(descendant.get("/FontDescriptor"))
+        file_ref = descriptor.get("/FontFile2") if descriptor else None
+        if not isinstance(file_ref, IndirectObject):
+            continue
+        glyphs = {0} | {
+            int.from_bytes(text[i : i + 2], "big") for text in codes for i in range(0, len(text) - 1, 2)
+        }
+        try:
+            ttf = TTFont(io.BytesIO(file_ref.get_object().get_data()))
+            options = font_subset.Options(retain_gids=True, notdef_outline=True, layout_features=[])
+            subsetter = font_subset.Subsetter(options)
+            subsetter.populate(gids=sorted(g for g in glyphs if g < ttf["maxp"].numGlyphs))
+            subsetter.subset(ttf)
+            output = io.BytesIO()
+            ttf.save(output)
+        except Exception as e:
+            logger.debug(f"Could not subset font {font.get('/BaseFont')}: {e}")
+            continue
+        data = output.getvalue()
+        embedded = EncodedStreamObject()
+        embedded[NameObject("/Filter")] = NameObject("/FlateDecode")
+        embedded[NameObject("/Length1")] = NumberObject(len(data))
+        embedded._data = zlib.compress(data, 9)
+        if len(embedded._data) >= len(file_ref.get_object()._data):
+            continue
+        writer._objects[file_ref.idnum - 1] = embedded
+        name = NameObject(f"/{_subset_tag(glyphs)}+{str(font['/BaseFont']).lstrip('/')}")
+        font[NameObject("/BaseFont")] = name
+        descendant[NameObject("/BaseFont")] = name
+        descriptor[NameObject("/FontName")] = name
+        count += 1
+    return count
+
+
+def _replace_references(obj: Any, remap: Dict[int, int], writer: PdfWriter) -> None:
+    if isinstance(obj, DictionaryObject):
+        items = list(obj.items())
+    elif isinstance(obj, ArrayObject):
+        items = list(enumerate(obj))
+    else:
+        return
+    for key, value in items:
+        if isinstance(value, IndirectObject):
+            if value.idnum in remap:
+                obj[key] = IndirectObject(remap[value.idnum], 0, writer)
+        else:
+            _replace_references(value, remap, writer)
+
+
+def deduplicate(writer: PdfWriter, max_passes: int = 5) -> int:
+    """
+    Store identical objects once and point every reference at that copy.
+
+    Repeated until nothing changes, since merging e.g. two identical logos
+    makes the resource dictionaries referring to them identical too.
+    """
+    protected = {writer._root.idnum, writer._info.idnum, writer._pages.idnum}
+    merged = 0
+    for _ in range(max_passes):
+        seen: Dict[bytes, int] = {}
+        remap: Dict[int, int] = {}
+        for index, obj in enumerate(writer._objects):
+            idnum = index + 1
+            if idnum in protected or not isinstance(obj, (DictionaryObject, ArrayObject)):
+                continue
+            if isinstance(obj, DictionaryObject) and obj.get("/Type") in _UNIQUE_TYPES:
+                continue
+            buffer = io.BytesIO()
+            obj.write_to_stream(buffer, None)
+            digest = hashlib.sha256(type(obj).__name__.encode() + buffer.getvalue()).digest()
+            if digest in seen:
+                remap[idnum] = seen[digest]
+            else:
+                seen[digest] = idnum
+        if not remap:
+            break
+        for index, obj in enumerate(writer._objects):
+            if index + 1 not in remap:
+                _replace_references(obj, remap, writer)
+        for idnum in remap:
+            writer._objects[idnum - 1] = NullObject()
+        merged += len(remap)
+    return merged
+
+
+def compress_streams(writer: PdfWriter) -> int:
+    """Flate-compress streams stored without a filter."""
+    count = 0
+    for index, obj in enumerate(writer._objects):
+        if not isinstance(obj, StreamObject) or "/Filter" in obj:
+            continue
+        data = obj.get_data()
+        compressed = zlib.compress(data, 9)
+        if len(compressed) >= len(data):
+            continue
+        encoded = EncodedStreamObject()
+        for key, value in obj.items():
+            if key != "/Length":
+                encoded[key] = value
+        encoded[NameObject("/Filter")] = NameObject("/FlateDecode")
+        encoded._data = compressed
+        writer._objects[index] = encoded
+        count += 1
+    return count
+
+
+def linearize(pdf: bytes, timeout: float = 60.0) -> Optional[bytes]:
+    """Linearise with qpdf; None when qpdf is not installed or fails."""
+    qpdf = shutil.which("qpdf")
+    if qpdf is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        source, target = os.path.join(tmp, "in.pdf"), os.path.join(tmp, "out.pdf")
+        with open(source, "wb") as f:
+            f.write(pdf)
+        result = subprocess.run(
+            [qpdf, "--linearize", "--object-streams=generate", source, target],
+            capture_output=True,
+            timeout=timeout,
+        )
+        # Exit status 3 means success with warnings
+        if result.returncode not in (0, 3) or not os.path.exists(target):
+            logger.warning(f"qpdf could not linearise the PDF: {result.stderr.decode(errors='replace')[:200]}")
+            return None
+        with open(target, "rb") as f:
+            return f.read()
+
+
+class PdfOptimizer:
+    """Rewrites rendered PDFs to be smaller and faster to preview."""
+
+    def __init__(
+        self,
+        enabled: bool = True,
+        image_dpi: float = 150,
+        jpeg_quality: int = 85,
+        subset: bool = True,
+        linearize: bool = True,
+    ):
+        self.enabled = enabled
+        self.image_dpi = image_dpi
+        self.jpeg_quality = jpeg_quality
+        self.subset = subset
+        self.linearize = linearize
+
+    @classmethod
+    def from_env(cls) -> "PdfOptimizer":
+        """Configure from PDF_OPTIMIZE, PDF_IMAGE_DPI, PDF_JPEG_QUALITY, PDF_SUBSET_FONTS and PDF_LINEARIZE."""
+
+        def flag(name: str) -> bool:
+            return os.environ.get(name, "1").lower() in ("1", "true", "yes")
+
+        return cls(
+            enabled=flag("PDF_OPTIMIZE"),
+            image_dpi=float(os.environ.get("PDF_IMAGE_DPI", 150)),
+            jpeg_quality=int(os.environ.get("PDF_JPEG_QUALITY", 85)),
+            subset=flag("PDF_SUBSET_FONTS"),
+            linearize=flag("PDF_LINEARIZE"),
+        )
+
+    def signature(self) -> str:
+        """Identifies the settings, so cached PDFs are not reused across changes to them."""
+        if not self.enabled:
+            return "off"
+        return f"dpi={self.image_dpi:g},q={self.jpeg_quality},subset={int(self.subset)},lin={int(self.linearize)}"
+
+    def optimize(self, pdf: bytes) -> Tuple[bytes, OptimizationReport]:
+        """
+        Optimise a PDF.
+
+        Returns:
+            The optimised bytes (or the input, if optimising failed or did
+            not make it smaller) and a report of what was done
+        """
+        report = OptimizationReport(bytes_in=len(pdf), bytes_out=len(pdf))
+        if not self.enabled:
+            report.skipped = "disabled"
+            return pdf, report
+        start = time.perf_counter()
+        try:
+            reader = PdfReader(io.BytesIO(pdf))
+            writer = PdfWriter()
+            for page in reader.pages:
+                writer.add_page(page)
+            if reader.metadata:
+                writer.add_metadata(reader.metadata)
+
+            usage = collect_usage(writer)
+            report.images_downsampled = downsample_images(writer, usage, self.image_dpi, self.jpeg_quality)
+            if self.subset:
+                report.fonts_subset = subset_fonts(writer, usage)
+            report.objects_deduplicated = deduplicate(writer)
+            report.streams_compressed = compress_streams(writer)
+            buffer = io.BytesIO()
+            writer.write(buffer)
+            output = buffer.getvalue()
+        except Exception as e:
+            logger.warning(f"PDF optimisation failed, keeping the original: {e}")
+            report.skipped = f"error: {e}"
+            report.seconds = time.perf_counter() - start
+            return pdf, report
+
+        if len(output) >= len(pdf):
+            output = pdf
+        if self.linearize:
+            linearized = linearize(output)
+            if linearized is not None:
+                output = linearized
+                report.linearized = True
+        if output is pdf:
+            report.skipped = "no smaller"
+        report.bytes_out = len(output)
+        report.seconds = time.perf_counter() - start
+        return output, report
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Optimise a PDF the way rendered briefs are")
+    parser.add_argument("source")
+    parser.add_argument("target", nargs="?", help="Where to write the result (default: only report)")
+    args = parser.parse_args(argv)
+
+    with open(args.source, "rb") as f:
+        pdf = f.read()
+    output, report = PdfOptimizer.from_env().optimize(pdf)
+    if args.target:
+        with open(args.target, "wb") as f:
+            f.write(output)
+    print(json.dumps(report.as_dict(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
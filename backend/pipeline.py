@@ -0,0 +1,210 @@
+"""
+Dataflow execution of the generation pipeline.
+
+A request is described as a small DAG of named stages (per-file extraction,
+context consolidation, model, template/renderer preparation, render). Every
+stage starts as soon as the stages it depends on have finished, so
+independent work overlaps: files are extracted concurrently, and the
+template and renderer are prepared while extraction and the model stage are
+still running.
+
+Each run records when every stage started and finished and derives the
+critical path, the chain of stages that actually determined the request
+latency. It is exposed as a ``Server-Timing`` header and in the logs.
+
+Since the graph says which stages consume each result, a run can drop
+intermediate results (upload texts, context, HTML) as soon as their last
+consumer has finished instead of holding everything until the end.
+"""
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Collection, Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+StageFn = Callable[..., Awaitable[Any]]
+
+
+@dataclass(frozen=True)
+class Stage:
+    """A unit of work; ``fn`` is called with the results of ``deps`` as keyword arguments."""
+
+    name: str
+    fn: StageFn
+    deps: Sequence[str] = ()
+    group: Optional[str] = None  # stages sharing a group are summed in the breakdown
+
+
+@dataclass
+class StageTiming:
+    name: str
+    start: float
+    end: float
+    deps: Sequence[str] = ()
+    group: Optional[str] = None
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+@dataclass
+class PipelineRun:
+    """Results and timings of one pipeline execution."""
+
+    results: Dict[str, Any]
+    timings: Dict[str, StageTiming]
+    start: float
+    end: float
+    critical_path: List[str] = field(default_factory=list)
+    memory: Dict[str, Any] = field(default_factory=dict)  # filled in by callers that measure it
+
+    @property
+    def wall_time(self) -> float:
+        return self.end - self.start
+
+    def breakdown(self) -> Dict[str, float]:
+        """
+        Seconds each critical-path stage contributed to the request latency.
+
+        A stage contributes the time between its predecessor on the path
+        finishing and its own end, so the values add up to the wall time
+        (minus scheduling gaps before the first stage).
+        """
+        breakdown: Dict[str, float] = {}
+        previous_end = self.start
+        for name in self.critical_path:
+            timing = self.timings[name]
+            label = timing.group or name
+            breakdown[label] = breakdown.get(label, 0.0) + timing.end - previous_end
+            previous_end = timing.end
+        return breakdown
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value: critical-path stages plus the total, in ms."""
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.breakdown().items()]
+        entries.append(f"total;dur={self.wall_time * 1000:.1f}")
+        return ", ".join(entries)
+
+
+def critical_path(timings: Dict[str, StageTiming]) -> List[str]:
+    """
+    The chain of stages that determined the finish time.
+
+    Starting from the stage that finished last, repeatedly step back to the
+    dependency that finished last, since that is the one the stage waited on.
+    """
+    if not timings:
+        return []
+    current = max(timings.values(), key=lambda t: t.end)
+    path = [current.name]
+    while current.deps:
+        current = max((timings[d] for d in current.deps), key=lambda t: t.end)
+        path.append(current.name)
+    return list(reversed(path))
+
+
+async def run_pipeline(
+    stages: Sequence[Stage],
+    keep: Optional[Collection[str]] = None,
+    on_stage_done: Optional[Callable[[str], None]] = None,
+) -> PipelineRun:
+    """
+    Execute stages as a DAG, each as soon as its dependencies are done.
+
+    If a stage fails, the remaining stages are cancelled and the exception
+    propagates to the caller.
+
+    Args:
+        stages: The graph
+        keep: Results to return in ``PipelineRun.results``; every other
+            result is released as soon as the last stage consuming it has
+            finished. None keeps all results.
+        on_stage_done: Called with the name of each finished stage (after
+            any releases), e.g. for memory accounting
+
+    Raises:
+        ValueError: For duplicate stage names, unknown dependencies or cycles
+    """
+    by_name: Dict[str, Stage] = {}
+    for stage in stages:
+        if stage.name in by_name:
+            raise ValueError(f"Duplicate pipeline stage '{stage.name}'")
+        by_name[stage.name] = stage
+    for stage in stages:
+        for dep in stage.deps:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+    _check_acyclic(by_name)
+
+    timings: Dict[str, StageTiming] = {}
+    tasks: Dict[str, "asyncio.Task"] = {}
+    results: Dict[str, Any] = {}
+    consumers = {name: 0 for name in by_name}
+    for stage in stages:
+        for dep in set(stage.deps):
+            consumers[dep] += 1
+
+    def release(name: str) -> None:
+        if keep is not None and name not in keep and consumers[name] == 0:
+            results.pop(name, None)
+
+    async def execute(stage: Stage) -> None:
+        for dep in stage.deps:
+            await tasks[dep]
+        inputs = {dep: results[dep] for dep in stage.deps}
+        started = time.perf_counter()
+        results[stage.name] = await stage.fn(**inputs)
+        del inputs
+        timings[stage.name] = StageTiming(
+            stage.name, started, time.perf_counter(), tuple(stage.deps), stage.group
+        )
+        release(stage.name)
+        for dep in set(stage.deps):
+            consumers[dep] -= 1
+            release(dep)
+        if on_stage_done is not None:
+            on_stage_done(stage.name)
+
+    start = time.perf_counter()
+    for stage in stages:
+        tasks[stage.name] = asyncio.ensure_future(execute(stage))
+    try:
+        await asyncio.gather(*tasks.values())
+    finally:
+        for task in tasks.values():
+            task.cancel()
+    end = time.perf_counter()
+
+    run = PipelineRun(
+        results=results,
+        timings=timings,
+        start=start,
+        end=end,
+        critical_path=critical_path(timings),
+    )
+    logger.info(
+        f"Pipeline finished in {run.wall_time:.2f}s, critical path: "
+        + " -> ".join(f"{name} ({timings[name].duration:.2f}s)" for name in run.critical_path)
+    )
+    return run
+
+
+def _check_acyclic(stages: Dict[str, Stage]) -> None:
+    state: Dict[str, int] = {}  # 1 = visiting, 2 = done
+
+    def visit(name: str) -> None:
+        if state.get(name) == 2:
+            return
+        if state.get(name) == 1:
+            raise ValueError(f"Pipeline has a dependency cycle through '{name}'")
+        state[name] = 1
+        for dep in stages[name].deps:
+            visit(dep)
+        state[name] = 2
+
+    for name in stages:
+        visit(name)
@@ -0,0 +1,271 @@
+"""
+Sampling profiler, profile files and a log of the slowest requests.
+
+When a specific upload is slow, the pipeline's Server-Timing breakdown says
+which stage took the time but not where inside pdfplumber, BeautifulSoup or
+Jinja it went. ``SamplingProfiler`` answers that: a background thread
+snapshots the stacks of every thread (``sys._current_frames``) at a fixed
+interval and counts identical stacks. Nothing is instrumented, so the
+overhead is one stack walk per thread per sample.
+
+Profiles are written as collapsed stacks (``flamegraph.pl``, speedscope and
+most flamegraph tools read them) and as speedscope JSON. They come from
+
+- on-demand profiling of a single request (admin only, see main.py);
+  samples cover the whole process, so concurrent requests show up too
+- ``ContinuousProfiler``, a low-frequency sampler that writes one profile
+  per time window in production
+
+``RequestLog`` keeps recent requests with their pipeline stage breakdown so
+the slowest ones can be listed.
+"""
+
+import functools
+import heapq
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Stack = Tuple[str, ...]
+
+
+def _frame_label(code: Any) -> str:
+    # Last two path components keep labels short but distinguishable
+    # (pdfplumber/page.py rather than the full site-packages path)
+    path = "/".join(Path(code.co_filename).parts[-2:])
+    return f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Counts the stacks of all threads, sampled every ``interval`` seconds."""
+
+    def __init__(self, interval: float = 0.005, max_depth: int = 256):
+        self.interval = interval
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started: Optional[float] = None
+        self.stopped: Optional[float] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> "SamplingProfiler":
+        self.started = time.time()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> Dict[Stack, int]:
+        """Stop sampling and return the stack counts."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.stopped = time.time()
+        return dict(self.stacks)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        """Record the current stack of every thread except the sampler's."""
+        own = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks = []
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            labels: List[str] = []
+            while frame is not None and len(labels) < self.max_depth:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            labels.append(f"thread:{names.get(thread_id, thread_id)}")
+            stacks.append(tuple(reversed(labels)))
+        with self._lock:
+            self.stacks.update(stacks)
+            self.samples += 1
+
+    def merge(self, stacks: Dict[Stack, int], prefix: Optional[str] = None) -> None:
+        """Add stacks sampled elsewhere (e.g. in an extraction worker process)."""
+        with self._lock:
+            for stack, count in stacks.items():
+                self.stacks[(prefix, *stack) if prefix else stack] += count
+
+    def snapshot(self, reset: bool = False) -> Dict[Stack, int]:
+        with self._lock:
+            stacks = dict(self.stacks)
+            if reset:
+                self.stacks.clear()
+                self.samples = 0
+        return stacks
+
+
+def collapsed(stacks: Dict[Stack, int]) -> str:
+    """Collapsed-stack text: one ``root;caller;callee count`` line per stack."""
+    return "".join(f"{';'.join(stack)} {count}\n" for stack, count in sorted(stacks.items()))
+
+
+def speedscope(stacks: Dict[Stack, int], name: str, interval: float) -> Dict[str, Any]:
+    """A speedscope "sampled" profile; sample weights are in seconds."""
+    frames: List[Dict[str, str]] = []
+    index: Dict[str, int] = {}
+    samples, weights = [], []
+    for stack, count in sorted(stacks.items()):
+        samples.append([index.setdefault(label, len(index)) for label in stack])
+        weights.append(round(count * interval, 6))
+    for label in index:
+        frames.append({"name": label})
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "ba_solution_brief",
+        "shared": {"frames": frames},
+        "profiles": [
+            {
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }
+        ],
+    }
+
+
+class ProfileWriter:
+    """Writes profiles to a local directory, keeping the newest ``keep``."""
+
+    def __init__(self, directory: Path, keep: int = 100):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.keep = keep
+
+    @classmethod
+    def from_env(cls) -> "ProfileWriter":
+        """Build a writer from ``PROFILE_DIR`` and ``PROFILE_KEEP``."""
+        directory = os.environ.get(
+            "PROFILE_DIR", os.path.join(tempfile.gettempdir(), "ba_solution_brief", "profiles")
+        )
+        return cls(Path(directory), keep=int(os.environ.get("PROFILE_KEEP", 100)))
+
+    def write(self, name: str, stacks: Dict[Stack, int], interval: float) -> Dict[str, str]:
+        """
+        Write ``<name>.collapsed`` and ``<name>.speedscope.json``.
+
+        Returns:
+            Dict[str, str]: Paths of the written files by format
+        """
+        paths = {
+            "collapsed": self.directory / f"{name}.collapsed",
+            "speedscope": self.directory / f"{name}.speedscope.json",
+        }
+        paths["collapsed"].write_text(collapsed(stacks))
+        paths["speedscope"].write_text(json.dumps(speedscope(stacks, name, interval)))
+        self.prune()
+        return {kind: str(path) for kind, path in paths.items()}
+
+    def prune(self) -> None:
+        profiles = sorted(self.directory.glob("*.collapsed"), key=lambda p: p.stat().st_mtime)
+        for path in profiles[: max(0, len(profiles) - self.keep)]:
+            path.unlink(missing_ok=True)
+            path.with_name(path.name.replace(".collapsed", ".speedscope.json")).unlink(missing_ok=True)
+
+
+@dataclass
+class ProfileSession:
+    """An on-demand profile of one request."""
+
+    name: str
+    profiler: SamplingProfiler
+    worker_interval: float = 0.005
+    files: Dict[str, str] = field(default_factory=dict)
+
+    def worker_profiler(self) -> Callable[[], SamplingProfiler]:
+        """Picklable factory of the profiler run inside an extraction worker (see extraction_sandbox)."""
+        return functools.partial(SamplingProfiler, self.worker_interval)
+
+    def merge_worker(self, stacks: Dict[Stack, int]) -> None:
+        self.profiler.merge(stacks, prefix="process:extraction-worker")
+
+
+# The on-demand profile of the current request, if any
+current_profile: ContextVar[Optional[ProfileSession]] = ContextVar("current_profile", default=None)
+
+
+class ContinuousProfiler(SamplingProfiler):
+    """
+    Low-frequency sampling for production: every ``window`` seconds the
+    stacks collected so far are written as one profile and reset.
+    """
+
+    def __init__(self, writer: ProfileWriter, interval: float = 0.05, window: float = 300.0):
+        super().__init__(interval)
+        self.writer = writer
+        self.window = window
+
+    def _run(self) -> None:
+        window_start = time.time()
+        while not self._stop.wait(self.interval):
+            self.sample()
+            if time.time() - window_start >= self.window:
+                self.flush(window_start)
+                window_start = time.time()
+        self.flush(window_start)
+
+    def flush(self, window_start: float) -> None:
+        stacks = self.snapshot(reset=True)
+        if stacks:
+            # The pid keeps the profiles of several server workers apart
+            name = f"continuous-{time.strftime('%Y%m%dT%H%M%S', time.gmtime(window_start))}-{os.getpid()}"
+            self.writer.write(name, stacks, self.interval)
+
+
+class RequestLog:
+    """Recent requests with their durations and stage breakdowns."""
+
+    def __init__(self, capacity: int = 500):
+        self._entries: Deque[Dict[str, Any]] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def record(self, name: str, duration: float, run: Any = None, **info: Any) -> None:
+        """
+        Record a finished request.
+
+        Args:
+            name: What ran, e.g. the endpoint path
+            duration: Wall time in seconds
+            run: The ``pipeline.PipelineRun``, if the request ran the pipeline
+            info: Extra fields to show (client, file count, ...)
+        """
+        entry: Dict[str, Any] = {"name": name, "finished": time.time(), "duration": round(duration, 4), **info}
+        if run is not None:
+            entry["critical_path"] = {stage: round(s, 4) for stage, s in run.breakdown().items()}
+            entry["stages"] = {stage: round(t.duration, 4) for stage, t in run.timings.items()}
+            if getattr(run, "memory", None):
+                entry["memory"] = run.memory
+        session = current_profile.get()
+        if session is not None:
+            entry["profile"] = session.name
+        with self._lock:
+            self._entries.append(entry)
+
+    def slowest(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            entries = list(self._entries)
+        return heapq.nlargest(limit, entries, key=lambda entry: entry["duration"])
@@ -0,0 +1,343 @@
+"""
+Progress events for long-running generations.
+
+A ``ProgressTracker`` records the events of one generation (files extracted,
+PDF pages read, model fields completed, pages rendered, and the final
+result) and lets any number of clients follow them as server-sent events.
+Events are numbered, so a client that reconnects with ``Last-Event-ID``
+resumes where it left off instead of starting a new generation.
+
+Pipeline code does not need a tracker passed in: the tracker of the running
+generation is held in a context variable, which ``asyncio.to_thread`` copies
+into worker threads, and ``report_progress`` is a no-op outside a tracked
+generation.
+
+With several server worker processes (see serve.py) the generation and the
+client following it may be served by different workers, so trackers can be
+kept in a shared SQLite database instead (``SQLiteProgressStore``);
+subscribers then also poll for events emitted by other processes.
+"""
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Set, Union
+
+# Terminal events; a generation emits exactly one of them
+COMPLETED = "completed"
+FAILED = "failed"
+
+# SSE comment sent while waiting, so proxies do not close idle streams
+HEARTBEAT_INTERVAL = 15.0
+
+
+class ProgressTracker:
+    """Ordered, replayable event log of one generation."""
+
+    # Seconds between checks for events emitted by other processes (None:
+    # every event is emitted in this process, so waiting is enough)
+    poll_interval: Optional[float] = None
+
+    def __init__(self, generation_id: Optional[str] = None):
+        self.generation_id = generation_id or uuid.uuid4().hex
+        self.created = time.time()
+        self._events: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._waiters: Set[asyncio.Event] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+
+    @property
+    def events(self) -> List[Dict[str, Any]]:
+        return self._read(0)
+
+    @property
+    def finished(self) -> bool:
+        events = self.events
+        return bool(events) and events[-1]["event"] in (COMPLETED, FAILED)
+
+    def _append(self, event: str, data: Dict[str, Any]) -> None:
+        with self._lock:
+            if self._events and self._events[-1]["event"] in (COMPLETED, FAILED):
+                return
+            self._events.append({"id": len(self._events), "event": event, "time": time.time(), **data})
+
+    def _read(self, position: int) -> List[Dict[str, Any]]:
+        with self._lock:
+            return self._events[position:]
+
+    async def _read_async(self, position: int) -> List[Dict[str, Any]]:
+        return self._read(position)
+
+    def emit(self, event: str, **data: Any) -> None:
+        """Record an event (safe to call from worker threads)."""
+        self._append(event, data)
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _wake(self) -> None:
+        for waiter in self._waiters:
+            waiter.set()
+
+    async def subscribe(
+        self, last_event_id: int = -1, heartbeat: float = HEARTBEAT_INTERVAL
+    ) -> AsyncIterator[Optional[Dict[str, Any]]]:
+        """
+        Yield events after ``last_event_id`` until the generation finishes.
+
+        Yields None when no event arrived within ``heartbeat`` seconds.
+        """
+        if self._loop is None:
+            self._loop = asyncio.get_running_loop()
+        waiter = asyncio.Event()
+        self._waiters.add(waiter)
+        position = last_event_id + 1
+        idle_since = time.monotonic()
+        try:
+            while True:
+                waiter.clear()
+                pending = await self._read_async(position)
+                for event in pending:
+                    yield event
+                position += len(pending)
+                if pending:
+                    idle_since = time.monotonic()
+                    if pending[-1]["event"] in (COMPLETED, FAILED):
+                        return
+                until_heartbeat = idle_since + heartbeat - time.monotonic()
+                if until_heartbeat <= 0:
+                    idle_since = time.monotonic()
+                    yield None
+                    continue
+                timeout = min(until_heartbeat, self.poll_interval or until_heartbeat)
+                try:
+                    await asyncio.wait_for(waiter.wait(), timeout=timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            self._waiters.discard(waiter)
+
+
+class ProgressStore:
+    """In-memory trackers of recent generations."""
+
+    def __init__(self, ttl: float = 3600):
+        self.ttl = ttl
+        self._trackers: Dict[str, ProgressTracker] = {}
+
+    def create(self) -> ProgressTracker:
+        self._expire()
+        tracker = ProgressTracker()
+        self._trackers[tracker.generation_id] = tracker
+        return tracker
+
+    def get(self, generation_id: str) -> Optional[ProgressTracker]:
+        return self._trackers.get(generation_id)
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        for generation_id in [g for g, t in self._trackers.items() if t.created < cutoff]:
+            del self._trackers[generation_id]
+
+
+_PROGRESS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS progress_events (
+    generation_id TEXT NOT NULL,
+    id INTEGER NOT NULL,
+    event TEXT NOT NULL,
+    data TEXT NOT NULL,
+    created REAL NOT NULL,
+    PRIMARY KEY (generation_id, id)
+);
+CREATE INDEX IF NOT EXISTS progress_events_created ON progress_events(created);
+"""
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+        return True
+    except RuntimeError:
+        return False
+
+
+class SQLiteProgressTracker(ProgressTracker):
+    """A tracker whose events live in a database shared by all worker processes."""
+
+    poll_interval = 0.25
+
+    def __init__(
+        self,
+        store: "SQLiteProgressStore",
+        generation_id: Optional[str] = None,
+        created: Optional[float] = None,
+    ):
+        super().__init__(generation_id)
+        self.created = created or self.created
+        self._store = store
+
+    def emit(self, event: str, **data: Any) -> None:
+        """
+        Record an event. Writes go through the store's writer thread, in
+        order; on the event loop this returns without waiting for the write
+        (other processes may not see it yet), elsewhere it waits.
+        """
+        future = self._store.submit(self._append, event, data)
+        if _on_event_loop():
+            future.add_done_callback(lambda _: self._wake_threadsafe())
+        else:
+            future.result()
+            self._wake_threadsafe()
+
+    def _wake_threadsafe(self) -> None:
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wake)
+
+    def _append(self, event: str, data: Dict[str, Any]) -> None:
+        payload = {"time": time.time(), **data}
+        with self._store._connect() as db:
+            # IMMEDIATE takes the write lock first, so ids cannot race
+            db.execute("BEGIN IMMEDIATE")
+            last = db.execute(
+                "SELECT id, event FROM progress_events WHERE generation_id = ? ORDER BY id DESC LIMIT 1",
+                (self.generation_id,),
+            ).fetchone()
+            if last is not None and last[1] in (COMPLETED, FAILED):
+                return
+            db.execute(
+                "INSERT INTO progress_events (generation_id, id, event, data, created) VALUES (?, ?, ?, ?, ?)",
+                (
+                    self.generation_id,
+                    last[0] + 1 if last else 0,
+                    event,
+                    json.dumps(payload, default=str),
+                    self.created,
+                ),
+            )
+
+    def _read(self, position: int) -> List[Dict[str, Any]]:
+        with self._store._connect() as db:
+            rows = db.execute(
+                "SELECT id, event, data FROM progress_events WHERE generation_id = ? AND id >= ? ORDER BY id",
+                (self.generation_id, position),
+            ).fetchall()
+        return [{"id": id_, "event": event, **json.loads(data)} for id_, event, data in rows]
+
+    async def _read_async(self, position: int) -> List[Dict[str, Any]]:
+        # Behind any pending writes of this process, and off the event loop
+        return await asyncio.wrap_future(self._store.submit(self._read, position))
+
+
+class SQLiteProgressStore:
+    """Trackers in a shared SQLite database (WAL), for multi-process servers."""
+
+    def __init__(self, path: Union[str, Path], ttl: float = 3600):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        # Trackers used in this process, so local emits wake local
+        # subscribers without waiting for the next poll
+        self._trackers: Dict[str, SQLiteProgressTracker] = {}
+        # One connection and one writer thread per process, opened lazily so
+        # they are not inherited by forked server workers
+        self._pid: Optional[int] = None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._writer: Optional[ThreadPoolExecutor] = None
+        with self._connect() as db:
+            db.executescript(_PROGRESS_SCHEMA)
+
+    def _open(self) -> None:
+        if self._pid != os.getpid():
+            # Autocommit mode; writers open their own IMMEDIATE transaction
+            self._db = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._writer = ThreadPoolExecutor(1, thread_name_prefix="progress-db")
+            self._db_lock = threading.Lock()
+            self._pid = os.getpid()
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        self._open()
+        with self._db_lock:
+            db = self._db
+            try:
+                yield db
+                if db.in_transaction:
+                    db.execute("COMMIT")
+            except BaseException:
+                if db.in_transaction:
+                    db.execute("ROLLBACK")
+                raise
+
+    def submit(self, fn: Any, *args: Any) -> "Future":
+        """Run a database call in this process's writer thread (calls run in order)."""
+        self._open()
+        return self._writer.submit(fn, *args)
+
+    def create(self) -> SQLiteProgressTracker:
+        self._expire()
+        tracker = SQLiteProgressTracker(self)
+        self._trackers[tracker.generation_id] = tracker
+        return tracker
+
+    def get(self, generation_id: str) -> Optional[SQLiteProgressTracker]:
+        tracker = self._trackers.get(generation_id)
+        if tracker is not None:
+            return tracker
+        with self._connect() as db:
+            row = db.execute(
+                "SELECT created FROM progress_events WHERE generation_id = ? LIMIT 1", (generation_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        tracker = SQLiteProgressTracker(self, generation_id, created=row[0])
+        self._trackers[generation_id] = tracker
+        return tracker
+
+    def _expire(self) -> None:
+        cutoff = time.time() - self.ttl
+        future = self.submit(self._delete_before, cutoff)
+        if not _on_event_loop():
+            future.result()
+        for generation_id in [g for g, t in self._trackers.items() if t.created < cutoff]:
+            del self._trackers[generation_id]
+
+    def _delete_before(self, cutoff: float) -> None:
+        with self._connect() as db:
+            db.execute("DELETE FROM progress_events WHERE created < ?", (cutoff,))
+
+
+def progress_store_from_env() -> Union[ProgressStore, SQLiteProgressStore]:
+    """A shared SQLite store when SHARED_STATE_DB is set (multi-worker mode), else in-memory."""
+    path = os.environ.get("SHARED_STATE_DB")
+    return SQLiteProgressStore(path) if path else ProgressStore()
+
+
+current_tracker: ContextVar[Optional[ProgressTracker]] = ContextVar("current_tracker", default=None)
+
+
+def report_progress(event: str, **data: Any) -> None:
+    """Emit an event on the current generation's tracker, if there is one."""
+    tracker = current_tracker.get()
+    if tracker is not None:
+        tracker.emit(event, **data)
+
+
+def format_sse(event: Optional[Dict[str, Any]]) -> str:
+    """Encode an event (or a heartbeat, for None) as a server-sent event."""
+    if event is None:
+        return ": heartbeat\n\n"
+    payload = {k: v for k, v in event.items() if k not in ("id", "event")}
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(payload)}\n\n"
@@ -0,0 +1,212 @@
+"""
+Pluggable HTML-to-PDF renderer backends.
+
+- ``chromium``: headless Chromium via pyppeteer. Highest CSS fidelity; the
+  browser is launched once per process and reused from a background event loop.
+- ``weasyprint``: pure-Python layout engine. No browser process, much smaller
+  memory footprint and startup cost, so more workers fit per node.
+
+The backend is chosen per request (``RenderOptions.renderer``) or by the
+``PDF_RENDERER`` environment variable. Both backends refuse network fetches
+while rendering: templates embed their assets, so output is fully offline and
+deterministic.
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Type
+
+try:
+    from pyppeteer import launch
+except ImportError:
+    launch = None
+
+try:
+    import weasyprint
+except (ImportError, OSError):
+    # OSError: weasyprint is installed but the pango/cairo system libraries are not
+    weasyprint = None
+
+logger = logging.getLogger(__name__)
+
+# URL schemes a document may load while rendering; everything else is blocked
+OFFLINE_SCHEMES = ("data:", "file:", "about:")
+
+
+def is_offline_url(url: str) -> bool:
+    return url.startswith(OFFLINE_SCHEMES)
+
+
+class Renderer:
+    """Base class for renderer backends."""
+
+    name = ""
+
+    def render(self, html: str, base_url: Optional[Path] = None) -> bytes:
+        """
+        Render an HTML document to PDF.
+
+        Args:
+            html: Complete HTML document
+            base_url: Directory relative resources (fonts, images) resolve against
+
+        Returns:
+            bytes: The PDF document
+        """
+        raise NotImplementedError
+
+    def warm_up(self) -> None:
+        """Start long-lived resources (e.g. the browser) ahead of the first render."""
+
+    def close(self) -> None:
+        """Release any long-lived resources held by the backend."""
+
+
+class ChromiumRenderer(Renderer):
+    """Headless Chromium renderer with a browser shared across renders."""
+
+    name = "chromium"
+
+    def __init__(self, timeout: float = 60.0):
+        if launch is None:
+            raise ImportError("pyppeteer not installed. Install it with: pip install pyppeteer")
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._browser = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    target=self._loop.run_forever, name="chromium-renderer", daemon=True
+                )
+                self._thread.start()
+        return self._loop
+
+    async def _get_browser(self):
+        if self._browser is None:
+            launch_kwargs = {}
+            if os.environ.get("CHROMIUM_PATH"):
+                launch_kwargs["executablePath"] = os.environ["CHROMIUM_PATH"]
+            self._browser = await launch(
+                headless=True,
+                args=["--no-sandbox", "--disable-dev-shm-usage", "--disable-gpu"],
+                # Signal handlers can only be installed from the main thread
+                handleSIGINT=False,
+                handleSIGTERM=False,
+                handleSIGHUP=False,
+                **launch_kwargs,
+            )
+        return self._browser
+
+    async def _render(self, html: str) -> bytes:
+        browser = await self._get_browser()
+        page = await browser.newPage()
+        try:
+            await page.setJavaScriptEnabled(False)
+            await page.setRequestInterception(True)
+            page.on("request", lambda request: asyncio.ensure_future(self._filter_request(request)))
+            await page.setContent(html)
+            return await page.pdf({"format": "Letter", "printBackground": True})
+        finally:
+            await page.close()
+
+    @staticmethod
+    async def _filter_request(request) -> None:
+        if is_offline_url(request.url):
+            await request.continue_()
+        else:
+            logger.warning(f"Blocked network request during render: {request.url}")
+            await request.abort()
+
+    def render(self, html: str, base_url: Optional[Path] = None) -> bytes:
+        if base_url is not None and "<head>" in html:
+            html = html.replace("<head>", f'<head><base href="{Path(base_url).resolve().as_uri()}/">', 1)
+        future = asyncio.run_coroutine_threadsafe(self._render(html), self._ensure_loop())
+        return future.result(timeout=self.timeout)
+
+    def warm_up(self) -> None:
+        future = asyncio.run_coroutine_threadsafe(self._get_browser(), self._ensure_loop())
+        future.result(timeout=self.timeout)
+
+    def close(self) -> None:
+        if self._loop is None:
+            return
+        if self._browser is not None:
+            asyncio.run_coroutine_threadsafe(self._browser.close(), self._loop).result(
+                timeout=self.timeout
+            )
+            self._browser = None
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout=5)
+        self._loop = None
+
+
+class WeasyPrintRenderer(Renderer):
+    """Pure-Python renderer built on WeasyPrint."""
+
+    name = "weasyprint"
+
+    def __init__(self):
+        if weasyprint is None:
+            raise ImportError(
+                "weasyprint not installed. Install it with: pip install weasyprint "
+                "(requires the pango system library)"
+            )
+
+    @staticmethod
+    def _url_fetcher(url: str, *args, **kwargs):
+        if not is_offline_url(url):
+            raise ValueError(f"Blocked network request during render: {url}")
+        return weasyprint.default_url_fetcher(url, *args, **kwargs)
+
+    def render(self, html: str, base_url: Optional[Path] = None) -> bytes:
+        document = weasyprint.HTML(
+            string=html,
+            base_url=str(base_url) if base_url else None,
+            url_fetcher=self._url_fetcher,
+        )
+        return document.write_pdf()
+
+
+RENDERERS: Dict[str, Type[Renderer]] = {
+    ChromiumRenderer.name: ChromiumRenderer,
+    WeasyPrintRenderer.name: WeasyPrintRenderer,
+}
+
+_instances: Dict[str, Renderer] = {}
+_instances_lock = threading.Lock()
+
+
+def resolve_renderer_name(name: Optional[str] = None) -> str:
+    """Return the backend name to use, falling back to ``PDF_RENDERER``."""
+    name = name or os.environ.get("PDF_RENDERER", ChromiumRenderer.name)
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown renderer '{name}', expected one of {sorted(RENDERERS)}")
+    return name
+
+
+def get_renderer(name: Optional[str] = None) -> Renderer:
+    """Return the process-wide instance of a renderer backend."""
+    name = resolve_renderer_name(name)
+    with _instances_lock:
+        if name not in _instances:
+            _instances[name] = RENDERERS[name]()
+        return _instances[name]
+
+
+def close_renderers() -> None:
+    """Shut down every backend that was started (call on application shutdown)."""
+    with _instances_lock:
+        for renderer in _instances.values():
+            try:
+                renderer.close()
+            except Exception as e:
+                logger.warning(f"Failed to close {renderer.name} renderer: {e}")
+        _instances.clear()
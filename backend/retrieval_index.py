@@ -0,0 +1,421 @@
+"""
+Local retrieval index over the extracted context.
+
+For large uploads, sending the whole context with every field-group prompt
+is wasteful: the "problems" group only needs the passages that talk about
+problems. The consolidated context is split back into its per-file
+sections, chunked into passages, and indexed with BM25. Each field group
+then asks the index for its top-k passages (see
+``field_extraction.extract_model_in_groups``).
+
+The index is a few NumPy arrays (inverted postings with precomputed BM25
+weights), so a query is a handful of vectorised gathers. Indexes are cached
+in memory and on disk by a hash of the context and the chunking
+parameters, so repeated uploads of the same documents are free.
+
+NumPy is optional: without it ``get_retrieval_index`` returns None and the
+full context is used.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+
+# Not anchored: combine_texts puts the first header right after a separator
+_FILE_HEADER = re.compile(r"=== File: (.+?) ===$", re.MULTILINE)
+_SEPARATOR = re.compile(r"^={10,}$", re.MULTILINE)
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be been but by can do does for from has have how if in into is it its "
+    "of on or our so such that the their them then there these they this to was we were what "
+    "when which who will with you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-cased word tokens without stop words, with a naive plural strip."""
+    tokens = []
+    for token in _TOKEN.findall(text.lower()):
+        if len(token) < 2 or token in _STOP_WORDS:
+            continue
+        if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+            token = token[:-1]
+        tokens.append(token)
+    return tokens
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A passage of one source file."""
+
+    filename: str
+    index: int  # position of the passage within its file
+    text: str
+
+
+def split_sections(context: str) -> List[Tuple[str, str]]:
+    """
+    Split a consolidated context (``document_processor.combine_texts``) into
+    ``(filename, text)`` per file; text without file headers is one section.
+    """
+    headers = list(_FILE_HEADER.finditer(context))
+    if not headers:
+        return [("", context)]
+    sections = []
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following else len(context)
+        text = _SEPARATOR.sub("", context[header.end():end]).strip()
+        sections.append((header.group(1), text))
+    return sections
+
+
+def chunk_text(text: str, chunk_words: int = 150, overlap_words: int = 30) -> List[str]:
+    """
+    Split text into passages of about ``chunk_words`` words.
+
+    Lines are kept together where possible; a line longer than a passage is
+    cut into overlapping windows so no passage loses the words around a cut.
+    """
+    chunks: List[str] = []
+    current: List[str] = []
+    size = 0
+    stride = max(1, chunk_words - overlap_words)
+
+    for line in text.splitlines():
+        words = line.split()
+        if not words:
+            continue
+        if size + len(words) > chunk_words and current:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        if len(words) > chunk_words:
+            for start in range(0, len(words), stride):
+                chunks.append(" ".join(words[start:start + chunk_words]))
+                if start + chunk_words >= len(words):
+                    break
+            continue
+        current.append(" ".join(words))
+        size += len(words)
+
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+def content_hash(context: str, chunk_words: int, overlap_words: int) -> str:
+    digest = hashlib.sha256(f"v{INDEX_VERSION}:{chunk_words}:{overlap_words}\0".encode("utf-8"))
+    digest.update(context.encode("utf-8"))
+    return digest.hexdigest()
+
+
+class RetrievalIndex:
+    """
+    BM25 index of context passages.
+
+    Postings are stored term-major: the passages containing term ``t`` are
+    ``passage_ids[offsets[t]:offsets[t + 1]]`` with their BM25 term weights in
+    ``weights``, so scoring a query only touches the postings of its terms.
+    """
+
+    def __init__(
+        self,
+        chunks: Sequence[Chunk],
+        vocabulary: Dict[str, int],
+        offsets: "np.ndarray",
+        passage_ids: "np.ndarray",
+        weights: "np.ndarray",
+    ):
+        self.chunks = list(chunks)
+        self.vocabulary = vocabulary
+        self.offsets = offsets
+        self.passage_ids = passage_ids
+        self.weights = weights
+
+    @classmethod
+    def build(
+        cls, context: str, chunk_words: int = 150, overlap_words: int = 30, k1: float = 1.2, b: float = 0.75
+    ) -> "RetrievalIndex":
+        """Chunk the context per file and build the BM25 postings."""
+        if np is None:
+            raise RuntimeError("numpy is required for the retrieval index")
+
+        chunks = [
+            Chunk(filename, i, text)
+            for filename, section in split_sections(context)
+            for i, text in enumerate(chunk_text(section, chunk_words, overlap_words))
+        ]
+        vocabulary: Dict[str, int] = {}
+        term_ids: List[int] = []
+        lengths = np.zeros(len(chunks), dtype=np.float32)
+        for n, chunk in enumerate(chunks):
+            tokens = tokenize(chunk.text)
+            lengths[n] = len(tokens)
+            term_ids.extend(vocabulary.setdefault(token, len(vocabulary)) for token in tokens)
+
+        terms = np.asarray(term_ids, dtype=np.int64)
+        owners = np.repeat(np.arange(len(chunks), dtype=np.int64), lengths.astype(np.int64))
+        # One entry per (term, passage) pair, sorted term-major, with its count
+        pairs, tf = np.unique(terms * max(len(chunks), 1) + owners, return_counts=True)
+        posting_terms = pairs // max(len(chunks), 1)
+        passage_ids = (pairs % max(len(chunks), 1)).astype(np.int32)
+        offsets = np.searchsorted(posting_terms, np.arange(len(vocabulary) + 1)).astype(np.int64)
+
+        n_docs = len(chunks)
+        df = np.diff(offsets).astype(np.float32)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        average = float(lengths.mean()) if n_docs else 1.0
+        norm = k1 * (1 - b + b * lengths[passage_ids] / max(average, 1.0))
+        tf = tf.astype(np.float32)
+        weights = (idf[posting_terms] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        return cls(chunks, vocabulary, offsets, passage_ids, weights)
+
+    def search(self, query: str, k: int = 5) -> List[Tuple[Chunk, float]]:
+        """The ``k`` best passages for the query, best first (only passages sharing a term)."""
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        for token in set(tokenize(query)):
+            term = self.vocabulary.get(token)
+            if term is None:
+                continue
+            start, end = self.offsets[term], self.offsets[term + 1]
+            # passage ids are unique within a term's postings, so += is safe
+            scores[self.passage_ids[start:end]] += self.weights[start:end]
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(self.chunks[i], float(scores[i])) for i in hits]
+
+    def context_for(self, query: str, k: int = 5) -> Optional[str]:
+        """
+        The top-k passages as a context string, in document order and grouped
+        under their file headers, or None if no passage matches the query.
+        """
+        hits = self.search(query, k)
+        if not hits:
+            return None
+        order = {chunk: n for n, chunk in enumerate(self.chunks)}
+        parts = []
+        for chunk, _ in sorted(hits, key=lambda hit: order[hit[0]]):
+            header = f"=== File: {chunk.filename} (passage {chunk.index + 1}) ===" if chunk.filename else ""
+            parts.append(f"{header}\n{chunk.text}".strip())
+        return "\n\n".join(parts)
+
+    def save(self, path: Path) -> None:
+        """Write the index as one ``.npz`` file (atomically)."""
+        meta = {
+            "vocabulary": self.vocabulary,
+            "chunks": [[c.filename, c.index, c.text] for c in self.chunks],
+        }
+        fd, tmp_name = tempfile.mkstemp(dir=Path(path).parent, suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp:
+            np.savez(
+                tmp,
+                offsets=self.offsets,
+                passage_ids=self.passage_ids,
+                weights=self.weights,
+                meta=np.frombuffer(json.dumps(meta).encode("utf-8"), dtype=np.uint8),
+            )
+        os.replace(tmp_name, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "RetrievalIndex":
+        with np.load(path, allow_pickle=False) as arrays:
+            meta = json.loads(arrays["meta"].tobytes().decode("utf-8"))
+            return cls(
+                [Chunk(*chunk) for chunk in meta["chunks"]],
+                meta["vocabulary"],
+                arrays["offsets"],
+                arrays["passage_ids"],
+                arrays["weights"],
+            )
+
+
+class IndexCache:
+    """
+    Indexes by content hash: a small in-memory LRU in front of ``.npz`` files.
+
+    The files are evicted like the PDF cache's: expired ones (by write time)
+    first, then the least recently used until under ``max_bytes``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[Path] = None,
+        max_memory_entries: int = 8,
+        chunk_words: int = 150,
+        overlap_words: int = 30,
+        max_bytes: int = 256 * 1024 * 1024,
+        ttl: float = 7 * 24 * 3600,
+        sweep_interval: float = 600.0,
+    ):
+        self.directory = Path(directory) if directory else None
+        if self.directory:
+            self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_memory_entries = max_memory_entries
+        self.chunk_words = chunk_words
+        self.overlap_words = overlap_words
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self._memory: "OrderedDict[str, RetrievalIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+        # Bytes on disk as of the last sweep plus what this process wrote since
+        self._total: Optional[int] = None
+        self._swept_at = 0.0
+
+    @classmethod
+    def from_env(cls) -> "IndexCache":
+        """Build a cache from ``RETRIEVAL_*`` environment variables."""
+        directory = os.environ.get(
+            "RETRIEVAL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ba_solution_brief", "retrieval")
+        )
+        return cls(
+            Path(directory),
+            chunk_words=int(os.environ.get("RETRIEVAL_CHUNK_WORDS", 150)),
+            overlap_words=int(os.environ.get("RETRIEVAL_OVERLAP_WORDS", 30)),
+            max_bytes=int(os.environ.get("RETRIEVAL_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+            ttl=float(os.environ.get("RETRIEVAL_CACHE_TTL", 7 * 24 * 3600)),
+            sweep_interval=float(os.environ.get("RETRIEVAL_CACHE_SWEEP_INTERVAL", 600)),
+        )
+
+    def get_or_build(self, context: str) -> RetrievalIndex:
+        """Return the cached index of this context, building it on a miss."""
+        key = content_hash(context, self.chunk_words, self.overlap_words)
+        with self._lock:
+            index = self._memory.get(key)
+            if index is not None:
+                self._memory.move_to_end(key)
+                return index
+
+        path = self.directory / f"{key}.npz" if self.directory else None
+        index = self._load(path) if path is not None else None
+        if index is None:
+            index = RetrievalIndex.build(context, self.chunk_words, self.overlap_words)
+            if path is not None:
+                self._save(path, index)
+
+        with self._lock:
+            self._memory[key] = index
+            while len(self._memory) > self.max_memory_entries:
+                self._memory.popitem(last=False)
+        return index
+
+    def _load(self, path: Path) -> Optional[RetrievalIndex]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        if time.time() - stat.st_mtime > self.ttl:
+            return None
+        try:
+            index = RetrievalIndex.load(path)
+            # mtime is the write time (TTL), atime the last access (LRU)
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Discarding unreadable retrieval index {path.name}: {e}")
+            return None
+        return index
+
+    def _save(self, path: Path, index: RetrievalIndex) -> None:
+        try:
+            replaced = path.stat().st_size
+        except FileNotFoundError:
+            replaced = 0
+        try:
+            index.save(path)
+            written = path.stat().st_size
+        except OSError as e:
+            logger.warning(f"Could not cache retrieval index: {e}")
+            return
+
+        with self._lock:
+            if self._total is not None:
+                self._total += written - replaced
+            due = (
+                self._total is None
+                or self._total > self.max_bytes
+                or time.monotonic() - self._swept_at >= self.sweep_interval
+            )
+        if due:
+            self.evict()
+
+    def evict(self) -> None:
+        """Remove expired index files, then least recently used ones until under budget."""
+        if self.directory is None:
+            return
+        with self._lock:
+            self._swept_at = time.monotonic()
+            now = time.time()
+            entries = []
+            for path in self.directory.glob("*.npz"):
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                if now - stat.st_mtime > self.ttl:
+                    path.unlink(missing_ok=True)
+                else:
+                    entries.append((stat.st_atime, stat.st_size, path))
+
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+            self._total = total
+
+
+_cache: Optional[IndexCache] = None
+
+
+def retrieval_min_chars() -> int:
+    """Contexts shorter than this are sent whole (RETRIEVAL_MIN_CHARS)."""
+    return int(os.environ.get("RETRIEVAL_MIN_CHARS", 20000))
+
+
+def get_retrieval_index(context: str) -> Optional[RetrievalIndex]:
+    """
+    The (cached) index of a context, or None when retrieval does not apply:
+    the context is below ``RETRIEVAL_MIN_CHARS`` or NumPy is not installed.
+    """
+    global _cache
+    if np is None or len(context) < retrieval_min_chars():
+        return None
+    if _cache is None:
+        _cache = IndexCache.from_env()
+    return _cache.get_or_build(context)
+
+
+def group_retriever(index: Optional[RetrievalIndex], k: Optional[int] = None) -> Callable[[Any], Optional[str]]:
+    """
+    Adapt an index to the ``retrieve`` hook of ``extract_model_in_groups``:
+    each field group gets the top-k passages for its ``search_query()``.
+    """
+    k = k or int(os.environ.get("RETRIEVAL_TOP_K", 6))
+
+    def retrieve(group: Any) -> Optional[str]:
+        if index is None:
+            return None
+        return index.context_for(group.search_query(), k)
+
+    return retrieve
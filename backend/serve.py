@@ -0,0 +1,277 @@
+"""
+Multi-worker production server.
+
+``uvicorn.run(app)`` is a single process, so every in-memory cache, pool and
+queue exists once per process and one process uses one core for Python
+code. This module runs the app as a pre-fork server instead:
+
+- the master process imports the app once before forking (parsers,
+  pydantic models, the compiled template) and freezes the garbage
+  collector, so workers share those pages copy-on-write instead of each
+  importing and compiling them again
+- it binds the listening socket itself and forks N uvicorn workers that
+  all accept on it; N defaults to the number of usable cores
+  (WEB_CONCURRENCY or --workers to override)
+- state that must be visible to every worker is shared: generation
+  progress and batch jobs go to a SQLite WAL database (SHARED_STATE_DB),
+  while the PDF cache, artefact store and retrieval indexes were already
+  on disk. Per-process limits (admission slots, memory budget, parser
+  workers) are divided by the worker count (SERVER_WORKERS)
+- dead workers are replaced; SIGHUP replaces the workers one at a time,
+  starting each new worker before stopping an old one, so capacity and
+  the warm preloaded state are kept throughout. Old workers finish their
+  in-flight requests and background generations before exiting
+- SIGTERM or SIGINT stop all workers gracefully
+
+Run with ``python -m backend.serve`` (or ``python -m backend.main``).
+"""
+
+import argparse
+import gc
+import logging
+import os
+import select
+import signal
+import socket
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+
+logger = logging.getLogger(__name__)
+
+
+def usable_cores() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    return int(os.environ.get("WEB_CONCURRENCY", usable_cores()))
+
+
+def bind_socket(host: str, port: int, backlog: int = 2048) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def preload() -> Any:
+    """
+    Import the app and warm everything that is the same in every worker.
+
+    Nothing here may start threads, event loops or subprocesses (the
+    renderer, parser workers and LLM clients are started lazily in each
+    worker): they do not survive a fork.
+    """
+    from .get_document_bytes_from_model import TEMPLATE_NAME, get_template_environment
+    from .main import app
+
+    get_template_environment().get_template(TEMPLATE_NAME)
+    # Move everything allocated so far out of the collector's reach, so
+    # collections in the workers do not touch (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+    return app
+
+
+class _WorkerServer(uvicorn.Server):
+    """A uvicorn server that reports on a pipe once it accepts requests."""
+
+    def __init__(self, config: uvicorn.Config, ready_fd: int):
+        super().__init__(config)
+        self.ready_fd = ready_fd
+
+    async def startup(self, sockets: Optional[List[socket.socket]] = None) -> None:
+        await super().startup(sockets=sockets)
+        os.write(self.ready_fd, b"1")
+        os.close(self.ready_fd)
+
+
+class Arbiter:
+    """Forks, supervises and rolls the worker processes."""
+
+    def __init__(
+        self,
+        app: Any,
+        sock: socket.socket,
+        workers: int,
+        graceful_timeout: float = 60.0,
+        log_level: str = "info",
+    ):
+        self.app = app
+        self.socket = sock
+        self.num_workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.log_level = log_level
+        self.workers: Dict[int, int] = {}  # pid -> read end of its ready pipe
+        self.retiring: Dict[int, float] = {}  # pid -> time it was asked to stop
+        self._signals: List[int] = []
+        self._crashes: List[float] = []
+
+    def spawn(self) -> int:
+        ready_read, ready_write = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(ready_read)
+            for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+                signal.signal(signum, signal.SIG_DFL)
+            config = uvicorn.Config(
+                self.app,
+                lifespan="on",
+                log_level=self.log_level,
+                timeout_graceful_shutdown=self.graceful_timeout,
+            )
+            try:
+                _WorkerServer(config, ready_write).run(sockets=[self.socket])
+            finally:
+                os._exit(0)
+        os.close(ready_write)
+        self.workers[pid] = ready_read
+        logger.info(f"Started worker {pid}")
+        return pid
+
+    def wait_ready(self, pid: int, timeout: float = 60.0) -> bool:
+        fd = self.workers.get(pid)
+        if fd is None:
+            return False
+        readable, _, _ = select.select([fd], [], [], timeout)
+        return bool(readable) and os.read(fd, 1) == b"1"
+
+    def retire(self, pid: int) -> None:
+        """Ask a worker to finish its requests and exit."""
+        fd = self.workers.pop(pid, None)
+        if fd is not None:
+            os.close(fd)
+        self.retiring[pid] = time.monotonic()
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            self.retiring.pop(pid, None)
+
+    def reap(self) -> None:
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if self.retiring.pop(pid, None) is not None:
+                logger.info(f"Worker {pid} stopped")
+                continue
+            fd = self.workers.pop(pid, None)
+            if fd is not None:
+                os.close(fd)
+                logger.error(f"Worker {pid} died (status {status}), replacing it")
+                self._crashes.append(time.monotonic())
+
+    def kill_stragglers(self) -> None:
+        now = time.monotonic()
+        for pid, since in list(self.retiring.items()):
+            if now - since > self.graceful_timeout + 5:
+                logger.warning(f"Worker {pid} did not stop in time, killing it")
+                try:
+                    os.kill(pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    self.retiring.pop(pid, None)
+
+    def maintain(self) -> None:
+        """Replace missing workers, backing off if they keep crashing."""
+        self._crashes = [t for t in self._crashes if time.monotonic() - t < 10]
+        if len(self._crashes) > self.num_workers * 2:
+            time.sleep(1)
+        while len(self.workers) < self.num_workers:
+            self.spawn()
+
+    def reload(self) -> None:
+        """Replace every worker, one at a time, without dropping capacity."""
+        logger.info("Reloading workers")
+        for pid in list(self.workers):
+            new_pid = self.spawn()
+            if not self.wait_ready(new_pid):
+                logger.error(f"Worker {new_pid} did not start, keeping worker {pid}")
+                return
+            self.retire(pid)
+
+    def stop(self) -> None:
+        for pid in list(self.workers):
+            self.retire(pid)
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.retiring and time.monotonic() < deadline:
+            self.reap()
+            time.sleep(0.1)
+        for pid in list(self.retiring):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+        self.reap()
+
+    def _on_signal(self, signum: int, frame: Any) -> None:
+        self._signals.append(signum)
+
+    def run(self) -> None:
+        for signum in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+            signal.signal(signum, self._on_signal)
+        logger.info(f"Master {os.getpid()} starting {self.num_workers} workers")
+        self.maintain()
+        while True:
+            while self._signals:
+                signum = self._signals.pop(0)
+                if signum in (signal.SIGTERM, signal.SIGINT):
+                    logger.info("Shutting down")
+                    self.stop()
+                    return
+                if signum == signal.SIGHUP:
+                    self.reload()
+            self.reap()
+            self.kill_stragglers()
+            self.maintain()
+            time.sleep(0.5)
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--host", default=os.environ.get("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("PORT", 8000)))
+    parser.add_argument("--workers", type=int, default=None, help="Default: WEB_CONCURRENCY or the core count")
+    parser.add_argument(
+        "--graceful-timeout", type=float, default=float(os.environ.get("GRACEFUL_TIMEOUT", 60)),
+        help="Seconds a stopping worker gets to finish its requests",
+    )
+    parser.add_argument("--log-level", default=os.environ.get("LOG_LEVEL", "info"))
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(process)d %(levelname)s %(message)s")
+    workers = max(1, args.workers or default_workers())
+
+    # Must be set before the app is imported: module-level stores and limits
+    # read them
+    os.environ["SERVER_WORKERS"] = str(workers)
+    os.environ["SHUTDOWN_DRAIN_TIMEOUT"] = str(args.graceful_timeout)
+    if workers > 1:
+        os.environ.setdefault(
+            "SHARED_STATE_DB", os.path.join(os.environ.get("TMPDIR", "/tmp"), "ba_solution_brief", "shared.db")
+        )
+
+    if workers == 1:
+        from .main import app
+
+        uvicorn.run(app, host=args.host, port=args.port, log_level=args.log_level)
+        return
+
+    sock = bind_socket(args.host, args.port)
+    Arbiter(preload(), sock, workers, args.graceful_timeout, args.log_level).run()
+    sock.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,136 @@
+"""
+Template asset pipeline.
+
+Templates carry several hundred lines of CSS that would otherwise be sent to
+the renderer and re-parsed verbatim on every render. This module:
+
+- minifies the CSS inside ``<style>`` elements and ``*_styles`` blocks once,
+  leaving Jinja tags untouched
+- embeds local fonts and images referenced by ``url(...)`` or ``src="..."``
+  as ``data:`` URIs, so rendering needs no file or network access
+
+``AssetInliningLoader`` applies this when Jinja first loads a template (the
+compiled template is then cached until the source changes), and
+``build_templates`` writes the processed templates to a bundle directory for
+build pipelines:
+
+    python -m backend.template_assets examples build/templates
+"""
+
+import base64
+import logging
+import mimetypes
+import re
+import sys
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Optional, Tuple
+
+from jinja2 import FileSystemLoader
+
+logger = logging.getLogger(__name__)
+
+_JINJA_TAG = re.compile(r"({%.*?%}|{{.*?}}|{#.*?#})", re.S)
+_STYLE_ELEMENT = re.compile(r"(<style[^>]*>)(.*?)(</style>)", re.S | re.I)
+_STYLES_BLOCK = re.compile(r"({%-?\s*block\s+\w*styles\s*-?%})(.*?)({%-?\s*endblock)", re.S)
+_CSS_URL = re.compile(r"url\(\s*(['\"]?)([^'\")]+)\1\s*\)")
+_SRC_ATTR = re.compile(r"(\bsrc=)(['\"])([^'\"{}]+)\2")
+_REMOTE = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//|#)", re.I)
+
+
+def minify_css(css: str) -> str:
+    """Remove comments and redundant whitespace from a CSS fragment."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};,>])\s*", r"\1", css)
+    # Only drop spaces after ":" so descendant selectors like "a :hover" survive
+    css = re.sub(r":\s+", ":", css)
+    css = css.replace(";}", "}")
+    return css.strip()
+
+
+def _minify_outside_jinja(text: str) -> str:
+    parts = _JINJA_TAG.split(text)
+    return "".join(part if _JINJA_TAG.fullmatch(part) else minify_css(part) for part in parts)
+
+
+@lru_cache(maxsize=256)
+def _data_uri(path: Path, mtime_ns: int) -> str:
+    mime = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+    if path.suffix.lower() in (".woff", ".woff2", ".ttf", ".otf"):
+        mime = f"font/{path.suffix.lower().lstrip('.')}"
+    encoded = base64.b64encode(path.read_bytes()).decode("ascii")
+    return f"data:{mime};base64,{encoded}"
+
+
+def data_uri_for(reference: str, base_dir: Path) -> Optional[str]:
+    """Return a data URI for a local asset reference, or None if it is not local."""
+    if _REMOTE.match(reference):
+        return None
+    path = (base_dir / reference.split("?", 1)[0].split("#", 1)[0]).resolve()
+    if not path.is_file():
+        logger.warning(f"Template asset not found: {reference}")
+        return None
+    return _data_uri(path, path.stat().st_mtime_ns)
+
+
+def inline_assets(text: str, base_dir: Path) -> str:
+    """Replace local ``url(...)`` and ``src="..."`` references with data URIs."""
+
+    def replace_url(match: "re.Match") -> str:
+        uri = data_uri_for(match.group(2), base_dir)
+        return f'url("{uri}")' if uri else match.group(0)
+
+    def replace_src(match: "re.Match") -> str:
+        uri = data_uri_for(match.group(3), base_dir)
+        return f"{match.group(1)}{match.group(2)}{uri}{match.group(2)}" if uri else match.group(0)
+
+    return _SRC_ATTR.sub(replace_src, _CSS_URL.sub(replace_url, text))
+
+
+def process_template_source(source: str, base_dir: Path) -> str:
+    """Minify template CSS and inline local assets."""
+
+    def minify_element(match: "re.Match") -> str:
+        return match.group(1) + _minify_outside_jinja(match.group(2)) + match.group(3)
+
+    source = _STYLE_ELEMENT.sub(minify_element, source)
+    source = _STYLES_BLOCK.sub(minify_element, source)
+    return inline_assets(source, base_dir)
+
+
+class AssetInliningLoader(FileSystemLoader):
+    """FileSystemLoader that serves templates with minified CSS and inlined assets."""
+
+    def get_source(self, environment, template: str) -> Tuple[str, Optional[str], Callable[[], bool]]:
+        source, filename, uptodate = super().get_source(environment, template)
+        base_dir = Path(filename).parent if filename else Path(self.searchpath[0])
+        return process_template_source(source, base_dir), filename, uptodate
+
+
+def build_templates(src_dir: Path, out_dir: Path) -> int:
+    """
+    Write processed copies of every ``.html`` template to ``out_dir``.
+
+    Returns:
+        int: Number of templates written
+    """
+    src_dir, out_dir = Path(src_dir), Path(out_dir)
+    count = 0
+    for path in src_dir.rglob("*.html"):
+        target = out_dir / path.relative_to(src_dir)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        processed = process_template_source(path.read_text(encoding="utf-8"), path.parent)
+        target.write_text(processed, encoding="utf-8")
+        logger.info(f"{path} -> {target} ({path.stat().st_size} -> {len(processed)} bytes)")
+        count += 1
+    return count
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        print("Usage: python -m backend.template_assets <template_dir> <output_dir>")
+        sys.exit(1)
+    logging.basicConfig(level=logging.INFO)
+    written = build_templates(Path(sys.argv[1]), Path(sys.argv[2]))
+    print(f"Wrote {written} templates to {sys.argv[2]}")
@@ -0,0 +1,351 @@
+"""
+Static analysis of what a template reads.
+
+The model stage and the template drift apart: the LLM is asked for fields
+the template never renders, while sections of the template wait for data no
+model provides. This module walks the Jinja AST of a template (following
+``extends``, ``include`` and ``import``) and collects every variable path it
+reads, e.g. ``solution_brief_data.problem_categories[].title``: ``[]`` marks
+a loop over a sequence and ``[*]`` a lookup with a computed key. Each
+``{% if %}`` is recorded as a branch with the paths its test reads.
+
+``reconcile`` compares those paths with a model class and reports which
+model fields are rendered (the only ones worth requesting from the LLM),
+which are not, which template fields nothing supplies, and which branches
+can therefore never render.
+
+Run it on the configured template:
+
+    python -m backend.template_schema examples.model:ProjectModel
+"""
+
+import importlib
+import logging
+import sys
+import types
+import typing
+from collections import abc
+from dataclasses import dataclass
+from typing import Any, Collection, Dict, FrozenSet, List, Mapping, Optional, Sequence, Set, Tuple
+
+from jinja2 import Environment, nodes
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+# Methods whose receiver is read as a mapping (``data.items()``)
+_MAPPING_METHODS = frozenset(["items", "values", "keys", "get"])
+
+Scope = Dict[str, Optional[str]]
+
+
+def _target_names(target: nodes.Node) -> List[nodes.Name]:
+    """The names bound by a ``for`` or ``set`` target (a name or a tuple of names)."""
+    return [target] if isinstance(target, nodes.Name) else list(target.find_all(nodes.Name))
+
+
+@dataclass(frozen=True)
+class Branch:
+    """An ``{% if %}`` (or ``elif``) and the variable paths its test reads."""
+
+    template: str
+    lineno: int
+    paths: FrozenSet[str]
+
+
+@dataclass(frozen=True)
+class TemplateSchema:
+    """Every variable path a template (with its parents and includes) reads."""
+
+    paths: FrozenSet[str]
+    branches: Tuple[Branch, ...]
+
+    def fields(self, root: str) -> Dict[str, FrozenSet[str]]:
+        """
+        Top-level fields read under ``root`` with their sub-paths, e.g.
+        ``{"problem_categories": {"[].title", "[].items[]"}}`` (a field read
+        as a whole has the sub-path ``""``).
+        """
+        fields: Dict[str, Set[str]] = {}
+        prefix = root + "."
+        for path in self.paths:
+            if not path.startswith(prefix):
+                continue
+            field, sub = _split_field(path[len(prefix):])
+            fields.setdefault(field, set()).add(sub)
+        return {field: frozenset(subs) for field, subs in fields.items()}
+
+
+def _split_field(rest: str) -> Tuple[str, str]:
+    cut = min((i for i in (rest.find("."), rest.find("[")) if i >= 0), default=len(rest))
+    return rest[:cut], rest[cut:]
+
+
+class _Collector:
+    def __init__(self, environment: Environment):
+        self.environment = environment
+        self.paths: Set[str] = set()
+        self.branches: List[Branch] = []
+        self._seen: Set[str] = set()
+
+    def template(self, name: str, skip_blocks: FrozenSet[str] = frozenset()) -> None:
+        if name in self._seen:
+            return
+        self._seen.add(name)
+        source, _, _ = self.environment.loader.get_source(self.environment, name)
+        tree = self.environment.parse(source, name)
+        parents = [n.template.value for n in tree.find_all(nodes.Extends) if isinstance(n.template, nodes.Const)]
+        # Blocks defined here replace the parent's blocks of the same name
+        overridden = skip_blocks | {block.name for block in tree.find_all(nodes.Block)}
+        self.visit(tree, {}, self.paths, name, skip_blocks)
+        for parent in parents:
+            self.template(parent, overridden)
+
+    def path(self, node: nodes.Node, scope: Scope) -> Optional[str]:
+        """The variable path an expression reads, or None if it is not one."""
+        if isinstance(node, nodes.Name):
+            if node.name in scope:
+                return scope[node.name]
+            return None if node.name in self.environment.globals else node.name
+        if isinstance(node, nodes.Getattr):
+            base = self.path(node.node, scope)
+            return f"{base}.{node.attr}" if base else None
+        if isinstance(node, nodes.Getitem):
+            base = self.path(node.node, scope)
+            if base is None:
+                return None
+            if isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, str):
+                return f"{base}.{node.arg.value}"
+            if isinstance(node.arg, nodes.Const) and isinstance(node.arg.value, int):
+                return f"{base}[]"
+            return f"{base}[*]"
+        return None
+
+    def iter_path(self, node: nodes.Node, scope: Scope) -> Optional[str]:
+        """The path of one item of a loop's iterable."""
+        if isinstance(node, nodes.Call) and isinstance(node.node, nodes.Getattr) and node.node.attr in _MAPPING_METHODS:
+            base = self.path(node.node.node, scope)
+            return f"{base}[*]" if base else None
+        if isinstance(node, nodes.Filter):
+            # e.g. ``x|sort`` or ``x|selectattr(...)``: items are still x's items
+            return self.iter_path(node.node, scope) if node.node is not None else None
+        base = self.path(node, scope)
+        return f"{base}[]" if base else None
+
+    def visit(self, node: nodes.Node, scope: Scope, out: Set[str], template: str, skip_blocks: FrozenSet[str]) -> None:
+        def visit(child: nodes.Node, child_scope: Scope = scope, child_out: Set[str] = out) -> None:
+            self.visit(child, child_scope, child_out, template, skip_blocks)
+
+        if isinstance(node, nodes.Block) and node.name in skip_blocks:
+            return
+        if isinstance(node, (nodes.Include, nodes.Import, nodes.FromImport)):
+            if isinstance(node.template, nodes.Const):
+                self.template(node.template.value)
+            return
+        if isinstance(node, (nodes.Name, nodes.Getattr, nodes.Getitem)):
+            path = self.path(node, scope)
+            if path:
+                out.add(path)
+            # Computed keys are expressions too (``data[key]``)
+            while isinstance(node, (nodes.Getattr, nodes.Getitem)):
+                if isinstance(node, nodes.Getitem) and not isinstance(node.arg, nodes.Const):
+                    visit(node.arg)
+                node = node.node
+            if path is None and not isinstance(node, nodes.Name):
+                visit(node)
+            return
+        if isinstance(node, nodes.Call) and isinstance(node.node, nodes.Getattr) and node.node.attr in _MAPPING_METHODS:
+            visit(node.node.node)
+            for child in [*node.args, *node.kwargs]:
+                visit(child)
+            return
+        if isinstance(node, nodes.For):
+            visit(node.iter)
+            item = self.iter_path(node.iter, scope)
+            inner: Scope = {**scope, "loop": None}
+            for target in _target_names(node.target):
+                inner[target.name] = item
+            if node.test is not None:
+                visit(node.test, inner)
+            for child in node.body:
+                visit(child, inner)
+            for child in node.else_:
+                visit(child)
+            return
+        if isinstance(node, nodes.If):
+            test_paths: Set[str] = set()
+            visit(node.test, scope, test_paths)
+            out.update(test_paths)
+            self.branches.append(Branch(template, node.lineno, frozenset(test_paths)))
+            for child in [*node.body, *node.elif_, *node.else_]:
+                visit(child)
+            return
+        if isinstance(node, nodes.Assign):
+            visit(node.node)
+            value = self.path(node.node, scope)
+            for target in _target_names(node.target):
+                scope[target.name] = value
+            return
+        if isinstance(node, nodes.AssignBlock):
+            for target in _target_names(node.target):
+                scope[target.name] = None
+            for child in node.body:
+                visit(child)
+            return
+        if isinstance(node, (nodes.Macro, nodes.CallBlock)):
+            inner = {**scope, "caller": None, "varargs": None, "kwargs": None}
+            for arg in node.args:
+                inner[arg.name] = None
+            for child in node.body:
+                visit(child, inner)
+            return
+        for child in node.iter_child_nodes():
+            visit(child)
+
+
+def analyze_template(environment: Environment, name: str) -> TemplateSchema:
+    """Collect the variable paths and branches of a template and everything it extends or includes."""
+    collector = _Collector(environment)
+    collector.template(name)
+    branches = sorted(collector.branches, key=lambda b: (b.template, b.lineno))
+    return TemplateSchema(frozenset(collector.paths), tuple(branches))
+
+
+def _supplies(annotation: Any, sub: str) -> bool:
+    """
+    Whether a field of this type can supply the sub-path ``sub``.
+
+    Only nested pydantic models are checked; other types (str, dict, Any)
+    give no static answer and are assumed to match.
+    """
+    if not sub:
+        return True
+    origin = typing.get_origin(annotation)
+    args = typing.get_args(annotation)
+    if origin in (typing.Union, types.UnionType):
+        options = [a for a in args if a is not type(None)]
+        return _supplies(options[0], sub) if len(options) == 1 else True
+    if sub.startswith("[]") and origin in (list, tuple, set, frozenset, abc.Sequence) and args:
+        return _supplies(args[0], sub[2:])
+    if sub.startswith("[*]") and origin in (dict, abc.Mapping) and len(args) == 2:
+        return _supplies(args[1], sub[3:])
+    if sub.startswith(".") and isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        name, rest = _split_field(sub[1:])
+        return name in annotation.model_fields and _supplies(annotation.model_fields[name].annotation, rest)
+    return True
+
+
+@dataclass(frozen=True)
+class SchemaReport:
+    """How a model class lines up with what a template reads."""
+
+    model: str
+    rendered: Tuple[str, ...]  # model fields the template reads (directly or derived)
+    unused: Tuple[str, ...]  # model fields the template never reads
+    missing: Tuple[str, ...]  # template paths no model field or default supplies
+    dead_branches: Tuple[Branch, ...]  # branches whose tests only read missing paths
+
+    def warnings(self) -> List[str]:
+        messages = []
+        if self.unused:
+            messages.append(f"{self.model}: fields never rendered by the template: {', '.join(self.unused)}")
+        if self.missing:
+            messages.append(f"{self.model}: template reads data the model does not supply: {', '.join(self.missing)}")
+        # One line per test, listing every place it guards
+        lines: Dict[Tuple[str, FrozenSet[str]], List[int]] = {}
+        for branch in self.dead_branches:
+            lines.setdefault((branch.template, branch.paths), []).append(branch.lineno)
+        for (template, paths), linenos in lines.items():
+            messages.append(
+                f"{self.model}: branch at {template}:{', '.join(map(str, linenos))} can never render "
+                f"(tests {', '.join(sorted(paths))})"
+            )
+        return messages
+
+
+def reconcile(
+    model_cls: type,
+    schema: TemplateSchema,
+    root: str,
+    sources: Optional[Mapping[str, Sequence[str]]] = None,
+    defaults: Collection[str] = (),
+) -> SchemaReport:
+    """
+    Compare a model class with the fields a template reads under ``root``.
+
+    Args:
+        model_cls: Pydantic model the model stage produces
+        schema: Result of ``analyze_template``
+        root: Name the model is passed to the template as
+        sources: Template fields derived from model fields, e.g.
+            ``{"service_title": ("title",)}``
+        defaults: Template fields filled in when the model has none
+    """
+    sources = sources or {}
+    model_fields = model_cls.model_fields
+    read = schema.fields(root)
+    whole_root = any(path == root for path in schema.paths)
+
+    rendered = [
+        name
+        for name in model_fields
+        if whole_root or name in read or any(name in sources.get(field, ()) for field in read)
+    ]
+    missing: List[str] = []
+    missing_fields: Set[str] = set()
+    for field, subs in sorted(read.items()):
+        if field in model_fields:
+            missing.extend(
+                f"{field}{sub}" for sub in sorted(subs) if not _supplies(model_fields[field].annotation, sub)
+            )
+        elif field not in defaults and not any(source in model_fields for source in sources.get(field, ())):
+            missing.append(field)
+            missing_fields.add(field)
+
+    def never_set(path: str) -> bool:
+        if not path.startswith(root + "."):
+            # Options, loop state and the like can be anything
+            return False
+        relative = path[len(root) + 1:]
+        return relative in missing or _split_field(relative)[0] in missing_fields
+
+    dead = [branch for branch in schema.branches if branch.paths and all(map(never_set, branch.paths))]
+
+    return SchemaReport(
+        model=model_cls.__name__,
+        rendered=tuple(rendered),
+        unused=tuple(name for name in model_fields if name not in rendered),
+        missing=tuple(missing),
+        dead_branches=tuple(dead),
+    )
+
+
+def import_model_class(path: str) -> type:
+    """Import a model class from ``module:QualName``."""
+    module_name, _, qualname = path.partition(":")
+    target: Any = importlib.import_module(module_name)
+    for part in qualname.split("."):
+        target = getattr(target, part)
+    return target
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .get_document_bytes_from_model import TEMPLATE_NAME, reconcile_model, template_schema
+
+    argv = sys.argv[1:] if argv is None else argv
+    schema = template_schema()
+    print(f"{TEMPLATE_NAME} reads:")
+    for path in sorted(schema.paths):
+        print(f"  {path}")
+    problems = 0
+    for path in argv:
+        report = reconcile_model(import_model_class(path))
+        print(f"\n{report.model} fields to request: {', '.join(report.rendered) or '(none)'}")
+        for message in report.warnings():
+            print(f"  warning: {message}")
+            problems += 1
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+import asyncio
+import io
+import zipfile
+from dataclasses import dataclass
+
+import pytest
+
+from admission import (
+    AdmissionController,
+    AdmissionError,
+    CostWeights,
+    count_pdf_pages,
+    estimate_cost,
+)
+
+
+@dataclass
+class Source:
+    filename: str
+    data: bytes
+
+
+def fake_pdf(pages: int, images: int = 0) -> bytes:
+    body = b"".join(b"<< /Type /Page >>\n" for _ in range(pages))
+    body += b"".join(b"<< /Subtype /Image >>\n" for _ in range(images))
+    return b"%PDF-1.4\n" + b"<< /Type /Pages /Count %d >>\n" % pages + body
+
+
+def fake_docx(images: int) -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("word/document.xml", "<w:document/>")
+        for i in range(images):
+            archive.writestr(f"word/media/image{i}.png", b"png")
+    return buffer.getvalue()
+
+
+class TestEstimateCost:
+    """Test suite for up-front cost estimation."""
+
+    def test_counts_pages_and_images(self):
+        """PDF pages and images, DOCX media and image files are all counted."""
+        estimate = estimate_cost([
+            Source("report.pdf", fake_pdf(pages=30, images=4)),
+            Source("brief.docx", fake_docx(images=2)),
+            Source("scan.png", b"png"),
+            Source("notes.txt", b"hello"),
+            None,
+        ])
+        assert estimate.files == 4
+        assert estimate.pages == 30 + 1 + 1 + 1
+        assert estimate.images == 4 + 2 + 1
+
+    def test_large_uploads_cost_more(self):
+        """Cost grows with pages, images and size."""
+        weights = CostWeights(base=1, per_page=0.1, per_image=1, per_megabyte=0)
+        small = estimate_cost([Source("a.pdf", fake_pdf(2))], weights)
+        large = estimate_cost([Source("a.pdf", fake_pdf(300, images=10))], weights)
+        assert small.cost == pytest.approx(1.2)
+        assert large.cost == pytest.approx(1 + 30 + 10)
+
+    def test_pages_tag_is_not_counted_as_a_page(self):
+        """The /Pages tree node is not a page."""
+        assert count_pdf_pages(fake_pdf(3)) == 3
+
+    def test_compressed_page_tree_is_estimated_from_size(self):
+        """Uploads are never parsed in the API process; hidden pages are estimated from size."""
+        assert count_pdf_pages(b"%PDF-1.5\n" + b"x" * 10) == 1
+        assert count_pdf_pages(b"%PDF-1.5\n" + b"x" * (500 * 1024)) == 10
+
+
+class TestAdmissionController:
+    """Test suite for quotas and weighted fair queuing."""
+
+    def test_rejects_request_larger_than_quota(self):
+        """A single request over the per-client quota can never be admitted."""
+        controller = AdmissionController(client_max_cost=10)
+        with pytest.raises(AdmissionError, match="exceeds"):
+            controller.check("a", 11)
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_client_has_too_much_in_flight(self):
+        """Queued and running cost count towards the client quota."""
+        controller = AdmissionController(max_concurrency=1, client_max_cost=10)
+        ticket = await controller.acquire("a", 6)
+        with pytest.raises(AdmissionError) as exc_info:
+            await controller.acquire("a", 6)
+        assert exc_info.value.retry_after
+        # Other clients are unaffected
+        other = asyncio.ensure_future(controller.acquire("b", 6))
+        ticket.release()
+        (await other).release()
+        assert controller.stats() == {"running": 0, "queued": 0, "clients": {}}
+
+    @pytest.mark.asyncio
+    async def test_fair_queuing_interleaves_clients(self):
+        """A client with many queued jobs does not delay another client's job."""
+        controller = AdmissionController(max_concurrency=1, client_max_concurrency=1, client_max_cost=100)
+        order = []
+
+        async def job(client, name):
+            async with controller.admit(client, 5):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        blocker = await controller.acquire("bulk", 5)
+        tasks = [asyncio.ensure_future(job("bulk", f"bulk{i}")) for i in range(4)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(job("interactive", "interactive")))
+        await asyncio.sleep(0)
+        blocker.release()
+        await asyncio.gather(*tasks)
+
+        assert order.index("interactive") <= 1
+
+    @pytest.mark.asyncio
+    async def test_weights_give_larger_share(self):
+        """A client with twice the weight is admitted twice as often."""
+        controller = AdmissionController(
+            max_concurrency=1, client_max_concurrency=1, client_max_cost=100,
+            weights={"heavy": 2.0},
+        )
+        order = []
+
+        async def job(client):
+            async with controller.admit(client, 1):
+                order.append(client)
+                await asyncio.sleep(0)
+
+        blocker = await controller.acquire("other", 1)
+        tasks = [asyncio.ensure_future(job(c)) for c in ["heavy"] * 6 + ["light"] * 6]
+        await asyncio.sleep(0)
+        blocker.release()
+        await asyncio.gather(*tasks)
+
+        assert order[:6].count("heavy") == 4
+
+    @pytest.mark.asyncio
+    async def test_per_client_concurrency_limit(self):
+        """A client cannot occupy more than its share of running slots."""
+        controller = AdmissionController(max_concurrency=4, client_max_concurrency=2)
+        first = await controller.acquire("a", 1)
+        second = await controller.acquire("a", 1)
+        third = asyncio.ensure_future(controller.acquire("a", 1))
+        await asyncio.sleep(0)
+        assert not third.done()
+        assert controller.stats()["running"] == 2
+
+        first.release()
+        (await third).release()
+        second.release()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_is_refunded(self):
+        """A client that goes away while queued gives back its quota."""
+        controller = AdmissionController(max_concurrency=1, client_max_cost=10)
+        ticket = await controller.acquire("a", 5)
+        waiting = asyncio.ensure_future(controller.acquire("b", 5))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert "b" not in controller.stats()["clients"]
+        ticket.release()
+
+    @pytest.mark.asyncio
+    async def test_on_queued_reports_position_after_queuing(self):
+        """on_queued sees the request's own place in the queue, 0 if admitted at once."""
+        controller = AdmissionController(max_concurrency=1, client_max_cost=100)
+        positions = []
+
+        ticket = await controller.acquire("a", 1, on_queued=positions.append)
+        first = asyncio.ensure_future(controller.acquire("b", 1, on_queued=positions.append))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(controller.acquire("c", 1, on_queued=positions.append))
+        await asyncio.sleep(0)
+
+        assert positions == [0, 0, 1]
+        ticket.release()
+        (await first).release()
+        (await second).release()
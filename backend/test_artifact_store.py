@@ -0,0 +1,149 @@
+import os
+import threading
+import time
+
+import pytest
+
+from artifact_store import ArtifactStore, downstream_stages, validate_document_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(tmp_path, gc_interval=3600, blob_grace=0)
+
+
+def blob_count(store):
+    return sum(1 for _ in store.blob_dir.glob("*/*"))
+
+
+class TestArtifactStore:
+    """Test suite for the per-brief artefact store."""
+
+    def test_save_and_load(self, store):
+        """Artefacts round-trip and the document lists its stages in order."""
+        store.save("brief1", "pdf", b"%PDF")
+        store.save("brief1", "context", b"text")
+        assert store.load("brief1", "context") == b"text"
+        assert store.load("brief1", "model") is None
+        assert store.load("missing", "pdf") is None
+
+        document = store.get_document("brief1")
+        assert list(document["stages"]) == ["context", "pdf"]
+        assert document["stages"]["pdf"]["size"] == 4
+
+    def test_identical_artefacts_share_a_blob(self, store):
+        """Blobs are content-addressed, so duplicates are stored once."""
+        store.save("a", "html", b"<html/>")
+        store.save("b", "html", b"<html/>")
+        assert blob_count(store) == 1
+        assert store.stats()["bytes"] == len(b"<html/>")
+
+    def test_invalidate_drops_downstream_stages(self, store):
+        """Invalidating a stage drops it and every later stage."""
+        for stage in ("context", "model", "html", "pdf"):
+            store.save("brief", stage, stage.encode())
+        store.invalidate("brief", "html")
+        assert list(store.get_document("brief")["stages"]) == ["context", "model"]
+        assert downstream_stages("model") == ("model", "html", "pdf")
+
+    def test_metadata_is_merged(self, store):
+        """Metadata updates keep earlier keys."""
+        store.create_document("brief", model_class="m:Model")
+        store.create_document("brief", template_version="v2")
+        assert store.get_document("brief")["metadata"] == {
+            "model_class": "m:Model",
+            "template_version": "v2",
+        }
+
+    def test_delete_removes_unshared_blobs(self, store):
+        """Deleting a document removes its blobs unless another document uses them."""
+        store.save("a", "pdf", b"shared")
+        store.save("b", "pdf", b"shared")
+        store.save("a", "html", b"only a")
+        assert store.delete_document("a")
+        assert not store.delete_document("a")
+        assert blob_count(store) == 1
+        assert store.load("b", "pdf") == b"shared"
+
+    def test_gc_expires_old_documents(self, store):
+        """Documents not accessed within the TTL are removed."""
+        store.ttl = 10
+        store.save("old", "pdf", b"old")
+        store.save("new", "pdf", b"new")
+        with store._connect() as db:
+            db.execute("UPDATE documents SET accessed = ? WHERE document_id = 'old'", (time.time() - 60,))
+        assert store.gc() == {"documents": 1, "blobs": 1}
+        assert store.get_document("old") is None
+        assert store.load("new", "pdf") == b"new"
+
+    def test_gc_evicts_least_recently_used_over_budget(self, store):
+        """Over the size budget, the least recently accessed documents go first."""
+        store.max_bytes = 250
+        now = time.time()
+        for i, document_id in enumerate(["first", "second", "third"]):
+            store.save(document_id, "pdf", bytes([i]) * 100)
+            with store._connect() as db:
+                db.execute(
+                    "UPDATE documents SET accessed = ? WHERE document_id = ?", (now - 30 + i, document_id)
+                )
+        store.load("first", "pdf")  # now the most recently used
+        store.gc()
+        assert store.get_document("second") is None
+        assert store.get_document("first") is not None
+        assert store.stats()["bytes"] == 200
+
+    def test_gc_counts_shared_blobs_until_last_reference(self, store):
+        """Evicting a document that shares its blob frees nothing until the last copy goes."""
+        store.max_bytes = 150
+        now = time.time()
+        for i, (document_id, data) in enumerate(
+            [("a", b"s" * 100), ("b", b"s" * 100), ("c", b"u" * 100)]
+        ):
+            store.save(document_id, "pdf", data)
+            with store._connect() as db:
+                db.execute(
+                    "UPDATE documents SET accessed = ? WHERE document_id = ?", (now - 30 + i, document_id)
+                )
+
+        assert store.gc()["documents"] == 2
+        assert store.get_document("a") is None
+        assert store.get_document("b") is None
+        assert store.load("c", "pdf") == b"u" * 100
+
+    def test_save_runs_gc_in_background(self, tmp_path, monkeypatch):
+        """A save that makes GC due does not wait for it."""
+        store = ArtifactStore(tmp_path, gc_interval=0, blob_grace=0)
+        started, release = threading.Event(), threading.Event()
+
+        def slow_gc():
+            started.set()
+            release.wait(5)
+            return {"documents": 0, "blobs": 0}
+
+        monkeypatch.setattr(store, "gc", slow_gc)
+        with store._gc_lock:
+            store.save("a", "pdf", b"skipped while another GC holds the lock")
+        assert not started.is_set()
+
+        store.save("a", "pdf", b"data")
+        assert started.wait(5)
+        assert store.load("a", "pdf") == b"data"
+        release.set()
+
+    def test_gc_keeps_recent_unreferenced_blobs(self, tmp_path):
+        """Blobs younger than the grace period may belong to a save in progress."""
+        store = ArtifactStore(tmp_path, gc_interval=3600, blob_grace=60)
+        digest = store._write_blob(b"in flight")
+        assert store.gc()["blobs"] == 0
+        old = time.time() - 120
+        os.utime(store._blob_path(digest), (old, old))
+        assert store.gc()["blobs"] == 1
+
+    def test_invalid_document_id(self, store):
+        """Ids that could escape the store are refused."""
+        with pytest.raises(ValueError):
+            validate_document_id("../etc")
+        with pytest.raises(ValueError):
+            store.save("a/b", "pdf", b"x")
+        with pytest.raises(ValueError):
+            store.save("brief", "docx", b"x")
@@ -0,0 +1,172 @@
+import io
+import threading
+import zipfile
+
+import pytest
+from pydantic import BaseModel
+
+from batch_jobs import BatchItem, JobStore, SQLiteJobStore, generate_batch, run_batch_jobs, stream_zip
+
+
+class Brief(BaseModel):
+    title: str
+    context: str
+
+
+async def model_fn(context):
+    return Brief(title="Generated", context=context)
+
+
+async def render_fn(model, context):
+    if model.title == "boom":
+        raise RuntimeError("render failed")
+    return f"%PDF-{model.title}".encode(), model.title.lower()
+
+
+ITEMS = [
+    BatchItem(name="Acme Corp", overrides={"title": "Acme"}),
+    BatchItem(name="Acme Corp", context="Second product line"),
+    BatchItem(name="Broken", overrides={"title": "boom"}),
+]
+
+
+class TestGenerateBatch:
+    """Test suite for batch generation."""
+
+    @pytest.mark.asyncio
+    async def test_items_share_context_and_apply_overrides(self):
+        """Each item gets the shared context, its own extras and overrides."""
+        contexts = []
+
+        async def recording_model_fn(context):
+            contexts.append(context)
+            return await model_fn(context)
+
+        results = [r async for r in generate_batch("shared", ITEMS, recording_model_fn, render_fn)]
+        by_index = {r.index: r for r in results}
+
+        assert by_index[0].pdf == b"%PDF-Acme"
+        assert by_index[1].pdf == b"%PDF-Generated"
+        assert by_index[2].error == "render failed"
+        assert sorted(contexts)[0] == "shared"
+        assert any("Second product line" in c and c.startswith("shared") for c in contexts)
+
+    @pytest.mark.asyncio
+    async def test_zip_stream_contains_every_item(self):
+        """The archive has one PDF per success and an error note per failure."""
+        chunks = [c async for c in stream_zip(generate_batch("shared", ITEMS, model_fn, render_fn))]
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+
+        assert sorted(archive.namelist()) == ["Acme_Corp.pdf", "Acme_Corp_2.pdf", "Broken.error.txt"]
+        assert archive.read("Broken.error.txt") == b"render failed"
+
+    @pytest.mark.asyncio
+    async def test_jobs_record_results(self):
+        """Job mode records the cache key or error for each item."""
+        store = JobStore()
+        job_ids = [store.create("batch", item.name) for item in ITEMS]
+
+        await run_batch_jobs(job_ids, store, generate_batch("shared", ITEMS, model_fn, render_fn))
+
+        assert store.get(job_ids[0])["key"] == "acme"
+        assert store.get(job_ids[2])["status"] == "failed"
+
+    @pytest.mark.asyncio
+    async def test_shared_job_store(self, tmp_path):
+        """Jobs run by one worker are visible through another worker's store."""
+        store = SQLiteJobStore(tmp_path / "shared.db")
+        job_ids = [store.create("batch", item.name) for item in ITEMS]
+
+        await run_batch_jobs(job_ids, store, generate_batch("shared", ITEMS, model_fn, render_fn))
+
+        other = SQLiteJobStore(tmp_path / "shared.db")
+        assert other.get(job_ids[0])["status"] == "done"
+        assert other.get(job_ids[0])["key"] == "acme"
+        assert other.get(job_ids[2])["status"] == "failed"
+        assert other.get("missing") is None
+
+    @pytest.mark.asyncio
+    async def test_finished_results_are_kept(self):
+        """With keep, finished PDFs are persisted under the job id before the job is done."""
+        store = JobStore()
+        job_ids = store.create_many("batch", [item.name for item in ITEMS])
+        kept = {}
+
+        async def keep(job_id, result):
+            assert store.get(job_id)["status"] == "running"
+            kept[job_id] = result.pdf
+
+        await run_batch_jobs(job_ids, store, generate_batch("shared", ITEMS, model_fn, render_fn), keep)
+
+        assert kept == {job_ids[0]: b"%PDF-Acme", job_ids[1]: b"%PDF-Generated"}
+        assert store.get(job_ids[0])["document_id"] == job_ids[0]
+        assert "document_id" not in store.get(job_ids[2])
+
+    @pytest.mark.asyncio
+    async def test_job_fails_when_result_cannot_be_kept(self, tmp_path):
+        """A PDF that could not be persisted is not reported as done."""
+        store = SQLiteJobStore(tmp_path / "shared.db")
+        job_ids = store.create_many("batch", [ITEMS[0].name])
+
+        async def keep(job_id, result):
+            raise OSError("disk full")
+
+        await run_batch_jobs(job_ids, store, generate_batch("shared", ITEMS[:1], model_fn, render_fn), keep)
+
+        job = store.get(job_ids[0])
+        assert job["status"] == "failed"
+        assert "disk full" in job["error"]
+        assert "key" not in job
+
+    @pytest.mark.asyncio
+    async def test_store_is_not_called_on_the_event_loop(self):
+        """Job store I/O runs in worker threads."""
+        loop_thread = threading.get_ident()
+        calls = []
+
+        class RecordingStore(JobStore):
+            def update_many(self, *args, **kwargs):
+                calls.append(threading.get_ident())
+                super().update_many(*args, **kwargs)
+
+        store = RecordingStore()
+        job_ids = store.create_many("batch", [item.name for item in ITEMS])
+        await run_batch_jobs(job_ids, store, generate_batch("shared", ITEMS, model_fn, render_fn))
+
+        assert len(calls) == 1 + len(ITEMS)
+        assert loop_thread not in calls
+
+
+class TestSQLiteJobStore:
+    """Test suite for the shared SQLite job store."""
+
+    def test_updates_merge_without_losing_fields(self, tmp_path):
+        """Updates from different workers each keep the other's fields."""
+        first = SQLiteJobStore(tmp_path / "shared.db")
+        second = SQLiteJobStore(tmp_path / "shared.db")
+        job_id = first.create("batch", "Acme")
+
+        first.update(job_id, status="running")
+        second.update(job_id, progress=0.5)
+        first.update(job_id, seconds=1.5)
+
+        job = second.get(job_id)
+        assert job["status"] == "running"
+        assert job["progress"] == 0.5
+        assert job["seconds"] == 1.5
+        assert job["name"] == "Acme"
+
+    def test_update_many_only_touches_matching_status(self, tmp_path):
+        """Failing a batch leaves jobs that already finished alone."""
+        store = SQLiteJobStore(tmp_path / "shared.db")
+        done, running, queued = store.create_many("batch", ["a", "b", "c"])
+        store.update(done, status="done", key="ab12")
+        store.update(running, status="running")
+
+        store.update_many(
+            [done, running, queued], where_status=("queued", "running"), status="failed", error="boom"
+        )
+
+        assert store.get(done)["status"] == "done"
+        assert store.get(running)["status"] == "failed"
+        assert store.get(queued)["error"] == "boom"
@@ -0,0 +1,183 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from bulk_runner import (
+    MANIFEST_NAME,
+    SUMMARY_NAME,
+    discover_units,
+    format_summary,
+    load_manifest,
+    output_path,
+    run,
+    summarize,
+)
+
+
+def fake_process(unit, paths, out_path, options):
+    """Stands in for the pipeline: fails on inputs named bad*, else writes a PDF."""
+    timings = {"extract": 0.1, "model": 0.2, "render": 0.3 * len(paths)}
+    if any(Path(p).name.startswith("bad") for p in paths):
+        return {"unit": unit, "status": "failed", "error": "ValueError: unreadable", "timings": timings}
+    Path(out_path).parent.mkdir(parents=True, exist_ok=True)
+    Path(out_path).write_bytes(b"%PDF-1.7 " + ",".join(paths).encode())
+    return {"unit": unit, "status": "done", "output": out_path, "timings": timings}
+
+
+def manifest_units(output_dir):
+    lines = (output_dir / MANIFEST_NAME).read_text().splitlines()
+    return [json.loads(line)["unit"] for line in lines]
+
+
+@pytest.fixture
+def input_dir(tmp_path):
+    root = tmp_path / "in"
+    (root / "acme").mkdir(parents=True)
+    (root / "acme" / "notes.txt").write_text("notes")
+    (root / "acme" / "pricing.txt").write_text("pricing")
+    (root / "overview.txt").write_text("overview")
+    (root / ".DS_Store").write_text("")
+    return root
+
+
+class TestUnits:
+    """Test suite for work-unit discovery and output paths."""
+
+    def test_group_by_file_and_directory(self, input_dir):
+        """Every file is a unit, or every directory; hidden files are ignored."""
+        by_file = discover_units(input_dir, "file")
+        by_directory = discover_units(input_dir, "directory")
+
+        assert sorted(by_file) == ["acme/notes.txt", "acme/pricing.txt", "overview.txt"]
+        assert sorted(by_directory) == [".", "acme"]
+        assert [p.name for p in by_directory["acme"]] == ["notes.txt", "pricing.txt"]
+
+    def test_output_paths(self, tmp_path):
+        """Outputs mirror the input tree; the top directory becomes root.pdf."""
+        assert output_path(tmp_path, "acme/notes.txt", "file") == tmp_path / "acme" / "notes.txt.pdf"
+        assert output_path(tmp_path, "acme", "directory") == tmp_path / "acme.pdf"
+        assert output_path(tmp_path, ".", "directory") == tmp_path / "root.pdf"
+
+    def test_same_stem_inputs_get_separate_outputs(self, tmp_path):
+        """brief.docx and brief.pdf each get their own PDF."""
+        root = tmp_path / "in"
+        root.mkdir()
+        (root / "brief.docx").write_text("docx")
+        (root / "brief.pdf").write_text("pdf")
+
+        run(fake_process, root, tmp_path / "out", workers=1)
+
+        assert sorted(p.name for p in (tmp_path / "out").glob("*.pdf")) == ["brief.docx.pdf", "brief.pdf.pdf"]
+
+    def test_colliding_outputs_are_rejected(self, tmp_path):
+        """A directory named root would overwrite the top directory's brief."""
+        root = tmp_path / "in"
+        (root / "root").mkdir(parents=True)
+        (root / "root" / "a.txt").write_text("a")
+        (root / "b.txt").write_text("b")
+
+        with pytest.raises(ValueError, match="root.pdf"):
+            run(fake_process, root, tmp_path / "out", group_by="directory", workers=1)
+
+    def test_output_dir_inside_input_dir_is_skipped(self, input_dir):
+        """A rerun does not pick up its own PDFs, manifest or summary as inputs."""
+        output_dir = input_dir / "briefs"
+
+        run(fake_process, input_dir, output_dir, workers=1)
+        summary = run(fake_process, input_dir, output_dir, workers=1)
+
+        assert summary["processed"] == 0
+        assert sorted(discover_units(input_dir, "file", exclude=output_dir)) == [
+            "acme/notes.txt", "acme/pricing.txt", "overview.txt"
+        ]
+
+
+class TestResume:
+    """Test suite for the manifest and resuming interrupted runs."""
+
+    def test_rerun_skips_done_units(self, input_dir, tmp_path):
+        """A second run processes nothing once every unit is done."""
+        output_dir = tmp_path / "out"
+
+        first = run(fake_process, input_dir, output_dir, workers=2)
+        second = run(fake_process, input_dir, output_dir, workers=2)
+
+        assert first["succeeded"] == 3
+        assert second["processed"] == 0
+        assert sorted(manifest_units(output_dir)) == ["acme/notes.txt", "acme/pricing.txt", "overview.txt"]
+        assert (output_dir / "acme" / "notes.txt.pdf").exists()
+
+    def test_changed_or_missing_outputs_are_redone(self, input_dir, tmp_path):
+        """Edited inputs and deleted outputs are processed again, the rest skipped."""
+        output_dir = tmp_path / "out"
+        run(fake_process, input_dir, output_dir, workers=1)
+
+        (input_dir / "overview.txt").write_text("overview, second draft")
+        (output_dir / "acme" / "notes.txt.pdf").unlink()
+        summary = run(fake_process, input_dir, output_dir, workers=1)
+
+        assert summary["processed"] == 2
+        assert sorted(manifest_units(output_dir)[3:]) == ["acme/notes.txt", "overview.txt"]
+
+    def test_failures_are_skipped_unless_retried(self, input_dir, tmp_path):
+        """Failed units are recorded, then only re-run with retry_failed."""
+        output_dir = tmp_path / "out"
+        (input_dir / "bad.txt").write_text("garbled")
+
+        first = run(fake_process, input_dir, output_dir, workers=1)
+        skipped = run(fake_process, input_dir, output_dir, workers=1)
+        retried = run(fake_process, input_dir, output_dir, workers=1, retry_failed=True)
+
+        assert first["failed"] == [{"unit": "bad.txt", "error": "ValueError: unreadable"}]
+        assert skipped["processed"] == 0
+        assert retried["processed"] == 1
+        assert load_manifest(output_dir / MANIFEST_NAME)["bad.txt"]["status"] == "failed"
+
+    def test_truncated_manifest_line_is_ignored(self, tmp_path):
+        """A run killed mid-write leaves a partial line; the complete records still count."""
+        manifest = tmp_path / MANIFEST_NAME
+        manifest.write_text(
+            json.dumps({"unit": "a.txt", "status": "failed"}) + "\n"
+            + json.dumps({"unit": "a.txt", "status": "done"}) + "\n"
+            + '{"unit": "b.txt", "sta'
+        )
+
+        assert load_manifest(manifest) == {"a.txt": {"unit": "a.txt", "status": "done"}}
+
+
+class TestSummary:
+    """Test suite for the end-of-run summary."""
+
+    def test_summary_file_and_report(self, input_dir, tmp_path):
+        """Stage timings and the slowest units are written and reported."""
+        output_dir = tmp_path / "out"
+        summary = run(fake_process, input_dir, output_dir, group_by="directory", workers=2)
+
+        assert json.loads((output_dir / SUMMARY_NAME).read_text()) == summary
+        assert summary["stages"]["render"]["max"] == pytest.approx(0.6)
+        assert summary["slowest"][0] == {"unit": "acme", "seconds": pytest.approx(0.9)}
+
+        report = format_summary(summary, output_dir / SUMMARY_NAME).splitlines()
+        assert report[0].startswith("Processed 2 units: 2 succeeded, 0 failed in ")
+        assert report[1:4] == [
+            "  extract: p50 0.10s  p95 0.10s  max 0.10s",
+            "    model: p50 0.20s  p95 0.20s  max 0.20s",
+            "   render: p50 0.60s  p95 0.60s  max 0.60s",
+        ]
+        assert report[-1] == f"Summary written to {output_dir / SUMMARY_NAME}"
+
+    def test_percentiles_ignore_failed_units(self):
+        """Only successful units contribute to the stage statistics."""
+        records = [
+            {"unit": f"u{i}", "status": "done", "timings": {"extract": float(i)}} for i in range(1, 21)
+        ] + [{"unit": "broken", "status": "failed", "error": "boom", "timings": {"extract": 99.0}}]
+
+        summary = summarize(records, wall_time=5.0)
+
+        assert summary["processed"] == 21
+        assert summary["succeeded"] == 20
+        assert summary["stages"]["extract"]["p50"] == 11.0
+        assert summary["stages"]["extract"]["p95"] == 20.0
+        assert summary["stages"]["extract"]["max"] == 20.0
+        assert len(summary["slowest"]) == 10
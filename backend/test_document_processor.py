@@ -3,10 +3,16 @@ import asyncio
 from unittest.mock import Mock, AsyncMock, patch
 from io import BytesIO
 import tempfile
+import threading
+import time
 from pathlib import Path
 
+import PyPDF2
 from fastapi import UploadFile
+from PyPDF2.generic import DecodedStreamObject, DictionaryObject, NameObject
 from document_processor import get_context_from_docs, DocumentProcessor, clean_text, get_text_summary
+from document_processor import DocumentSource, extract_context, get_context_from_paths, load_source
+from document_processor import LayoutBlock, LayoutLine, analyze_page_layout, find_ruled_tables, remove_repeated_margins
 
 
 class TestDocumentProcessor:
@@ -242,6 +248,25 @@ class TestGetContextFromDocs:
             assert "Extracted PDF text content" in result
             mock_extract.assert_called_once()
     
+    @pytest.mark.asyncio
+    async def test_parsing_runs_off_the_event_loop(self):
+        """Files are parsed in a worker thread, not on the event loop."""
+        mock_file = AsyncMock(spec=UploadFile)
+        mock_file.filename = "document.pdf"
+        mock_file.content_type = "application/pdf"
+        mock_file.read = AsyncMock(return_value=b"fake pdf content")
+        mock_file.seek = AsyncMock()
+        threads = []
+
+        def extract(content, on_page=None):
+            threads.append(threading.get_ident())
+            return "Extracted PDF text content"
+
+        with patch.object(DocumentProcessor, 'extract_text_from_pdf', side_effect=extract):
+            await get_context_from_docs([mock_file])
+
+        assert threads and threads[0] != threading.get_ident()
+
     @pytest.mark.asyncio
     async def test_unsupported_file_fallback(self):
         """Test fallback behavior for unsupported file types."""
@@ -369,6 +394,181 @@ class TestIntegration:
             Path(temp_path).unlink(missing_ok=True)
 
 
+class TestDocumentSources:
+    """Test suite for the transport-neutral inputs."""
+
+    @pytest.mark.asyncio
+    async def test_load_source_from_path_bytes_and_file_like(self, tmp_path):
+        """Paths, bytes and sync file-likes all normalise to DocumentSource."""
+        path = tmp_path / "notes.txt"
+        path.write_bytes(b"from disk")
+
+        from_path = await load_source(path)
+        assert from_path == DocumentSource("notes.txt", b"from disk", "text/plain")
+        assert (await load_source(b"raw")).data == b"raw"
+
+        handle = BytesIO(b"from handle")
+        assert (await load_source(handle)).data == b"from handle"
+        assert handle.tell() == 0
+
+    @pytest.mark.asyncio
+    async def test_load_source_from_async_stream(self):
+        """Async byte streams are joined into one source."""
+
+        class Stream:
+            filename = "stream.md"
+            content_type = None
+
+            async def __aiter__(self):
+                for chunk in (b"# Title", b"\nBody"):
+                    yield chunk
+
+        source = await load_source(Stream())
+        assert source.filename == "stream.md"
+        assert source.data == b"# Title\nBody"
+
+    def test_extract_context_without_upload_files(self, tmp_path):
+        """The core works on DocumentSource values and paths, no FastAPI involved."""
+        result = extract_context([DocumentSource("a.txt", b"Alpha"), None])
+        assert "=== File: a.txt ===" in result
+        assert "Successfully processed 1 out of 2 files" in result
+
+        path = tmp_path / "b.txt"
+        path.write_text("Beta")
+        missing = tmp_path / "missing.txt"
+        result = get_context_from_paths([path, missing])
+        assert "Beta" in result
+        assert "Successfully processed 1 out of 2 files" in result
+
+    def test_document_source_is_picklable(self):
+        """Sources can be handed to worker processes."""
+        import pickle
+
+        source = DocumentSource("a.txt", b"Alpha", "text/plain")
+        assert pickle.loads(pickle.dumps(source)) == source
+
+
+def layout_chars(text, x, top, size=10.0):
+    """Character dicts for one line of text, half an em per character."""
+    width = size / 2
+    return [
+        {"x0": x + i * width, "x1": x + (i + 1) * width, "top": top, "bottom": top + size, "text": char, "size": size}
+        for i, char in enumerate(text)
+    ]
+
+
+def two_column_pdf(pages):
+    """A PDF with a running header and two columns of three lines per page."""
+    writer = PyPDF2.PdfWriter()
+    font = writer._add_object(DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Courier"),
+    }))
+    for number in range(1, pages + 1):
+        ops = ["BT /F1 10 Tf 72 760 Td (Acme Quarterly Review) Tj ET"]
+        for column, x in (("left", 72), ("right", 340)):
+            for line in range(3):
+                ops.append(f"BT /F1 10 Tf {x} {600 - 14 * line} Td (page {number} {column} line {line} of the quarterly report) Tj ET")
+        writer.add_blank_page(width=612, height=792)
+        page = writer.pages[-1]
+        page[NameObject("/Resources")] = DictionaryObject(
+            {NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})}
+        )
+        content = DecodedStreamObject()
+        content.set_data("\n".join(ops).encode())
+        page[NameObject("/Contents")] = writer._add_object(content)
+    output = BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+class TestLayoutExtraction:
+    """Test suite for layout-aware PDF extraction."""
+
+    def test_columns_are_read_one_after_the_other(self):
+        """A full-width heading comes first, then each column top to bottom."""
+        chars = layout_chars("Quarterly results for all regions in review", 50, 40, 14)
+        for line in range(4):
+            chars += layout_chars(f"left column text line {line} with more words", 50, 100 + 13 * line)
+            chars += layout_chars(f"right column text line {line} with more words", 300, 100 + 13 * line)
+
+        blocks = analyze_page_layout(chars)
+
+        assert [block.text for block in blocks] == [
+            "Quarterly results for all regions in review",
+            "\n".join(f"left column text line {line} with more words" for line in range(4)),
+            "\n".join(f"right column text line {line} with more words" for line in range(4)),
+        ]
+
+    def test_aligned_rows_become_a_table(self):
+        """Rows of cells separated by wide gaps are kept as table rows."""
+        chars = []
+        for row, cells in enumerate([("Service", "Tier", "Price"), ("Backup", "Pro", "$10"), ("Cloud", "Basic", "$5")]):
+            for cell, x in zip(cells, (50, 200, 350)):
+                chars += layout_chars(cell, x, 100 + 14 * row)
+
+        blocks = analyze_page_layout(chars)
+
+        assert len(blocks) == 1
+        assert blocks[0].kind == "table"
+        assert blocks[0].text == "Service | Tier | Price\nBackup | Pro | $10\nCloud | Basic | $5"
+
+    def test_ruled_grid_is_read_cell_by_cell(self):
+        """Characters are assigned to the cells of a ruled grid; a lone box is not a table."""
+        chars = layout_chars("Name", 55, 105) + layout_chars("Hours", 155, 105)
+        chars += layout_chars("Support", 55, 125) + layout_chars("24", 155, 125)
+        rulings = [(50, y, 250, y + 0.5) for y in (100, 120, 140)]
+        rulings += [(x, 100, x + 0.5, 140) for x in (50, 150, 250)]
+
+        tables = find_ruled_tables(chars, rulings)
+
+        assert tables == [((50.25, 100.25, 250.25, 140.25), [["Name", "Hours"], ["Support", "24"]])]
+        assert [block.text for block in analyze_page_layout(chars, tables)] == ["Name | Hours\nSupport | 24"]
+        assert find_ruled_tables(chars, [(40, 90, 300, 150)]) == []
+
+    def test_vector_heavy_pages_are_handled_quickly(self):
+        """Many separate boxes (chart bars) are not tables, and huge artwork is skipped."""
+        bars = [(10 + 6 * (i % 100), 100 + 20 * (i // 100), 13 + 6 * (i % 100), 110 + 20 * (i // 100)) for i in range(1500)]
+        start = time.perf_counter()
+        assert find_ruled_tables([], bars) == []
+        assert time.perf_counter() - start < 2
+        assert find_ruled_tables([], bars * 2) == []
+
+    def test_repeated_headers_are_kept_once(self):
+        """Running headers and numbered footers are dropped after their first page."""
+        pages = []
+        for number in range(1, 4):
+            blocks = [
+                LayoutBlock("text", [LayoutLine("Acme Confidential", 20, 30)]),
+                LayoutBlock("text", [LayoutLine(f"Body of page {number}", 300, 310)]),
+                LayoutBlock("text", [LayoutLine(f"Page {number} of 3", 760, 770)]),
+            ]
+            pages.append((792.0, blocks))
+
+        assert remove_repeated_margins(pages) == 4
+        assert [line.text for block in pages[0][1] for line in block.lines] == [
+            "Acme Confidential", "Body of page 1", "Page 1 of 3"
+        ]
+        assert [line.text for block in pages[2][1] for line in block.lines] == ["Body of page 3"]
+
+    def test_extract_text_from_pdf_layout(self):
+        """Layout mode reads real PDFs column by column."""
+        text = DocumentProcessor.extract_text_from_pdf(two_column_pdf(2), layout=True)
+
+        assert text.count("Acme Quarterly Review") == 1
+        assert text.index("page 1 left line 2") < text.index("page 1 right line 0")
+        assert text.index("page 1 right line 2") < text.index("page 2 left line 0")
+
+    def test_layout_mode_from_environment(self, monkeypatch):
+        """PDF_EXTRACTION_MODE=layout switches the default extraction."""
+        pdf = two_column_pdf(1)
+        monkeypatch.setenv("PDF_EXTRACTION_MODE", "layout")
+        assert "left line 0 of the quarterly report\npage 1 left line 1" in DocumentProcessor.extract_text_from_pdf(pdf)
+        monkeypatch.setenv("PDF_EXTRACTION_MODE", "plain")
+        assert "left line 0 of the quarterly report\npage 1 left line 1" not in DocumentProcessor.extract_text_from_pdf(pdf)
+
+
 # Pytest configuration
 @pytest.fixture
 def sample_upload_file():
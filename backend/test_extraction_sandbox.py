@@ -0,0 +1,148 @@
+import asyncio
+import functools
+import os
+import threading
+import time
+
+import pytest
+from PIL import Image
+
+from extraction_sandbox import ExtractionLimitError, SandboxLimits, SandboxPool
+from profiling import SamplingProfiler
+
+
+def echo(value):
+    return value
+
+
+def worker_pid():
+    return os.getpid()
+
+
+def fail():
+    raise ValueError("bad document")
+
+
+def allocate(megabytes):
+    return len(bytearray(megabytes * 1024 * 1024))
+
+
+def burn_cpu():
+    while True:
+        pass
+
+
+def sleep(seconds):
+    time.sleep(seconds)
+    return seconds
+
+
+def crash():
+    os._exit(3)
+
+
+def max_image_pixels():
+    return Image.MAX_IMAGE_PIXELS
+
+
+def pages(count, on_page=None):
+    for i in range(count):
+        on_page(i + 1, count)
+    return count
+
+
+@pytest.fixture
+def pool():
+    pool = SandboxPool(
+        max_workers=1,
+        limits=SandboxLimits(cpu_seconds=1, memory_bytes=512 * 1024 ** 2, wall_seconds=5),
+    )
+    yield pool
+    pool.close()
+
+
+class TestSandboxPool:
+    """Test suite for limited extraction workers."""
+
+    def test_runs_function_and_reuses_worker(self, pool):
+        """Results come back and healthy workers are reused."""
+        assert pool.run_sync(echo, {"text": "hello"}) == {"text": "hello"}
+        assert pool.run_sync(worker_pid) == pool.run_sync(worker_pid) != os.getpid()
+
+    def test_exception_keeps_worker(self, pool):
+        """An ordinary parser error fails the task but not the worker."""
+        pid = pool.run_sync(worker_pid)
+        with pytest.raises(RuntimeError, match="ValueError: bad document"):
+            pool.run_sync(fail)
+        assert pool.run_sync(worker_pid) == pid
+
+    def test_memory_limit_replaces_worker(self, pool):
+        """Allocating past the address-space limit fails the task and respawns the worker."""
+        pid = pool.run_sync(worker_pid)
+        with pytest.raises(ExtractionLimitError) as exc_info:
+            pool.run_sync(allocate, 2048)
+        assert exc_info.value.reason == "memory"
+        assert pool.run_sync(worker_pid) != pid
+        assert pool.run_sync(allocate, 16) == 16 * 1024 * 1024
+
+    def test_cpu_limit_kills_worker(self, pool):
+        """A task spinning past its CPU budget is killed by the kernel."""
+        with pytest.raises(ExtractionLimitError) as exc_info:
+            pool.run_sync(burn_cpu)
+        assert exc_info.value.reason == "cpu"
+        assert pool.run_sync(echo, 1) == 1
+
+    def test_wall_clock_timeout(self):
+        """A task blocked without using CPU is killed after the timeout."""
+        pool = SandboxPool(max_workers=1, limits=SandboxLimits(wall_seconds=0.5))
+        try:
+            with pytest.raises(ExtractionLimitError) as exc_info:
+                pool.run_sync(sleep, 10)
+            assert exc_info.value.reason == "timeout"
+            assert pool.run_sync(sleep, 0) == 0
+        finally:
+            pool.close()
+
+    def test_crashed_worker_is_replaced(self, pool):
+        """A worker that dies mid-task is reported and replaced."""
+        with pytest.raises(ExtractionLimitError) as exc_info:
+            pool.run_sync(crash)
+        assert exc_info.value.reason == "crashed"
+        assert pool.run_sync(echo, "ok") == "ok"
+
+    def test_progress_is_forwarded(self, pool):
+        """Progress callbacks made in the worker reach the caller."""
+        seen = []
+        result = pool.run_sync(
+            pages, 3, on_progress=lambda done, total: seen.append((done, total)), progress_param="on_page"
+        )
+        assert result == 3
+        assert seen == [(1, 3), (2, 3), (3, 3)]
+
+    @pytest.mark.asyncio
+    async def test_async_run(self, pool):
+        """The async API waits in a thread."""
+        assert await pool.run(echo, 5) == 5
+
+    @pytest.mark.asyncio
+    async def test_queued_tasks_do_not_use_default_executor(self, pool):
+        """Tasks waiting for a busy worker queue in the pool's own threads."""
+        tasks = [asyncio.create_task(pool.run(sleep, 0.2)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        waiting = [t for t in threading.enumerate() if t.name.startswith("extraction-wait")]
+        assert len(waiting) == pool.max_workers
+        assert await asyncio.gather(*tasks) == [0.2, 0.2, 0.2]
+
+    def test_pixel_limit_is_set_in_workers_only(self, pool):
+        """The decompression-bomb limit applies inside workers, not the caller."""
+        assert pool.run_sync(max_image_pixels) == 50_000_000
+        assert Image.MAX_IMAGE_PIXELS != 50_000_000
+
+    def test_profile_is_returned(self, pool):
+        """Stacks sampled inside the worker come back to the caller."""
+        profiles = []
+        assert pool.run_sync(
+            sleep, 0.1, profiler=functools.partial(SamplingProfiler, 0.005), on_profile=profiles.append
+        ) == 0.1
+        (stacks,) = profiles
+        assert any(label.startswith("sleep (") for stack in stacks for label in stack)
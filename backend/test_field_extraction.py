@@ -0,0 +1,168 @@
+import asyncio
+import json
+from typing import List, Optional
+
+import pytest
+from pydantic import BaseModel
+
+from field_extraction import (
+    FieldGroup,
+    FieldGroupError,
+    extract_model_in_groups,
+    plan_field_groups,
+)
+from progress import ProgressTracker, current_tracker, report_progress
+
+
+class SampleModel(BaseModel):
+    title: str
+    intro: str
+    problem: Optional[List[str]] = None
+    about: str
+
+
+GROUPS = [
+    FieldGroup("overview", ("title", "intro")),
+    FieldGroup("problems", ("problem",)),
+    FieldGroup("unknown", ("not_a_field",)),
+]
+
+ANSWERS = {
+    "title": {"title": "Brief", "intro": "Intro text"},
+    "problem": {"problem": ["Slow", "Costly"]},
+    "about": {"about": "About us"},
+}
+
+
+def answer_for(prompt: str) -> str:
+    keys_line = next(line for line in prompt.splitlines() if line.startswith("Return only"))
+    first_key = keys_line.split(": ", 1)[1].split(",")[0].rstrip(".")
+    return json.dumps(ANSWERS[first_key])
+
+
+class TestPlanFieldGroups:
+    """Test suite for building the extraction plan."""
+
+    def test_plan_covers_every_field_once(self):
+        """Unknown fields are dropped and uncovered fields are collected."""
+        plan = plan_field_groups(SampleModel, GROUPS)
+
+        assert [g.name for g in plan] == ["overview", "problems", "remaining"]
+        assert plan[-1].fields == ("about",)
+
+    def test_plan_skips_unrendered_optional_fields(self):
+        """Only the requested fields are planned, but required ones are always kept."""
+        plan = plan_field_groups(SampleModel, GROUPS, fields={"title"})
+
+        assert [g.fields for g in plan] == [("title", "intro"), ("about",)]
+
+
+class TestExtractModelInGroups:
+    """Test suite for concurrent group extraction."""
+
+    @pytest.mark.asyncio
+    async def test_assembles_validated_model(self):
+        """Each group is requested once and merged into the final model."""
+        prompts = []
+
+        async def complete(prompt, schema):
+            prompts.append(prompt)
+            return answer_for(prompt)
+
+        model = await extract_model_in_groups("context", complete, SampleModel, GROUPS)
+
+        assert model == SampleModel(
+            title="Brief", intro="Intro text", problem=["Slow", "Costly"], about="About us"
+        )
+        assert len(prompts) == 3
+
+    @pytest.mark.asyncio
+    async def test_reports_progress_once_per_group(self):
+        """on_group lets the pipeline emit one fields_completed event per finished group."""
+        async def complete(prompt, schema):
+            return answer_for(prompt)
+
+        def on_group(group):
+            report_progress("fields_completed", group=group.name, fields=list(group.fields))
+
+        tracker = ProgressTracker()
+        token = current_tracker.set(tracker)
+        try:
+            await extract_model_in_groups("context", complete, SampleModel, GROUPS, on_group=on_group)
+        finally:
+            current_tracker.reset(token)
+
+        events = [e for e in tracker.events if e["event"] == "fields_completed"]
+        assert sorted(e["group"] for e in events) == ["overview", "problems", "remaining"]
+        assert sorted(f for e in events for f in e["fields"]) == ["about", "intro", "problem", "title"]
+
+    @pytest.mark.asyncio
+    async def test_retries_only_failed_group(self):
+        """A malformed answer only re-triggers the group that produced it."""
+        calls = {"overview": 0, "other": 0}
+
+        async def complete(prompt, schema):
+            if "keys: title, intro" in prompt:
+                calls["overview"] += 1
+                if calls["overview"] == 1:
+                    return "not json"
+                assert "previous answer was rejected" in prompt
+            else:
+                calls["other"] += 1
+            return answer_for(prompt)
+
+        model = await extract_model_in_groups("context", complete, SampleModel, GROUPS)
+
+        assert model.title == "Brief"
+        assert calls == {"overview": 2, "other": 2}
+
+    @pytest.mark.asyncio
+    async def test_raises_after_retries_exhausted(self):
+        """A group that never validates raises FieldGroupError."""
+
+        async def complete(prompt, schema):
+            return json.dumps({"title": 1})
+
+        with pytest.raises(FieldGroupError):
+            await extract_model_in_groups(
+                "context", complete, SampleModel, GROUPS, max_retries=1
+            )
+
+    @pytest.mark.asyncio
+    async def test_failed_group_cancels_the_others(self):
+        """Once a group has failed, slower groups stop instead of spending LLM calls."""
+        cancelled = []
+
+        async def complete(prompt, schema):
+            if "keys: title" in prompt:
+                return "not json"
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(prompt)
+                raise
+            return answer_for(prompt)
+
+        with pytest.raises(FieldGroupError):
+            await asyncio.wait_for(
+                extract_model_in_groups("context", complete, SampleModel, GROUPS, max_retries=0), timeout=2
+            )
+        assert len(cancelled) == 2
+
+    @pytest.mark.asyncio
+    async def test_retrieved_passages_replace_context(self):
+        """With a retriever, each group's prompt carries only its passages."""
+        prompts = []
+
+        async def complete(prompt, schema):
+            prompts.append(prompt)
+            return answer_for(prompt)
+
+        def retrieve(group):
+            return f"passages for {group.name}" if group.name == "problems" else None
+
+        await extract_model_in_groups("full context", complete, SampleModel, GROUPS, retrieve=retrieve)
+
+        problems = next(p for p in prompts if "keys: problem" in p)
+        assert "passages for problems" in problems and "full context" not in problems
+        assert all("full context" in p for p in prompts if p is not problems)
@@ -0,0 +1,130 @@
+import asyncio
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+from llm_client import (
+    AdaptiveConcurrencyLimiter,
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMClient,
+    LLMClientConfig,
+)
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"status {status_code}")
+        self.status_code = status_code
+
+
+def make_response(content):
+    return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=content))])
+
+
+def make_client(side_effect, **config):
+    fake = Mock()
+    fake.chat.completions.create = AsyncMock(side_effect=side_effect)
+    config.setdefault("backoff_base", 0.0)
+    return LLMClient(LLMClientConfig(**config), client=fake), fake
+
+
+class TestLLMClient:
+    """Test suite for the shared LLM client."""
+
+    @pytest.mark.asyncio
+    async def test_retries_rate_limited_call(self):
+        """A 429 is retried and halves the concurrency limit."""
+        client, fake = make_client(
+            [StatusError(429), make_response('{"ok": true}')], initial_concurrency=8
+        )
+
+        result = await client.complete("prompt")
+
+        assert result == '{"ok": true}'
+        assert fake.chat.completions.create.await_count == 2
+        assert client.limiter.limit == 4
+
+    @pytest.mark.asyncio
+    async def test_non_retryable_error_is_raised(self):
+        """Client errors other than 429 are not retried."""
+        client, fake = make_client([StatusError(400)])
+
+        with pytest.raises(StatusError):
+            await client.complete("prompt")
+
+        assert fake.chat.completions.create.await_count == 1
+
+    @pytest.mark.asyncio
+    async def test_circuit_opens_after_failures(self):
+        """Repeated server errors open the breaker and later calls fail fast."""
+        client, fake = make_client(
+            StatusError(503), max_retries=1, breaker_failure_threshold=2
+        )
+
+        with pytest.raises(StatusError):
+            await client.complete("prompt")
+        with pytest.raises(CircuitOpenError):
+            await client.complete("prompt")
+
+        assert fake.chat.completions.create.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_rate_limits_do_not_open_circuit(self):
+        """429s back off without counting as backend failures."""
+        client, fake = make_client(
+            StatusError(429), max_retries=2, breaker_failure_threshold=1
+        )
+
+        with pytest.raises(StatusError):
+            await client.complete("prompt")
+
+        assert client.breaker.state == "closed"
+        assert fake.chat.completions.create.await_count == 3
+
+    @pytest.mark.asyncio
+    async def test_cancelled_probe_releases_breaker(self):
+        """A probe cancelled while waiting lets the next call probe."""
+        client, fake = make_client([make_response("{}")], breaker_reset_timeout=0.0)
+        client.breaker.record_failure()
+        client.breaker.opened_at = 0.0
+        await client.limiter.acquire()
+        client.limiter.limit = 1  # the probe waits for the limiter
+
+        probe = asyncio.create_task(client.complete("prompt"))
+        await asyncio.sleep(0.01)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        await client.limiter.release()
+
+        assert await client.complete("prompt") == "{}"
+        assert client.breaker.state == "closed"
+
+
+class TestLimiters:
+    """Test suite for the concurrency limiter and circuit breaker."""
+
+    @pytest.mark.asyncio
+    async def test_limiter_grows_after_successes(self):
+        """The limit grows by one after a run of successful calls."""
+        limiter = AdaptiveConcurrencyLimiter(initial=2, maximum=4, increase_after=2)
+
+        for _ in range(2):
+            await limiter.acquire()
+            await limiter.release()
+
+        assert limiter.limit == 3
+
+    def test_breaker_half_open_allows_single_probe(self):
+        """After the reset timeout only one probe call is let through."""
+        breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.0)
+        breaker.record_failure()
+
+        breaker.before_call()
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        breaker.record_success()
+        assert breaker.state == "closed"
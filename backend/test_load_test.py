@@ -0,0 +1,131 @@
+import asyncio
+import math
+
+import pytest
+
+from load_test import (
+    Sample,
+    UploadMix,
+    check_targets,
+    closed_loop,
+    find_knee,
+    open_loop,
+    parse_server_timing,
+    percentile,
+    summarize,
+)
+
+
+def run(label, p95, throughput=1.0, error_rate=0.0, completed=10, **extra):
+    return {
+        "label": label,
+        "completed": completed,
+        "throughput": throughput,
+        "error_rate": error_rate,
+        "latency": {"p50": p95 / 2, "p95": p95, "p99": p95},
+        **extra,
+    }
+
+
+class TestStatistics:
+    """Test suite for the load test's measurements."""
+
+    def test_percentile_interpolates(self):
+        """Percentiles interpolate between ranks; no values give NaN."""
+        assert percentile([1, 2, 3, 4], 50) == 2.5
+        assert percentile([5], 99) == 5
+        assert math.isnan(percentile([], 95))
+
+    def test_parse_server_timing(self):
+        """Stage durations are read from the header in seconds."""
+        stages = parse_server_timing("extract;dur=120.5, model;dur=3000.0, total;dur=3500.0")
+        assert stages == {"extract": 0.1205, "model": 3.0, "total": 3.5}
+        assert parse_server_timing(None) == {}
+
+    def test_summarize_separates_errors_and_rejections(self):
+        """Admission refusals are counted apart from failures."""
+        samples = [
+            Sample(0, 1.0, 200, {"model": 0.5}),
+            Sample(0, 2.0, 200, {"model": 1.5}),
+            Sample(0, 0.1, 429),
+            Sample(0, 0.1, 500),
+        ]
+        summary = summarize(samples, duration=2.0)
+        assert summary["completed"] == 2
+        assert summary["throughput"] == 1.0
+        assert summary["error_rate"] == 0.25
+        assert summary["rejection_rate"] == 0.25
+        assert summary["latency"]["p50"] == 1.5
+        assert summary["stages"]["model"]["max"] == 1.5
+        assert summary["errors"] == {"HTTP 429": 1, "HTTP 500": 1}
+
+    def test_uploads_are_unique(self):
+        """Every request carries different content, so none is a cache hit."""
+        mix = UploadMix(seed=1)
+        first, second = mix.next_request(), mix.next_request()
+        assert 1 <= len(first) <= 3
+        assert {content for _, content, _ in first}.isdisjoint(content for _, content, _ in second)
+
+
+class TestTargets:
+    """Test suite for the knee and the PRD target checks."""
+
+    def test_knee_is_last_rate_the_server_keeps_up_with(self):
+        """Saturation is throughput falling behind or p95 latency climbing."""
+        steps = [
+            run("rate=1", 2.0, throughput=1.0, offered_rate=1),
+            run("rate=2", 2.5, throughput=1.95, offered_rate=2),
+            run("rate=4", 9.0, throughput=3.9, offered_rate=4),
+            run("rate=8", 20.0, throughput=4.0, offered_rate=8),
+        ]
+        assert find_knee(steps) == 2
+        assert find_knee([run("rate=8", 2.0, throughput=4.0, offered_rate=8)]) is None
+
+    def test_targets(self):
+        """Latency and error targets apply to every run."""
+        report = {"runs": [run("users=50", 12.0, error_rate=0.05), run("users=10", 3.0)]}
+        failures = check_targets(report)
+        assert len(failures) == 2
+        assert all(f.startswith("users=50") for f in failures)
+        assert check_targets({"runs": [run("users=50", 9.0)]}) == []
+
+    def test_regression_against_baseline(self):
+        """A drop in throughput or a rise in latency beyond the tolerance fails."""
+        baseline = {"runs": [run("users=50", 4.0, throughput=5.0)]}
+        assert check_targets({"runs": [run("users=50", 4.4, throughput=4.5)]}, baseline=baseline) == []
+        failures = check_targets({"runs": [run("users=50", 6.0, throughput=3.0)]}, baseline=baseline)
+        assert len(failures) == 2
+
+
+class TestArrivals:
+    """Test suite for the closed- and open-loop drivers."""
+
+    @pytest.mark.asyncio
+    async def test_closed_loop_keeps_users_busy(self):
+        """Each user sends requests back to back until the duration is over."""
+        in_flight = 0
+        peak = 0
+
+        async def send(user, started_at):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return Sample(started_at, 0.01, 200)
+
+        samples = await closed_loop(send, users=5, duration=0.1, think_time=0)
+        assert peak == 5
+        assert len(samples) >= 5 * 5
+
+    @pytest.mark.asyncio
+    async def test_open_loop_does_not_wait_for_responses(self):
+        """Arrivals keep coming while earlier requests are still running."""
+
+        async def send(user, started_at):
+            await asyncio.sleep(0.2)
+            return Sample(started_at, 0.2, 200)
+
+        samples = await open_loop(send, rate=200, duration=0.1, seed=3)
+        assert len(samples) > 5
+        assert max(s.start for s in samples) < 0.15
@@ -0,0 +1,127 @@
+import asyncio
+import tracemalloc
+from types import SimpleNamespace
+
+import pytest
+
+from memory_budget import MB, MemoryBudget, MemoryMeter, MemoryWeights, current_rss, estimate_memory
+
+
+class TestEstimateMemory:
+    """Test suite for peak-memory estimates."""
+
+    def test_grows_with_input(self):
+        """Upload bytes, pages and images all add to the estimate."""
+        weights = MemoryWeights(base=10 * MB, per_upload_byte=4, per_page=MB, per_image=8 * MB)
+        cost = SimpleNamespace(bytes=MB, pages=10, images=2)
+        assert estimate_memory(cost, weights) == (10 + 4 + 10 + 16) * MB
+        assert estimate_memory(None, weights) == 10 * MB
+
+
+class TestMemoryBudget:
+    """Test suite for memory-aware admission."""
+
+    @pytest.mark.asyncio
+    async def test_waits_for_budget(self):
+        """A reservation that does not fit waits until memory is released."""
+        budget = MemoryBudget(100 * MB, high_watermark=float("inf"))
+        await budget.acquire(60 * MB)
+        waiting = asyncio.ensure_future(budget.acquire(60 * MB))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        assert budget.stats()["waiting"] == 1
+
+        budget.release(60 * MB)
+        await waiting
+        assert budget.stats()["reserved_bytes"] == 60 * MB
+
+    @pytest.mark.asyncio
+    async def test_admits_in_arrival_order(self):
+        """A small request does not overtake a large one that is already waiting."""
+        budget = MemoryBudget(100 * MB, high_watermark=float("inf"))
+        order = []
+
+        async def job(name, nbytes):
+            async with budget.reserve(nbytes):
+                order.append(name)
+                await asyncio.sleep(0)
+
+        await budget.acquire(50 * MB)
+        tasks = [asyncio.ensure_future(job("large", 80 * MB))]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.ensure_future(job("small", 10 * MB)))
+        await asyncio.sleep(0)
+        assert order == []
+        budget.release(50 * MB)
+        await asyncio.gather(*tasks)
+        assert order == ["large", "small"]
+
+    @pytest.mark.asyncio
+    async def test_oversized_request_runs_alone(self):
+        """A request larger than the budget is admitted once nothing else runs."""
+        budget = MemoryBudget(100 * MB)
+        async with budget.reserve(500 * MB):
+            assert budget.stats()["running"] == 1
+        assert budget.stats()["reserved_bytes"] == 0
+
+    @pytest.mark.skipif(not current_rss(), reason="RSS is not available on this platform")
+    @pytest.mark.asyncio
+    async def test_rss_watermark_holds_back_work(self):
+        """Requests wait while the process RSS is above the high watermark."""
+        # Reservations always fit this budget; only the watermark blocks
+        budget = MemoryBudget(10 ** 15, high_watermark=current_rss() / 2 / 10 ** 15)
+        await budget.acquire(MB)
+        waiting = asyncio.ensure_future(budget.acquire(MB))
+        await asyncio.sleep(0)
+        assert not waiting.done()
+        budget.release(MB)  # nothing running any more: admitted regardless
+        await waiting
+
+    @pytest.mark.asyncio
+    async def test_cancelled_waiter_unblocks_queue(self):
+        """Cancelling the head of the queue lets the next waiter in."""
+        budget = MemoryBudget(100 * MB, high_watermark=float("inf"))
+        await budget.acquire(50 * MB)
+        large = asyncio.ensure_future(budget.acquire(80 * MB))
+        await asyncio.sleep(0)
+        small = asyncio.ensure_future(budget.acquire(10 * MB))
+        await asyncio.sleep(0)
+        large.cancel()
+        await asyncio.sleep(0)
+        await small
+        assert budget.stats()["reserved_bytes"] == 60 * MB
+
+
+class TestMemoryMeter:
+    """Test suite for per-request memory accounting."""
+
+    def test_records_stage_checkpoints(self):
+        """Each checkpoint records the growth since the start."""
+        meter = MemoryMeter(trace=False)
+        buffer = bytearray(64 * MB)
+        meter.checkpoint("extract")
+        del buffer
+        summary = meter.summary()
+        assert summary["stages"]["extract"] >= 32 * MB
+        assert summary["process_peak_rss_delta"] >= summary["stages"]["extract"]
+        assert summary["concurrent"] == 1
+
+    def test_overlapping_requests_are_flagged(self):
+        """A meter reports how many requests shared the process while it ran."""
+        first = MemoryMeter(trace=False)
+        second = MemoryMeter(trace=False)
+        assert second.summary()["concurrent"] == 2
+
+        first.checkpoint("extract")
+        assert first.summary()["concurrent"] == 2
+        assert MemoryMeter(trace=False).summary()["concurrent"] == 1
+
+    def test_tracemalloc_peak(self):
+        """In trace mode the traced heap peak is reported."""
+        meter = MemoryMeter(trace=True)
+        try:
+            buffer = bytearray(8 * MB)
+            del buffer
+            assert meter.summary()["traced_peak"] >= 8 * MB
+        finally:
+            tracemalloc.stop()
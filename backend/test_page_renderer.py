@@ -0,0 +1,110 @@
+import io
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from page_renderer import render_incrementally, split_pages
+
+DOCUMENT = (
+    "<html><head><style>.page{}</style></head><body>\n"
+    "<!-- Cover -->\n<div class=\"cover\"><div>{cover}</div></div>\n"
+    "<div class=\"page\"><div class=\"header\">2</div><p>{overview}</p></div>\n"
+    "<div class=\"page\"><p>{use_cases}</p></div>\n"
+    "</body></html>"
+)
+
+
+def make_document(**values):
+    fields = {"cover": "Cover", "overview": "Overview", "use_cases": "Use cases"}
+    fields.update(values)
+    html = DOCUMENT
+    for name, value in fields.items():
+        html = html.replace("{" + name + "}", value)
+    return html
+
+
+class FakeRenderer:
+    name = "fake"
+
+    def __init__(self):
+        self.rendered = []
+
+    def render(self, html, base_url=None):
+        self.rendered.append(html)
+        writer = PdfWriter()
+        writer.add_blank_page(width=612, height=792)
+        output = io.BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+
+class DictCache(dict):
+    def put(self, key, data):
+        self[key] = data
+
+
+class TestSplitPages:
+    """Test suite for splitting a document into page sections."""
+
+    def test_top_level_divs_become_fragments(self):
+        """Nested divs stay inside their page and comments are dropped."""
+        prefix, fragments, suffix = split_pages(make_document())
+
+        assert prefix.endswith("<body>")
+        assert suffix == "</body></html>"
+        assert len(fragments) == 3
+        assert fragments[0] == '<div class="cover"><div>Cover</div></div>'
+
+    def test_stray_content_falls_back_to_single_fragment(self):
+        """Body text outside any div keeps the document whole."""
+        _, fragments, _ = split_pages("<html><body>loose text<div>a</div></body></html>")
+
+        assert fragments == ["loose text<div>a</div>"]
+
+
+class TestRenderIncrementally:
+    """Test suite for fragment caching and merging."""
+
+    def test_only_changed_pages_are_rerendered(self):
+        """Editing one section re-renders just that section."""
+        renderer, cache = FakeRenderer(), DictCache()
+
+        first = render_incrementally(make_document(), renderer, cache)
+        assert len(renderer.rendered) == 3
+        assert len(PdfReader(io.BytesIO(first)).pages) == 3
+
+        renderer.rendered.clear()
+        render_incrementally(make_document(use_cases="Edited"), renderer, cache)
+
+        assert len(renderer.rendered) == 1
+        assert "Edited" in renderer.rendered[0]
+
+    def test_title_change_reuses_every_fragment(self):
+        """The title is not part of a fragment's key; stylesheets and assets are."""
+        renderer, cache = FakeRenderer(), DictCache()
+        titled = make_document().replace("<head>", "<head><title>Acme brief</title>")
+        render_incrementally(titled, renderer, cache, asset_version="v1")
+
+        renderer.rendered.clear()
+        render_incrementally(
+            titled.replace("Acme brief", "Globex brief"), renderer, cache, asset_version="v1"
+        )
+        assert renderer.rendered == []
+
+        render_incrementally(titled.replace(".page{}", ".page{color:red}"), renderer, cache, asset_version="v1")
+        assert len(renderer.rendered) == 3
+
+        renderer.rendered.clear()
+        render_incrementally(titled, renderer, cache, asset_version="v2")
+        assert len(renderer.rendered) == 3
+
+    def test_reports_fragment_progress(self):
+        """Progress counts reused fragments first, then each rendered one."""
+        renderer, cache = FakeRenderer(), DictCache()
+        render_incrementally(make_document(), renderer, cache)
+
+        progress = []
+        render_incrementally(
+            make_document(use_cases="Edited"), renderer, cache,
+            on_fragment=lambda done, total: progress.append((done, total)),
+        )
+        assert progress == [(2, 3), (3, 3)]
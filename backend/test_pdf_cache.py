@@ -0,0 +1,137 @@
+import importlib
+import os
+import sys
+import time
+
+import pytest
+from pydantic import BaseModel
+
+from pdf_cache import PDFCache, code_version, model_fingerprint, template_version
+
+
+class Brief(BaseModel):
+    title: str
+    tags: list
+
+
+class Options(BaseModel):
+    include_page_numbers: bool = True
+
+
+class TestFingerprint:
+    """Test suite for cache keys."""
+
+    def test_key_depends_on_model_template_and_options(self):
+        """Any change to the inputs of a render changes the key."""
+        model = Brief(title="A", tags=["x"])
+        base = model_fingerprint(model, "v1", Options())
+
+        assert base == model_fingerprint(Brief(title="A", tags=["x"]), "v1", Options())
+        assert base != model_fingerprint(Brief(title="B", tags=["x"]), "v1", Options())
+        assert base != model_fingerprint(model, "v2", Options())
+        assert base != model_fingerprint(model, "v1", Options(include_page_numbers=False))
+
+    def test_template_version_tracks_content(self, tmp_path):
+        """Editing a template changes the version."""
+        template = tmp_path / "template.html"
+        template.write_text("<p>{{ title }}</p>")
+        first = template_version(tmp_path)
+
+        template.write_text("<h1>{{ title }}</h1>")
+        os.utime(template, ns=(time.time_ns(), time.time_ns() + 1_000_000))
+
+        assert template_version(tmp_path) != first
+
+    def test_template_version_ignores_non_template_files(self, tmp_path):
+        """Only templates and assets count; code and bytecode next to them do not."""
+        (tmp_path / "template.html").write_text("<p>{{ title }}</p>")
+        (tmp_path / "fonts").mkdir()
+        (tmp_path / "fonts" / "Inter.woff2").write_bytes(b"font")
+        first = template_version(tmp_path)
+
+        (tmp_path / "model.py").write_text("class ProjectModel: ...")
+        (tmp_path / "__pycache__").mkdir()
+        (tmp_path / "__pycache__" / "model.cpython-310.pyc").write_bytes(b"\x00")
+        assert template_version(tmp_path) == first
+
+        (tmp_path / "fonts" / "Inter.woff2").write_bytes(b"new font")
+        assert template_version(tmp_path) != first
+
+
+    def test_code_version_tracks_source(self, tmp_path, monkeypatch):
+        """Editing the code that renders a PDF changes the version, whatever object names it."""
+        (tmp_path / "mapping.py").write_text("def build(model):\n    return model\n")
+        monkeypatch.syspath_prepend(str(tmp_path))
+        module = importlib.import_module("mapping")
+        try:
+            first = code_version(module)
+            assert code_version(module.build) == first
+
+            (tmp_path / "mapping.py").write_text("def build(model):\n    return dict(model)\n")
+            assert code_version(module) != first
+        finally:
+            sys.modules.pop("mapping", None)
+
+
+class TestPDFCache:
+    """Test suite for the disk-backed PDF cache."""
+
+    def test_round_trip(self, tmp_path):
+        """Stored bytes are returned on a hit."""
+        cache = PDFCache(tmp_path)
+        cache.put("ab12", b"%PDF-1.4 data")
+
+        assert cache.get("ab12") == b"%PDF-1.4 data"
+        assert cache.get("cd34") is None
+
+    def test_expired_entries_are_dropped(self, tmp_path):
+        """Entries older than the TTL are misses."""
+        cache = PDFCache(tmp_path, ttl=60)
+        cache.put("ab12", b"old")
+        stale = time.time() - 120
+        os.utime(tmp_path / "ab12.pdf", (stale, stale))
+
+        assert cache.get("ab12") is None
+
+    def test_least_recently_used_evicted_over_budget(self, tmp_path):
+        """Exceeding max_bytes evicts the least recently accessed entry."""
+        cache = PDFCache(tmp_path, max_bytes=10)
+        cache.put("aa", b"12345")
+        cache.put("bb", b"12345")
+        os.utime(tmp_path / "aa.pdf", (time.time() - 100, time.time()))
+        cache.put("cc", b"12345")
+
+        assert cache.get("aa") is None
+        assert cache.get("bb") == b"12345"
+        assert cache.get("cc") == b"12345"
+
+    def test_puts_under_budget_do_not_scan(self, tmp_path, monkeypatch):
+        """The directory is only swept when over budget or when the sweep is due."""
+        cache = PDFCache(tmp_path, max_bytes=20, sweep_interval=3600)
+        cache.put("aa", b"12345")
+        sweeps = []
+        monkeypatch.setattr(cache, "evict", lambda: sweeps.append(1))
+
+        cache.put("bb", b"12345")
+        cache.put("bb", b"1234567890")  # replacing counts the difference only
+        assert sweeps == []
+
+        cache.put("cc", b"123456")
+        assert sweeps == [1]
+
+    def test_template_change_clears_cache(self, tmp_path):
+        """A new template version drops every cached render."""
+        cache = PDFCache(tmp_path)
+        cache.ensure_template_version("v1")
+        cache.put("ab12", b"data")
+
+        cache.ensure_template_version("v2")
+
+        assert cache.get("ab12") is None
+
+    def test_rejects_non_hex_keys(self, tmp_path):
+        """Keys come from URLs, so anything but a hex digest is refused."""
+        cache = PDFCache(tmp_path)
+
+        with pytest.raises(ValueError):
+            cache.get("../secret")
@@ -0,0 +1,187 @@
+import functools
+import io
+
+import pytest
+from PIL import Image
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import (
+    ArrayObject,
+    DecodedStreamObject,
+    DictionaryObject,
+    EncodedStreamObject,
+    FloatObject,
+    NameObject,
+    NumberObject,
+)
+
+from pdf_optimize import PdfOptimizer
+
+
+@functools.lru_cache()
+def jpeg_bytes(size):
+    buffer = io.BytesIO()
+    Image.effect_noise(size, 40).convert("RGB").save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def jpeg_image(size):
+    image = EncodedStreamObject()
+    image.update(
+        {
+            NameObject("/Type"): NameObject("/XObject"),
+            NameObject("/Subtype"): NameObject("/Image"),
+            NameObject("/Width"): NumberObject(size[0]),
+            NameObject("/Height"): NumberObject(size[1]),
+            NameObject("/ColorSpace"): NameObject("/DeviceRGB"),
+            NameObject("/BitsPerComponent"): NumberObject(8),
+            NameObject("/Filter"): NameObject("/DCTDecode"),
+        }
+    )
+    image._data = jpeg_bytes(size)
+    return image
+
+
+def content(writer, data):
+    stream = DecodedStreamObject()
+    stream.set_data(data)
+    return writer._add_object(stream)
+
+
+def add_page(writer, xobjects, data):
+    writer.add_blank_page(width=612, height=792)
+    page = writer.pages[-1]
+    resources = DictionaryObject({NameObject(name): ref for name, ref in xobjects.items()})
+    page[NameObject("/Resources")] = DictionaryObject({NameObject("/XObject"): resources})
+    page[NameObject("/Contents")] = content(writer, data)
+    return page
+
+
+def to_bytes(writer):
+    output = io.BytesIO()
+    writer.write(output)
+    return output.getvalue()
+
+
+def page_image(pdf, page_number=0, name="/Im0"):
+    page = PdfReader(io.BytesIO(pdf)).pages[page_number]
+    return page["/Resources"]["/XObject"].raw_get(name)
+
+
+def optimizer(**settings):
+    settings.setdefault("linearize", False)
+    return PdfOptimizer(**settings)
+
+
+class TestPdfOptimizer:
+    """Tests for the rendered PDF post-processing"""
+
+    def test_downsamples_image_drawn_small(self):
+        """An image drawn at 100pt is resampled to what 150 dpi needs"""
+        writer = PdfWriter()
+        image = writer._add_object(jpeg_image((1200, 900)))
+        add_page(writer, {"/Im0": image}, b"q 100 0 0 75 50 600 cm /Im0 Do Q")
+        pdf = to_bytes(writer)
+
+        output, report = optimizer(image_dpi=150).optimize(pdf)
+
+        assert report.images_downsampled == 1
+        assert report.bytes_out == len(output) < len(pdf)
+        resampled = page_image(output).get_object()
+        assert (resampled["/Width"], resampled["/Height"]) == (208, 156)
+        assert resampled["/Filter"] == "/DCTDecode"
+        assert Image.open(io.BytesIO(resampled._data)).size == (208, 156)
+
+    def test_keeps_image_at_target_resolution(self):
+        """Images already close to the target resolution are left alone"""
+        writer = PdfWriter()
+        image = writer._add_object(jpeg_image((200, 200)))
+        add_page(writer, {"/Im0": image}, b"q 100 0 0 100 50 600 cm /Im0 Do Q")
+
+        output, report = optimizer(image_dpi=150).optimize(to_bytes(writer))
+
+        assert report.images_downsampled == 0
+        assert page_image(output).get_object()["/Width"] == 200
+
+    def test_uses_largest_placement_and_form_matrices(self):
+        """The drawn size follows form XObject matrices, and the largest use wins"""
+        writer = PdfWriter()
+        image = writer._add_object(jpeg_image((1000, 1000)))
+        form = DecodedStreamObject()
+        form.set_data(b"q 50 0 0 50 0 0 cm /Im0 Do Q")
+        form.update(
+            {
+                NameObject("/Type"): NameObject("/XObject"),
+                NameObject("/Subtype"): NameObject("/Form"),
+                NameObject("/BBox"): ArrayObject([NumberObject(0), NumberObject(0), NumberObject(50), NumberObject(50)]),
+                NameObject("/Matrix"): ArrayObject(
+                    [FloatObject(4), FloatObject(0), FloatObject(0), FloatObject(4), FloatObject(0), FloatObject(0)]
+                ),
+                NameObject("/Resources"): DictionaryObject(
+                    {NameObject("/XObject"): DictionaryObject({NameObject("/Im0"): image})}
+                ),
+            }
+        )
+        form_ref = writer._add_object(form)
+        add_page(writer, {"/Im0": image, "/Fm0": form_ref}, b"q 20 0 0 20 0 0 cm /Im0 Do Q /Fm0 Do")
+
+        output, report = optimizer(image_dpi=72).optimize(to_bytes(writer))
+
+        # Drawn at 200pt through the form, i.e. 200 pixels at 72 dpi
+        assert report.images_downsampled == 1
+        assert page_image(output).get_object()["/Width"] == 200
+
+    def test_deduplicates_repeated_objects(self):
+        """Identical copies of an image (e.g. merged page sections) are stored once"""
+        writer = PdfWriter()
+        for _ in range(3):
+            image = writer._add_object(jpeg_image((150, 50)))
+            add_page(writer, {"/Im0": image}, b"q 100 0 0 33 50 700 cm /Im0 Do Q")
+        pdf = to_bytes(writer)
+
+        output, report = optimizer().optimize(pdf)
+
+        assert report.objects_deduplicated >= 2
+        assert len(output) < len(pdf)
+        refs = {page_image(output, number).idnum for number in range(3)}
+        assert len(refs) == 1
+        assert len(PdfReader(io.BytesIO(output)).pages) == 3
+
+    def test_compresses_uncompressed_streams(self):
+        """Content streams without a filter are Flate-compressed"""
+        writer = PdfWriter()
+        text = b"BT /F1 12 Tf 72 700 Td (repeated text) Tj ET\n" * 50
+        writer.add_blank_page(width=612, height=792)
+        writer.pages[0][NameObject("/Contents")] = content(writer, text)
+        pdf = to_bytes(writer)
+
+        output, report = optimizer().optimize(pdf)
+
+        assert report.streams_compressed >= 1
+        assert len(output) < len(pdf)
+        page = PdfReader(io.BytesIO(output)).pages[0]
+        assert page["/Contents"].get_object()["/Filter"] == "/FlateDecode"
+        assert page["/Contents"].get_object().get_data() == text
+
+    def test_disabled_or_unreadable_input_is_returned_unchanged(self):
+        """Optimisation never fails a render"""
+        output, report = PdfOptimizer(enabled=False).optimize(b"%PDF-1.4 not really")
+        assert output == b"%PDF-1.4 not really"
+        assert report.skipped == "disabled"
+
+        output, report = optimizer().optimize(b"not a pdf")
+        assert output == b"not a pdf"
+        assert report.skipped.startswith("error")
+
+    def test_signature_changes_with_settings(self):
+        """Cached renders are keyed by the optimiser settings"""
+        assert optimizer(image_dpi=150).signature() != optimizer(image_dpi=300).signature()
+        assert PdfOptimizer(enabled=False).signature() == "off"
+
+
+@pytest.mark.parametrize("value, enabled", [("0", False), ("1", True)])
+def test_from_env(monkeypatch, value, enabled):
+    monkeypatch.setenv("PDF_OPTIMIZE", value)
+    monkeypatch.setenv("PDF_IMAGE_DPI", "200")
+    settings = PdfOptimizer.from_env()
+    assert settings.enabled is enabled
+    assert settings.image_dpi == 200
@@ -0,0 +1,132 @@
+import asyncio
+import weakref
+
+import pytest
+
+from pipeline import Stage, critical_path, run_pipeline
+
+
+class Blob:
+    pass
+
+
+def sleeper(seconds, value=None, log=None, name=None):
+    async def fn(**inputs):
+        if log is not None:
+            log.append((name, "start"))
+        await asyncio.sleep(seconds)
+        return value if value is not None else inputs
+
+    return fn
+
+
+class TestRunPipeline:
+    """Test suite for the DAG executor."""
+
+    @pytest.mark.asyncio
+    async def test_passes_dependency_results(self):
+        """Stages receive their dependencies' results as keyword arguments."""
+
+        async def double(a):
+            return a * 2
+
+        async def add(a, b):
+            return a + b
+
+        run = await run_pipeline([
+            Stage("a", sleeper(0, 3)),
+            Stage("b", double, deps=["a"]),
+            Stage("c", add, deps=["a", "b"]),
+        ])
+        assert run.results == {"a": 3, "b": 6, "c": 9}
+
+    @pytest.mark.asyncio
+    async def test_independent_stages_overlap(self):
+        """Independent stages start without waiting for each other."""
+        log = []
+        run = await run_pipeline([
+            Stage("slow", sleeper(0.1, 1, log, "slow")),
+            Stage("prepare", sleeper(0.05, 2, log, "prepare")),
+            Stage("after", sleeper(0, 3, log, "after"), deps=["slow", "prepare"]),
+        ])
+        assert [entry[0] for entry in log[:2]] == ["slow", "prepare"]
+        assert run.wall_time < 0.14
+
+    @pytest.mark.asyncio
+    async def test_critical_path_follows_slowest_dependency(self):
+        """The critical path and breakdown name the stages that set the latency."""
+        run = await run_pipeline([
+            Stage("extract_0", sleeper(0.01, 1), group="extract"),
+            Stage("extract_1", sleeper(0.08, 1), group="extract"),
+            Stage("prepare", sleeper(0.02, 1)),
+            Stage("model", sleeper(0.01, 1), deps=["extract_0", "extract_1"]),
+            Stage("render", sleeper(0.01, 1), deps=["model", "prepare"]),
+        ])
+        assert run.critical_path == ["extract_1", "model", "render"]
+        breakdown = run.breakdown()
+        assert list(breakdown) == ["extract", "model", "render"]
+        assert breakdown["extract"] >= 0.08
+        assert "extract;dur=" in run.server_timing()
+
+    @pytest.mark.asyncio
+    async def test_failure_cancels_and_propagates(self):
+        """A failing stage raises and its dependants never run."""
+        ran = []
+
+        async def boom():
+            raise RuntimeError("extraction failed")
+
+        async def never(boom):
+            ran.append("never")
+
+        with pytest.raises(RuntimeError, match="extraction failed"):
+            await run_pipeline([Stage("boom", boom), Stage("never", never, deps=["boom"])])
+        assert ran == []
+
+    @pytest.mark.asyncio
+    async def test_releases_consumed_results(self):
+        """With ``keep``, a result is dropped as soon as its last consumer has finished."""
+        refs = []
+        done = []
+
+        async def upload():
+            blob = Blob()
+            refs.append(weakref.ref(blob))
+            return blob
+
+        async def text(upload):
+            return "text"
+
+        async def check(text):
+            return refs[0]() is None
+
+        run = await run_pipeline(
+            [
+                Stage("upload", upload),
+                Stage("text", text, deps=["upload"]),
+                Stage("check", check, deps=["text"]),
+            ],
+            keep=("check",),
+            on_stage_done=done.append,
+        )
+        assert run.results == {"check": True}
+        assert done == ["upload", "text", "check"]
+
+    @pytest.mark.asyncio
+    async def test_rejects_invalid_graphs(self):
+        """Unknown dependencies, duplicates and cycles are rejected up front."""
+        fn = sleeper(0, 1)
+        with pytest.raises(ValueError, match="unknown"):
+            await run_pipeline([Stage("a", fn, deps=["missing"])])
+        with pytest.raises(ValueError, match="Duplicate"):
+            await run_pipeline([Stage("a", fn), Stage("a", fn)])
+        with pytest.raises(ValueError, match="cycle"):
+            await run_pipeline([Stage("a", fn, deps=["b"]), Stage("b", fn, deps=["a"])])
+
+
+class TestCriticalPath:
+    """Test suite for critical path derivation."""
+
+    def test_empty(self):
+        """No stages, no path."""
+        assert critical_path({}) == []
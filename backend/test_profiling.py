@@ -0,0 +1,102 @@
+import json
+import threading
+import time
+from types import SimpleNamespace
+
+from pipeline import StageTiming
+from profiling import (
+    ContinuousProfiler,
+    ProfileSession,
+    ProfileWriter,
+    RequestLog,
+    SamplingProfiler,
+    collapsed,
+    current_profile,
+    speedscope,
+)
+
+
+def busy_loop(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+class TestSamplingProfiler:
+    """Test suite for stack sampling and profile formats."""
+
+    def test_samples_other_threads(self):
+        """A busy thread shows up with its thread name and function."""
+        stop = threading.Event()
+        worker = threading.Thread(target=busy_loop, args=(stop,), name="busy")
+        worker.start()
+        profiler = SamplingProfiler(interval=0.001).start()
+        time.sleep(0.1)
+        stacks = profiler.stop()
+        stop.set()
+        worker.join()
+
+        busy = [stack for stack in stacks if stack[0] == "thread:busy"]
+        assert busy and any(label.startswith("busy_loop (") for stack in busy for label in stack)
+        assert not any(stack[0] == "thread:sampling-profiler" for stack in stacks)
+
+    def test_merge_prefixes_worker_stacks(self):
+        """Stacks from another process are added under a prefix frame."""
+        profiler = SamplingProfiler()
+        profiler.merge({("main", "parse"): 3}, prefix="process:worker")
+        assert profiler.snapshot() == {("process:worker", "main", "parse"): 3}
+
+    def test_output_formats(self):
+        """Collapsed text and speedscope JSON describe the same samples."""
+        stacks = {("a", "b"): 2, ("a", "c"): 1}
+        assert collapsed(stacks) == "a;b 2\na;c 1\n"
+
+        profile = speedscope(stacks, "test", interval=0.01)
+        names = [frame["name"] for frame in profile["shared"]["frames"]]
+        sampled = profile["profiles"][0]
+        assert [[names[i] for i in sample] for sample in sampled["samples"]] == [["a", "b"], ["a", "c"]]
+        assert sampled["weights"] == [0.02, 0.01]
+
+    def test_writer_keeps_newest(self, tmp_path):
+        """Old profiles beyond ``keep`` are removed with both their files."""
+        writer = ProfileWriter(tmp_path, keep=2)
+        for i in range(3):
+            files = writer.write(f"p{i}", {("a",): 1}, 0.01)
+            time.sleep(0.01)
+        assert sorted(p.name for p in tmp_path.iterdir()) == [
+            "p1.collapsed", "p1.speedscope.json", "p2.collapsed", "p2.speedscope.json",
+        ]
+        assert json.loads(open(files["speedscope"]).read())["name"] == "p2"
+
+    def test_continuous_profiler_writes_windows(self, tmp_path):
+        """Each window is written as its own profile, and the rest on stop."""
+        profiler = ContinuousProfiler(ProfileWriter(tmp_path), interval=0.005, window=0.05).start()
+        time.sleep(0.2)
+        profiler.stop()
+        assert len(list(tmp_path.glob("continuous-*.collapsed"))) >= 1
+
+
+class TestRequestLog:
+    """Test suite for the slow-request log."""
+
+    def test_slowest_with_stage_breakdown(self):
+        """Requests are listed slowest first with their pipeline timings."""
+        log = RequestLog(capacity=10)
+        timings = {
+            "extract": StageTiming("extract", 0.0, 2.0),
+            "render": StageTiming("render", 2.0, 3.0, deps=["extract"]),
+        }
+        run = SimpleNamespace(timings=timings, breakdown=lambda: {"extract": 2.0, "render": 1.0})
+        log.record("/generate-document", 3.0, run, files=2)
+        log.record("/generate-document", 0.5)
+
+        token = current_profile.set(ProfileSession("p1", SamplingProfiler()))
+        try:
+            log.record("/generations", 1.0)
+        finally:
+            current_profile.reset(token)
+
+        slowest = log.slowest(2)
+        assert [entry["duration"] for entry in slowest] == [3.0, 1.0]
+        assert slowest[0]["stages"] == {"extract": 2.0, "render": 1.0}
+        assert slowest[0]["files"] == 2
+        assert slowest[1]["profile"] == "p1"
@@ -0,0 +1,161 @@
+import asyncio
+import threading
+
+import pytest
+
+from progress import (
+    COMPLETED,
+    ProgressStore,
+    ProgressTracker,
+    SQLiteProgressStore,
+    current_tracker,
+    format_sse,
+    report_progress,
+)
+
+
+async def collect(tracker, **kwargs):
+    return [event async for event in tracker.subscribe(**kwargs)]
+
+
+class TestProgressTracker:
+    """Test suite for generation progress tracking."""
+
+    @pytest.mark.asyncio
+    async def test_subscriber_receives_events_until_completed(self):
+        """Events emitted from worker threads reach a waiting subscriber."""
+        tracker = ProgressTracker()
+        subscriber = asyncio.ensure_future(collect(tracker))
+        await asyncio.sleep(0)
+
+        await asyncio.to_thread(tracker.emit, "files_extracted", done=1, total=2)
+        await asyncio.to_thread(tracker.emit, "files_extracted", done=2, total=2)
+        tracker.emit(COMPLETED, pdf_url="/documents/abc")
+
+        events = await asyncio.wait_for(subscriber, timeout=1)
+        assert [e["event"] for e in events] == ["files_extracted", "files_extracted", COMPLETED]
+        assert [e["id"] for e in events] == [0, 1, 2]
+        assert tracker.finished
+
+    @pytest.mark.asyncio
+    async def test_resume_after_last_event_id(self):
+        """A reconnecting client only gets the events it missed."""
+        tracker = ProgressTracker()
+        for i in range(3):
+            tracker.emit("pages_rendered", done=i + 1, total=3)
+        tracker.emit(COMPLETED)
+
+        events = await collect(tracker, last_event_id=1)
+        assert [e["id"] for e in events] == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_events_after_completion_are_ignored(self):
+        """Nothing follows the terminal event."""
+        tracker = ProgressTracker()
+        tracker.emit(COMPLETED)
+        tracker.emit("pages_rendered")
+        assert len(tracker.events) == 1
+
+    @pytest.mark.asyncio
+    async def test_heartbeat_while_idle(self):
+        """An idle stream yields None so the endpoint can send a keep-alive."""
+        tracker = ProgressTracker()
+        stream = tracker.subscribe(heartbeat=0.01)
+        assert await asyncio.wait_for(stream.__anext__(), timeout=1) is None
+        await stream.aclose()
+
+
+class TestReportProgress:
+    """Test suite for the context-variable reporting helper."""
+
+    def test_no_tracker_is_a_no_op(self):
+        """Code outside a tracked generation can report freely."""
+        report_progress("pages_rendered", done=1, total=1)
+
+    @pytest.mark.asyncio
+    async def test_reports_to_current_tracker_from_threads(self):
+        """The tracker follows the generation into asyncio.to_thread workers."""
+        tracker = ProgressTracker()
+        token = current_tracker.set(tracker)
+        try:
+            await asyncio.to_thread(report_progress, "model_started")
+        finally:
+            current_tracker.reset(token)
+        assert tracker.events[0]["event"] == "model_started"
+
+
+class TestFormatting:
+    """Test suite for SSE encoding and the tracker store."""
+
+    def test_format_sse(self):
+        """Events carry their id and type; heartbeats are comments."""
+        text = format_sse({"id": 3, "event": "completed", "pdf_url": "/documents/abc"})
+        assert text == 'id: 3\nevent: completed\ndata: {"pdf_url": "/documents/abc"}\n\n'
+        assert format_sse(None) == ": heartbeat\n\n"
+
+    def test_store_expires_old_trackers(self):
+        """Trackers older than the TTL are dropped."""
+        store = ProgressStore(ttl=60)
+        old = store.create()
+        old.created -= 120
+        new = store.create()
+        assert store.get(old.generation_id) is None
+        assert store.get(new.generation_id) is new
+
+
+class TestSQLiteProgressStore:
+    """Test suite for progress shared between worker processes."""
+
+    @pytest.mark.asyncio
+    async def test_events_reach_subscribers_of_another_store(self, tmp_path):
+        """A client connected to one worker follows a generation running in another."""
+        running = SQLiteProgressStore(tmp_path / "shared.db")
+        serving = SQLiteProgressStore(tmp_path / "shared.db")
+        tracker = running.create()
+        # Emits from the event loop do not wait for the database
+        await asyncio.to_thread(tracker.emit, "accepted", files=["a.pdf"])
+
+        remote = serving.get(tracker.generation_id)
+        assert remote is not None
+        subscriber = asyncio.ensure_future(collect(remote))
+        await asyncio.sleep(0)
+        tracker.emit("files_extracted", done=1, total=1)
+        tracker.emit(COMPLETED, pdf_url="/documents/abc")
+        tracker.emit("pages_rendered")
+
+        events = await asyncio.wait_for(subscriber, timeout=5)
+        assert [e["event"] for e in events] == ["accepted", "files_extracted", COMPLETED]
+        assert [e["id"] for e in events] == [0, 1, 2]
+        assert events[0]["files"] == ["a.pdf"]
+        assert remote.finished
+
+    @pytest.mark.asyncio
+    async def test_one_connection_and_no_writes_on_the_event_loop(self, tmp_path):
+        """Emits from the loop are written by the store's thread on a shared connection."""
+        store = SQLiteProgressStore(tmp_path / "shared.db")
+        tracker = store.create()
+        with store._connect() as first:
+            pass
+        with store._connect() as second:
+            pass
+        assert first is second
+
+        writers = []
+        append = tracker._append
+        tracker._append = lambda *args: (writers.append(threading.current_thread().name), append(*args))[1]
+        tracker.emit("accepted")
+        tracker.emit(COMPLETED)
+        events = await collect(tracker)
+        assert [e["event"] for e in events] == ["accepted", COMPLETED]
+        assert all(name.startswith("progress-db") for name in writers)
+
+    def test_store_expires_old_generations(self, tmp_path):
+        """Generations older than the TTL are dropped from the database."""
+        store = SQLiteProgressStore(tmp_path / "shared.db", ttl=60)
+        old = store.create()
+        old.created -= 120
+        old.emit("accepted")
+        store.create()
+        other = SQLiteProgressStore(tmp_path / "shared.db", ttl=60)
+        assert other.get(old.generation_id) is None
+        assert SQLiteProgressStore(tmp_path / "missing.db").get("nope") is None
@@ -0,0 +1,179 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+
+import pytest
+
+import renderers
+from renderers import (
+    ChromiumRenderer,
+    Renderer,
+    WeasyPrintRenderer,
+    close_renderers,
+    get_renderer,
+    is_offline_url,
+    resolve_renderer_name,
+)
+
+
+class FakeRenderer(Renderer):
+    name = "fake"
+    closed = 0
+
+    def close(self):
+        FakeRenderer.closed += 1
+
+
+class BrokenRenderer(Renderer):
+    name = "broken"
+
+    def close(self):
+        raise RuntimeError("browser already gone")
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """Register mocked backends and start from an empty instance registry."""
+    monkeypatch.setitem(renderers.RENDERERS, FakeRenderer.name, FakeRenderer)
+    monkeypatch.setitem(renderers.RENDERERS, BrokenRenderer.name, BrokenRenderer)
+    monkeypatch.setattr(renderers, "_instances", {})
+    FakeRenderer.closed = 0
+
+
+class TestRendererSelection:
+    """Test suite for choosing a renderer backend."""
+
+    def test_explicit_name_wins_over_environment(self, monkeypatch):
+        """A per-request renderer overrides PDF_RENDERER."""
+        monkeypatch.setenv("PDF_RENDERER", "chromium")
+
+        assert resolve_renderer_name("weasyprint") == "weasyprint"
+
+    def test_falls_back_to_environment_then_chromium(self, monkeypatch):
+        """Without a name PDF_RENDERER is used, and Chromium without either."""
+        monkeypatch.setenv("PDF_RENDERER", "weasyprint")
+        assert resolve_renderer_name() == "weasyprint"
+
+        monkeypatch.delenv("PDF_RENDERER")
+        assert resolve_renderer_name(None) == "chromium"
+        assert resolve_renderer_name("") == "chromium"
+
+    def test_unknown_renderer_is_rejected(self, monkeypatch):
+        """Unknown names raise instead of silently using another backend."""
+        with pytest.raises(ValueError, match="Unknown renderer"):
+            resolve_renderer_name("wkhtmltopdf")
+
+        monkeypatch.setenv("PDF_RENDERER", "prince")
+        with pytest.raises(ValueError, match="prince"):
+            resolve_renderer_name()
+
+    def test_instances_are_shared_per_backend(self, fake_backends, monkeypatch):
+        """get_renderer returns one instance per backend, chosen by name or environment."""
+        monkeypatch.setenv("PDF_RENDERER", "fake")
+
+        first = get_renderer()
+        assert isinstance(first, FakeRenderer)
+        assert get_renderer("fake") is first
+        assert isinstance(get_renderer("broken"), BrokenRenderer)
+
+    def test_close_renderers_survives_failing_backend(self, fake_backends):
+        """One backend failing to close does not keep the others open."""
+        get_renderer("broken")
+        get_renderer("fake")
+
+        close_renderers()
+
+        assert FakeRenderer.closed == 1
+        assert renderers._instances == {}
+
+    def test_missing_backends_raise_import_error(self, monkeypatch):
+        """A backend whose dependency is missing says how to install it."""
+        monkeypatch.setattr(renderers, "launch", None)
+        monkeypatch.setattr(renderers, "weasyprint", None)
+
+        with pytest.raises(ImportError, match="pyppeteer"):
+            ChromiumRenderer()
+        with pytest.raises(ImportError, match="weasyprint"):
+            WeasyPrintRenderer()
+
+
+class TestOfflineRendering:
+    """Test suite for blocking network fetches while rendering."""
+
+    def test_offline_urls(self):
+        """Only embedded and local resources count as offline."""
+        assert is_offline_url("data:image/png;base64,AAAA")
+        assert is_offline_url("file:///app/examples/fonts/Inter.woff2")
+        assert is_offline_url("about:blank")
+        assert not is_offline_url("https://fonts.googleapis.com/css?family=Inter")
+        assert not is_offline_url("http://169.254.169.254/latest/meta-data/")
+        assert not is_offline_url("//cdn.example.com/logo.png")
+
+    def test_weasyprint_fetcher_blocks_external_urls(self, monkeypatch):
+        """The WeasyPrint url_fetcher refuses network URLs and defers to the default otherwise."""
+        default_fetcher = Mock(return_value={"string": b"", "mime_type": "image/png"})
+        monkeypatch.setattr(
+            renderers, "weasyprint", SimpleNamespace(default_url_fetcher=default_fetcher)
+        )
+
+        with pytest.raises(ValueError, match="Blocked network request"):
+            WeasyPrintRenderer._url_fetcher("https://example.com/tracker.png")
+        default_fetcher.assert_not_called()
+
+        result = WeasyPrintRenderer._url_fetcher("data:image/png;base64,AAAA", timeout=5)
+        assert result["mime_type"] == "image/png"
+        default_fetcher.assert_called_once_with("data:image/png;base64,AAAA", timeout=5)
+
+    def test_weasyprint_render_uses_offline_fetcher(self, monkeypatch):
+        """Renders pass the blocking fetcher and base URL to WeasyPrint."""
+        document = Mock()
+        document.write_pdf.return_value = b"%PDF-1.7"
+        fake = SimpleNamespace(HTML=Mock(return_value=document), default_url_fetcher=Mock())
+        monkeypatch.setattr(renderers, "weasyprint", fake)
+
+        pdf = WeasyPrintRenderer().render("<html></html>", base_url="/app/examples")
+
+        assert pdf == b"%PDF-1.7"
+        kwargs = fake.HTML.call_args.kwargs
+        assert kwargs["base_url"] == "/app/examples"
+        assert kwargs["url_fetcher"] == WeasyPrintRenderer._url_fetcher
+
+    @pytest.mark.asyncio
+    async def test_chromium_request_filter(self):
+        """Chromium aborts network requests and continues offline ones."""
+        external = SimpleNamespace(
+            url="https://example.com/font.woff2", continue_=AsyncMock(), abort=AsyncMock()
+        )
+        embedded = SimpleNamespace(
+            url="data:font/woff2;base64,AAAA", continue_=AsyncMock(), abort=AsyncMock()
+        )
+
+        await ChromiumRenderer._filter_request(external)
+        await ChromiumRenderer._filter_request(embedded)
+
+        external.abort.assert_awaited_once()
+        external.continue_.assert_not_awaited()
+        embedded.continue_.assert_awaited_once()
+        embedded.abort.assert_not_awaited()
+
+    def test_chromium_pages_intercept_requests(self, monkeypatch):
+        """Every Chromium page disables JavaScript and routes requests through the filter."""
+        page = Mock()
+        for method in ("setJavaScriptEnabled", "setRequestInterception", "setContent", "close"):
+            setattr(page, method, AsyncMock())
+        page.pdf = AsyncMock(return_value=b"%PDF-1.7")
+        browser = Mock(newPage=AsyncMock(return_value=page), close=AsyncMock())
+        monkeypatch.setattr(renderers, "launch", AsyncMock(return_value=browser))
+
+        renderer = ChromiumRenderer(timeout=5)
+        try:
+            pdf = renderer.render("<html><head></head></html>", base_url="/app/examples")
+        finally:
+            renderer.close()
+
+        assert pdf == b"%PDF-1.7"
+        page.setJavaScriptEnabled.assert_awaited_once_with(False)
+        page.setRequestInterception.assert_awaited_once_with(True)
+        assert page.on.call_args.args[0] == "request"
+        assert '<base href="file:///app/examples/">' in page.setContent.await_args.args[0]
+        page.close.assert_awaited_once()
+        browser.close.assert_awaited_once()
@@ -0,0 +1,118 @@
+import os
+import time
+
+import pytest
+
+from retrieval_index import (
+    IndexCache,
+    RetrievalIndex,
+    chunk_text,
+    group_retriever,
+    split_sections,
+)
+from field_extraction import FieldGroup
+
+
+def context(*files):
+    sections = [f"=== File: {name} ===\n{text}" for name, text in files]
+    return "Successfully processed files.\n\n" + "=" * 50 + "\n\n".join(sections) + "\n\n" + "=" * 50
+
+
+CONTEXT = context(
+    ("rfp.pdf", "The customer struggles with manual invoice processing.\nErrors cause payment delays."),
+    ("proposal.docx", "Our approach has three phases: discovery, build and rollout.\nEach phase takes four weeks."),
+    ("company.txt", "Acme was founded in 2001 and has 200 consultants."),
+)
+
+
+class TestChunking:
+    """Test suite for splitting the context into passages."""
+
+    def test_split_sections_per_file(self):
+        """File headers and separator lines are removed from the sections."""
+        sections = split_sections(CONTEXT)
+        assert [name for name, _ in sections] == ["rfp.pdf", "proposal.docx", "company.txt"]
+        assert sections[2][1] == "Acme was founded in 2001 and has 200 consultants."
+
+    def test_long_lines_are_windowed_with_overlap(self):
+        """A line longer than a passage is cut into overlapping windows."""
+        words = [f"w{i}" for i in range(25)]
+        chunks = chunk_text(" ".join(words), chunk_words=10, overlap_words=2)
+        assert chunks[0].split() == words[:10]
+        assert chunks[1].split()[0] == "w8"
+        assert chunks[-1].split()[-1] == "w24"
+
+    def test_lines_are_grouped(self):
+        """Short lines are kept together up to the passage size."""
+        chunks = chunk_text("one two\nthree four\nfive six", chunk_words=4)
+        assert chunks == ["one two\nthree four", "five six"]
+
+
+class TestRetrievalIndex:
+    """Test suite for BM25 passage retrieval."""
+
+    def test_search_ranks_relevant_passage_first(self):
+        """The passage sharing the query terms wins."""
+        index = RetrievalIndex.build(CONTEXT)
+        hits = index.search("phases of the delivery approach", k=2)
+        assert hits[0][0].filename == "proposal.docx"
+        assert all(score > 0 for _, score in hits)
+        assert index.search("zebra") == []
+
+    def test_context_for_keeps_file_headers(self):
+        """Retrieved passages are labelled with their file."""
+        index = RetrievalIndex.build(CONTEXT)
+        passages = index.context_for("invoice errors", k=1)
+        assert passages.startswith("=== File: rfp.pdf (passage 1) ===")
+        assert "Acme" not in passages
+
+    def test_group_retriever_uses_group_query(self):
+        """Field groups are searched by their query, or their field names."""
+        retrieve = group_retriever(RetrievalIndex.build(CONTEXT), k=1)
+        assert "Acme" in retrieve(FieldGroup("about", ("about",), query="company founded"))
+        assert "approach" in retrieve(FieldGroup("approach", ("approach",)))
+        assert group_retriever(None)(FieldGroup("about", ("about",))) is None
+
+    def test_cache_round_trip(self, tmp_path):
+        """Indexes are cached by content hash, in memory and on disk."""
+        cache = IndexCache(tmp_path)
+        index = cache.get_or_build(CONTEXT)
+        assert cache.get_or_build(CONTEXT) is index
+        assert len(list(tmp_path.glob("*.npz"))) == 1
+
+        loaded = IndexCache(tmp_path).get_or_build(CONTEXT)
+        assert loaded is not index
+        assert loaded.chunks == index.chunks
+        assert [c for c, _ in loaded.search("invoice")] == [c for c, _ in index.search("invoice")]
+
+    def test_cache_evicts_least_recently_used_over_budget(self, tmp_path):
+        """Index files beyond max_bytes are removed, least recently used first."""
+        cache = IndexCache(tmp_path, max_memory_entries=0)
+        cache.get_or_build(CONTEXT)
+        (first,) = tmp_path.glob("*.npz")
+        os.utime(first, (time.time() - 60, time.time()))
+
+        cache.max_bytes = first.stat().st_size * 3 // 2
+        cache.get_or_build(CONTEXT + "\nA second upload.")
+
+        files = list(tmp_path.glob("*.npz"))
+        assert len(files) == 1 and files[0] != first
+
+    def test_cache_expires_old_files(self, tmp_path):
+        """Index files older than the TTL are rebuilt on use and removed by a sweep."""
+        cache = IndexCache(tmp_path, max_memory_entries=0, ttl=3600)
+        cache.get_or_build(CONTEXT)
+        (path,) = tmp_path.glob("*.npz")
+        old = time.time() - 7200
+        os.utime(path, (old, old))
+
+        cache.get_or_build(CONTEXT)
+        assert path.stat().st_mtime > old
+
+        os.utime(path, (old, old))
+        cache.evict()
+        assert not path.exists()
+
+    def test_empty_context(self):
+        """An empty context builds an index with no hits."""
+        assert RetrievalIndex.build("").search("anything") == []
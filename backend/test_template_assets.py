@@ -0,0 +1,44 @@
+from jinja2 import Environment
+
+from template_assets import AssetInliningLoader, inline_assets, minify_css, process_template_source
+
+
+class TestMinifyCss:
+    """Test suite for CSS minification."""
+
+    def test_strips_comments_and_whitespace(self):
+        """Comments, indentation and trailing semicolons are removed."""
+        css = "/* header */\n.a > .b {\n    color: red;\n    margin: 0 auto;\n}\n"
+        assert minify_css(css) == ".a>.b{color:red;margin:0 auto}"
+
+    def test_jinja_tags_are_preserved(self):
+        """Jinja tags inside style blocks survive minification."""
+        source = "<style>\n.a {  color: red; }\n{% block extra_styles %}\n.b { top: 0; }\n{% endblock %}\n</style>"
+        result = process_template_source(source, base_dir=None)
+        assert result == "<style>.a{color:red}{% block extra_styles %}.b{top:0}{% endblock %}</style>"
+
+
+class TestInlineAssets:
+    """Test suite for asset embedding."""
+
+    def test_local_assets_become_data_uris(self, tmp_path):
+        """Local url() and src references are embedded; remote ones are left alone."""
+        (tmp_path / "logo.png").write_bytes(b"\x89PNG")
+        text = (
+            '.x{background:url("logo.png")}'
+            '<img src="logo.png"><img src="https://example.com/a.png"><img src="{{ url }}">'
+        )
+
+        result = inline_assets(text, tmp_path)
+
+        assert 'url("data:image/png;base64,iVBORw==")' in result
+        assert '<img src="data:image/png;base64,iVBORw==">' in result
+        assert '<img src="https://example.com/a.png">' in result
+        assert '<img src="{{ url }}">' in result
+
+    def test_loader_serves_processed_source(self, tmp_path):
+        """Templates loaded through the loader are rendered from processed source."""
+        (tmp_path / "page.html").write_text("<style>\n  p { color: blue; }\n</style><p>{{ name }}</p>")
+        env = Environment(loader=AssetInliningLoader(str(tmp_path)))
+
+        assert env.get_template("page.html").render(name="x") == "<style>p{color:blue}</style><p>x</p>"
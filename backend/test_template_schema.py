@@ -0,0 +1,91 @@
+from typing import List, Optional
+
+from jinja2 import DictLoader, Environment
+from pydantic import BaseModel
+
+from template_schema import analyze_template, reconcile
+
+TEMPLATES = {
+    "base.html": "<title>{% block title %}{{ site.name }}{% endblock %}</title>{% block content %}{% endblock %}",
+    "page.html": (
+        '{% extends "base.html" %}'
+        "{% block title %}{{ data.title }}{% endblock %}"
+        "{% block content %}"
+        "{% if options.show_intro %}{{ data.intro }}{% endif %}"
+        "{% for feature in data.features %}{{ feature.title }}"
+        "{% for sub in feature.subs|sort %}{{ sub }}{% endfor %}{% endfor %}"
+        "{% for key in data.numbers %}{{ data.numbers[key] }}{{ loop.index }}{% endfor %}"
+        "{% set story = data.story %}"
+        "{% if story %}{{ story.client }}{% endif %}"
+        "{% include 'footer.html' %}"
+        "{% endblock %}"
+    ),
+    "footer.html": "{{ data['contact'] }}{% for label, url in data.links.items() %}{{ url }}{% endfor %}",
+}
+
+
+def schema():
+    return analyze_template(Environment(loader=DictLoader(TEMPLATES)), "page.html")
+
+
+class Feature(BaseModel):
+    title: str
+
+
+class BriefModel(BaseModel):
+    title: str
+    features: List[Feature] = []
+    summary: Optional[str] = None
+
+
+class TestAnalyzeTemplate:
+    """Test suite for collecting the variable paths a template reads."""
+
+    def test_paths_follow_loops_aliases_and_includes(self):
+        """Loop variables, set aliases and included templates resolve to data paths."""
+        paths = schema().paths
+        assert {
+            "data.title",
+            "data.intro",
+            "options.show_intro",
+            "data.features[].title",
+            "data.features[].subs[]",
+            "data.numbers[*]",
+            "data.story.client",
+            "data.contact",
+            "data.links[*]",
+        } <= paths
+        assert not any(path.startswith(("loop", "sub", "feature", "story")) for path in paths)
+
+    def test_overridden_parent_blocks_are_skipped(self):
+        """A parent block replaced by the child template is never rendered."""
+        assert "site.name" not in schema().paths
+
+    def test_fields_under_root(self):
+        """Paths are grouped by top-level field with their sub-paths."""
+        fields = schema().fields("data")
+        assert fields["features"] >= {"", "[].title", "[].subs[]"}
+        assert fields["title"] == {""}
+
+
+class TestReconcile:
+    """Test suite for comparing a model with its template."""
+
+    def test_report(self):
+        """Rendered, unused and missing fields and never-rendered branches are reported."""
+        report = reconcile(BriefModel, schema(), "data", sources={"intro": ("summary",)}, defaults=("contact",))
+        assert report.rendered == ("title", "features", "summary")
+        assert report.unused == ()
+        assert "features[].subs[]" in report.missing
+        assert {"story", "numbers", "links"} <= set(report.missing)
+        assert "contact" not in report.missing and "intro" not in report.missing
+        # The story branch tests a missing field; the intro branch tests an option
+        dead = {path for branch in report.dead_branches for path in branch.paths}
+        assert dead == {"data.story"}
+        assert report.warnings()
+
+    def test_unused_fields(self):
+        """Model fields the template never reads are not worth requesting."""
+        report = reconcile(BriefModel, schema(), "data")
+        assert report.unused == ("summary",)
+        assert "summary" not in report.rendered
@@ -0,0 +1,146 @@
+"""
+Benchmark and equivalence check for ProjectModel string sanitisation.
+
+Compares the fast sanitiser in model.py against calling bleach.clean on every
+string, on an adversarial corpus (tags, scripts, comments, entities, broken
+markup, control characters, unicode) plus plain marketing copy. Exits non-zero
+if any output differs from bleach.
+
+Usage:
+    python bench_sanitize.py [iterations]
+"""
+
+import random
+import sys
+import time
+from typing import List
+
+import bleach
+
+from model import ALLOWED_ATTRIBUTES, ALLOWED_TAGS, ProjectModel, _bleach_clean, _clean_str
+
+
+def reference_clean(s: str) -> str:
+    return bleach.clean(s.strip(), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES, strip=True)
+
+
+ADVERSARIAL = [
+    "<script>alert(1)</script>",
+    "<SCRIPT SRC=//evil.example/x.js></SCRIPT>",
+    "<img src=x onerror=alert(1)>",
+    "<a href=\"javascript:alert('x')\">click</a>",
+    "<b>bold</b> and <i>italic</i>",
+    "<!-- comment --> visible",
+    "<!--> tricky -->",
+    "<![CDATA[ data ]]>",
+    "<style>body{color:red}</style>text",
+    "<div title=\">\">quoted</div>",
+    "unclosed <b tag",
+    "a < b > c",
+    "1 <3 you",
+    "<<script>script>alert(1)<</script>/script>",
+    "<svg/onload=alert(1)>",
+    "<iframe src=//evil></iframe>",
+    "AT&T and R&D",
+    "&amp; &lt; &gt; &quot; &#39; &#x27;",
+    "&nbsp;&copy;&notanentity;",
+    "&#0; &#xD800; &#1114112;",
+    "café — naïve “quotes”",
+    "‮RTL override",
+    "null\x00byte",
+    "vertical\x0btab and form\x0cfeed",
+    "windows\r\nline\rendings",
+    "bell\x07 and escape\x1b[31m",
+    "\t  padded with whitespace \n ",
+    "</p></div></body></html>",
+    "<math><mi xlink:href=\"data:x\">m</mi></math>",
+    "<noscript><p title=\"</noscript><img src=x onerror=alert(1)>\">",
+    "<textarea><b>inside</b></textarea>",
+    "<p>nested <span><em>deep</em></span></p>",
+    "greater > than only",
+]
+
+PLAIN = [
+    "Accelerate your cloud migration",
+    "Reduce operational costs by up to 40%",
+    "Our proven four-phase methodology",
+    "Schedule a discovery workshop with our architects",
+    "Legacy infrastructure slows down innovation",
+]
+
+
+def fuzz_corpus(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    alphabet = "<>&;#/!-=\"' abcxyz0123\r\n\t\x00\x0bé"
+    pieces = ["<b>", "</b>", "<script>", "</script>", "&amp;", "&lt", "<!--", "-->", "<a href='", "'>"]
+    corpus = []
+    for _ in range(count):
+        parts = []
+        for _ in range(rng.randint(1, 12)):
+            if rng.random() < 0.3:
+                parts.append(rng.choice(pieces))
+            else:
+                parts.append("".join(rng.choice(alphabet) for _ in range(rng.randint(1, 6))))
+        corpus.append("".join(parts))
+    return corpus
+
+
+def check_equivalence(corpus: List[str]) -> int:
+    mismatches = 0
+    for s in corpus:
+        expected = reference_clean(s)
+        actual = _clean_str(s)
+        if actual != expected:
+            mismatches += 1
+            print(f"MISMATCH {s!r}: fast={actual!r} bleach={expected!r}")
+    return mismatches
+
+
+def time_it(fn, corpus: List[str], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        for s in corpus:
+            fn(s)
+    return time.perf_counter() - start
+
+
+def model_payload() -> dict:
+    return {
+        "title": PLAIN[0],
+        "intro": PLAIN[1] + " " + ADVERSARIAL[16],
+        "problem": PLAIN[:4] + ADVERSARIAL[:2],
+        "solution_desc": PLAIN[2],
+        "implementation": PLAIN[3],
+        "approach": PLAIN,
+        "about": PLAIN[4],
+        "getting_started": PLAIN[3],
+    }
+
+
+def main() -> int:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    corpus = ADVERSARIAL + PLAIN + fuzz_corpus(2000)
+
+    mismatches = check_equivalence(corpus)
+    print(f"Equivalence: {len(corpus) - mismatches}/{len(corpus)} strings match bleach")
+
+    mixed = ADVERSARIAL + PLAIN * 6
+    bleach_time = time_it(reference_clean, mixed, iterations)
+    _bleach_clean.cache_clear()
+    cold_time = time_it(_clean_str, mixed, 1) * iterations
+    warm_time = time_it(_clean_str, mixed, iterations)
+    print(f"bleach.clean per string:  {bleach_time:.4f}s")
+    print(f"fast sanitiser (cold):    {cold_time:.4f}s  ({bleach_time / cold_time:.1f}x)")
+    print(f"fast sanitiser (cached):  {warm_time:.4f}s  ({bleach_time / warm_time:.1f}x)")
+
+    payload = model_payload()
+    start = time.perf_counter()
+    for _ in range(iterations * 10):
+        ProjectModel(**payload)
+    print(f"ProjectModel validations: {iterations * 10} in {time.perf_counter() - start:.4f}s")
+
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
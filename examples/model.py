@@ -1,4 +1,6 @@
-from typing import Optional, List, Dict, Any
+import re
+from functools import lru_cache
+from typing import Optional, List, Dict, Any, Callable, ClassVar
 
 import bleach
 from pydantic import BaseModel, Field, root_validator, model_validator
@@ -7,15 +9,35 @@ from pydantic import BaseModel, Field, root_validator, model_validator
 ALLOWED_TAGS: List[str] = []          # no HTML tags
 ALLOWED_ATTRIBUTES: Dict[str, List[str]] = {}
 
-def _clean_str(s: str) -> str:
-    # trim then strip any HTML/JS
+# Characters bleach changes when no tags are allowed: markup and entity
+# delimiters, plus the C0 controls html5lib drops or replaces (tab and
+# newline are kept). A string without any of them comes back unchanged.
+_BLEACH_SPECIAL = re.compile(r"[\x00-\x08\x0b-\x1f&<>]")
+# Same set without ">": if only ">" is present it is simply escaped.
+_BLEACH_MARKUP = re.compile(r"[\x00-\x08\x0b-\x1f&<]")
+
+
+@lru_cache(maxsize=4096)
+def _bleach_clean(s: str) -> str:
     return bleach.clean(
-        s.strip(),
+        s,
         tags=ALLOWED_TAGS,
         attributes=ALLOWED_ATTRIBUTES,
         strip=True
     )
 
+
+def _clean_str(s: str) -> str:
+    # trim then strip any HTML/JS; only strings that bleach would actually
+    # change pay for the html5lib parse, and repeated values hit the cache
+    s = s.strip()
+    if not _BLEACH_SPECIAL.search(s):
+        return s
+    if not _BLEACH_MARKUP.search(s):
+        return s.replace(">", "&gt;")
+    return _bleach_clean(s)
+
+
 class ProjectModel(BaseModel):
     title: str = Field(..., description="Project title")
     intro: str = Field(..., description="Introduction text")
@@ -33,6 +55,10 @@ class ProjectModel(BaseModel):
     about: str = Field(..., description="About section")
     getting_started: str = Field(..., description="Getting started guide")
 
+    # Per-field sanitiser overrides; fields not listed use _clean_str
+    # (e.g. str.strip for a field that is never rendered as markup).
+    field_sanitizers: ClassVar[Dict[str, Callable[[str], str]]] = {}
+
     class Config:
         # This allows the model to work with both snake_case and original field names
         populate_by_name = True
@@ -50,11 +76,12 @@ class ProjectModel(BaseModel):
         """
         sanitized: Dict[str, Any] = {}
         for k, v in values.items():
+            clean = cls.field_sanitizers.get(k, _clean_str)
             if isinstance(v, str):
-                sanitized[k] = _clean_str(v)
+                sanitized[k] = clean(v)
             elif isinstance(v, list):
                 sanitized[k] = [
-                    _clean_str(item) if isinstance(item, str) else item
+                    clean(item) if isinstance(item, str) else item
                     for item in v
                 ]
             else:
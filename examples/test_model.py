@@ -0,0 +1,50 @@
+import pytest
+
+bleach = pytest.importorskip("bleach")
+
+from bench_sanitize import ADVERSARIAL, fuzz_corpus, reference_clean
+from model import ProjectModel, _clean_str
+
+# Inputs the fast paths in _clean_str decide on without asking bleach
+EDGE_CASES = [
+    "&", "<", ">", "&&", "<<", ">>", "a & b", "a > b", "x<y", "<>", "&;", "&#",
+    "&amp", "&lt;", "&GT;", "&#60;", "&#x3c;", "&#x3C;script&#x3E;", "&unknown;",
+    "\x00", "\x01<b>", "\x08", "\x0b", "\x0c", "\x1b", "\x1f", "\x7f", "\x85", " ",
+    "tab\tand\nnewline", "  > padded  ", "\r\n<b>\r\n",
+]
+
+REQUIRED = {
+    "title": "Brief",
+    "intro": "Intro",
+    "solution_desc": "Solution",
+    "implementation": "Implementation",
+    "about": "About",
+    "getting_started": "Getting started",
+}
+
+
+class TestCleanStr:
+    """Test suite for the fast ProjectModel sanitiser against bleach."""
+
+    @pytest.mark.parametrize("value", ADVERSARIAL + EDGE_CASES)
+    def test_matches_bleach(self, value):
+        """Entities, lone delimiters, control characters and markup come out as bleach leaves them."""
+        assert _clean_str(value) == reference_clean(value)
+
+    def test_matches_bleach_on_fuzzed_input(self):
+        """Random mixes of markup pieces and delimiters match bleach too."""
+        for value in fuzz_corpus(500, seed=29):
+            assert _clean_str(value) == reference_clean(value), value
+
+    def test_markup_split_across_fields(self):
+        """A tag split over two fields or list items is cleaned per value, as bleach would."""
+        parts = ["<scr", "ipt>alert(1)</script>", "<img src=x on", "error=alert(1)>", "&am", "p;"]
+        model = ProjectModel(
+            **{**REQUIRED, "title": parts[0], "intro": parts[1]},
+            problem=parts[2:4],
+            approach=parts[4:],
+        )
+
+        assert [model.title, model.intro] == [reference_clean(p) for p in parts[:2]]
+        assert model.problem == [reference_clean(p) for p in parts[2:4]]
+        assert model.approach == [reference_clean(p) for p in parts[4:]]
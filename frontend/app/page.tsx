@@ -1,57 +1,86 @@
 "use client";
 
-import { useState } from "react";
-import axios from "axios";
+import { useEffect, useRef, useState } from "react";
 import { Document, Page } from "react-pdf";
 import "react-pdf/dist/esm/Page/AnnotationLayer.css";
+import { API_URL, ProgressEvent, followGeneration, startGeneration } from "@/lib/api";
+
+const STEP_LABELS: Record<string, string> = {
+  queued: "Queued",
+  files_extracted: "Extracting documents",
+  pages_extracted: "Reading pages",
+  model_started: "Writing the brief",
+  fields_completed: "Brief content ready",
+  pages_rendered: "Rendering pages",
+  pdf_optimized: "Optimising the PDF",
+  render_cached: "Reusing a previous render",
+};
+
+// Load the preview with range requests: the server sends linearised PDFs,
+// so the first page can be shown before the whole file has arrived
+const PDF_OPTIONS = { disableAutoFetch: true, disableStream: true };
+
+function describe(event: ProgressEvent): string {
+  const label = STEP_LABELS[event.event] ?? event.event;
+  if (event.done !== undefined && event.total !== undefined) {
+    return `${label} (${event.done}/${event.total})`;
+  }
+  return label;
+}
 
 export default function Home() {
-  const [file, setFile] = useState<File | null>(null);
+  const [files, setFiles] = useState<File[]>([]);
   const [pdfUrl, setPdfUrl] = useState<string | null>(null);
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [progress, setProgress] = useState<string | null>(null);
+  const stopFollowing = useRef<(() => void) | null>(null);
+
+  useEffect(() => () => stopFollowing.current?.(), []);
 
   const handleFileChange = (event: React.ChangeEvent<HTMLInputElement>) => {
-    const selectedFile = event.target.files?.[0];
-    if (selectedFile && selectedFile.type === "application/vnd.openxmlformats-officedocument.wordprocessingml.document") {
-      setFile(selectedFile);
+    const selected = Array.from(event.target.files ?? []);
+    if (selected.length > 0) {
+      setFiles(selected);
       setError(null);
     } else {
-      setError("Please upload a valid .docx file.");
+      setError("Please select at least one document.");
     }
   };
 
-  const uploadWithRetry = async (retries: number = 3): Promise<void> => {
-    if (!file) {
+  const handleUpload = async () => {
+    if (files.length === 0) {
       setError("No file selected.");
       return;
     }
 
     setLoading(true);
     setError(null);
+    setPdfUrl(null);
+    setProgress("Uploading");
 
-    const formData = new FormData();
-    formData.append("file", file);
-
-    for (let attempt = 1; attempt <= retries; attempt++) {
-      try {
-        const response = await axios.post("http://localhost:8000/generate_document", formData, {
-          headers: { "Content-Type": "multipart/form-data" },
-        });
-        setPdfUrl(response.data.pdf_url);
-        return;
-      } catch (err) {
-        if (attempt === retries) {
-          setError("Failed to generate PDF after multiple attempts. Please try again later.");
+    try {
+      // One request per click: progress comes from the event stream, which
+      // resumes after dropped connections instead of re-running the pipeline
+      const eventsUrl = await startGeneration(files);
+      stopFollowing.current = followGeneration(eventsUrl, (event) => {
+        if (event.event === "completed") {
+          setPdfUrl(`${API_URL}${event.pdf_url}`);
+          setProgress(null);
+          setLoading(false);
+        } else if (event.event === "failed") {
+          setError(event.error ?? "Failed to generate PDF.");
+          setProgress(null);
+          setLoading(false);
+        } else {
+          setProgress(describe(event));
         }
-      }
+      });
+    } catch {
+      setError("Failed to start PDF generation. Please try again later.");
+      setProgress(null);
+      setLoading(false);
     }
-
-    setLoading(false);
-  };
-
-  const handleUpload = () => {
-    uploadWithRetry();
   };
 
   return (
@@ -60,7 +89,8 @@ export default function Home() {
       <div className="w-full max-w-md">
         <input
           type="file"
-          accept=".docx"
+          multiple
+          accept=".docx,.pdf,.txt,.md,.html,.xlsx,.png,.jpg,.jpeg"
           onChange={handleFileChange}
           className="block w-full text-sm text-gray-500 file:mr-4 file:py-2 file:px-4 file:rounded-full file:border-0 file:text-sm file:font-semibold file:bg-blue-50 file:text-blue-700 hover:file:bg-blue-100"
         />
@@ -70,15 +100,16 @@ export default function Home() {
           disabled={loading}
           className="mt-4 w-full bg-blue-500 text-white py-2 px-4 rounded hover:bg-blue-600 disabled:bg-gray-400"
         >
-          {loading ? "Uploading..." : "Generate PDF"}
+          {loading ? "Generating..." : "Generate PDF"}
         </button>
+        {progress && <p className="text-gray-600 text-sm mt-2">{progress}…</p>}
       </div>
 
       {pdfUrl && (
         <div className="mt-8 w-full max-w-2xl">
           <h2 className="text-lg font-semibold mb-4">PDF Preview</h2>
           <div className="border p-4">
-            <Document file={pdfUrl}>
+            <Document file={pdfUrl} options={PDF_OPTIONS}>
               <Page pageNumber={1} />
             </Document>
           </div>
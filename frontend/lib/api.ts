@@ -0,0 +1,68 @@
+import axios from "axios";
+
+export const API_URL = process.env.NEXT_PUBLIC_API_URL ?? "http://localhost:8000";
+
+export type ProgressEvent = {
+  id: number;
+  event: string;
+  done?: number;
+  total?: number;
+  file?: string;
+  fields?: string[];
+  pdf_url?: string;
+  error?: string;
+};
+
+const EVENT_TYPES = [
+  "queued",
+  "files_extracted",
+  "pages_extracted",
+  "model_started",
+  "fields_completed",
+  "pages_rendered",
+  "pdf_optimized",
+  "render_cached",
+  "completed",
+  "failed",
+];
+
+/** Upload the documents and start a generation; returns its events URL. */
+export async function startGeneration(files: File[]): Promise<string> {
+  const formData = new FormData();
+  files.forEach((file) => formData.append("files", file));
+  const response = await axios.post(`${API_URL}/generations`, formData);
+  return `${API_URL}${response.data.events_url}`;
+}
+
+/**
+ * Follow a generation's progress events until it completes or fails.
+ *
+ * EventSource reconnects on its own after network errors, sending the last
+ * event id, so a dropped connection resumes the same generation instead of
+ * starting a new one. If the server refuses the stream, `onEvent` gets a
+ * `failed` event.
+ */
+export function followGeneration(
+  eventsUrl: string,
+  onEvent: (event: ProgressEvent) => void,
+): () => void {
+  const source = new EventSource(eventsUrl);
+  EVENT_TYPES.forEach((type) =>
+    source.addEventListener(type, (message) => {
+      const data = JSON.parse((message as MessageEvent).data);
+      onEvent({ ...data, id: Number((message as MessageEvent).lastEventId), event: type });
+      if (type === "completed" || type === "failed") {
+        source.close();
+      }
+    }),
+  );
+  // Network errors leave the source CONNECTING while it retries; it is only
+  // CLOSED when the server refused the stream (e.g. 404 after a restart lost
+  // the generation), which it will not retry
+  source.onerror = () => {
+    if (source.readyState === EventSource.CLOSED) {
+      onEvent({ id: -1, event: "failed", error: "Lost track of the generation. Please try again." });
+    }
+  };
+  return () => source.close();
+}